@@ -6,9 +6,28 @@ Lightweight User class for SQLite-based authentication (transitional)
 NOTE: This is a simplified version for blueprint migration.
       The full SQLAlchemy models exist in user.py for future migration.
 """
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
 from flask_login import UserMixin
-import sqlite3
-from app.utils.db import DB_PATH
+from app.utils.db import get_db
+
+log = logging.getLogger(__name__)
+
+
+def _cache_ttl() -> float:
+    try:
+        return min(3600.0, max(0.0, float(os.getenv('USER_CACHE_TTL', '60'))))
+    except ValueError:
+        return 60.0
+
+
+# user_id -> (loaded_at, user or None); read by every authenticated request
+_USER_CACHE: Dict[str, Tuple[float, Optional['SimpleUser']]] = {}
+_USER_CACHE_LOCK = threading.Lock()
 
 
 class SimpleUser(UserMixin):
@@ -37,7 +56,13 @@ class SimpleUser(UserMixin):
 
 
 def load_user_from_db(user_id):
-    """Load user from SQLite database (Flask-Login user_loader helper)
+    """Load user for the Flask-Login user_loader (cached)
+
+    Every authenticated request (page views, SSE reconnects, API polls,
+    downloads) goes through here, so rows are cached in-process for
+    USER_CACHE_TTL seconds (default 60, 0 disables). Call invalidate_user()
+    after changing a user's row; the TTL only bounds staleness for writes
+    from other processes.
 
     Args:
         user_id: User ID to load
@@ -45,16 +70,43 @@ def load_user_from_db(user_id):
     Returns:
         SimpleUser: User object or None if not found
     """
+    key = str(user_id)
+    ttl = _cache_ttl()
+    now = time.monotonic()
+    if ttl > 0:
+        with _USER_CACHE_LOCK:
+            cached = _USER_CACHE.get(key)
+        if cached is not None and now - cached[0] < ttl:
+            return cached[1]
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        row = cur.execute(
-            "SELECT id, username, role FROM users WHERE id=?",
-            (user_id,)
-        ).fetchone()
-        conn.close()
-        if row:
-            return SimpleUser(row[0], row[1], row[2])
-    except Exception:
-        pass
-    return None
+        conn = get_db()
+        try:
+            row = conn.execute(
+                "SELECT id, username, role FROM users WHERE id=?",
+                (user_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except Exception as exc:
+        log.debug("[simple_user] user lookup failed", extra={'user_id': user_id, 'error': str(exc)})
+        return None
+    user = SimpleUser(row[0], row[1], row[2]) if row else None
+    if ttl > 0:
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[key] = (now, user)
+    return user
+
+
+def remember_user(user: SimpleUser) -> None:
+    """Seed the cache with a user just loaded elsewhere (e.g. at login)."""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE[str(user.id)] = (time.monotonic(), user)
+
+
+def invalidate_user(user_id=None) -> None:
+    """Drop one cached user (all users when ``user_id`` is None) after a user/role change."""
+    with _USER_CACHE_LOCK:
+        if user_id is None:
+            _USER_CACHE.clear()
+        else:
+            _USER_CACHE.pop(str(user_id), None)
@@ -12,8 +12,11 @@ import sqlite3
 import json
 from app.utils.db import DB_PATH, get_db
 from datetime import datetime
-from app.utils.crypto import encrypt_credential, decrypt_credential
+from app.utils.crypto import encrypt_credential, decrypt_credential, invalidate_credentials
+from app.utils.imap_batch import fetch_envelopes, move_uids, search_uids
+from app.services import imap_providers, message_summary
 from app.extensions import limiter, csrf
+from app.services import stats as stats_cache
 import csv
 from io import StringIO
 import socket
@@ -48,6 +51,13 @@ def _to_int(val, default=None):
         return default
 
 
+def _provider_unavailable(exc: imap_providers.ProviderUnavailable):
+    """503 + Retry-After when the IMAP provider budget or circuit refuses a connection."""
+    resp = jsonify({'success': False, 'error': str(exc), 'retry_after': round(exc.retry_after, 1)})
+    resp.headers['Retry-After'] = str(max(1, int(exc.retry_after + 0.999)))
+    return resp, 503
+
+
 def _compute_watcher_state(account_id: int, *, conn: Optional[sqlite3.Connection] = None) -> dict:
     """Inspect thread + DB state for a watcher and return diagnostic fields."""
     thread_alive = False
@@ -214,6 +224,8 @@ def api_accounts_bulk_delete():
         deleted = cur.rowcount if cur.rowcount is not None else len(id_list)
     finally:
         conn.close()
+    for aid in id_list:
+        invalidate_credentials(aid)
     return jsonify({'success': True, 'deleted': deleted, 'ids': id_list})
 
 
@@ -301,6 +313,7 @@ def api_account_crud(account_id):
         if fields:
             fields.append('updated_at = CURRENT_TIMESTAMP'); values.append(account_id)
             cur.execute(f"UPDATE email_accounts SET {', '.join(fields)} WHERE id = ?", values); conn.commit()
+            invalidate_credentials(account_id)
         conn.close(); return jsonify({'success': True})
 
     # DELETE
@@ -308,6 +321,7 @@ def api_account_crud(account_id):
         return jsonify({'error': 'Admin access required'}), 403
     conn = sqlite3.connect(DB_PATH); cur = conn.cursor()
     cur.execute("DELETE FROM email_accounts WHERE id=?", (account_id,)); conn.commit(); conn.close()
+    invalidate_credentials(account_id)
     return jsonify({'success': True})
 
 
@@ -350,6 +364,7 @@ def api_update_credentials(account_id: int):
             cur = conn.cursor()
             cur.execute(sql, values)
             conn.commit()
+        invalidate_credentials(account_id)
         return jsonify({'ok': True, 'success': True})
     except Exception as e:
         return jsonify({'ok': False, 'success': False, 'error': str(e)}), 500
@@ -376,7 +391,11 @@ def api_reset_circuit(account_id: int):
             WHERE id = ?
         """, (account_id,))
         conn.commit()
+        row = cur.execute("SELECT imap_host FROM email_accounts WHERE id=?", (account_id,)).fetchone()
         conn.close()
+        if row and row[0]:
+            # Also close the shared provider circuit so the next connect is admitted
+            imap_providers.get_registry().reset(row[0])
         return jsonify({'ok': True, 'success': True})
     except Exception as e:
         conn.close()
@@ -402,8 +421,8 @@ def api_test_account(account_id):
 
     # Decrypt credentials
     try:
-        imap_pwd = decrypt_credential(acc['imap_password'])
-        smtp_pwd = decrypt_credential(acc['smtp_password'])
+        imap_pwd = decrypt_credential(acc['imap_password'], account_id=account_id)
+        smtp_pwd = decrypt_credential(acc['smtp_password'], account_id=account_id)
     except Exception as e:
         conn.close()
         return jsonify({
@@ -558,7 +577,7 @@ def api_imap_live_test(account_id: int):
     if not acc:
         conn.close(); return jsonify({'success': False, 'error': 'Account not found'}), 404
     host, port, user = acc['imap_host'], _to_int(acc['imap_port'], 993), acc['imap_username'] or acc['email_address']
-    pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+    pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
     if not (host and user):
         conn.close(); return jsonify({'success': False, 'error': 'IMAP credentials missing'}), 400
     if pwd is None:
@@ -567,12 +586,13 @@ def api_imap_live_test(account_id: int):
     # Build unique probe
     probe_id = f"probe-{account_id}-{int(time.time())}"
     msg = EmailMessage(); msg['From']=user; msg['To']=user; msg['Subject']=f"[EMT-PROBE] {probe_id}"; msg.set_content('probe')
+    imap = None
     try:
         import imaplib, imaplib as _imap
         if port == 993:
-            imap = imaplib.IMAP4_SSL(host, port)
+            imap = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port))
         else:
-            imap = imaplib.IMAP4(host, port)
+            imap = imap_providers.open_connection(host, lambda: imaplib.IMAP4(host, port))
             try: imap.starttls()
             except (imaplib.IMAP4.error, OSError) as e:
                 log.warning("[accounts::probe] STARTTLS failed (non-SSL port, continuing)", extra={'account_id': account_id, 'error': str(e)})
@@ -580,11 +600,14 @@ def api_imap_live_test(account_id: int):
         import time as _t
         date_param = imaplib.Time2Internaldate(_t.localtime())
         imap.append('INBOX', '', date_param, msg.as_bytes())
-        imap.logout()
         log.debug("[accounts::probe] appended probe message", extra={'account_id': account_id, 'probe_id': probe_id})
+    except imap_providers.ProviderUnavailable as e:
+        conn.close(); return _provider_unavailable(e)
     except (imaplib.IMAP4.error, OSError) as e:
         log.error(f"[accounts::probe] IMAP append failed for account {account_id}: {e}")
         conn.close(); return jsonify({'success': False, 'error': f'IMAP append failed: {e}'}), 500
+    finally:
+        imap_providers.close_connection(imap)
     # Poll for HELD entry in DB and verify server state
     ok=False; attempts=10; last=None
     while attempts>0 and not ok:
@@ -596,14 +619,18 @@ def api_imap_live_test(account_id: int):
         if row:
             last = dict(row)
             # Double check IMAP: present in Quarantine, absent in INBOX
+            imap = None
             try:
                 port = _to_int(acc['imap_port'], 993)
-                imap = imaplib.IMAP4_SSL(acc['imap_host'], port) if port==993 else imaplib.IMAP4(acc['imap_host'], port)
+                imap = imap_providers.open_connection(
+                    acc['imap_host'],
+                    lambda: imaplib.IMAP4_SSL(acc['imap_host'], port) if port==993 else imaplib.IMAP4(acc['imap_host'], port),
+                )
                 try:
                     if port!=993: imap.starttls()
                 except (imaplib.IMAP4.error, OSError):
                     pass
-                imap_pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+                imap_pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
                 if imap_pwd is None:
                     log.warning("[accounts::probe] decrypted password missing during verification", extra={'account_id': account_id})
                     break
@@ -624,13 +651,14 @@ def api_imap_live_test(account_id: int):
                         imap.select(f'INBOX/{qname}')
                 typ2, d2 = imap.search(None, 'SUBJECT', f'"{mid_hdr}"')
                 in_quar = bool(d2 and d2[0] and len(d2[0].split())>0)
-                imap.logout()
                 ok = (in_quar and not in_inbox)
                 if ok:
                     log.info("[accounts::probe] probe quarantined successfully", extra={'account_id': account_id, 'probe_id': probe_id})
                     break
             except Exception:
                 ok = False
+            finally:
+                imap_providers.close_connection(imap)
         time.sleep(2); attempts-=1
     conn.close()
     return jsonify({'success': ok, 'result': last, 'probe_id': probe_id})
@@ -646,24 +674,21 @@ def api_scan_inbox(account_id: int):
     if not acc:
         conn.close(); return jsonify({'success': False, 'error': 'Account not found'}), 404
     host, port, user = acc['imap_host'], _to_int(acc['imap_port'], 993), acc['imap_username'] or acc['email_address']
-    pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+    pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
     if not (host and user):
         conn.close(); return jsonify({'success': False, 'error': 'IMAP credentials missing'}), 400
     if pwd is None:
         conn.close(); return jsonify({'success': False, 'error': 'IMAP credentials missing'}), 400
     log.debug("[accounts::scan_inbox] scanning INBOX", extra={'account_id': account_id, 'limit': n})
+    imap = None
     try:
-        imap = imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port)
+        imap = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port))
         try:
             if port!=993: imap.starttls()
         except Exception:
             pass
         imap.login(user, pwd); imap.select('INBOX')
-        typ, data = imap.search(None, 'ALL')
-        uids = []
-        if typ=='OK' and data and data[0]:
-            all_uids = [int(x) for x in data[0].split()]
-            uids = all_uids[-n:]
+        uids = search_uids(imap, 'ALL')[-n:]
         # Filter out those already in DB by original_uid
         res=[]
         if uids:
@@ -671,24 +696,31 @@ def api_scan_inbox(account_id: int):
             seen = set(x[0] for x in cur.execute(f"SELECT DISTINCT original_uid FROM email_messages WHERE account_id=? AND original_uid IN ({placeholders})", [account_id,*uids]).fetchall())
             to_show = [u for u in uids if u not in seen]
             if to_show:
-                # Fetch ENVELOPE for subject
+                # One UID FETCH (ENVELOPE) per sequence set instead of one per message
+                try:
+                    envelopes = fetch_envelopes(imap, to_show)
+                except Exception as e:
+                    log.warning("[accounts::scan_inbox] envelope fetch failed", extra={'account_id': account_id, 'error': str(e)})
+                    envelopes = {}
                 for uid in to_show:
-                    try:
-                        typ2, d2 = imap.uid('FETCH', str(uid), '(ENVELOPE)')
-                        subj = f'UID {uid}'
-                        if typ2=='OK' and d2 and d2[0]:
-                            s = str(d2[0])
-                            # crude subject extract
-                            if 'ENVELOPE' in s:
-                                start = s.find('ENVELOPE')
-                        res.append({'uid': uid, 'subject': subj})
-                    except Exception:
-                        res.append({'uid': uid, 'subject': f'UID {uid}'})
-        imap.logout(); conn.close();
+                    env = envelopes.get(uid) or {}
+                    sender = (env.get('from') or [{}])[0]
+                    res.append({
+                        'uid': uid,
+                        'subject': env.get('subject') or f'UID {uid}',
+                        'from': sender.get('email', ''),
+                        'date': env.get('date', ''),
+                        'message_id': env.get('message_id', ''),
+                    })
+        conn.close()
         log.debug("[accounts::scan_inbox] completed", extra={'account_id': account_id, 'candidates': len(res)})
         return jsonify({'success': True, 'candidates': res})
+    except imap_providers.ProviderUnavailable as e:
+        conn.close(); return _provider_unavailable(e)
     except Exception as e:
         conn.close(); return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        imap_providers.close_connection(imap)
 
 
 @accounts_bp.route('/api/accounts/<int:account_id>/intercept-uid', methods=['POST'])
@@ -704,11 +736,12 @@ def api_intercept_uid(account_id: int):
     if not acc:
         conn.close(); return jsonify({'success': False, 'error': 'Account not found'}), 404
     host, port, user = acc['imap_host'], _to_int(acc['imap_port'], 993), acc['imap_username'] or acc['email_address']
-    pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+    pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
     if not (host and user and pwd):
         conn.close(); return jsonify({'success': False, 'error': 'IMAP credentials missing'}), 400
+    imap = None
     try:
-        imap = imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port)
+        imap = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port))
         try:
             if port!=993: imap.starttls()
         except Exception:
@@ -741,26 +774,31 @@ def api_intercept_uid(account_id: int):
                 exists = cur.execute('SELECT id FROM email_messages WHERE message_id=?', (orig_mid,)).fetchone()
             if not exists:
                 sender = str(emsg.get('From','')); recips = str(emsg.get('To','') or '')
-                import json as _json
                 cur.execute('''
                     INSERT INTO email_messages
                     (message_id, sender, recipients, subject, body_text, body_html, raw_content,
-                     account_id, interception_status, direction, original_uid, original_message_id, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'HELD', 'inbound', ?, ?, datetime('now'))
+                     account_id, interception_status, direction, original_uid, original_message_id,
+                     preview_snippet, created_at, created_at_utc)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'HELD', 'inbound', ?, ?, '', datetime('now'), strftime('%Y-%m-%dT%H:%M:%SZ','now'))
                 ''', (
                     orig_mid or f"imap_{uid}_{int(time.time())}",
                     sender,
-                    _json.dumps([recips]) if recips else '[]',
+                    message_summary.recipients_json(recips),
                     str(emsg.get('Subject','')),
                     '', '', raw_bytes,
                     account_id,
                     int(uid), orig_mid
                 ))
                 conn.commit()
-        imap.logout(); conn.close()
+                stats_cache.invalidate(account_id)
+        conn.close()
         return jsonify({'success': True, 'moved': moved})
+    except imap_providers.ProviderUnavailable as e:
+        conn.close(); return _provider_unavailable(e)
     except Exception as e:
         conn.close(); return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        imap_providers.close_connection(imap)
 
 
 @accounts_bp.route('/api/accounts/<int:account_id>/resync', methods=['POST'])
@@ -775,42 +813,28 @@ def api_resync_last(account_id: int):
     if not acc:
         conn.close(); return jsonify({'success': False, 'error': 'Account not found'}), 404
     host, port, user = acc['imap_host'], _to_int(acc['imap_port'], 993), acc['imap_username'] or acc['email_address']
-    pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+    pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
     if not (host and user and pwd):
         conn.close(); return jsonify({'success': False, 'error': 'IMAP credentials missing'}), 400
+    imap = None
     try:
         import imaplib
-        imap = imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port)
+        imap = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port) if port==993 else imaplib.IMAP4(host, port))
         try:
             if port!=993: imap.starttls()
         except Exception:
             pass
         imap.login(user, pwd); imap.select('INBOX')
-        typ, data = imap.search(None, 'ALL')
-        uids = []
-        if typ=='OK' and data and data[0]:
-            all_uids = [int(x) for x in data[0].split()]
-            uids = all_uids[-n:]
-        # Move to Quarantine; duplicates safely ignored by DB insert logic
-        moved=0
-        for uid in uids:
-            try:
-                typ2, _ = imap.uid('MOVE', str(uid), 'Quarantine')
-                if typ2!='OK':
-                    # fallback copy+delete
-                    typ3,_ = imap.uid('COPY', str(uid), 'Quarantine')
-                    if typ3=='OK':
-                        imap.uid('STORE', str(uid), '+FLAGS', r'(\Deleted)')
-                        imap.expunge()
-                        moved += 1
-                else:
-                    moved += 1
-            except Exception:
-                continue
-        imap.logout()
+        uids = search_uids(imap, 'ALL')[-n:]
+        # Move to Quarantine in UID sets; duplicates safely ignored by DB insert logic
+        moved = len(move_uids(imap, uids, 'Quarantine')) if uids else 0
         conn.close(); return jsonify({'success': True, 'moved': moved, 'checked': len(uids)})
+    except imap_providers.ProviderUnavailable as e:
+        conn.close(); return _provider_unavailable(e)
     except Exception as e:
         conn.close(); return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        imap_providers.close_connection(imap)
 
 
 @accounts_bp.route('/accounts')
@@ -1101,7 +1125,7 @@ def api_start_monitor(account_id: int):
         payload, code = _watcher_response(account_id, ok=False, detail='Account not found', status_code=404)
         return jsonify(payload), code
     imap_user = acc['imap_username'] or acc['email_address']
-    imap_pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else None
+    imap_pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else None
     if not imap_user or not imap_pwd:
         conn.close()
         payload, code = _watcher_response(account_id, ok=False, detail='IMAP credentials missing', status_code=400)
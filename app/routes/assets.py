@@ -0,0 +1,42 @@
+"""Fingerprinted static assets (/assets/<file>).
+
+Serves the bundles written by ``python -m app.utils.assets`` from
+static/dist. File names embed a content hash, so responses are cacheable
+forever (``Cache-Control: public, max-age=31536000, immutable``). When the
+client accepts br or gzip and a precompressed sibling exists, that file is
+sent with the matching Content-Encoding instead of compressing per request.
+"""
+import mimetypes
+
+from flask import Blueprint, request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+from app.utils import assets
+
+assets_bp = Blueprint('assets', __name__)
+
+_ONE_YEAR = 365 * 24 * 3600
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset_file(filename: str):
+    dist = assets.STATIC_ROOT / assets.DIST_DIR
+    if filename == assets.MANIFEST_NAME or filename.endswith(('.gz', '.br')):
+        return ('Not found', 404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for name, suffix in _ENCODINGS:
+        if request.accept_encodings[name] and (dist / (filename + suffix)).is_file():
+            served, encoding = filename + suffix, name
+            break
+    try:
+        response = send_from_directory(dist, served, mimetype=mimetype, max_age=_ONE_YEAR)
+    except NotFound:
+        return ('Not found', 404)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
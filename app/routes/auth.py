@@ -10,7 +10,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
 import sqlite3
 from app.utils.db import DB_PATH
-from app.models.simple_user import SimpleUser
+from app.models.simple_user import SimpleUser, invalidate_user, remember_user
 from app.services.audit import log_action
 
 # Import limiter from extensions
@@ -50,6 +50,7 @@ def login():
         if user and password and check_password_hash(user[2], password):
             user_obj = SimpleUser(user[0], user[1], user[3])
             login_user(user_obj)
+            remember_user(user_obj)
 
             # Log the action
             log_action('LOGIN', user[0], None, f"User {username} logged in")
@@ -67,6 +68,8 @@ def login():
 @login_required
 def logout():
     """Logout"""
-    log_action('LOGOUT', current_user.id, None, f"User {current_user.username} logged out")
+    user_id = current_user.id
+    log_action('LOGOUT', user_id, None, f"User {current_user.username} logged out")
     logout_user()
+    invalidate_user(user_id)
     return redirect(url_for('auth.login'))
@@ -17,6 +17,7 @@ from email.utils import make_msgid
 from app.utils.db import DB_PATH
 from app.utils.crypto import decrypt_credential
 from app.utils.email_helpers import negotiate_smtp as _negotiate_smtp
+from app.services import message_summary
 
 
 # Create blueprint
@@ -67,7 +68,7 @@ def compose_email():
             flash('Invalid sending account', 'error')
             conn.close(); return render_template('compose.html', accounts=accounts)
 
-        smtp_password = decrypt_credential(account['smtp_password'])
+        smtp_password = decrypt_credential(account['smtp_password'], account_id=account['id'])
         if not smtp_password:
             if request.is_json:
                 conn.close(); return jsonify({'ok': False, 'error': 'decrypt-failed'}), 500
@@ -128,8 +129,8 @@ def compose_email():
                     """
                     INSERT INTO email_messages
                     (message_id, sender, recipients, subject, body_text, body_html, raw_content,
-                     account_id, direction, status, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'outbound', 'SENT', datetime('now'))
+                     account_id, direction, status, preview_snippet, created_at, created_at_utc)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'outbound', 'SENT', ?, datetime('now'), strftime('%Y-%m-%dT%H:%M:%SZ','now'))
                     """,
                     (
                         msg['Message-ID'],
@@ -140,6 +141,7 @@ def compose_email():
                         '',
                         msg.as_string(),
                         int(from_account_id),
+                        message_summary.preview_snippet(body),
                     ),
                 )
                 conn.commit()
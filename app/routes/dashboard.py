@@ -5,9 +5,8 @@ Routes: /dashboard, /dashboard/<tab>, /test-dashboard
 """
 from flask import Blueprint, render_template, request, redirect, url_for
 from flask_login import login_required, current_user
-import sqlite3
-import json
-from app.utils.db import DB_PATH, get_db, fetch_counts
+from app.utils.db import get_db, fetch_counts
+from app.services import message_summary
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -17,8 +16,7 @@ dashboard_bp = Blueprint('dashboard', __name__)
 @login_required
 def dashboard(tab='overview'):
     """Main dashboard with tab navigation"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get email accounts for account selector
@@ -37,8 +35,9 @@ def dashboard(tab='overview'):
         stats = fetch_counts(account_id=int(selected_account_id), include_outbound=False)
 
         # Get recent emails for selected account
-        recent_emails = cursor.execute("""
-            SELECT id, sender, recipients, subject, status, interception_status, created_at, body_text
+        recent_emails = cursor.execute(f"""
+            SELECT id, sender, recipients, subject, status, interception_status, created_at,
+                   {message_summary.PREVIEW_SQL}
             FROM email_messages
             WHERE account_id = ? AND (direction IS NULL OR direction!='outbound')
             ORDER BY created_at DESC
@@ -49,8 +48,9 @@ def dashboard(tab='overview'):
         stats = fetch_counts(include_outbound=False)
 
         # Get recent emails from all accounts
-        recent_emails = cursor.execute("""
-            SELECT id, sender, recipients, subject, status, interception_status, created_at, body_text
+        recent_emails = cursor.execute(f"""
+            SELECT id, sender, recipients, subject, status, interception_status, created_at,
+                   {message_summary.PREVIEW_SQL}
             FROM email_messages
             WHERE (direction IS NULL OR direction!='outbound')
             ORDER BY created_at DESC
@@ -119,26 +119,8 @@ def dashboard(tab='overview'):
     email_payload = []
     for row in recent_emails:
         record = dict(row)
-        recipients = record.get('recipients')
-        if recipients:
-            try:
-                if isinstance(recipients, str):
-                    # Attempt JSON parse, fallback to CSV
-                    parsed = json.loads(recipients)
-                    if isinstance(parsed, list):
-                        record['recipients'] = parsed
-                    else:
-                        record['recipients'] = [recipients]
-                else:
-                    record['recipients'] = list(recipients)
-            except json.JSONDecodeError:
-                record['recipients'] = [addr.strip() for addr in recipients.split(',') if addr.strip()]
-        else:
-            record['recipients'] = []
-
-        body = record.get('body_text') or ''
-        preview = ' '.join(body.split())[:160]
-        record['preview_snippet'] = preview
+        record['recipients'] = message_summary.recipient_list(record.get('recipients'))
+        record['preview_snippet'] = message_summary.preview_snippet(record.get('preview_snippet'))
 
         email_payload.append(record)
 
@@ -12,9 +12,10 @@ from email.utils import formatdate, make_msgid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, jsonify, render_template, request, redirect, url_for, flash, stream_with_context
 from flask_login import login_required
 
+from app.services import log_query
 from app.utils.db import DB_PATH
 from app.utils.crypto import decrypt_credential
 from app.utils.email_helpers import test_email_connection as _test_email_connection
@@ -56,67 +57,70 @@ def get_test_status():
 @diagnostics_bp.route('/api/logs')
 @login_required
 def get_logs():
-    """Fetch recent application logs with filtering."""
-    import glob
+    """Fetch recent application logs with filtering (newest first).
+
+    Query: severity (exact level), component (logger/message substring),
+    since/until (ISO timestamps), limit (1-1000). Served by
+    app/services/log_query.py, which reads the current per-startup log files
+    backwards from the end instead of loading them.
+    """
     import logging
-    
+
     # Get filter parameters
     severity = request.args.get('severity', '').upper()  # ERROR, WARNING, INFO, DEBUG
     component = request.args.get('component', '')  # imap_watcher, smtp_handler, accounts, etc.
-    limit = int(request.args.get('limit', 100))
-    
-    logs = []
-    log_dir = 'logs'
-    
+    limit = max(1, min(1000, request.args.get('limit', 100, type=int) or 100))
+    since = request.args.get('since') or None
+    until = request.args.get('until') or None
+
     try:
-        # Read from app.log (JSON formatted logs)
-        log_file = os.path.join(log_dir, 'app.log')
-        if not os.path.exists(log_file):
+        if not log_query.log_files():
             return jsonify({'logs': [], 'message': 'No log file found'}), 200
-        
-        with open(log_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            # Read last N lines for efficiency
-            recent_lines = lines[-1000:] if len(lines) > 1000 else lines
-            
-            for line in reversed(recent_lines):  # Most recent first
-                try:
-                    log_entry = json.loads(line.strip())
-                    
-                    # Apply severity filter
-                    if severity and log_entry.get('level', '').upper() != severity:
-                        continue
-                    
-                    # Apply component filter (check message or logger name)
-                    if component:
-                        msg = log_entry.get('message', '').lower()
-                        logger = log_entry.get('name', '').lower()
-                        if component.lower() not in msg and component.lower() not in logger:
-                            continue
-                    
-                    logs.append(log_entry)
-                    
-                    if len(logs) >= limit:
-                        break
-                except (json.JSONDecodeError, ValueError):
-                    # Skip malformed log lines
-                    continue
-        
+
+        logs = log_query.query(
+            levels=[severity] if severity else None,
+            component=component,
+            since=since,
+            until=until,
+            limit=limit,
+        )
         return jsonify({
             'logs': logs,
             'count': len(logs),
             'filters': {
                 'severity': severity or 'all',
                 'component': component or 'all',
+                'since': since,
+                'until': until,
                 'limit': limit
             }
         }), 200
-        
+
     except Exception as e:
         logging.getLogger(__name__).error(f"[diagnostics] Failed to fetch logs: {e}")
         return jsonify({'error': 'Failed to read logs', 'details': str(e)}), 500
 
 
+@diagnostics_bp.route('/api/logs/stream')
+@login_required
+def stream_logs():
+    """Server-sent events: log records appended from now on (same filters as /api/logs)."""
+    severity = request.args.get('severity', '').upper()
+    follower = log_query.follow(
+        levels=[severity] if severity else None,
+        component=request.args.get('component', ''),
+    )
+
+    def generate():
+        for batch in follower:
+            if batch:
+                for entry in batch:
+                    yield f"data: {json.dumps(entry, default=str)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+
 @diagnostics_bp.route('/diagnostics/test', methods=['POST'])
 @login_required
 def test_email_send():
@@ -229,7 +233,7 @@ def api_test_send_bi_directional():
             return jsonify({'success': False, 'error': f'Sender account not found: {sender_email}'}), 404
 
         # Decrypt credentials
-        smtp_password = decrypt_credential(sender_account['smtp_password']) if sender_account['smtp_password'] else None
+        smtp_password = decrypt_credential(sender_account['smtp_password'], account_id=sender_account['id']) if sender_account['smtp_password'] else None
         if not smtp_password:
             conn.close()
             return jsonify({'success': False, 'error': 'SMTP password not configured'}), 400
@@ -310,8 +314,8 @@ def api_account_diagnostics(account_id: int):
         # Prepare credentials
         imap_user = str(acc['imap_username'] or '')
         smtp_user = str(acc['smtp_username'] or '')
-        imap_pwd = decrypt_credential(acc['imap_password']) if acc['imap_password'] else ''
-        smtp_pwd = decrypt_credential(acc['smtp_password']) if acc['smtp_password'] else ''
+        imap_pwd = decrypt_credential(acc['imap_password'], account_id=account_id) if acc['imap_password'] else ''
+        smtp_pwd = decrypt_credential(acc['smtp_password'], account_id=account_id) if acc['smtp_password'] else ''
 
         # Run tests (best-effort if creds missing)
         imap_ok = False; smtp_ok = False
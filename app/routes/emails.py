@@ -5,7 +5,10 @@ Routes: /emails, /email/<id>, /email/<id>/action, /inbox, /compose, /api/held, /
 Plus API routes for reply/forward, download, intercept
 """
 import logging
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, Response
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, get_template_attribute, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 import sqlite3
 import os
@@ -18,12 +21,17 @@ from email import policy
 from email import message_from_bytes
 from email.utils import parsedate_to_datetime, getaddresses
 from app.utils.db import DB_PATH, get_db, fetch_counts
-from app.utils.imap_helpers import _ensure_quarantine, _move_uid_to_quarantine
+from app.utils.imap_helpers import _ensure_quarantine
 from app.extensions import csrf, limiter
 from app.utils.crypto import decrypt_credential
 from app.utils.rule_engine import evaluate_rules
 from app.services.audit import log_action
+from app.services import stats as stats_cache
 from app.utils.rate_limit import get_rate_limit_config, simple_rate_limit
+from app.utils.downloads import file_response, sqlite_blob_response
+from app.utils.imap_batch import fetch_messages, move_uids
+from app.services import change_log, imap_providers, message_summary
+from app.utils.json_responses import conditional_json
 
 emails_bp = Blueprint('emails', __name__)
 log = logging.getLogger(__name__)
@@ -73,96 +81,202 @@ def emails_unified():
     )
 
 
-@emails_bp.route('/api/emails/unified')
-@login_required
-def api_emails_unified():
-    """API endpoint for unified email list"""
-    status_filter = request.args.get('status', 'ALL')
-    account_id = request.args.get('account_id', type=int)
+def _list_row(row):
+    """List-endpoint payload for an email_messages row (no body columns)."""
+    email_dict = dict(row)
+    email_dict['created_at'] = message_summary.api_created_at(email_dict.pop('created_at_utc', None),
+                                                              email_dict.get('created_at'))
+    email_dict['preview_snippet'] = message_summary.preview_snippet(email_dict.get('preview_snippet'))
+    email_dict['recipients'] = message_summary.recipient_list(email_dict.get('recipients'))
+    return email_dict
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
 
-    # Build query based on filters (exclude outbound by default)
-    query = """
-        SELECT id, account_id, sender, recipients, subject, body_text,
-               interception_status, status, created_at,
-               latency_ms, risk_score, keywords_matched
-        FROM email_messages
-        WHERE (direction IS NULL OR direction!='outbound')
-    """
+def _unified_filters(status_filter, account_id):
+    """WHERE clause + params for the unified list's status/account filters."""
+    where = "(direction IS NULL OR direction!='outbound')"
     params = []
 
     if account_id:
-        query += " AND account_id = ?"
+        where += " AND account_id = ?"
         params.append(account_id)
 
     if status_filter and status_filter != 'ALL':
         if status_filter == 'RELEASED':
             # Treat released as interception_status=RELEASED or legacy delivered/approved (exclude SENT/outbound)
-            query += " AND (interception_status='RELEASED' OR status IN ('APPROVED','DELIVERED'))"
+            where += " AND (interception_status='RELEASED' OR status IN ('APPROVED','DELIVERED'))"
         elif status_filter == 'HELD':
             # HELD now includes both PENDING and HELD statuses
-            query += " AND (interception_status IN ('HELD', 'PENDING') OR status IN ('HELD', 'PENDING'))"
+            where += " AND (interception_status IN ('HELD', 'PENDING') OR status IN ('HELD', 'PENDING'))"
         else:
-            query += " AND (interception_status = ? OR status = ?)"
+            where += " AND (interception_status = ? OR status = ?)"
             params.extend([status_filter, status_filter])
     else:
         # Default ALL view hides DISCARDED items
-        query += " AND (interception_status IS NULL OR interception_status != 'DISCARDED')"
+        where += " AND (interception_status IS NULL OR interception_status != 'DISCARDED')"
+    return where, params
 
-    query += " ORDER BY created_at DESC LIMIT 200"
 
-    emails = cursor.execute(query, params).fetchall()
+def _count_payload(counts):
+    return {
+        'total': counts.get('total', 0),
+        'held': counts.get('held', 0),
+        'pending': counts.get('pending', 0),
+        'approved': counts.get('approved', 0),
+        'rejected': counts.get('rejected', 0),
+        'released': counts.get('released', 0),
+        'discarded': counts.get('discarded', 0),
+    }
 
-    # Get counts (exclude outbound by default)
-    counts = fetch_counts(account_id=account_id if account_id else None, include_outbound=False)
 
-    # Process emails for response (Phase 5 Quick Wins: optimized with helper function)
-    def _process_email(email):
-        """Process a single email record for API response"""
-        email_dict = dict(email)
+@emails_bp.route('/api/emails/unified')
+@login_required
+@conditional_json()
+def api_emails_unified():
+    """API endpoint for unified email list"""
+    status_filter = request.args.get('status', 'ALL')
+    account_id = request.args.get('account_id', type=int)
 
-        # Fix timezone for created_at: SQLite datetime('now') returns UTC without 'Z' suffix
-        # JavaScript interprets timestamps without timezone as local time, causing display errors
-        # Append 'Z' to indicate UTC so browsers display correct local time
-        if email_dict.get('created_at') and isinstance(email_dict['created_at'], str):
-            if not email_dict['created_at'].endswith('Z') and 'T' not in email_dict['created_at']:
-                # SQLite format: "YYYY-MM-DD HH:MM:SS" → "YYYY-MM-DDTHH:MM:SSZ"
-                email_dict['created_at'] = email_dict['created_at'].replace(' ', 'T') + 'Z'
+    conn = get_db()
+    cursor = conn.cursor()
 
-        # Add preview snippet
-        body_text = email_dict.get('body_text') or ''
-        email_dict['preview_snippet'] = ' '.join(body_text.split())[:160]
+    # since=<seq>: only rows changed after that point (see app/services/change_log.py)
+    seq, changed = change_log.delta_scope(conn, request.args.get('since'))
 
-        # Parse recipients if JSON (pre-computed to avoid repeated parsing)
-        try:
-            if email_dict.get('recipients'):
-                email_dict['recipients'] = json.loads(email_dict['recipients'])
-        except (json.JSONDecodeError, TypeError):
-            pass
+    # Build query based on filters (exclude outbound by default)
+    where, params = _unified_filters(status_filter, account_id)
+    query = f"""
+        SELECT id, account_id, sender, recipients, subject, {message_summary.PREVIEW_SQL},
+               interception_status, status, created_at, created_at_utc,
+               latency_ms, risk_score, keywords_matched
+        FROM email_messages
+        WHERE {where}
+    """
 
-        return email_dict
+    if changed is not None:
+        clause, ids = change_log.id_filter(changed)
+        query += f" AND {clause}"
+        params.extend(ids)
 
-    # Process all emails in one comprehension (faster than loop)
-    email_list = [_process_email(email) for email in emails]
+    query += " ORDER BY created_at DESC LIMIT 200"
+
+    emails = cursor.execute(query, params).fetchall()
+
+    # Get counts (exclude outbound by default)
+    counts = fetch_counts(account_id=account_id if account_id else None, include_outbound=False)
+
+    # Preview, UTC timestamp and recipients are stored at ingest (message_summary)
+    email_list = [_list_row(email) for email in emails]
 
     conn.close()
 
     # Return accurate counts from database, not len(email_list) which is limited by LIMIT clause
     # The "total" count should ALWAYS be >= individual status counts (held, released, rejected)
-    return jsonify({
+    payload = {
         'emails': email_list,
-        'counts': {
-            'total': counts.get('total', 0),
-            'held': counts.get('held', 0),
-            'pending': counts.get('pending', 0),
-            'approved': counts.get('approved', 0),
-            'rejected': counts.get('rejected', 0),
-            'released': counts.get('released', 0),
-            'discarded': counts.get('discarded', 0),
-        }
+        'seq': seq,
+        'counts': _count_payload(counts),
+    }
+    if changed is not None:
+        payload['delta'] = True
+        payload['removed'] = change_log.removed_ids(changed, email_list)
+    return jsonify(payload)
+
+
+# Row revision = newest change-log seq for the email (0 once pruned), so a row's
+# rendered HTML can be cached and patched per (id, rev).
+ROW_REV_SQL = "COALESCE((SELECT MAX(c.seq) FROM email_changes c WHERE c.email_id = email_messages.id), 0) AS rev"
+_ROW_HTML_MAX = 2000
+_row_html_lock = threading.Lock()
+_row_html: "OrderedDict[tuple, str]" = OrderedDict()
+
+
+def _render_rows(conn, wanted):
+    """``{id: html}`` for ``wanted`` ({id: rev}), rendering only cache misses."""
+    html = {}
+    missing = []
+    with _row_html_lock:
+        for email_id, rev in wanted.items():
+            cached = _row_html.get((email_id, rev))
+            if cached is None:
+                missing.append(email_id)
+            else:
+                _row_html.move_to_end((email_id, rev))
+                html[email_id] = cached
+    if not missing:
+        return html
+
+    clause, params = change_log.id_filter(missing)
+    rows = conn.execute(
+        f"""
+        SELECT id, sender, recipients, subject, {message_summary.PREVIEW_SQL},
+               interception_status, status, created_at, created_at_utc, {ROW_REV_SQL}
+        FROM email_messages
+        WHERE {clause}
+        """,
+        params,
+    ).fetchall()
+    email_row = get_template_attribute('partials/email_components.html', 'email_row')
+    fresh = {}
+    for row in rows:
+        item = _list_row(row)
+        fresh[(item['id'], item['rev'])] = str(email_row(item))
+    with _row_html_lock:
+        for key, value in fresh.items():
+            _row_html[key] = value
+            _row_html.move_to_end(key)
+        while len(_row_html) > _ROW_HTML_MAX:
+            _row_html.popitem(last=False)
+    html.update({key[0]: value for key, value in fresh.items()})
+    return html
+
+
+def clear_row_cache():
+    with _row_html_lock:
+        _row_html.clear()
+
+
+@emails_bp.route('/api/emails/unified/rows')
+@login_required
+@conditional_json()
+def api_emails_unified_rows():
+    """Server-rendered rows for the unified list.
+
+    Returns the visible ``order`` as ``[id, rev]`` pairs plus HTML for the
+    rows the client needs: all of them on a full load, only those changed
+    after ``since`` (change-log seq) otherwise. Rows missing from ``order``
+    are gone from the view. The client patches #emailTableBody in place.
+    """
+    status_filter = request.args.get('status', 'ALL')
+    account_id = request.args.get('account_id', type=int)
+
+    conn = get_db()
+    try:
+        seq, changed = change_log.delta_scope(conn, request.args.get('since'))
+        where, params = _unified_filters(status_filter, account_id)
+        order = [
+            (row['id'], row['rev'])
+            for row in conn.execute(
+                f"SELECT id, {ROW_REV_SQL} FROM email_messages WHERE {where} "
+                "ORDER BY created_at DESC LIMIT 200",
+                params,
+            ).fetchall()
+        ]
+        if changed is None:
+            wanted = dict(order)
+        else:
+            changed_ids = set(changed)
+            wanted = {email_id: rev for email_id, rev in order if email_id in changed_ids}
+        rows = _render_rows(conn, wanted)
+    finally:
+        conn.close()
+
+    counts = fetch_counts(account_id=account_id if account_id else None, include_outbound=False)
+    return jsonify({
+        'seq': seq,
+        'delta': changed is not None,
+        'order': [list(pair) for pair in order],
+        'rows': {str(email_id): html for email_id, html in rows.items()},
+        'counts': _count_payload(counts),
     })
 
 
@@ -180,9 +294,9 @@ def search_emails():
         cursor = conn.cursor()
 
         # Search in subject, sender, recipients (JSON array), and body_text
-        query = """
-            SELECT id, account_id, sender, recipients, subject, body_text,
-                   interception_status, status, created_at,
+        query = f"""
+            SELECT id, account_id, sender, recipients, subject, {message_summary.PREVIEW_SQL},
+                   interception_status, status, created_at, created_at_utc,
                    latency_ms, risk_score, keywords_matched
             FROM email_messages
             WHERE (direction IS NULL OR direction!='outbound')
@@ -204,22 +318,7 @@ def search_emails():
 
         emails = cursor.execute(query, params).fetchall()
 
-        # Process emails
-        def _process_email(email):
-            email_dict = dict(email)
-            if email_dict.get('created_at') and isinstance(email_dict['created_at'], str):
-                if not email_dict['created_at'].endswith('Z') and 'T' not in email_dict['created_at']:
-                    email_dict['created_at'] = email_dict['created_at'].replace(' ', 'T') + 'Z'
-            body_text = email_dict.get('body_text') or ''
-            email_dict['preview_snippet'] = ' '.join(body_text.split())[:160]
-            try:
-                if email_dict.get('recipients'):
-                    email_dict['recipients'] = json.loads(email_dict['recipients'])
-            except (json.JSONDecodeError, TypeError):
-                pass
-            return email_dict
-
-        email_list = [_process_email(email) for email in emails]
+        email_list = [_list_row(email) for email in emails]
 
     return jsonify({'emails': email_list, 'count': len(email_list), 'query': q})
 
@@ -410,174 +509,242 @@ def email_action(email_id):
 
     conn.commit()
     conn.close()
+    stats_cache.invalidate()
 
     flash(f'Email {action.lower()}d successfully', 'success')
     return redirect(url_for('emails.email_queue'))
 
 
-@emails_bp.route('/api/fetch-emails', methods=['POST'])
-@csrf.exempt
-@limiter.limit(_FETCH_LIMIT_STRING)
-@simple_rate_limit('fetch', config=_FETCH_RATE_LIMIT)
-@login_required
-def api_fetch_emails():
-    """Fetch emails from IMAP server using UID-based fetching (migrated)."""
-    data = request.get_json(silent=True) or {}
-    account_id = data.get('account_id'); fetch_count = int(data.get('count', 20)); offset = int(data.get('offset', 0))
-    if not account_id:
-        return jsonify({'success': False, 'error': 'Account ID required'}), 400
-    conn = sqlite3.connect(DB_PATH); conn.row_factory = sqlite3.Row; cur = conn.cursor()
+def _fetch_workers() -> int:
+    try:
+        return min(16, max(1, int(os.environ.get('FETCH_WORKERS', '4'))))
+    except ValueError:
+        return 4
+
+
+def _message_bodies(msg) -> tuple:
+    """Return (body_text, body_html) using the last text/plain and text/html parts."""
+    body_text = ''
+    body_html = ''
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            ctype = part.get_content_type()
+            payload = part.get_payload(decode=True)
+            if payload is None:
+                continue
+            if ctype == 'text/plain':
+                if isinstance(payload, (bytes, bytearray)):
+                    body_text = payload.decode('utf-8', errors='ignore')
+                elif isinstance(payload, str):
+                    body_text = payload
+            elif ctype == 'text/html':
+                if isinstance(payload, (bytes, bytearray)):
+                    body_html = payload.decode('utf-8', errors='ignore')
+                elif isinstance(payload, str):
+                    body_html = payload
+    else:
+        payload = msg.get_payload(decode=True)
+        if isinstance(payload, (bytes, bytearray)):
+            body_text = payload.decode('utf-8', errors='ignore')
+        elif isinstance(payload, str):
+            body_text = payload
+    return body_text, body_html
+
+
+def _fetch_account(account_id, fetch_count: int, offset: int, headers_only: bool, auto_move_enabled: bool):
+    """Fetch one account's UID window; returns (status_code, body). Runs on pool threads."""
+    conn = get_db(); cur = conn.cursor()
     acct = cur.execute("SELECT * FROM email_accounts WHERE id=? AND is_active=1", (account_id,)).fetchone()
     if not acct:
-        conn.close(); return jsonify({'success': False, 'error': 'Account not found'}), 404
+        conn.close(); return 404, {'success': False, 'error': 'Account not found'}
     mail = None
-    auto_move_enabled = str(os.environ.get('AUTO_MOVE_ON_FETCH', '0')).lower() in ('1', 'true', 'yes')
-    log.debug("[emails::fetch] start", extra={'account_id': account_id, 'count': fetch_count, 'offset': offset, 'auto_move': auto_move_enabled})
+    log.debug("[emails::fetch] start", extra={'account_id': account_id, 'count': fetch_count, 'offset': offset, 'auto_move': auto_move_enabled, 'headers_only': headers_only})
     try:
-        password = decrypt_credential(acct['imap_password'])
+        password = decrypt_credential(acct['imap_password'], account_id=account_id)
         if not password:
-            conn.close(); return jsonify({'success': False, 'error': 'Password decrypt failed'}), 500
-        if int(acct['imap_port'] or 993) == 993:
-            mail = imaplib.IMAP4_SSL(acct['imap_host'], int(acct['imap_port']))
+            return 500, {'success': False, 'error': 'Password decrypt failed'}
+        host, port = acct['imap_host'], int(acct['imap_port'] or 993)
+        if port == 993:
+            mail = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port))
         else:
-            mail = imaplib.IMAP4(acct['imap_host'], int(acct['imap_port']))
+            mail = imap_providers.open_connection(host, lambda: imaplib.IMAP4(host, port))
             try: mail.starttls()
             except Exception as e:
                 log.warning("[emails::fetch] STARTTLS failed (non-SSL port, continuing)", extra={'account_id': account_id, 'error': str(e)})
         mail.login(acct['imap_username'], password); mail.select('INBOX')
         typ, data_uids = mail.uid('SEARCH', 'ALL')
         if typ != 'OK':
-            return jsonify({'success': False, 'error': 'UID SEARCH failed'}), 500
-        uid_bytes = data_uids[0].split() if data_uids and data_uids[0] else []
-        total = len(uid_bytes); start = max(0, total - offset - fetch_count); end = total - offset
-        window = uid_bytes[start:end][-fetch_count:]
-        results = []
-        for raw_uid in reversed(window):
-            uid = raw_uid.decode(); typ, msg_payload = mail.uid('fetch', uid, '(RFC822 INTERNALDATE)')
-            if typ != 'OK' or not msg_payload or msg_payload[0] is None: continue
-            raw_email = msg_payload[0][1]; msg = message_from_bytes(raw_email, policy=policy.default)
+            return 500, {'success': False, 'error': 'UID SEARCH failed'}
+        all_uids = [int(u) for u in (data_uids[0].split() if data_uids and data_uids[0] else [])]
+        total = len(all_uids); start = max(0, total - offset - fetch_count); end = total - offset
+        window = all_uids[start:end][-fetch_count:]
+        # One UID FETCH for the whole window (BODY.PEEK keeps messages unread)
+        fetched = fetch_messages(mail, window, headers_only=headers_only) if window else {}
+
+        parsed = []
+        for uid in reversed(window):
+            item = fetched.get(uid)
+            if not item:
+                continue
+            msg = message_from_bytes(item['raw'], policy=policy.default)
             internaldate = None
-            try:
-                fetch_data = msg_payload[0][0]
-                if isinstance(fetch_data, bytes):
-                    fetch_str = fetch_data.decode('utf-8', errors='ignore')
-                    import re
-                    m = re.search(r'INTERNALDATE "([^"]+)"', fetch_str)
-                    if m:
-                        date_str = m.group(1)
-                        date_tuple = imaplib.Internaldate2tuple(f'INTERNALDATE "{date_str}"'.encode())
-                        if date_tuple:
-                            from datetime import datetime as dt
-                            internaldate = dt(*date_tuple[:6]).isoformat()
-            except Exception:
-                pass
-            if not internaldate:
+            if item['internaldate'] is not None:
+                # Local naive ISO, matching what the IMAP watcher stores
+                internaldate = item['internaldate'].astimezone().replace(tzinfo=None).isoformat()
+            else:
                 try:
                     date_hdr = msg.get('Date')
                     if date_hdr: internaldate = parsedate_to_datetime(date_hdr).isoformat()
                 except Exception:
                     pass
-            message_id = msg.get('Message-ID') or f"fetch_{account_id}_{uid}"
-            sender = msg.get('From', '')
-            subject = msg.get('Subject', 'No Subject')
             addr_fields = msg.get_all('To', []) + msg.get_all('Cc', [])
             addr_list = [addr for _, addr in getaddresses(addr_fields)]
             recipients_list = [a for a in addr_list if a] or ([msg.get('To', '')] if msg.get('To') else [])
-            recipients = json.dumps(recipients_list)
-
-            body_text = ''
-            body_html = ''
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.is_multipart():
-                        continue
-                    ctype = part.get_content_type()
-                    payload = part.get_payload(decode=True)
-                    if payload is None:
-                        continue
-                    if ctype == 'text/plain':
-                        if isinstance(payload, (bytes, bytearray)):
-                            body_text = payload.decode('utf-8', errors='ignore')
-                        elif isinstance(payload, str):
-                            body_text = payload
-                    elif ctype == 'text/html':
-                        if isinstance(payload, (bytes, bytearray)):
-                            body_html = payload.decode('utf-8', errors='ignore')
-                        elif isinstance(payload, str):
-                            body_html = payload
-            else:
-                payload = msg.get_payload(decode=True)
-                if isinstance(payload, (bytes, bytearray)):
-                    body_text = payload.decode('utf-8', errors='ignore')
-                elif isinstance(payload, str):
-                    body_text = payload
+            parsed.append({
+                'uid': str(uid),
+                'message_id': msg.get('Message-ID') or f"fetch_{account_id}_{uid}",
+                'sender': msg.get('From', ''),
+                'subject': msg.get('Subject', 'No Subject'),
+                'recipients_list': recipients_list,
+                'internaldate': internaldate,
+                'msg': msg,
+                'raw': item['raw'],
+            })
 
-            rule_eval = evaluate_rules(subject, body_text, sender, recipients_list)
-            should_hold = bool(rule_eval['should_hold'])
-            risk_score = rule_eval['risk_score']
-            keywords_json = json.dumps(rule_eval['keywords'])
-            log.debug("[emails::fetch] evaluated", extra={'account_id': account_id, 'uid': uid, 'should_hold': should_hold, 'risk': risk_score})
-            cur.execute(
+        if headers_only:
+            # Listing only: nothing is stored without the full message
+            known = set()
+            ids = [p['message_id'] for p in parsed]
+            if ids:
+                placeholders = ','.join('?' * len(ids))
+                known = {r['message_id'] for r in cur.execute(f"SELECT message_id FROM email_messages WHERE message_id IN ({placeholders})", ids)}
+            listing = [{
+                'uid': p['uid'], 'message_id': p['message_id'], 'subject': p['subject'], 'sender': p['sender'],
+                'recipients': p['recipients_list'], 'internaldate': p['internaldate'], 'stored': p['message_id'] in known,
+            } for p in parsed]
+            return 200, {'success': True, 'total_available': total, 'fetched': len(listing), 'emails': listing, 'headers_only': True}
+
+        insert_rows = []
+        for p in parsed:
+            body_text, body_html = _message_bodies(p['msg'])
+            rule_eval = evaluate_rules(p['subject'], body_text, p['sender'], p['recipients_list'])
+            p['should_hold'] = bool(rule_eval['should_hold'])
+            log.debug("[emails::fetch] evaluated", extra={'account_id': account_id, 'uid': p['uid'], 'should_hold': p['should_hold'], 'risk': rule_eval['risk_score']})
+            insert_rows.append((
+                p['message_id'], p['sender'], json.dumps(p['recipients_list']), p['subject'], body_text, body_html,
+                p['raw'], account_id, 'inbound', 'FETCHED', p['uid'], p['internaldate'],
+                rule_eval['risk_score'], json.dumps(rule_eval['keywords']),
+                message_summary.preview_snippet(body_text, body_html),
+            ))
+        if insert_rows:
+            cur.executemany(
                 """
                 INSERT OR IGNORE INTO email_messages
                 (message_id, sender, recipients, subject, body_text, body_html,
                  raw_content, account_id, direction, interception_status,
-                 original_uid, original_internaldate, risk_score, keywords_matched, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                 original_uid, original_internaldate, risk_score, keywords_matched, preview_snippet,
+                 created_at, created_at_utc)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), strftime('%Y-%m-%dT%H:%M:%SZ','now'))
                 """,
-                (message_id, sender, recipients, subject, body_text, body_html, raw_email, account_id, 'inbound', 'FETCHED', uid, internaldate, risk_score, keywords_json),
+                insert_rows,
             )
-            row = cur.execute("SELECT id FROM email_messages WHERE message_id=? ORDER BY id DESC LIMIT 1", (message_id,)).fetchone()
-            email_row_id = row['id'] if row else None
-
-            moved_to_quarantine = False
-            quarantine_folder = None
-            if should_hold and auto_move_enabled and email_row_id:
-                try:
-                    quarantine_folder = _ensure_quarantine(mail, 'Quarantine')
-                    moved_to_quarantine = _move_uid_to_quarantine(mail, uid, quarantine_folder)
-                except Exception:
-                    moved_to_quarantine = False
-                if moved_to_quarantine:
-                    cur.execute(
-                        """
-                        UPDATE email_messages
-                        SET interception_status='HELD',
-                            status='PENDING',
-                            quarantine_folder=?,
-                            action_taken_at=datetime('now')
-                        WHERE id=?
-                        """,
-                        (quarantine_folder, email_row_id),
-                    )
-                    log.info("[emails::fetch] auto-held message", extra={'account_id': account_id, 'email_id': email_row_id, 'uid': uid, 'quarantine_folder': quarantine_folder})
-                else:
-                    quarantine_folder = None
-                    log.debug("[emails::fetch] auto-move skipped", extra={'account_id': account_id, 'email_id': email_row_id, 'uid': uid})
-
-            results.append({
-                'id': email_row_id,
-                'message_id': message_id,
-                'uid': uid,
-                'subject': subject,
-                'should_hold': should_hold,
-                'held': moved_to_quarantine,
-                'quarantine_folder': quarantine_folder,
-            })
-        conn.commit();
+        row_ids = {}
+        ids = [p['message_id'] for p in parsed]
+        if ids:
+            placeholders = ','.join('?' * len(ids))
+            for r in cur.execute(f"SELECT id, message_id FROM email_messages WHERE message_id IN ({placeholders}) ORDER BY id", ids):
+                row_ids[r['message_id']] = r['id']  # newest row wins, as before
+
+        held_uids = set()
+        quarantine_folder = None
+        to_hold = [p for p in parsed if p['should_hold'] and row_ids.get(p['message_id'])]
+        if auto_move_enabled and to_hold:
+            try:
+                quarantine_folder = _ensure_quarantine(mail, 'Quarantine')
+                mail.select('INBOX')
+                held_uids = {str(u) for u in move_uids(mail, [p['uid'] for p in to_hold], quarantine_folder)}
+            except Exception as e:
+                log.warning("[emails::fetch] auto-move failed", extra={'account_id': account_id, 'error': str(e)})
+            if held_uids:
+                cur.executemany(
+                    """
+                    UPDATE email_messages
+                    SET interception_status='HELD',
+                        status='PENDING',
+                        quarantine_folder=?,
+                        action_taken_at=datetime('now')
+                    WHERE id=?
+                    """,
+                    [(quarantine_folder, row_ids[p['message_id']]) for p in to_hold if p['uid'] in held_uids],
+                )
+                log.info("[emails::fetch] auto-held messages", extra={'account_id': account_id, 'count': len(held_uids), 'quarantine_folder': quarantine_folder})
+
+        results = [{
+            'id': row_ids.get(p['message_id']),
+            'message_id': p['message_id'],
+            'uid': p['uid'],
+            'subject': p['subject'],
+            'should_hold': p['should_hold'],
+            'held': p['uid'] in held_uids,
+            'quarantine_folder': quarantine_folder if p['uid'] in held_uids else None,
+        } for p in parsed]
+        conn.commit()
+        stats_cache.invalidate(account_id)
         log.debug("[emails::fetch] completed", extra={'account_id': account_id, 'fetched': len(results), 'total': total})
-        return jsonify({'success': True, 'total_available': total, 'fetched': len(results), 'emails': results})
+        return 200, {'success': True, 'total_available': total, 'fetched': len(results), 'emails': results}
+    except imap_providers.ProviderUnavailable as exc:
+        log.warning("[emails::fetch] provider unavailable", extra={'account_id': account_id, 'error': str(exc)})
+        return 503, {'success': False, 'error': str(exc), 'retry_after': round(exc.retry_after, 1)}
     except Exception as exc:
         log.exception("[emails::fetch] failed", extra={'account_id': account_id})
-        return jsonify({'success': False, 'error': str(exc)}), 500
+        return 500, {'success': False, 'error': str(exc)}
     finally:
-        if mail:
-            try: mail.logout()
-            except Exception as e:
-                log.debug("[emails::fetch] IMAP logout failed (non-critical)", extra={'account_id': account_id, 'error': str(e)})
+        imap_providers.close_connection(mail)
         conn.close()
 
 
+@emails_bp.route('/api/fetch-emails', methods=['POST'])
+@csrf.exempt
+@limiter.limit(_FETCH_LIMIT_STRING)
+@simple_rate_limit('fetch', config=_FETCH_RATE_LIMIT)
+@login_required
+def api_fetch_emails():
+    """Fetch emails from IMAP with one batched UID FETCH per account window.
+
+    Body: ``account_id`` or ``account_ids`` (fetched concurrently, FETCH_WORKERS
+    threads), ``count``, ``offset``, ``headers_only`` (list without storing).
+    """
+    data = request.get_json(silent=True) or {}
+    fetch_count = int(data.get('count', 20)); offset = int(data.get('offset', 0))
+    headers_only = str(data.get('headers_only', '')).lower() in ('1', 'true', 'yes')
+    auto_move_enabled = str(os.environ.get('AUTO_MOVE_ON_FETCH', '0')).lower() in ('1', 'true', 'yes')
+    account_ids = data.get('account_ids')
+    if not account_ids:
+        account_id = data.get('account_id')
+        if not account_id:
+            return jsonify({'success': False, 'error': 'Account ID required'}), 400
+        status, body = _fetch_account(account_id, fetch_count, offset, headers_only, auto_move_enabled)
+        resp = jsonify(body)
+        if status == 503:
+            resp.headers['Retry-After'] = str(max(1, int(body['retry_after'] + 0.999)))
+        return resp, status
+    if not isinstance(account_ids, list):
+        return jsonify({'success': False, 'error': 'account_ids must be a list'}), 400
+
+    account_ids = list(dict.fromkeys(account_ids))
+    with ThreadPoolExecutor(max_workers=min(_fetch_workers(), len(account_ids)), thread_name_prefix='fetch-emails') as pool:
+        futures = {aid: pool.submit(_fetch_account, aid, fetch_count, offset, headers_only, auto_move_enabled) for aid in account_ids}
+        per_account = {}
+        for aid, future in futures.items():
+            status, body = future.result()
+            per_account[str(aid)] = dict(body, status=status)
+    fetched = sum(body.get('fetched', 0) for body in per_account.values())
+    ok = any(body.get('success') for body in per_account.values())
+    return jsonify({'success': ok, 'fetched': fetched, 'accounts': per_account}), (200 if ok else 502)
+
+
 @emails_bp.route('/api/email/<email_id>/reply-forward', methods=['GET'])
 @login_required
 def api_email_reply_forward(email_id):
@@ -597,14 +764,33 @@ def api_email_reply_forward(email_id):
 @emails_bp.route('/api/email/<email_id>/download', methods=['GET'])
 @login_required
 def api_email_download(email_id):
-    """Download email as .eml file (migrated)."""
-    conn = sqlite3.connect(DB_PATH); conn.row_factory = sqlite3.Row; cur = conn.cursor()
-    row = cur.execute("SELECT raw_content, subject FROM email_messages WHERE id=?", (email_id,)).fetchone(); conn.close()
-    if not row or not row['raw_content']:
+    """Download email as .eml file, streamed from raw_path or the raw_content column."""
+    conn = get_db()
+    row = conn.execute(
+        "SELECT id, subject, raw_path, raw_content IS NOT NULL AS has_raw FROM email_messages WHERE id=?",
+        (email_id,),
+    ).fetchone()
+    if not row:
+        conn.close()
         return jsonify({'success': False, 'error': 'Email not found or no raw content'}), 404
     import re
-    safe_subject = re.sub(r'[^\w\s-]', '', row['subject'] or 'email')[:50]; filename = f"{safe_subject}_{email_id}.eml"
-    return Response(row['raw_content'], mimetype='message/rfc822', headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    safe_subject = re.sub(r'[^\w\s-]', '', row['subject'] or 'email')[:50]; filename = f"{safe_subject}_{row['id']}.eml"
+    raw_path = row['raw_path']
+    if raw_path and os.path.isfile(raw_path):
+        conn.close()
+        stat = os.stat(raw_path)
+        return file_response(raw_path, mimetype='message/rfc822', download_name=filename,
+                             etag=f"eml-{row['id']}-{stat.st_size}-{int(stat.st_mtime)}")
+    response = None
+    if row['has_raw']:
+        # raw_content is written once at ingest, so the id identifies the bytes
+        response = sqlite_blob_response(conn, 'email_messages', 'raw_content', row['id'],
+                                        mimetype='message/rfc822', download_name=filename,
+                                        etag=f"eml-{row['id']}")
+    if response is None:
+        conn.close()
+        return jsonify({'success': False, 'error': 'Email not found or no raw content'}), 404
+    return response
 
 
 @emails_bp.route('/email/<int:email_id>/full')
@@ -1,6 +1,7 @@
 """Interception & Inbox Blueprint (Phase 2 Migration).
 
-Contains: healthz, interception dashboard APIs, inbox API, edit, release, discard.
+Contains: healthz/livez/readyz, interception dashboard APIs, inbox API, edit, release (sync or queued
+release jobs), discard.
 Diff and attachment scrubbing supported.
 """
 import logging
@@ -17,7 +18,7 @@ from pathlib import Path
 import json
 
 from typing import Dict, Any, Optional, Union, cast, Iterable
-from flask import Blueprint, jsonify, render_template, request, current_app, send_file, abort
+from flask import Blueprint, jsonify, render_template, request, current_app, abort, url_for
 from flask_login import login_required, current_user
 from email.parser import BytesParser
 from email.policy import default as default_policy
@@ -27,10 +28,18 @@ import imaplib, ssl
 
 from app.utils.db import get_db, DB_PATH
 from app.utils.crypto import decrypt_credential, encrypt_credential
-from app.utils.imap_helpers import _imap_connect_account, _ensure_quarantine, _move_uid_to_quarantine
+from app.utils.imap_helpers import _imap_connect_account, _ensure_quarantine, _move_uid_to_quarantine, _move_uid_from_quarantine
 from app.utils.email_markers import RELEASE_BYPASS_HEADER, RELEASE_EMAIL_ID_HEADER
 from app.services.imap_utils import normalize_folder
 from app.services.audit import log_action
+from app.services import stats as stats_cache
+from app.services.stats import get_or_load
+from app.services import latency_stats
+from app.services import health
+from app.services import release_jobs
+from app.services import attachment_store
+from app.services import change_log, imap_providers, message_summary
+from app.utils.json_responses import conditional_json
 import socket
 from app.extensions import csrf, limiter
 from app.utils.rate_limit import get_rate_limit_config, simple_rate_limit
@@ -53,11 +62,11 @@ except ImportError:  # pragma: no cover - optional dependency
 
 from typing import List
 from typing import Set
-import tempfile
-import mmap
 import html
 from email.message import EmailMessage
 from app.utils.metrics import record_release, track_latency, release_latency
+from app.utils.downloads import file_response
+from app.utils.mime_stream import FilePart, Multipart, StreamingMessage, TextPart, read_header_block
 _RELEASE_RATE_LIMIT = get_rate_limit_config('release', default_requests=30)
 _EDIT_RATE_LIMIT = get_rate_limit_config('edit', default_requests=30)
 _RELEASE_LIMIT_STRING = str(_RELEASE_RATE_LIMIT['limit_string'])
@@ -72,7 +81,6 @@ def _db():
     return get_db()
 
 WORKER_HEARTBEATS = {}
-_HEALTH_CACHE: Dict[str, Any] = {'ts': 0.0, 'payload': None}
 
 _FILENAME_SANITIZER = re.compile(r'[^A-Za-z0-9._-]+')
 
@@ -107,6 +115,7 @@ def _is_under(child: Path, parent: Path) -> bool:
 def _serialize_attachment_row(row: sqlite3.Row) -> Dict[str, Any]:
     """Safely serialize attachment row with defaults for missing fields."""
     try:
+        row = dict(row)
         return {
             'id': row.get('id') or 0,
             'email_id': row.get('email_id') or 0,
@@ -118,6 +127,7 @@ def _serialize_attachment_row(row: sqlite3.Row) -> Dict[str, Any]:
             'content_id': row.get('content_id') or '',
             'is_original': bool(row.get('is_original', False)),
             'is_staged': bool(row.get('is_staged', False)),
+            'extracted': bool(row.get('storage_path')),
         }
     except Exception as e:
         log.warning(f"Failed to serialize attachment row: {e}")
@@ -132,6 +142,7 @@ def _serialize_attachment_row(row: sqlite3.Row) -> Dict[str, Any]:
             'content_id': '',
             'is_original': False,
             'is_staged': False,
+            'extracted': False,
         }
 
 
@@ -139,105 +150,34 @@ def _attachments_feature_enabled(flag: str) -> bool:
     return bool(current_app.config.get(flag, False))
 
 
-def _ensure_attachments_extracted(conn: sqlite3.Connection, row: sqlite3.Row) -> Iterable[sqlite3.Row]:
-    """Ensure original attachments for the given email are extracted to disk and recorded."""
-    email_id = row['id']
-    cur = conn.cursor()
-    existing = cur.execute(
-        "SELECT * FROM email_attachments WHERE email_id=? AND is_original=1 ORDER BY id",
-        (email_id,),
-    ).fetchall()
-    if existing:
-        return existing
+def _ensure_attachments_indexed(conn: sqlite3.Connection, row: sqlite3.Row, extract: bool = False) -> List[sqlite3.Row]:
+    """Original attachment rows for an email, indexing legacy messages on first use.
 
-    raw_bytes = None
-    raw_path = row['raw_path']
-    raw_content = row['raw_content']
-    if raw_path and os.path.exists(raw_path):
+    Messages ingested by the watcher are indexed at ingest time; others are
+    parsed once and then marked indexed, attachments or not. With
+    ``extract=True`` pending payloads are decoded into the shared blob store
+    (download and release need the bytes; listing does not).
+    """
+    email_id = row['id']
+    query = "SELECT * FROM email_attachments WHERE email_id=? AND is_original=1 ORDER BY id"
+    existing = conn.execute(query, (email_id,)).fetchall()
+    changed = False
+    if not existing and not attachment_store.is_indexed(conn, email_id):
+        message = attachment_store.load_raw_message(row['raw_path'], row['raw_content'])
+        if message is None:
+            return existing
+        attachment_store.index_attachments(conn, email_id, message)
+        changed = True
+    if extract and (changed or any(r['storage_path'] == attachment_store.PENDING_PATH for r in existing)):
+        attachments_root, _ = _get_storage_roots()
         try:
-            raw_bytes = Path(raw_path).read_bytes()
-        except (OSError, IOError) as exc:
-            log.warning("[attachments] Failed reading raw_path", extra={'email_id': email_id, 'path': raw_path, 'error': str(exc)})
-    if raw_bytes is None and raw_content:
-        raw_bytes = raw_content if isinstance(raw_content, bytes) else raw_content.encode('utf-8', 'ignore')
-
-    if not raw_bytes:
-        return existing
-
-    try:
-        message = BytesParser(policy=default_policy).parsebytes(raw_bytes)
-    except (ValueError, TypeError) as exc:
-        log.warning("[attachments] Failed parsing raw email", extra={'email_id': email_id, 'error': str(exc)})
+            changed = attachment_store.extract_pending(conn, row, attachments_root) > 0 or changed
+        except OSError as exc:
+            log.warning("[attachments] Blob extraction failed", extra={'email_id': email_id, 'error': str(exc)})
+    if not changed:
         return existing
-
-    attachments_root, _ = _get_storage_roots()
-    email_dir = attachments_root / str(email_id)
-    try:
-        email_dir.mkdir(parents=True, exist_ok=True)
-    except OSError as exc:
-        log.warning("[attachments] Failed to create storage directory", extra={'email_id': email_id, 'path': str(email_dir), 'error': str(exc)})
-        return existing
-
-    counter = 0
-    for part in message.walk():
-        if part.is_multipart():
-            continue
-        payload = part.get_payload(decode=True)
-        if not payload:
-            continue
-        disposition = (part.get_content_disposition() or '').lower() or None
-        filename = part.get_filename()
-        content_id = part.get('Content-ID')
-        if not filename and disposition != 'attachment' and not content_id:
-            # Skip inline body parts without filenames
-            continue
-
-        counter += 1
-        base_name = _sanitize_filename(filename) if filename else f'attachment-{counter}'
-        mime_type = part.get_content_type() or 'application/octet-stream'
-        if '.' not in base_name:
-            subtype = mime_type.split('/')[-1] if '/' in mime_type else None
-            if subtype and subtype not in ('plain', 'html'):
-                base_name = f'{base_name}.{subtype.lower()}'
-
-        final_name = base_name
-        suffix_count = 1
-        while (email_dir / final_name).exists():
-            path_obj = Path(base_name)
-            final_name = f"{path_obj.stem}_{suffix_count}{path_obj.suffix}"
-            suffix_count += 1
-
-        destination = email_dir / final_name
-        try:
-            destination.write_bytes(payload)
-        except (OSError, IOError) as exc:
-            log.warning("[attachments] Failed writing attachment", extra={'email_id': email_id, 'file': final_name, 'error': str(exc)})
-            continue
-
-        sha256 = hashlib.sha256(payload).hexdigest()
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO email_attachments
-                (email_id, filename, mime_type, size, sha256, disposition, content_id, is_original, is_staged, storage_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 1, 0, ?)
-            """,
-            (
-                email_id,
-                final_name,
-                mime_type,
-                len(payload),
-                sha256,
-                disposition,
-                (content_id or '').strip('<>') if content_id else None,
-                str(destination),
-            ),
-        )
-
     conn.commit()
-    return cur.execute(
-        "SELECT * FROM email_attachments WHERE email_id=? AND is_original=1 ORDER BY id",
-        (email_id,),
-    ).fetchall()
+    return conn.execute(query, (email_id,)).fetchall()
 
 
 def _ensure_manifest_structure(manifest: Optional[Dict[str, Any]]) -> Dict[str, Any]:
@@ -359,7 +299,7 @@ def _set_idempotency_record(
 ) -> None:
     response_json = json.dumps(response) if response is not None else None
     conn.execute(
-        "INSERT INTO idempotency_keys(key, email_id, status, response_json)\n         VALUES(?, ?, ?, ?)\n         ON CONFLICT(key) DO UPDATE SET status=excluded.status, response_json=excluded.response_json",
+        "INSERT INTO idempotency_keys(key, email_id, status, response_json)\n         VALUES(?, ?, ?, ?)\n         ON CONFLICT(key) DO UPDATE SET email_id=excluded.email_id, status=excluded.status, response_json=excluded.response_json",
         (key, email_id, status, response_json),
     )
     conn.commit()
@@ -462,7 +402,8 @@ def _build_release_message(
     attachments_root: Path,
     staged_root: Path,
     strip_notice: bool = False,
-) -> EmailMessage:
+) -> StreamingMessage:
+    """Assemble the release message lazily; attachments stream from disk at send time."""
     subject = payload.get('edited_subject')
     if not subject:
         subject = row['subject'] if 'subject' in row.keys() else None
@@ -488,7 +429,7 @@ def _build_release_message(
         else:
             html_body = '<em>[Attachments removed]</em>'
 
-    message = EmailMessage()
+    message = StreamingMessage()
     message['Subject'] = subject
 
     for header, value in original_msg.items():
@@ -499,61 +440,50 @@ def _build_release_message(
             continue
         message[header] = value
 
-    message.make_mixed()
-
-    body_container = EmailMessage()
-    body_container.make_alternative()
-    # Must use add_alternative for both text and HTML on a multipart/alternative container
-    body_container.add_alternative(text_body or '', subtype='plain')
+    body_container = Multipart('alternative', [TextPart(text_body or '', 'plain')])
     if html_body:
-        body_container.add_alternative(html_body, subtype='html')
+        body_container.parts.append(TextPart(html_body, 'html'))
 
     inline_entries = [entry for entry in plan['final'] if entry.get('is_inline')]
     regular_entries = [entry for entry in plan['final'] if not entry.get('is_inline')]
 
-    if inline_entries and html_body:
-        related_container = EmailMessage()
-        related_container.make_related()
-        related_container.attach(body_container)
-        for entry in inline_entries:
-            row_entry = entry['row']
-            storage_path = Path(row_entry['storage_path']).resolve()
-            if not storage_path.exists() or not storage_path.is_file():
-                continue
-            if not (_is_under(storage_path, attachments_root) or _is_under(storage_path, staged_root)):
-                continue
-            maintype, subtype = _split_mime_type(row_entry['mime_type'])
-            with storage_path.open('rb') as fh:
-                data = fh.read()
-            related_container.add_attachment(
-                data,
-                maintype=maintype,
-                subtype=subtype,
-                filename=row_entry['filename'] or f'attachment-{row_entry["id"]}',
-                disposition='inline',
-                cid=f"{row_entry['content_id']}" if row_entry.get('content_id') else None,
-            )
-        message.attach(related_container)
-    else:
-        message.attach(body_container)
-
-    for entry in regular_entries:
-        row_entry = entry['row']
+    def _file_part(row_entry: sqlite3.Row, disposition: str) -> Optional[FilePart]:
         storage_path = Path(row_entry['storage_path']).resolve()
         if not storage_path.exists() or not storage_path.is_file():
-            continue
+            return None
         if not (_is_under(storage_path, attachments_root) or _is_under(storage_path, staged_root)):
-            continue
+            return None
         maintype, subtype = _split_mime_type(row_entry['mime_type'])
-        with storage_path.open('rb') as fh:
-            data = fh.read()
-        message.add_attachment(
-            data,
+        return FilePart(
+            storage_path,
             maintype=maintype,
             subtype=subtype,
             filename=row_entry['filename'] or f'attachment-{row_entry["id"]}',
+            disposition=disposition,
+            content_id=(
+                str(row_entry['content_id'])
+                if disposition == 'inline' and 'content_id' in row_entry.keys() and row_entry['content_id']
+                else None
+            ),
         )
 
+    mixed = Multipart('mixed')
+    if inline_entries and html_body:
+        related_container = Multipart('related', [body_container])
+        for entry in inline_entries:
+            part = _file_part(entry['row'], 'inline')
+            if part is not None:
+                related_container.parts.append(part)
+        mixed.parts.append(related_container)
+    else:
+        mixed.parts.append(body_container)
+
+    for entry in regular_entries:
+        part = _file_part(entry['row'], 'attachment')
+        if part is not None:
+            mixed.parts.append(part)
+    message.body = mixed
+
     needs_new_message_id = bool(
         payload.get('edited_subject')
         or payload.get('edited_body')
@@ -575,6 +505,24 @@ def _build_release_message(
     return message
 
 
+def _is_unmodified_release(
+    row: sqlite3.Row,
+    payload: Dict[str, Any],
+    plan: Dict[str, Any],
+    strip_attachments: bool,
+) -> bool:
+    """True when the release can move the quarantined original as-is."""
+    if strip_attachments or not row['original_uid']:
+        return False
+    if any(payload.get(key) is not None for key in ('edited_subject', 'edited_body', 'edited_body_html')):
+        return False
+    if 'content_edited' in row.keys() and row['content_edited']:
+        return False
+    if plan['added'] or plan['removed'] or plan['replaced']:
+        return False
+    return all(entry['row']['is_original'] for entry in plan['final'])
+
+
 def _split_mime_type(value: Optional[str]) -> tuple[str, str]:
     if value and '/' in value:
         maintype, subtype = value.split('/', 1)
@@ -768,14 +716,32 @@ def _robust_message_id_search(imap_conn, folder, message_id, is_gmail=False, tri
     return []
 
 
+@bp_interception.route('/livez')
+@limiter.exempt
+def livez():
+    """Liveness probe: constant time, in-process state only (no DB, no sockets)."""
+    return jsonify(health.liveness()), 200
+
+
+@bp_interception.route('/readyz')
+@limiter.exempt
+def readyz():
+    """Readiness probe: last background snapshot with per-component timing."""
+    payload = health.readiness()
+    return jsonify(payload), 200 if payload.get('ready') else 503
+
+
 @bp_interception.route('/healthz')
 @limiter.exempt
 def healthz():
     """Health check endpoint with security configuration status (without exposing secrets)."""
-    now = time.time()
-    if _HEALTH_CACHE['payload'] and now - _HEALTH_CACHE['ts'] < 5:
-        cached = dict(_HEALTH_CACHE['payload']); cached['cached'] = True
-        return jsonify(cached), 200 if cached.get('ok') else 503
+    info, from_cache = get_or_load('healthz', _build_health_payload, ttl=5.0)
+    if from_cache:
+        info = dict(info); info['cached'] = True
+    return jsonify(info), 200 if info.get('ok') else 503
+
+
+def _build_health_payload() -> Dict[str, Any]:
     info: Dict[str, Any] = {
         'ok': True,
         'db': None,
@@ -820,10 +786,9 @@ def healthz():
         conn = _db(); cur = conn.cursor()
         info['held_count'] = cur.execute("SELECT COUNT(*) FROM email_messages WHERE direction='inbound' AND interception_status='HELD'").fetchone()[0]
         info['released_24h'] = cur.execute("SELECT COUNT(*) FROM email_messages WHERE direction='inbound' AND interception_status='RELEASED' AND created_at >= datetime('now','-1 day')").fetchone()[0]
-        lat_rows = cur.execute("SELECT latency_ms FROM email_messages WHERE latency_ms IS NOT NULL ORDER BY id DESC LIMIT 200").fetchall()
-        latencies = [r['latency_ms'] for r in lat_rows if r['latency_ms'] is not None]
-        if latencies:
-            info['median_latency_ms'] = int(statistics.median(latencies))
+        lat_sketch = latency_stats.get_sketch(latency_stats.WINDOWS['24h'], conn=conn)
+        if lat_sketch.count:
+            info['median_latency_ms'] = int(lat_sketch.quantile(0.5))
         # Worker heartbeats from DB (last 2 minutes)
         try:
             rows = cur.execute(
@@ -867,9 +832,8 @@ def healthz():
     except Exception:
         pass
     info['smtp'] = smtp_info
-    _HEALTH_CACHE['ts'] = now; _HEALTH_CACHE['payload'] = info
     log.debug("[interception::healthz] refreshed", extra={'ok': info.get('ok'), 'held_count': info.get('held_count'), 'workers': len(info.get('workers', []))})
-    return jsonify(info), 200 if info.get('ok') else 503
+    return info
 
 @bp_interception.route('/api/smtp-health')
 @limiter.exempt
@@ -950,16 +914,29 @@ def interception_dashboard_legacy():
 
 @bp_interception.route('/api/interception/held')
 @login_required
+@conditional_json(time_bucket=60)  # stats.released24h is a rolling 24h count
 def api_interception_held():
     conn = _db(); cur = conn.cursor()
-    rows = cur.execute("""
-        SELECT id, account_id, interception_status, original_uid, sender, recipients, subject, latency_ms, created_at
+    seq, changed = change_log.delta_scope(conn, request.args.get('since'))
+    clause, ids = change_log.id_filter(changed) if changed is not None else ('1', [])
+    rows = cur.execute(f"""
+        SELECT id, account_id, interception_status, original_uid, sender, recipients, subject, latency_ms,
+               created_at, created_at_utc
         FROM email_messages
         WHERE direction='inbound' AND interception_status='HELD'
-          AND sender != 'selfcheck@localhost'
+          AND sender != 'selfcheck@localhost' AND {clause}
         ORDER BY id DESC LIMIT 200
-    """).fetchall()
-    latencies = [r['latency_ms'] for r in rows if r['latency_ms'] is not None]
+    """, ids).fetchall()
+    held_rows = rows
+    if changed is not None:
+        # Queue stats always describe the whole held queue, not just the delta
+        held_rows = cur.execute("""
+            SELECT latency_ms FROM email_messages
+            WHERE direction='inbound' AND interception_status='HELD'
+              AND sender != 'selfcheck@localhost'
+            ORDER BY id DESC LIMIT 200
+        """).fetchall()
+    latencies = [r['latency_ms'] for r in held_rows if r['latency_ms'] is not None]
     median_latency = int(statistics.median(latencies)) if latencies else None
     released24 = cur.execute("""
         SELECT COUNT(*) FROM email_messages
@@ -967,15 +944,16 @@ def api_interception_held():
     """).fetchone()[0]
     accounts_active = cur.execute("SELECT COUNT(DISTINCT account_id) FROM email_messages WHERE direction='inbound'").fetchone()[0]
     conn.close()
-    # Fix timezone: SQLite datetime('now') returns UTC without 'Z', JavaScript needs 'Z' suffix
+    # created_at for JavaScript: stored UTC ISO value (legacy rows get the "Z" fix-up)
     messages = []
     for r in rows:
         msg = dict(r)
-        if msg.get('created_at') and isinstance(msg['created_at'], str):
-            if not msg['created_at'].endswith('Z') and 'T' not in msg['created_at']:
-                msg['created_at'] = msg['created_at'].replace(' ', 'T') + 'Z'
+        msg['created_at'] = message_summary.api_created_at(msg.pop('created_at_utc'), msg.get('created_at'))
         messages.append(msg)
-    return jsonify({'messages':messages, 'stats':{'held':len(rows),'released24h':released24,'median_latency_ms':median_latency,'accounts_active':accounts_active}})
+    payload = {'messages':messages, 'seq':seq, 'stats':{'held':len(held_rows),'released24h':released24,'median_latency_ms':median_latency,'accounts_active':accounts_active}}
+    if changed is not None:
+        payload['delta'] = True; payload['removed'] = change_log.removed_ids(changed, messages)
+    return jsonify(payload)
 
 @bp_interception.route('/api/interception/held/<int:msg_id>')
 @login_required
@@ -986,38 +964,48 @@ def api_interception_get(msg_id:int):
     if not row:
         conn.close(); return jsonify({'error':'not found'}), 404
     data = dict(row)
-    raw_path = data.get('raw_path'); snippet = None
-    if raw_path and os.path.exists(raw_path):
-        try:
-            with open(raw_path,'rb') as f: emsg = BytesParser(policy=default_policy).parsebytes(f.read())
-            text_part = None
-            if emsg.is_multipart():
-                for part in emsg.walk():
-                    if part.get_content_type()=='text/plain':
-                        text_part = part.get_content(); break
-                if text_part is None:
-                    for part in emsg.walk():
-                        if part.get_content_type()=='text/html':
-                            import re; text_part = re.sub('<[^>]+>',' ', part.get_content()); break
-            else:
-                if emsg.get_content_type()=='text/plain': text_part = emsg.get_content()
-                elif emsg.get_content_type()=='text/html':
-                    import re; text_part = re.sub('<[^>]+>',' ', emsg.get_content())
-            if text_part:
-                snippet = ' '.join(text_part.split())[:500]
-        except Exception:
-            snippet = None
+    # preview_snippet is stored at ingest; the raw .eml is only parsed for the
+    # diff (original text) or for rows written without a stored preview
+    snippet = data.get('preview_snippet')
+    original = _raw_text_snippet(data.get('raw_path')) if include_diff or snippet is None else None
+    if snippet is None:
+        snippet = original
     data['preview_snippet'] = snippet
-    if include_diff and snippet is not None:
+    if include_diff and original is not None:
         try:
             current_body = (row['body_text'] or '').strip()
-            if current_body and current_body != snippet:
-                diff_lines = list(difflib.unified_diff(snippet.splitlines(), current_body.splitlines(), fromfile='original', tofile='edited', lineterm=''))
+            if current_body and current_body != original:
+                diff_lines = list(difflib.unified_diff(original.splitlines(), current_body.splitlines(), fromfile='original', tofile='edited', lineterm=''))
                 data['body_diff'] = diff_lines[:500]
         except Exception:
             data['body_diff'] = None
     conn.close(); return jsonify(data)
 
+def _raw_text_snippet(raw_path):
+    """First 500 whitespace-collapsed chars of the original text (or tag-stripped HTML) part."""
+    if not raw_path or not os.path.exists(raw_path):
+        return None
+    try:
+        with open(raw_path,'rb') as f: emsg = BytesParser(policy=default_policy).parsebytes(f.read())
+        text_part = None
+        if emsg.is_multipart():
+            for part in emsg.walk():
+                if part.get_content_type()=='text/plain':
+                    text_part = part.get_content(); break
+            if text_part is None:
+                for part in emsg.walk():
+                    if part.get_content_type()=='text/html':
+                        import re; text_part = re.sub('<[^>]+>',' ', part.get_content()); break
+        else:
+            if emsg.get_content_type()=='text/plain': text_part = emsg.get_content()
+            elif emsg.get_content_type()=='text/html':
+                import re; text_part = re.sub('<[^>]+>',' ', emsg.get_content())
+        if text_part:
+            return ' '.join(text_part.split())[:500]
+    except Exception:
+        return None
+    return None
+
 @bp_interception.route('/api/email/<int:email_id>/attachments', methods=['GET'])
 @login_required
 def api_email_attachments(email_id: int):
@@ -1033,7 +1021,7 @@ def api_email_attachments(email_id: int):
         if not row:
             return jsonify({'ok': False, 'error': 'not-found'}), 404
 
-        original_rows = list(_ensure_attachments_extracted(conn, row))
+        original_rows = _ensure_attachments_indexed(conn, row)
         manifest = _load_manifest_from_row(row)
         version = row['version'] if 'version' in row.keys() and row['version'] is not None else 0
 
@@ -1066,6 +1054,11 @@ def api_attachment_download(attachment_id: int):
         row = conn.execute("SELECT * FROM email_attachments WHERE id=?", (attachment_id,)).fetchone()
         if not row:
             return jsonify({'ok': False, 'error': 'not-found'}), 404
+        if row['is_original'] and row['storage_path'] == attachment_store.PENDING_PATH:
+            email_row = conn.execute("SELECT * FROM email_messages WHERE id=?", (row['email_id'],)).fetchone()
+            if email_row:
+                _ensure_attachments_indexed(conn, email_row, extract=True)
+                row = conn.execute("SELECT * FROM email_attachments WHERE id=?", (attachment_id,)).fetchone()
 
         attachments_root, staged_root = _get_storage_roots()
         storage_path = Path(row['storage_path']).resolve()
@@ -1080,7 +1073,10 @@ def api_attachment_download(attachment_id: int):
 
         download_name = row['filename'] or f'attachment-{attachment_id}'
         mimetype = row['mime_type'] or 'application/octet-stream'
-        return send_file(storage_path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+        # ?inline=1 lets the browser preview (PDF viewers issue Range requests)
+        inline = request.args.get('inline', '').lower() in ('1', 'true', 'yes')
+        return file_response(storage_path, mimetype=mimetype, download_name=download_name,
+                             etag=row['sha256'], as_attachment=not inline)
     finally:
         conn.close()
 
@@ -1552,12 +1548,125 @@ def api_email_attachments_delete_staged(email_id: int, staged_id: int):
 @login_required
 def api_interception_release(msg_id: int):
     payload = request.get_json(silent=True) or {}
+    idempotency_key = request.headers.get('X-Idempotency-Key')
+    user_id = getattr(current_user, 'id', None)
+    if _release_async_requested(payload):
+        return _enqueue_release(msg_id, payload, idempotency_key, user_id)
+    return _release_email(msg_id, payload, idempotency_key, user_id)
+
+
+def _release_async_requested(payload: Dict[str, Any]) -> bool:
+    if 'async' in payload:
+        return bool(payload.get('async'))
+    if 'respond-async' in (request.headers.get('Prefer') or '').lower():
+        return True
+    return bool(current_app.config.get('RELEASE_ASYNC'))
+
+
+def _enqueue_release(msg_id: int, payload: Dict[str, Any], idempotency_key: Optional[str], user_id: Any):
+    """Queue the release and answer 202 with a job id (the job id is the idempotency key)."""
+    job_id = idempotency_key or release_jobs.new_job_id()
+    conn = _db()
+    try:
+        record = _get_idempotency_record(conn, job_id)
+        if record:
+            status = (record['status'] or '').lower()
+            if status == 'success' and record['response_json']:
+                return current_app.response_class(record['response_json'], mimetype='application/json')
+            if status in ('queued', 'pending') and release_jobs.get_job(job_id):
+                return _release_job_accepted(job_id, 'queued' if status == 'queued' else 'running')
+        row = conn.execute(
+            "SELECT account_id FROM email_messages WHERE id=? AND direction='inbound'",
+            (msg_id,),
+        ).fetchone()
+        if not row:
+            return jsonify({'ok': False, 'reason': 'not-found'}), 404
+        _set_idempotency_record(conn, job_id, msg_id, 'queued', {'ok': False, 'job_id': job_id, 'status': 'queued'})
+    finally:
+        conn.close()
+
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    job_payload = dict(payload)
+
+    def _runner() -> tuple[int, Dict[str, Any]]:
+        with app.app_context():
+            response = app.make_response(_release_email(msg_id, job_payload, job_id, user_id, claimed=True))
+            body = response.get_json(silent=True) or {}
+            outcome = 'success' if response.status_code < 400 else 'failed'
+            done = _db()
+            try:
+                _set_idempotency_record(done, job_id, msg_id, outcome, body)
+            finally:
+                done.close()
+            return response.status_code, body
+
+    try:
+        job = release_jobs.submit(msg_id, row['account_id'], _runner, job_id=job_id)
+    except release_jobs.QueueFull:
+        conn = _db()
+        try:
+            conn.execute("DELETE FROM idempotency_keys WHERE key=?", (job_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        resp = jsonify({'ok': False, 'reason': 'release-queue-full'})
+        resp.headers['Retry-After'] = '5'
+        return resp, 503
+    return _release_job_accepted(job.id, job.status)
+
+
+def _release_job_accepted(job_id: str, status: str):
+    status_url = url_for('interception_bp.api_release_job_status', job_id=job_id)
+    resp = jsonify({'ok': True, 'job_id': job_id, 'status': status, 'status_url': status_url})
+    resp.headers['Location'] = status_url
+    return resp, 202
+
+
+@bp_interception.route('/api/interception/release-jobs/<job_id>')
+@login_required
+def api_release_job_status(job_id: str):
+    """Poll an async release job; finished jobs fall back to idempotency_keys."""
+    job = release_jobs.get_job(job_id)
+    if job is not None:
+        job['ok'] = True
+        return jsonify(job)
+    conn = _db()
+    try:
+        record = _get_idempotency_record(conn, job_id)
+    finally:
+        conn.close()
+    if not record:
+        return jsonify({'ok': False, 'reason': 'not-found'}), 404
+    status = (record['status'] or '').lower()
+    result = json.loads(record['response_json']) if record['response_json'] else None
+    return jsonify({
+        'ok': True,
+        'job_id': job_id,
+        'email_id': record['email_id'],
+        # A queued/pending key with no live job was lost with its process
+        'status': {'success': 'succeeded', 'failed': 'failed'}.get(status, 'lost'),
+        'result': result,
+    })
+
+
+def _release_email(
+    msg_id: int,
+    payload: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
+    user_id: Any = None,
+    claimed: bool = False,
+):
+    """Release a held message end to end (sync API and release jobs).
+
+    Returns a Flask response value; needs an app context, not a request.
+    ``claimed`` means the caller (a release job) already owns the
+    idempotency key, so its queued record is not treated as a conflict.
+    """
     edited_subject = payload.get('edited_subject')
     edited_body = payload.get('edited_body')
     edited_body_html = payload.get('edited_body_html')
     target_folder = normalize_folder(payload.get('target_folder', 'INBOX'))
     strip_attachments = bool(payload.get('strip_attachments'))
-    idempotency_key = request.headers.get('X-Idempotency-Key')
 
     conn = _db()
     cur = conn.cursor()
@@ -1565,23 +1674,21 @@ def api_interception_release(msg_id: int):
     app_log = logging.getLogger("simple_app")
 
     lock_acquired = False
-    temp_path: Optional[Path] = None
-    mapped_bytes = None
     staged_rows: List[sqlite3.Row] = []
     response_payload: Dict[str, Any] = {}
 
     try:
         # Fast idempotency check before acquiring lock
-        if idempotency_key:
+        if idempotency_key and not claimed:
             record = _get_idempotency_record(conn, idempotency_key)
             if record:
                 status = (record['status'] or '').lower()
                 stored_response = record['response_json']
                 if status == 'success' and stored_response:
                     return current_app.response_class(stored_response, mimetype='application/json')
-                if status == 'pending':
+                if status in ('pending', 'queued'):
                     return jsonify({'ok': False, 'reason': 'release-in-progress'}), 409
-                if status not in {'success', 'pending'}:
+                if status not in {'success', 'pending', 'queued'}:
                     conn.execute("DELETE FROM idempotency_keys WHERE key=?", (idempotency_key,))
                     conn.commit()
 
@@ -1636,17 +1743,16 @@ def api_interception_release(msg_id: int):
         except Exception as e:
             app_log.error(f"[Release ERROR] Failed to access raw message fields: {e}", exc_info=True)
             return jsonify({'ok': False, 'error': f'Failed to access raw message: {str(e)}'}), 500
+        # Only the original headers are reused; the body comes from the edit payload
         if raw_path and os.path.exists(raw_path):
-            with open(raw_path, 'rb') as f:
-                original_bytes = f.read()
+            original_msg = read_header_block(raw_path)
         elif raw_content:
-            original_bytes = raw_content.encode('utf-8') if isinstance(raw_content, str) else raw_content
+            original_msg = read_header_block(raw_content.encode('utf-8') if isinstance(raw_content, str) else raw_content)
         else:
             raise RuntimeError('raw-missing')
 
-        original_msg = BytesParser(policy=default_policy).parsebytes(original_bytes)
-
         attachments_root, staged_root = _get_storage_roots()
+        _ensure_attachments_indexed(conn, row, extract=True)
         attachment_rows = conn.execute(
             "SELECT * FROM email_attachments WHERE email_id=?",
             (msg_id,),
@@ -1688,12 +1794,18 @@ def api_interception_release(msg_id: int):
             'replaced': len(plan['replaced']),
         }
 
-        decrypted_pass = decrypt_credential(row['imap_password'])
+        fast_path = _is_unmodified_release(row, payload, plan, strip_attachments)
+        fast_released = False
+
+        decrypted_pass = decrypt_credential(row['imap_password'], account_id=row['account_id'])
+        imap = None
         try:
             if row['imap_use_ssl']:
-                imap = imaplib.IMAP4_SSL(row['imap_host'], int(row['imap_port']))
+                imap = imap_providers.open_connection(
+                    row['imap_host'], lambda: imaplib.IMAP4_SSL(row['imap_host'], int(row['imap_port'])))
             else:
-                imap = imaplib.IMAP4(row['imap_host'], int(row['imap_port']))
+                imap = imap_providers.open_connection(
+                    row['imap_host'], lambda: imaplib.IMAP4(row['imap_host'], int(row['imap_port'])))
             if not decrypted_pass:
                 raise RuntimeError('Decrypted password missing')
             imap.login(row['imap_username'], decrypted_pass)
@@ -1719,6 +1831,28 @@ def api_interception_release(msg_id: int):
                     extra={"email_id": msg_id, "original_message_id": original_message_id},
                 )
 
+            if fast_path and original_message_id:
+                # A stray copy of the original already in the target needs the full
+                # path (new Message-ID + failsafe cleanup), not a second copy
+                try:
+                    imap.select(target_folder)
+                    typ_dup, data_dup = imap.search(None, 'HEADER', 'Message-ID', original_message_id)
+                    fast_path = not (typ_dup == 'OK' and data_dup and data_dup[0] and data_dup[0].split())
+                except Exception:
+                    fast_path = False
+            if fast_path:
+                # Unmodified: move the quarantined original instead of re-uploading it
+                fast_released = _move_uid_from_quarantine(
+                    imap,
+                    str(row['original_uid']),
+                    row['quarantine_folder'] or 'Quarantine',
+                    target_folder,
+                )
+                app_log.info(
+                    "[Release] Fast path server-side move",
+                    extra={"email_id": msg_id, "original_uid": row['original_uid'], "moved": fast_released},
+                )
+
             # Use internaldate if available; else use current time
             date_param = None
             try:
@@ -1741,7 +1875,7 @@ def api_interception_release(msg_id: int):
 
             already_present = False
             try:
-                if message_id_hdr:
+                if message_id_hdr and not fast_released:
                     imap.select(target_folder)
                     typ0, data0 = imap.search(None, 'HEADER', 'Message-ID', f"{message_id_hdr}")
                     already_present = bool(data0 and data0[0] and len(data0[0].split()) > 0)
@@ -1756,16 +1890,11 @@ def api_interception_release(msg_id: int):
                 del msg[RELEASE_EMAIL_ID_HEADER]
             msg[RELEASE_EMAIL_ID_HEADER] = str(msg_id)
 
-            message_bytes = msg.as_bytes(policy=default_policy)
-
             with track_latency(release_latency, action='RELEASED'):
-                if not already_present:
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                        tmp_file.write(message_bytes)
-                        temp_path = Path(tmp_file.name)
-                    with temp_path.open('rb') as mapped_file:
-                        mapped_bytes = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
-                        imap.append(target_folder, '', date_param, mapped_bytes[:])
+                if not already_present and not fast_released:
+                    # imaplib sends the literal as one bytes object; read the spool exactly once
+                    with msg.spool() as release_spool:
+                        imap.append(target_folder, '', date_param, release_spool.read())
 
                 # Existing Gmail cleanup phases (B-E)
                 original_uid = row['original_uid']
@@ -1777,8 +1906,8 @@ def api_interception_release(msg_id: int):
                 host_l = str(row['imap_host'] if row['imap_host'] else '').lower()
                 is_gmail = any(k in host_l for k in ("gmail", "googlemail", "google"))
 
-                # Phase A: remove from quarantine
-                if original_uid:
+                # Phase A: remove from quarantine (the fast path already moved it out)
+                if original_uid and not fast_released:
                     try:
                         app_log.info(
                             "[Release] Phase A: Pre-append Quarantine cleanup",
@@ -1804,14 +1933,14 @@ def api_interception_release(msg_id: int):
                         )
                 else:
                     app_log.info(
-                        "[Release] Phase A: No original_uid, skipping Quarantine delete",
-                        extra={"email_id": msg_id},
+                        "[Release] Phase A: Skipping Quarantine delete",
+                        extra={"email_id": msg_id, "original_uid": original_uid, "fast_path": fast_released},
                     )
 
                 # Phase B: append edited message already handled above
 
                 # Phase C onwards reuse existing logic
-                if is_gmail and _server_supports_x_gm(imap):
+                if is_gmail and not fast_released and _server_supports_x_gm(imap):
                     try:
                         app_log.info(
                             "[Release] Phase C: Gmail thread cleanup starting",
@@ -1931,7 +2060,8 @@ def api_interception_release(msg_id: int):
                         "INBOX select for failsafe cleanup",
                         extra={"email_id": msg_id, "typ": typ, "is_gmail": is_gmail},
                     )
-                    if typ == "OK" and original_message_id:
+                    # With the fast path the original *is* the released message
+                    if typ == "OK" and original_message_id and not fast_released:
                         inbox_count = data[0].decode() if data and data[0] else "?"
                         all_typ, all_data = imap.uid('SEARCH', None, 'ALL')
                         all_uids = all_data[0].decode() if all_data and all_data[0] else ""
@@ -1973,7 +2103,7 @@ def api_interception_release(msg_id: int):
                 verify_ok = True
                 duplicate_detected = False
                 try:
-                    if message_id_hdr:
+                    if message_id_hdr and not fast_released:
                         app_log.info(
                             "[Release] Phase E: Starting verification",
                             extra={"email_id": msg_id, "is_gmail": is_gmail},
@@ -2079,21 +2209,11 @@ def api_interception_release(msg_id: int):
                     )
 
                 if not verify_ok:
-                    try:
-                        imap.logout()
-                    except Exception as exc:
-                        log.debug(
-                            "[interception::release] IMAP logout failed during verify failure (non-critical)",
-                            extra={'email_id': msg_id, 'error': str(exc)},
-                        )
                     raise RuntimeError('verify-failed')
-
-                try:
-                    imap.logout()
-                except Exception:
-                    pass
         except Exception as exc:
             raise RuntimeError(f'append-failed:{exc}') from exc
+        finally:
+            imap_providers.close_connection(imap)
 
         # Update database and clear manifest
         cur.execute(
@@ -2115,6 +2235,7 @@ def api_interception_release(msg_id: int):
             (msg_id,),
         )
         conn.commit()
+        stats_cache.invalidate(row['account_id'])
 
         for staged in staged_rows:
             try:
@@ -2134,6 +2255,7 @@ def api_interception_release(msg_id: int):
             'released_to': target_folder,
             'attachments_removed': removed,
             'attachments_summary': attachments_summary,
+            'fast_path': fast_released,
         }
         if idempotency_key:
             _set_idempotency_record(conn, idempotency_key, msg_id, 'success', response_payload)
@@ -2141,7 +2263,7 @@ def api_interception_release(msg_id: int):
         try:
             log_action(
                 'RELEASE',
-                getattr(current_user, 'id', None),
+                user_id,
                 msg_id,
                 f"Released to {target_folder}; edited={bool(edited_subject or edited_body)}; removed={removed}",
             )
@@ -2203,16 +2325,6 @@ def api_interception_release(msg_id: int):
         )
         return jsonify(error_payload), 500
     finally:
-        if mapped_bytes:
-            try:
-                mapped_bytes.close()
-            except Exception:
-                pass
-        if temp_path and temp_path.exists():
-            try:
-                temp_path.unlink()
-            except Exception:
-                pass
         if lock_acquired:
             try:
                 _release_release_lock(conn, msg_id)
@@ -2243,10 +2355,12 @@ def api_interception_discard(msg_id:int):
     cur.execute("UPDATE email_messages SET interception_status='DISCARDED', action_taken_at=datetime('now') WHERE id=?", (msg_id,))
     changed = cur.rowcount or 0
     conn.commit(); conn.close()
+    stats_cache.invalidate()
     return jsonify({'ok': True, 'status': 'DISCARDED', 'changed': int(changed)})
 
 @bp_interception.route('/api/inbox')
 @login_required
+@conditional_json()
 def api_inbox():
     status_filter = request.args.get('status','').strip().upper() or None
     account_id = request.args.get('account_id', type=int)
@@ -2256,6 +2370,9 @@ def api_inbox():
         limit = 200
     limit = max(10, min(limit, 500))
     conn = _db(); cur = conn.cursor(); params=[]; clauses=[]
+    seq, changed = change_log.delta_scope(conn, request.args.get('since'))
+    if changed is not None:
+        clause, ids = change_log.id_filter(changed); clauses.append(clause); params.extend(ids)
     if status_filter:
         clauses.append("(interception_status = ? OR status = ?)"); params.extend([status_filter,status_filter])
     if account_id:
@@ -2267,7 +2384,8 @@ def api_inbox():
     where = ('WHERE '+ ' AND '.join(clauses)) if clauses else ''
     rows = cur.execute(
         f"""
-        SELECT id, account_id, sender, recipients, subject, interception_status, status, created_at, latency_ms, body_text, raw_path
+        SELECT id, account_id, sender, recipients, subject, interception_status, status, created_at, latency_ms,
+               raw_path, {message_summary.PREVIEW_SQL}
         FROM email_messages
         {where}
         ORDER BY id DESC LIMIT ?
@@ -2276,10 +2394,13 @@ def api_inbox():
     ).fetchall()
     msgs=[]
     for r in rows:
-        d=dict(r); body_txt=(d.get('body_text') or '')
-        d['preview_snippet']=' '.join(body_txt.split())[:160]
+        d=dict(r); d['preview_snippet']=message_summary.preview_snippet(d.get('preview_snippet'))
         msgs.append(d)
-    conn.close(); return jsonify({'messages':msgs,'count':len(msgs)})
+    conn.close()
+    payload = {'messages':msgs,'count':len(msgs),'seq':seq}
+    if changed is not None:
+        payload['delta'] = True; payload['removed'] = change_log.removed_ids(changed, msgs)
+    return jsonify(payload)
 
 @bp_interception.route('/api/email/<int:email_id>/edit', methods=['POST'])
 @csrf.exempt
@@ -2300,7 +2421,11 @@ def api_email_edit(email_id:int):
     if body_text is not None: fields.append('body_text = ?'); values.append(body_text)
     if body_html is not None: fields.append('body_html = ?'); values.append(body_html)
     values.append(email_id)
-    cur.execute(f"UPDATE email_messages SET {', '.join(fields)}, updated_at = datetime('now') WHERE id = ?", values)
+    cur.execute(f"UPDATE email_messages SET {', '.join(fields)}, content_edited = 1, updated_at = datetime('now') WHERE id = ?", values)
+    if body_text is not None or body_html is not None:
+        bodies = cur.execute("SELECT body_text, body_html FROM email_messages WHERE id = ?", (email_id,)).fetchone()
+        cur.execute("UPDATE email_messages SET preview_snippet = ? WHERE id = ?",
+                    (message_summary.preview_snippet(bodies['body_text'], bodies['body_html']), email_id))
     conn.commit()
     # Re-read to verify persistence
     verify = cur.execute("SELECT id, subject, body_text, body_html FROM email_messages WHERE id = ?", (email_id,)).fetchone()
@@ -2347,12 +2472,14 @@ def api_email_intercept(email_id:int):
     resolved_uid = row['original_uid']
     log.debug("[interception::manual_intercept] begin", extra={'email_id': email_id, 'account_id': row['account_id'], 'previous_status': previous, 'resolved_uid': resolved_uid})
 
+    imap_obj = None
     try:
         host = row['imap_host']; port = int(row['imap_port'] or 993)
         username = row['imap_username']; password = decrypt_credential(row['imap_password'])
         if not password:
             raise RuntimeError('Decrypted password missing')
-        imap_obj = imaplib.IMAP4_SSL(host, port) if port == 993 else imaplib.IMAP4(host, port)
+        imap_obj = imap_providers.open_connection(
+            host, lambda: imaplib.IMAP4_SSL(host, port) if port == 993 else imaplib.IMAP4(host, port))
         try:
             if port != 993:
                 imap_obj.starttls()
@@ -2410,13 +2537,10 @@ def api_email_intercept(email_id:int):
         else:
             note = 'Remote UID not found for manual intercept'
             log.warning("[interception::manual_intercept] UID not resolved", extra={'email_id': email_id, 'account_id': row['account_id']})
-
-        try:
-            imap_obj.logout()
-        except Exception:
-            pass
     except Exception as exc:
         note = f'IMAP error: {exc}'
+    finally:
+        imap_providers.close_connection(imap_obj)
 
     if not remote_move:
         conn.close()
@@ -2438,6 +2562,7 @@ def api_email_intercept(email_id:int):
         """,
         (effective_quarantine, email_id),
     ); conn.commit()
+    stats_cache.invalidate(row['account_id'])
     log.info("[interception::manual_intercept] success", extra={'email_id': email_id, 'account_id': row['account_id'], 'quarantine_folder': effective_quarantine})
 
     # Calculate latency_ms best-effort
@@ -2446,6 +2571,8 @@ def api_email_intercept(email_id:int):
         if row_t and row_t['created_at'] and row_t['action_taken_at'] and row_t['latency_ms'] is None:
             cur.execute("UPDATE email_messages SET latency_ms = CAST((julianday(action_taken_at) - julianday(created_at)) * 86400000 AS INTEGER) WHERE id=?", (email_id,))
             conn.commit()
+            row_l = cur.execute("SELECT latency_ms FROM email_messages WHERE id=?", (email_id,)).fetchone()
+            latency_stats.record_latency(row_l['latency_ms'] if row_l else None, account_id=row['account_id'])
     except Exception:
         pass
     conn.close()
@@ -2520,6 +2647,7 @@ def api_batch_discard():
 
         conn.commit()
         conn.close()
+        stats_cache.invalidate()
 
         # Audit log for batch operation
         try:
@@ -2577,7 +2705,9 @@ def api_batch_delete():
                 email_ids
             )
             deleted = cur.rowcount
+            attachment_store.release_email_blobs(conn, email_ids)
             conn.commit()
+            stats_cache.invalidate()
         except Exception as e:
             failed = len(email_ids)
             log.error(f"[batch-delete] Failed to delete emails: {e}")
@@ -2632,6 +2762,16 @@ def api_delete_all_discarded():
         conn = _db()
         cur = conn.cursor()
 
+        # Release shared attachment blobs before the rows go away
+        discarded_ids = [
+            r[0] for r in cur.execute(
+                "SELECT id FROM email_messages WHERE interception_status='DISCARDED'"
+                + (" AND account_id=?" if account_id else ""),
+                (account_id,) if account_id else (),
+            ).fetchall()
+        ]
+        attachment_store.release_email_blobs(conn, discarded_ids)
+
         # Build delete query with optional account filter
         if account_id:
             cur.execute(
@@ -2644,6 +2784,7 @@ def api_delete_all_discarded():
         deleted = cur.rowcount
         conn.commit()
         conn.close()
+        stats_cache.invalidate(account_id)
 
         # Audit log
         try:
@@ -2715,6 +2856,7 @@ def bulk_release_emails():
                     errors.append(f"Email {email_id}: {str(e)}")
 
             conn.commit()
+        stats_cache.invalidate()
 
         response = {'released': released_count}
         if errors:
@@ -2773,6 +2915,7 @@ def bulk_discard_emails():
                     errors.append(f"Email {email_id}: {str(e)}")
 
             conn.commit()
+        stats_cache.invalidate()
 
         response = {'discarded': discarded_count}
         if errors:
@@ -1,27 +1,21 @@
 """Statistics Blueprint - Phase 1B Route Modularization
 
 Extracted from simple_app.py lines 1011, 2207, 2274, 2297
-Routes: /api/stats, /api/unified-stats, /api/latency-stats, /stream/stats
+Routes: /api/stats, /api/unified-stats, /api/latency-stats, /api/stats/trends,
+        /api/stats/trends/latency, /stream/stats
 """
-from flask import Blueprint, jsonify, Response, stream_with_context, current_app
+from flask import Blueprint, jsonify, Response, stream_with_context
 from flask_login import login_required
 import time
 import json
 from datetime import datetime, timezone
-from app.utils.db import get_db, fetch_counts
 from app.extensions import csrf
-from app.services.stats import get_stats
-import statistics
+from app.services.stats import get_stats, get_unified_stats, get_or_load
+from app.services import latency_stats, rollups
+from app.utils.json_responses import conditional_json
 
 stats_bp = Blueprint('stats', __name__)
 
-# TODO Phase 2: Unify stat sources (fetch_counts vs get_stats)
-
-# Helper to access cache (Phase 5: replaced manual cache dicts with Flask-Caching)
-def _get_cache():
-    """Get cache instance from app context"""
-    return current_app.cache
-
 
 @stats_bp.route('/api/stats')
 @login_required
@@ -33,122 +27,85 @@ def api_stats():
 
 @stats_bp.route('/api/unified-stats')
 @login_required
+@conditional_json()
 def api_unified_stats():
     """Get unified statistics with released count, optionally filtered by account
-    
-    Phase 5 Quick Wins: Now uses Flask-Caching with automatic memoization by account_id
+
+    Served from the shared stats cache (keyed per account, invalidated on writes).
     """
     from flask import request
     account_id = request.args.get('account_id')
-    
-    # Use cache with memoization (automatically handles different account_id values)
-    cache = _get_cache()
-    cache_key = f'unified_stats_{account_id or "all"}'
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return jsonify(cached)
-    
-    # Get counts with optional account filtering
-    if account_id:
-        from app.utils.db import fetch_counts
-        counts = fetch_counts(account_id=int(account_id), include_outbound=False)
-    else:
-        counts = get_stats()
-
-    # Get released count with optional account filtering
-    with get_db() as conn:
-        cur = conn.cursor()
-        if account_id:
-            released = cur.execute("""
-                SELECT COUNT(*) FROM email_messages
-                WHERE (interception_status='RELEASED' OR status IN ('APPROVED','DELIVERED'))
-                  AND (direction IS NULL OR direction!='outbound')
-                  AND account_id = ?
-            """, (account_id,)).fetchone()[0]
-        else:
-            released = cur.execute("""
-                SELECT COUNT(*) FROM email_messages
-                WHERE (interception_status='RELEASED' OR status IN ('APPROVED','DELIVERED'))
-                  AND (direction IS NULL OR direction!='outbound')
-            """).fetchone()[0]
-
-    val = {
-        'total': counts['total'],
-        'pending': counts['pending'],
-        'held': counts['held'],
-        'released': released,
-        'rejected': counts.get('rejected', 0),
-        'discarded': counts.get('discarded', 0)
-    }
-    
-    # Cache result (5 second TTL set in app config)
-    cache.set(cache_key, val, timeout=5)
-    return jsonify(val)
-
-
-def _percentile(sorted_vals, pct: float) -> float:
-    """Calculate percentile from sorted values"""
-    if not sorted_vals:
-        return 0.0
-    n = len(sorted_vals)
-    if n == 1:
-        return float(sorted_vals[0])
-    pos = (n - 1) * pct
-    lo = int(pos)
-    hi = min(lo + 1, n - 1)
-    frac = pos - lo
-    return float(sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * frac)
+    return jsonify(get_unified_stats(account_id=account_id))
 
 
 @stats_bp.route('/api/latency-stats')
 def api_latency_stats():
-    """Get latency statistics with 10s cache
-    
-    Phase 5 Quick Wins: Now uses Flask-Caching instead of manual dict
+    """Get latency percentiles from the streaming latency sketches.
+
+    Query params: window=1h|24h|7d|30d (default 24h), account_id (optional).
+    Served from the shared stats cache ('latency' namespace, 10s backstop TTL).
     """
-    cache = _get_cache()
-    cache_key = 'latency_stats'
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return jsonify(cached)
-
-    with get_db() as conn:
-        cur = conn.cursor()
-        rows = cur.execute(
-            """
-            SELECT latency_ms FROM email_messages
-            WHERE latency_ms IS NOT NULL
-            ORDER BY id DESC LIMIT 1000
-            """
-        ).fetchall()
-
-    vals = [float(r[0]) for r in rows if r[0] is not None]
-    vals.sort()
-    count = len(vals)
-    if count == 0:
-        payload = {
-            'count': 0,
-            'min': 0, 'p50': 0, 'p90': 0, 'p95': 0, 'p99': 0, 'max': 0,
-            'mean': 0, 'median': 0
-        }
-    else:
-        payload = {
-            'count': count,
-            'min': float(vals[0]),
-            'p50': _percentile(vals, 0.50),
-            'p90': _percentile(vals, 0.90),
-            'p95': _percentile(vals, 0.95),
-            'p99': _percentile(vals, 0.99),
-            'max': float(vals[-1]),
-            'mean': float(statistics.fmean(vals) if hasattr(statistics, 'fmean') else sum(vals)/count),
-            'median': float(statistics.median(vals)),
-        }
-
-    # Cache for 10 seconds (longer than default 5s due to expensive percentile calculations)
-    cache.set(cache_key, payload, timeout=10)
+    from flask import request
+    window = request.args.get('window', '24h')
+    if window not in latency_stats.WINDOWS:
+        return jsonify({'error': f"window must be one of {sorted(latency_stats.WINDOWS)}"}), 400
+    account_id = request.args.get('account_id', type=int)
+    payload, _ = get_or_load(
+        'latency',
+        lambda: dict(latency_stats.get_latency_summary(window, account_id=account_id), window=window),
+        account_id=account_id,
+        filter_key=window,
+        ttl=10.0,
+    )
     return jsonify(payload)
 
 
+@stats_bp.route('/api/stats/trends')
+@login_required
+def api_stats_trends():
+    """Message count trends from the hourly/daily rollup tables.
+
+    Query params: granularity=hour|day (default day), days (default 30, max 366),
+    group_by=status|direction|risk_band|rule_hit|account_id, account_id (optional).
+    """
+    from flask import request
+    granularity = request.args.get('granularity', 'day')
+    group_by = request.args.get('group_by', 'status')
+    days = max(1, min(366, request.args.get('days', 30, type=int) or 30))
+    account_id = request.args.get('account_id', type=int)
+    if granularity not in rollups.GRANULARITIES or group_by not in rollups.GROUP_BY_DIMENSIONS:
+        return jsonify({'error': 'invalid granularity or group_by'}), 400
+    rollups.maybe_run_rollups()
+    series, _ = get_or_load(
+        'trends',
+        lambda: rollups.get_trends(granularity, days, account_id=account_id, group_by=group_by),
+        account_id=account_id,
+        filter_key=f"{granularity}:{days}:{group_by}",
+        ttl=30.0,
+    )
+    return jsonify({'granularity': granularity, 'group_by': group_by, 'days': days, 'series': series})
+
+
+@stats_bp.route('/api/stats/trends/latency')
+@login_required
+def api_latency_trends():
+    """Latency percentiles per hour/day bucket, merged from latency sketches."""
+    from flask import request
+    granularity = request.args.get('granularity', 'day')
+    days = max(1, min(90, request.args.get('days', 7, type=int) or 7))
+    account_id = request.args.get('account_id', type=int)
+    if granularity not in rollups.GRANULARITIES:
+        return jsonify({'error': 'invalid granularity'}), 400
+    series, _ = get_or_load(
+        'latency_trends',
+        lambda: rollups.get_latency_trends(granularity, days, account_id=account_id),
+        account_id=account_id,
+        filter_key=f"{granularity}:{days}",
+        ttl=30.0,
+    )
+    return jsonify({'granularity': granularity, 'days': days, 'series': series})
+
+
 @stats_bp.route('/stream/stats')
 @csrf.exempt
 @login_required
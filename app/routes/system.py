@@ -9,6 +9,7 @@ from typing import Dict, Any, List, Optional
 from flask import Blueprint, jsonify, request
 from flask_login import login_required
 
+from app.services import log_query
 from app.utils.db import DB_PATH
 
 
@@ -16,10 +17,7 @@ system_bp = Blueprint('system', __name__)
 _PROCESS_START_TS = time.time()
 
 
-LOG_DIRS: List[str] = [
-    os.path.join(os.getcwd(), 'logs'),
-    os.path.join(os.getcwd(), 'app', 'logs')
-]
+LOG_DIRS: List[str] = log_query.LOG_DIRS
 
 
 def _query_system_status(key: str) -> Optional[str]:
@@ -113,16 +111,12 @@ def api_watchers_status():
 @login_required
 def api_system_logs():
     """Return recent logs from DB if available, otherwise tail log files.
-    Supports both JSON logs (logs/app.json.log) and text logs (logs/app.log).
+    Supports both JSON logs (logs/app_<ts>.json.log) and text logs (logs/app_<ts>.log).
     Filtering:
     - Excludes noisy "Logging initialized" lines
     - Respects ?min_level= (DEBUG|INFO|WARNING|ERROR|CRITICAL), default INFO
     - De-duplicates by message (keeps newest occurrence)
     """
-    from collections import deque
-    import json as _json
-    import re
-
     limit = int(max(1, min(500, int(request.args.get('limit', 200)))))
     min_level = (request.args.get('min_level') or 'INFO').upper()
     level_rank = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
@@ -164,77 +158,19 @@ def api_system_logs():
         except Exception:
             pass
 
-    # 2) Fallback: tail JSON log file
-    def _read_json_log(path: str, n: int):
-        out = []
-        try:
-            dq = deque(maxlen=n)
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    dq.append(line.strip())
-            for line in dq:
-                if not line:
-                    continue
-                try:
-                    obj = _json.loads(line)
-                    out.append({
-                        'timestamp': obj.get('timestamp'),
-                        'level': obj.get('level'),
-                        'message': obj.get('message'),
-                        'source': obj.get('logger') or obj.get('module')
-                    })
-                except Exception:
-                    continue
-        except Exception:
-            return []
-        return out
-
-    # 3) Fallback: tail text log file
-    _TEXT_RE = re.compile(r"^(?P<ts>[^ ]+\s+[^ ]+)\s+(?P<level>[A-Z]+)\s+\[(?P<src>[^\]]+)\]\s+(?P<msg>.*)$")
-
-    def _read_text_log(path: str, n: int):
-        out = []
-        try:
-            dq = deque(maxlen=n)
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    dq.append(line.rstrip('\n'))
-            for line in dq:
-                m = _TEXT_RE.match(line)
-                if not m:
-                    continue
-                out.append({
-                    'timestamp': m.group('ts'),
-                    'level': m.group('level'),
-                    'message': m.group('msg'),
-                    'source': m.group('src')
-                })
-        except Exception:
-            return []
-        return out
-
-    files_to_check = []
-    for d in LOG_DIRS:
-        files_to_check.append(os.path.join(d, 'app.json.log'))
-        files_to_check.append(os.path.join(d, 'app.log'))
-
-    # Prefer JSON log if present
-    for p in files_to_check:
-        if p.endswith('app.json.log') and os.path.exists(p):
-            json_rows = _read_json_log(p, limit)
-            if json_rows:
-                json_rows = [r for r in json_rows if _passes_filters(r)]
-                json_rows = _dedupe_newest_first(list(reversed(json_rows)))
-                return jsonify({'logs': json_rows})
-
-    # Otherwise try text log
-    for p in files_to_check:
-        if p.endswith('app.log') and os.path.exists(p):
-            text_rows = _read_text_log(p, limit)
-            if text_rows:
-                text_rows = [r for r in text_rows if _passes_filters(r)]
-                text_rows = _dedupe_newest_first(list(reversed(text_rows)))
-                return jsonify({'logs': text_rows})
+    # 2) Fallback: newest per-startup log file(s), JSON preferred over text
+    #    (app/services/log_query.py reads backwards from the end of each file)
+    try:
+        file_rows = log_query.query(
+            LOG_DIRS,
+            min_level=min_level,
+            exclude=('Logging initialized',),
+            limit=limit,
+        )
+    except OSError:
+        file_rows = []
+    if file_rows:
+        return jsonify({'logs': _dedupe_newest_first(file_rows)})
 
     # Nothing found
     return jsonify({'logs': []})
@@ -21,6 +21,7 @@ from flask import Blueprint, render_template, jsonify, request
 from flask_login import login_required, current_user
 
 from app.utils.db import DB_PATH
+from app.utils.json_responses import conditional_json
 
 
 watchers_bp = Blueprint('watchers', __name__)
@@ -59,6 +60,7 @@ def watchers_page():
 
 @watchers_bp.route('/api/watchers/overview')
 @login_required
+@conditional_json(tables=None)
 def api_watchers_overview():
     """Combine account list with recent heartbeats and SMTP health."""
     conn = sqlite3.connect(DB_PATH)
@@ -0,0 +1,296 @@
+"""Attachment Index & Content-Addressed Blob Store
+
+Attachment metadata is indexed when a message is ingested; payloads are
+decoded only when someone needs the bytes (download, release).
+
+- index_attachments(): walks MIME headers of an already-parsed message and
+  writes email_attachments rows (filename, type, disposition, content_id,
+  estimated size, part_index) with storage_path='' (= not extracted yet).
+  Payloads are never decoded here. The email is marked in
+  attachment_index_state even when it has no attachments, so is_indexed()
+  spares later readers a re-parse.
+- extract_pending(): parses the raw message once, decodes only the parts
+  whose rows are still pending, and stores them in the blob store
+- Blob store: <attachments_root>/blobs/<sha[:2]>/<sha256>, one file per
+  distinct content, tracked in attachment_blobs with a refcount; identical
+  newsletter logos/PDFs across hundreds of emails share one file
+- release_email_blobs(): drops the refcounts held by an email's original
+  attachments and unlinks blobs nobody references anymore
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+PENDING_PATH = ''
+_ID_CHUNK = 500  # stay under SQLite's bound-parameter limit
+
+_FILENAME_SANITIZER = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attachment_blobs(
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            storage_path TEXT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attachment_index_state(
+            email_id INTEGER PRIMARY KEY,
+            indexed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(email_attachments)")}
+    except sqlite3.Error:
+        columns = set()
+    if columns and 'part_index' not in columns:
+        conn.execute("ALTER TABLE email_attachments ADD COLUMN part_index INTEGER")
+
+
+def _sanitize_filename(value: Optional[str]) -> str:
+    if not value:
+        return 'attachment'
+    candidate = value.strip().replace('\\', '_').replace('/', '_')
+    sanitized = _FILENAME_SANITIZER.sub('_', candidate).strip('._')
+    return sanitized[:255] or 'attachment'
+
+
+def _attachment_parts(message: EmailMessage) -> Iterator[Tuple[int, EmailMessage]]:
+    """Yield ``(part_index, part)`` for leaf parts that look like attachments.
+
+    ``part_index`` is the position in ``message.walk()`` so a later parse of
+    the same raw bytes finds the same part.
+    """
+    for index, part in enumerate(message.walk()):
+        if part.is_multipart():
+            continue
+        disposition = (part.get_content_disposition() or '').lower() or None
+        if not part.get_filename() and disposition != 'attachment' and not part.get('Content-ID'):
+            # Inline body parts without filenames
+            continue
+        yield index, part
+
+
+def _estimated_size(part: EmailMessage) -> int:
+    encoded = part.get_payload()
+    if not isinstance(encoded, str):
+        return 0
+    cte = str(part.get('Content-Transfer-Encoding', '')).strip().lower()
+    if cte == 'base64':
+        return (len(''.join(encoded.split())) * 3) // 4
+    return len(encoded)
+
+
+def index_attachments(conn: sqlite3.Connection, email_id: int, message: EmailMessage) -> int:
+    """Record attachment metadata for a parsed message; returns rows written.
+
+    The caller commits. Existing original rows for the email are left alone.
+    """
+    names: set = set()
+    written = 0
+    counter = 0
+    for index, part in _attachment_parts(message):
+        counter += 1
+        filename = part.get_filename()
+        mime_type = part.get_content_type() or 'application/octet-stream'
+        base_name = _sanitize_filename(filename) if filename else f'attachment-{counter}'
+        if '.' not in base_name:
+            subtype = mime_type.split('/')[-1] if '/' in mime_type else None
+            if subtype and subtype not in ('plain', 'html'):
+                base_name = f'{base_name}.{subtype.lower()}'
+        final_name = base_name
+        suffix = 1
+        while final_name in names:
+            stem, ext = os.path.splitext(base_name)
+            final_name = f"{stem}_{suffix}{ext}"
+            suffix += 1
+        names.add(final_name)
+
+        content_id = part.get('Content-ID')
+        cur = conn.execute(
+            """
+            INSERT OR IGNORE INTO email_attachments
+                (email_id, filename, mime_type, size, sha256, disposition, content_id,
+                 is_original, is_staged, storage_path, part_index)
+            VALUES (?, ?, ?, ?, NULL, ?, ?, 1, 0, ?, ?)
+            """,
+            (
+                email_id,
+                final_name,
+                mime_type,
+                _estimated_size(part),
+                (part.get_content_disposition() or '').lower() or None,
+                str(content_id).strip().strip('<>') if content_id else None,
+                PENDING_PATH,
+                index,
+            ),
+        )
+        written += cur.rowcount or 0
+    conn.execute("INSERT OR IGNORE INTO attachment_index_state(email_id) VALUES (?)", (email_id,))
+    return written
+
+
+def is_indexed(conn: sqlite3.Connection, email_id: int) -> bool:
+    """True once index_attachments() ran for the email (with or without attachments)."""
+    row = conn.execute("SELECT 1 FROM attachment_index_state WHERE email_id=?", (email_id,)).fetchone()
+    return row is not None
+
+
+def blob_path(root: Path, sha256: str) -> Path:
+    return Path(root) / 'blobs' / sha256[:2] / sha256
+
+
+def put_blob(conn: sqlite3.Connection, root: Path, data: bytes) -> Tuple[str, Path]:
+    """Store ``data`` once per distinct SHA-256 and take a reference on it."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_path(root, sha256)
+    row = conn.execute("SELECT storage_path FROM attachment_blobs WHERE sha256=?", (sha256,)).fetchone()
+    if row is None or not Path(row[0]).is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so readers never see a partial blob
+        fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_name, path)
+        except Exception:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+    conn.execute(
+        """
+        INSERT INTO attachment_blobs(sha256, size, storage_path, refcount) VALUES(?, ?, ?, 1)
+        ON CONFLICT(sha256) DO UPDATE SET refcount=refcount+1, storage_path=excluded.storage_path
+        """,
+        (sha256, len(data), str(path)),
+    )
+    return sha256, path
+
+
+def release_blob(conn: sqlite3.Connection, sha256: str) -> bool:
+    """Drop one reference; unlinks the file when none remain. Returns True if removed."""
+    row = conn.execute("SELECT refcount, storage_path FROM attachment_blobs WHERE sha256=?", (sha256,)).fetchone()
+    if row is None:
+        return False
+    if int(row[0]) > 1:
+        conn.execute("UPDATE attachment_blobs SET refcount=refcount-1 WHERE sha256=?", (sha256,))
+        return False
+    conn.execute("DELETE FROM attachment_blobs WHERE sha256=?", (sha256,))
+    try:
+        Path(row[1]).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        log.warning("[attachments] Failed to remove blob", extra={'sha256': sha256, 'error': str(exc)})
+    return True
+
+
+def _pending_rows(conn: sqlite3.Connection, email_id: int) -> List[sqlite3.Row]:
+    return conn.execute(
+        "SELECT * FROM email_attachments WHERE email_id=? AND is_original=1 AND storage_path=? ORDER BY id",
+        (email_id, PENDING_PATH),
+    ).fetchall()
+
+
+def load_raw_message(raw_path: Optional[str], raw_content: Union[str, bytes, None]) -> Optional[EmailMessage]:
+    raw_bytes: Optional[bytes] = None
+    if raw_path and os.path.exists(raw_path):
+        try:
+            raw_bytes = Path(raw_path).read_bytes()
+        except OSError as exc:
+            log.warning("[attachments] Failed reading raw_path", extra={'path': raw_path, 'error': str(exc)})
+    if raw_bytes is None and raw_content:
+        raw_bytes = raw_content if isinstance(raw_content, bytes) else raw_content.encode('utf-8', 'ignore')
+    if not raw_bytes:
+        return None
+    try:
+        return BytesParser(policy=default_policy).parsebytes(raw_bytes)
+    except (ValueError, TypeError) as exc:
+        log.warning("[attachments] Failed parsing raw email", extra={'error': str(exc)})
+        return None
+
+
+def extract_pending(conn: sqlite3.Connection, email_row: Any, root: Path) -> int:
+    """Decode still-pending original attachments of one email into blobs.
+
+    Returns the number of rows extracted; the caller commits. Rows whose part
+    is missing or empty stay pending (storage_path='') and are skipped by
+    download/release path checks.
+    """
+    email_id = email_row['id']
+    pending = _pending_rows(conn, email_id)
+    if not pending:
+        return 0
+    message = load_raw_message(email_row['raw_path'], email_row['raw_content'])
+    if message is None:
+        return 0
+    parts: Dict[int, EmailMessage] = dict(_attachment_parts(message))
+    extracted = 0
+    for row in pending:
+        part = parts.get(row['part_index']) if row['part_index'] is not None else None
+        if part is None:
+            continue
+        payload = part.get_payload(decode=True)
+        if not payload:
+            continue
+        sha256, path = put_blob(conn, root, payload)
+        conn.execute(
+            "UPDATE email_attachments SET sha256=?, size=?, storage_path=?, updated_at=datetime('now') WHERE id=?",
+            (sha256, len(payload), str(path), row['id']),
+        )
+        extracted += 1
+    if extracted:
+        log.debug("[attachments] extracted", extra={'email_id': email_id, 'count': extracted})
+    return extracted
+
+
+def release_email_blobs(conn: sqlite3.Connection, email_ids: List[int]) -> int:
+    """Release blob references held by original attachments of deleted emails.
+
+    Only rows stored in the blob store hold a reference; legacy
+    ``attachments/<email_id>/...`` files and pending rows are not released
+    even when their sha256 matches a blob another email uses.
+
+    Deletes those email_attachments rows and index markers; returns the
+    number of blob files removed.
+    """
+    removed = 0
+    ids = list(email_ids)
+    for start in range(0, len(ids), _ID_CHUNK):
+        chunk = ids[start:start + _ID_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(
+            f"SELECT a.sha256 FROM email_attachments a "
+            f"JOIN attachment_blobs b ON b.sha256 = a.sha256 AND b.storage_path = a.storage_path "
+            f"WHERE a.email_id IN ({placeholders}) AND a.is_original=1 AND a.storage_path != ?",
+            (*chunk, PENDING_PATH),
+        ).fetchall()
+        for row in rows:
+            if release_blob(conn, row[0]):
+                removed += 1
+        conn.execute(
+            f"DELETE FROM email_attachments WHERE email_id IN ({placeholders}) AND is_original=1",
+            chunk,
+        )
+        conn.execute(f"DELETE FROM attachment_index_state WHERE email_id IN ({placeholders})", chunk)
+    return removed
@@ -3,15 +3,89 @@
 Extracted from simple_app.py lines 71-90
 Provides lightweight audit logging for user actions
 
-Best-effort logging - failures are silently caught to preserve
+Records are buffered in memory and written with one executemany per batch:
+- A background thread flushes every AUDIT_FLUSH_SECONDS (default 2s), and
+  early once AUDIT_BATCH_SIZE (default 100) records are pending
+- Pending records are flushed on process exit (atexit) and before reads
+- SYNC_ACTIONS (LOGIN, LOGOUT, ...) and ``log_action(..., sync=True)`` write
+  immediately, together with anything already pending, so security events
+  never wait in memory
+- created_at is stamped when the action happens, not when it is flushed
+
+Best-effort logging - failures are logged and the batch is kept for the
+next flush (up to AUDIT_MAX_PENDING records) but never raised, to preserve
 application functionality (matches original monolith behavior).
 """
+import atexit
+import logging
+import os
 import sqlite3
+import threading
 from datetime import datetime, timezone
-from app.utils.db import DB_PATH
+from typing import List, Optional, Tuple
 
+from app.utils.db import get_db
 
-def log_action(action_type, user_id, email_id, message):
+log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int, low: int, high: int) -> int:
+    try:
+        return min(high, max(low, int(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+FLUSH_SECONDS = _env_float('AUDIT_FLUSH_SECONDS', 2.0, 0.05, 300)
+BATCH_SIZE = _env_int('AUDIT_BATCH_SIZE', 100, 1, 10000)
+MAX_PENDING = _env_int('AUDIT_MAX_PENDING', 10000, 100, 1000000)
+SYNC_ACTIONS = frozenset({'LOGIN', 'LOGOUT', 'LOGIN_FAILED', 'PASSWORD_CHANGE'})
+
+# Columns added to pre-existing audit_log tables (legacy schema: action, target_id, details)
+_COLUMNS = (
+    ('action_type', 'TEXT'),
+    ('email_id', 'INTEGER'),
+    ('message', 'TEXT'),
+)
+
+AuditRecord = Tuple[str, Optional[int], Optional[int], Optional[str], str]
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_pending: List[AuditRecord] = []
+_wake = threading.Event()
+_state = {'thread': None}
+
+
+def ensure_table(conn: sqlite3.Connection) -> None:
+    """Create audit_log, or add the current columns to a legacy table."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action_type TEXT NOT NULL,
+            user_id INTEGER,
+            email_id INTEGER,
+            message TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(audit_log)").fetchall()}
+    for name, decl in _COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE audit_log ADD COLUMN {name} {decl}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_created_at ON audit_log(created_at DESC)")
+
+
+def log_action(action_type, user_id, email_id, message, sync=None):
     """Log user action to audit_log table
 
     Args:
@@ -19,45 +93,101 @@ def log_action(action_type, user_id, email_id, message):
         user_id: ID of user performing action
         email_id: ID of email being acted upon (None for auth actions)
         message: Human-readable description of action
+        sync: Write before returning (default: only for SYNC_ACTIONS)
 
     Returns:
-        None (failures silently caught)
+        None (failures logged, never raised)
 
     Example:
         >>> log_action('LOGIN', 1, None, "User admin logged in")
         >>> log_action('APPROVE', 1, 42, "Email approved by admin")
     """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-
-        # Ensure audit_log table exists (idempotent)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action_type TEXT NOT NULL,
-                user_id INTEGER,
-                email_id INTEGER,
-                message TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Insert audit record
-        cur.execute(
-            """
-            INSERT INTO audit_log (action_type, user_id, email_id, message, created_at)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (action_type, user_id, email_id, message, datetime.now(timezone.utc).isoformat()),
-        )
-
-        conn.commit()
-        conn.close()
-    except Exception:
-        # Silent failure preserves behavior from monolith
-        # Audit logging is best-effort and should never break application flow
-        pass
+    record = (action_type, user_id, email_id, message, datetime.now(timezone.utc).isoformat())
+    if sync is None:
+        sync = action_type in SYNC_ACTIONS
+    with _lock:
+        _pending.append(record)
+        _trim_locked()
+        size = len(_pending)
+    if sync:
+        flush()
+        return
+    _start_flusher()
+    if size >= BATCH_SIZE:
+        _wake.set()
+
+
+def _trim_locked() -> None:
+    overflow = len(_pending) - MAX_PENDING
+    if overflow > 0:
+        del _pending[:overflow]
+        log.warning(f"[audit] buffer full; dropped {overflow} oldest records")
+
+
+def flush(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Write all pending records with one executemany. Returns rows written."""
+    with _write_lock:
+        with _lock:
+            batch = list(_pending)
+            _pending.clear()
+        if not batch:
+            return 0
+        own = conn is None
+        try:
+            c = conn or get_db()
+            try:
+                ensure_table(c)
+                c.executemany(
+                    "INSERT INTO audit_log (action_type, user_id, email_id, message, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+                c.commit()
+            finally:
+                if own:
+                    c.close()
+            return len(batch)
+        except sqlite3.Error as e:
+            # Keep the batch (ahead of newer records) for the next flush
+            with _lock:
+                _pending[:0] = batch
+                _trim_locked()
+            log.warning(f"[audit] failed to write {len(batch)} records: {e}")
+            return 0
+
+
+def _flusher() -> None:
+    while True:
+        _wake.wait(FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:  # keep the thread alive whatever happens
+            log.warning(f"[audit] flusher error: {e}")
+
+
+def _start_flusher() -> None:
+    thread = _state['thread']
+    if thread is not None and thread.is_alive():
+        return
+    with _lock:
+        thread = _state['thread']
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_flusher, name='audit-flusher', daemon=True)
+        _state['thread'] = thread
+    thread.start()
+
+
+def pending_count() -> int:
+    with _lock:
+        return len(_pending)
+
+
+def reset() -> None:
+    """Drop pending records (tests)."""
+    with _lock:
+        _pending.clear()
 
 
 def get_recent_logs(limit=100):
@@ -74,9 +204,9 @@ def get_recent_logs(limit=100):
         >>> for log in logs:
         ...     print(f"{log['action_type']}: {log['message']}")
     """
+    flush()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cur = conn.cursor()
 
         logs = cur.execute("""
@@ -90,3 +220,6 @@ def get_recent_logs(limit=100):
         return [dict(log) for log in logs]
     except Exception:
         return []
+
+
+atexit.register(flush)
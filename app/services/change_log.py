@@ -0,0 +1,179 @@
+"""Email Change Log (Outbox)
+
+``email_changes`` records one row per insert, update and delete on
+email_messages, written by SQLite triggers inside the writer's own
+transaction. That covers the watcher, SMTP handler, fetch, release,
+discard and edit paths (and writers in other processes) with no per-path
+bookkeeping. ``seq`` is AUTOINCREMENT, so it only ever grows and is never
+reused.
+
+Readers use it two ways:
+
+- Delta sync: list APIs accept ``since=<seq>`` and return only rows changed
+  after it (plus the ids that disappeared from the view) together with the
+  current ``seq``. changed_since() returns None when the client must reload
+  in full: its seq predates the retention horizon, or too much changed.
+- Cache invalidation: sync_caches() (run at most every CHANGE_LOG_SYNC_INTERVAL
+  seconds from a before_request hook) invalidates the stats cache for just
+  the accounts touched since the last sync, including writes made by other
+  processes that never called stats.invalidate().
+- Row revisions: the newest seq for an email id versions its rendered list
+  row (/api/emails/unified/rows caches row HTML per (id, rev)).
+
+Rows older than CHANGE_LOG_RETENTION_HOURS (default 72) are pruned, always
+keeping the newest row so the current seq survives.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from app.services import stats as stats_cache
+from app.utils.db import get_db
+
+log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+SYNC_INTERVAL = _env_float('CHANGE_LOG_SYNC_INTERVAL', 1.0, 0.0, 300)
+RETENTION_HOURS = _env_float('CHANGE_LOG_RETENTION_HOURS', 72, 1, 24 * 365)
+MAX_DELTA_IDS = 500
+_PRUNE_INTERVAL = 600.0
+
+_sync_lock = threading.Lock()
+_sync_state = {'cursor': None, 'checked_at': 0.0, 'pruned_at': 0.0}
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_changes(
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_id INTEGER NOT NULL,
+            account_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_email_changes_changed_at ON email_changes(changed_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_email_changes_email ON email_changes(email_id, seq)")
+    for suffix, event, ref, op in (('ai', 'INSERT', 'NEW', 'insert'),
+                                   ('au', 'UPDATE', 'NEW', 'update'),
+                                   ('ad', 'DELETE', 'OLD', 'delete')):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_email_messages_change_{suffix}
+            AFTER {event} ON email_messages
+            BEGIN
+                INSERT INTO email_changes(email_id, account_id, op) VALUES ({ref}.id, {ref}.account_id, '{op}');
+            END
+            """
+        )
+
+
+def parse_since(value: Any) -> Optional[int]:
+    """``since`` query value -> seq, None when absent or malformed."""
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seq if seq >= 0 else None
+
+
+def latest_seq(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(seq) FROM email_changes").fetchone()
+    return int(row[0] or 0)
+
+
+def changed_since(conn: sqlite3.Connection, since: int, limit: int = MAX_DELTA_IDS) -> Optional[List[int]]:
+    """Email ids changed after ``since``; None when a full reload is needed."""
+    oldest = conn.execute("SELECT MIN(seq) FROM email_changes").fetchone()[0]
+    if oldest is not None and since < oldest - 1:
+        return None  # changes in between were pruned
+    ids = [int(r[0]) for r in conn.execute(
+        "SELECT DISTINCT email_id FROM email_changes WHERE seq > ? LIMIT ?", (since, limit + 1)
+    ).fetchall()]
+    if len(ids) > limit:
+        return None
+    return ids
+
+
+def delta_scope(conn: sqlite3.Connection, since_value: Any) -> Tuple[int, Optional[List[int]]]:
+    """``(seq, ids)`` for a list API: the current seq (read before the list
+    query, so nothing committed after it is missed) and the email ids to
+    restrict the listing to, or None for a full listing."""
+    seq = latest_seq(conn)
+    since = parse_since(since_value)
+    if since is None:
+        return seq, None
+    return seq, changed_since(conn, since)
+
+
+def id_filter(ids: List[int], column: str = 'id') -> Tuple[str, List[int]]:
+    """SQL condition + params restricting ``column`` to ``ids``."""
+    if not ids:
+        return "0", []
+    return f"{column} IN ({','.join('?' * len(ids))})", list(ids)
+
+
+def removed_ids(changed: List[int], rows: List[Any]) -> List[int]:
+    """Changed ids absent from a delta listing (deleted or no longer matching)."""
+    present = {row['id'] for row in rows}
+    return sorted(set(changed) - present)
+
+
+def prune(conn: sqlite3.Connection, retention_hours: float = RETENTION_HOURS) -> int:
+    cur = conn.execute(
+        "DELETE FROM email_changes WHERE changed_at < datetime('now', ?) "
+        "AND seq < (SELECT MAX(seq) FROM email_changes)",
+        (f"-{retention_hours} hours",),
+    )
+    return cur.rowcount or 0
+
+
+def sync_caches(force: bool = False) -> None:
+    """Invalidate stats cache entries for accounts changed since the last sync."""
+    now = time.monotonic()
+    with _sync_lock:
+        if not force and now - _sync_state['checked_at'] < SYNC_INTERVAL:
+            return
+        _sync_state['checked_at'] = now
+        cursor = _sync_state['cursor']
+        try:
+            conn = get_db()
+            try:
+                latest = latest_seq(conn)
+                accounts = set()
+                if cursor is not None and latest > cursor:
+                    accounts = {r[0] for r in conn.execute(
+                        "SELECT DISTINCT account_id FROM email_changes WHERE seq > ?", (cursor,)
+                    ).fetchall()}
+                if now - _sync_state['pruned_at'] >= _PRUNE_INTERVAL:
+                    _sync_state['pruned_at'] = now
+                    if prune(conn):
+                        conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            log.debug(f"[change_log] sync skipped: {e}")
+            return
+        _sync_state['cursor'] = latest
+    if None in accounts:
+        stats_cache.invalidate()
+        return
+    for account_id in accounts:
+        stats_cache.invalidate(account_id)
+
+
+def reset_sync_state() -> None:
+    with _sync_lock:
+        _sync_state.update(cursor=None, checked_at=0.0, pruned_at=0.0)
@@ -0,0 +1,189 @@
+"""Liveness & Readiness State
+
+Separates the cheap liveness probe from the deep readiness check so load
+balancer probes never touch the database.
+
+- Liveness (/livez): in-process only (uptime, pid, refresher thread state)
+- Readiness (/readyz): snapshot of components computed by a background
+  refresher every HEALTH_REFRESH_SECONDS (default 15s, clamped 2-300);
+  probes only read the last snapshot
+- Each component records ok/detail/duration_ms/checked_at; durations and
+  up/down are also exported as Prometheus gauges
+- A snapshot older than 3 refresh intervals counts as not ready (stalled
+  refresher)
+
+Components:
+- database (required): SELECT 1
+- queue: held/pending counts from the shared stats cache
+- workers: heartbeats seen in the last 2 minutes
+- smtp: TCP connect to the SMTP proxy port
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from app.utils.db import get_db
+from app.utils.metrics import record_health_component
+
+log = logging.getLogger(__name__)
+
+REQUIRED_COMPONENTS = ('database',)
+
+try:
+    _REFRESH_INTERVAL = min(300.0, max(2.0, float(os.getenv('HEALTH_REFRESH_SECONDS', '15'))))
+except ValueError:
+    _REFRESH_INTERVAL = 15.0
+
+_STARTED_AT = time.time()
+_LOCK = threading.Lock()
+_SNAPSHOT: Dict[str, Any] = {'components': {}, 'refreshed_at': None}
+_REFRESHER: Dict[str, Any] = {'thread': None, 'stop': threading.Event()}
+
+
+def _check_database() -> Dict[str, Any]:
+    conn = get_db()
+    try:
+        conn.execute("SELECT 1").fetchone()
+    finally:
+        conn.close()
+    return {'ok': True}
+
+
+def _check_queue() -> Dict[str, Any]:
+    from app.services.stats import get_stats
+    counts = get_stats()
+    return {'ok': True, 'held': int(counts.get('held', 0)), 'pending': int(counts.get('pending', 0))}
+
+
+def _check_workers() -> Dict[str, Any]:
+    conn = get_db()
+    try:
+        rows = conn.execute(
+            """
+            SELECT worker_id, status FROM worker_heartbeats
+            WHERE datetime(last_heartbeat) > datetime('now', '-2 minutes')
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+    return {'ok': True, 'active': len(rows), 'errors': sum(1 for r in rows if (r['status'] or '') == 'error')}
+
+
+def _check_smtp() -> Dict[str, Any]:
+    host = os.environ.get('SMTP_PROXY_HOST', '127.0.0.1')
+    port = int(os.environ.get('SMTP_PROXY_PORT', '8587'))
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.settimeout(0.5)
+        listening = s.connect_ex((host, port)) == 0
+    finally:
+        s.close()
+    return {'ok': listening, 'listening': listening}
+
+
+COMPONENT_CHECKS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    'database': _check_database,
+    'queue': _check_queue,
+    'workers': _check_workers,
+    'smtp': _check_smtp,
+}
+
+
+def refresh_now() -> Dict[str, Any]:
+    """Run every component check once and publish the snapshot (refresher thread / tests)."""
+    components: Dict[str, Dict[str, Any]] = {}
+    for name, check in COMPONENT_CHECKS.items():
+        start = time.perf_counter()
+        try:
+            result = dict(check())
+        except Exception as exc:
+            result = {'ok': False, 'error': str(exc)}
+        duration = time.perf_counter() - start
+        result['duration_ms'] = round(duration * 1000.0, 2)
+        result['checked_at'] = datetime.now(timezone.utc).isoformat()
+        components[name] = result
+        record_health_component(name, bool(result.get('ok')), duration)
+    with _LOCK:
+        _SNAPSHOT['components'] = components
+        _SNAPSHOT['refreshed_at'] = time.time()
+    log.debug("[health] snapshot refreshed", extra={'components': {k: v.get('ok') for k, v in components.items()}})
+    return components
+
+
+def _refresh_loop() -> None:
+    stop: threading.Event = _REFRESHER['stop']
+    while not stop.is_set():
+        try:
+            refresh_now()
+        except Exception as exc:  # pragma: no cover - defensive, checks already guarded
+            log.warning("[health] refresh failed: %s", exc)
+        stop.wait(_REFRESH_INTERVAL)
+
+
+def start_refresher() -> None:
+    """Start the background refresher once per process (idempotent)."""
+    with _LOCK:
+        thread = _REFRESHER['thread']
+        if thread is not None and thread.is_alive():
+            return
+        _REFRESHER['stop'].clear()
+        thread = threading.Thread(target=_refresh_loop, name='health-refresher', daemon=True)
+        _REFRESHER['thread'] = thread
+    thread.start()
+
+
+def stop_refresher(timeout: float = 2.0) -> None:
+    _REFRESHER['stop'].set()
+    thread = _REFRESHER['thread']
+    if thread is not None:
+        thread.join(timeout)
+
+
+def liveness() -> Dict[str, Any]:
+    """Constant-time liveness payload built from in-process state only."""
+    thread = _REFRESHER['thread']
+    return {
+        'ok': True,
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _STARTED_AT, 1),
+        'threads': threading.active_count(),
+        'health_refresher_alive': bool(thread is not None and thread.is_alive()),
+    }
+
+
+def readiness() -> Dict[str, Any]:
+    """Last published readiness snapshot; never runs checks inline."""
+    start_refresher()
+    with _LOCK:
+        components = dict(_SNAPSHOT['components'])
+        refreshed_at = _SNAPSHOT['refreshed_at']
+    if refreshed_at is None:
+        return {'ready': False, 'status': 'starting', 'components': {}, 'age_seconds': None}
+    age = time.time() - refreshed_at
+    stale = age > 3 * _REFRESH_INTERVAL
+    required_ok = all(components.get(name, {}).get('ok') for name in REQUIRED_COMPONENTS)
+    degraded = [name for name, c in components.items() if not c.get('ok') and name not in REQUIRED_COMPONENTS]
+    ready = required_ok and not stale
+    if not ready:
+        status = 'stale' if stale else 'unavailable'
+    else:
+        status = 'degraded' if degraded else 'ok'
+    return {
+        'ready': ready,
+        'status': status,
+        'degraded': degraded,
+        'age_seconds': round(age, 2),
+        'refresh_interval_seconds': _REFRESH_INTERVAL,
+        'components': components,
+    }
+
+
+def reset() -> None:
+    """Forget the published snapshot (tests)."""
+    with _LOCK:
+        _SNAPSHOT['components'] = {}
+        _SNAPSHOT['refreshed_at'] = None
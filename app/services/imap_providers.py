@@ -0,0 +1,309 @@
+"""IMAP Provider Registry
+
+Process-wide admission control per IMAP host, shared by the watchers and
+every route that opens an IMAP connection (release, resync, scan, fetch).
+Before this, 80 accounts on one provider reconnecting after a restart hit
+the server with 80 simultaneous logins and got throttled or banned.
+
+Per host (lower-cased ``imap_host``):
+
+- Connection cap: IMAP_PROVIDER_MAX_CONNECTIONS open connections (default
+  100); watcher connections hold their slot for as long as they are open
+- Login rate: token bucket of IMAP_PROVIDER_LOGIN_RATE logins/s (default 1)
+  with burst IMAP_PROVIDER_LOGIN_BURST (default 5)
+- Circuit breaker: IMAP_PROVIDER_FAILURE_THRESHOLD consecutive connect or
+  login failures (default 5) open the circuit for IMAP_PROVIDER_COOLDOWN
+  seconds (default 60); then one half-open probe is admitted, success
+  closes the circuit, failure re-opens it. Authentication failures are
+  per-account problems and do not count.
+
+acquire() raises ProviderUnavailable (with ``retry_after``) when the
+circuit is open or no slot/token frees up within the timeout.
+open_connection() wraps a connection factory: it acquires a lease, records
+the connect/login outcome and releases the slot on logout or failed login.
+Callers log out in a finally block (close_connection() does it best-effort)
+so error paths never leave a slot or a half-open probe held.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.metrics import record_provider_admission, set_provider_circuit
+
+log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+MAX_CONNECTIONS = int(_env_float('IMAP_PROVIDER_MAX_CONNECTIONS', 100, 1, 10000))
+LOGIN_RATE = _env_float('IMAP_PROVIDER_LOGIN_RATE', 1.0, 0.01, 100)
+LOGIN_BURST = _env_float('IMAP_PROVIDER_LOGIN_BURST', 5, 1, 1000)
+FAILURE_THRESHOLD = int(_env_float('IMAP_PROVIDER_FAILURE_THRESHOLD', 5, 1, 1000))
+COOLDOWN_SECONDS = _env_float('IMAP_PROVIDER_COOLDOWN', 60, 1, 3600)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+_AUTH_ERROR_HINTS = ('authenticationfailed', 'authentication failed', 'invalid credentials',
+                     'login failed', '[auth]', 'bad credentials')
+
+
+class ProviderUnavailable(Exception):
+    """Admission refused: circuit open or no slot / login token in time."""
+
+    def __init__(self, host: str, reason: str, retry_after: float):
+        super().__init__(f"IMAP provider {host} unavailable ({reason}); retry in {retry_after:.0f}s")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Provider:
+    def __init__(self, host: str, now: float):
+        self.host = host
+        self.active = 0
+        self.tokens = LOGIN_BURST
+        self.tokens_at = now
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(LOGIN_BURST, self.tokens + (now - self.tokens_at) * LOGIN_RATE)
+        self.tokens_at = now
+
+
+class Lease:
+    """One admitted connection; release() is idempotent."""
+
+    def __init__(self, registry: 'ProviderRegistry', host: str, probe: bool):
+        self._registry = registry
+        self.host = host
+        self.probe = probe
+        self._released = False
+        self._lock = threading.Lock()
+
+    def success(self) -> None:
+        self._registry.record_success(self.host)
+
+    def failure(self, error: Any) -> None:
+        self._registry.record_failure(self.host, error)
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._registry._release(self.host, self.probe)
+
+    def __enter__(self) -> 'Lease':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class ProviderRegistry:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._providers: Dict[str, _Provider] = {}
+
+    def _get_locked(self, host: str) -> _Provider:
+        provider = self._providers.get(host)
+        if provider is None:
+            provider = self._providers[host] = _Provider(host, self._clock())
+        return provider
+
+    def acquire(self, host: Optional[str], timeout: float = 10.0) -> Lease:
+        """Wait for a connection slot and a login token on ``host``."""
+        key = str(host or '').strip().lower()
+        deadline = self._clock() + max(0.0, timeout)
+        with self._cond:
+            provider = self._get_locked(key)
+            while True:
+                now = self._clock()
+                probe = False
+                if provider.state == OPEN:
+                    remaining = provider.opened_at + COOLDOWN_SECONDS - now
+                    if remaining > 0:
+                        record_provider_admission(key, 'circuit_open')
+                        raise ProviderUnavailable(key, 'circuit open', remaining)
+                    provider.state = HALF_OPEN
+                    set_provider_circuit(key, HALF_OPEN)
+                if provider.state == HALF_OPEN:
+                    if provider.probe_in_flight:
+                        record_provider_admission(key, 'circuit_open')
+                        raise ProviderUnavailable(key, 'half-open probe in flight', COOLDOWN_SECONDS)
+                    probe = True
+
+                provider.refill(now)
+                wait = 0.0
+                if provider.active >= MAX_CONNECTIONS:
+                    wait = 1.0  # woken by release()
+                elif provider.tokens < 1:
+                    wait = (1 - provider.tokens) / LOGIN_RATE
+                if wait == 0.0:
+                    provider.tokens -= 1
+                    provider.active += 1
+                    if probe:
+                        provider.probe_in_flight = True
+                    record_provider_admission(key, 'admitted')
+                    return Lease(self, key, probe)
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    reason = 'connection limit' if provider.active >= MAX_CONNECTIONS else 'login rate'
+                    record_provider_admission(key, 'timeout')
+                    raise ProviderUnavailable(key, reason, wait)
+                self._cond.wait(min(wait, remaining))
+
+    def _release(self, host: str, probe: bool) -> None:
+        with self._cond:
+            provider = self._get_locked(host)
+            provider.active = max(0, provider.active - 1)
+            if probe:
+                provider.probe_in_flight = False
+            self._cond.notify_all()
+
+    def record_success(self, host: str) -> None:
+        with self._cond:
+            provider = self._get_locked(host)
+            provider.failures = 0
+            provider.last_error = None
+            if provider.state != CLOSED:
+                log.info("[imap_providers] circuit closed", extra={'host': host})
+                provider.state = CLOSED
+                set_provider_circuit(host, CLOSED)
+
+    def record_failure(self, host: str, error: Any) -> None:
+        text = str(error or '')
+        if any(hint in text.lower() for hint in _AUTH_ERROR_HINTS):
+            return  # wrong password for one account says nothing about the provider
+        with self._cond:
+            provider = self._get_locked(host)
+            provider.failures += 1
+            provider.last_error = text[:200]
+            if provider.state == HALF_OPEN or provider.failures >= FAILURE_THRESHOLD:
+                if provider.state != OPEN:
+                    log.warning("[imap_providers] circuit opened",
+                                extra={'host': host, 'failures': provider.failures, 'error': provider.last_error})
+                provider.state = OPEN
+                provider.opened_at = self._clock()
+                set_provider_circuit(host, OPEN)
+
+    def reset(self, host: Optional[str] = None) -> None:
+        """Close the circuit for ``host`` (all hosts when None)."""
+        with self._cond:
+            hosts = [str(host).lower()] if host else list(self._providers)
+            for key in hosts:
+                provider = self._providers.get(key)
+                if provider is None:
+                    continue
+                provider.state = CLOSED
+                provider.failures = 0
+                provider.probe_in_flight = False
+                set_provider_circuit(key, CLOSED)
+            self._cond.notify_all()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            now = self._clock()
+            out = []
+            for provider in self._providers.values():
+                provider.refill(now)
+                out.append({
+                    'host': provider.host,
+                    'state': provider.state,
+                    'active_connections': provider.active,
+                    'login_tokens': round(provider.tokens, 2),
+                    'consecutive_failures': provider.failures,
+                    'last_error': provider.last_error,
+                    'retry_after': round(max(0.0, provider.opened_at + COOLDOWN_SECONDS - now), 1)
+                    if provider.state == OPEN else 0,
+                })
+            return out
+
+
+_REGISTRY = ProviderRegistry()
+
+
+def get_registry() -> ProviderRegistry:
+    return _REGISTRY
+
+
+def acquire(host: Optional[str], timeout: float = 10.0) -> Lease:
+    return _REGISTRY.acquire(host, timeout=timeout)
+
+
+def open_connection(host: Optional[str], factory: Callable[[], Any], timeout: float = 10.0) -> Any:
+    """Admit, then build an imaplib-style connection with ``factory``.
+
+    login() outcomes feed the circuit breaker; a failed login or logout()
+    releases the slot. Pair with close_connection() in a finally block.
+    """
+    lease = acquire(host, timeout=timeout)
+    try:
+        conn = factory()
+    except Exception as exc:
+        lease.failure(exc)
+        lease.release()
+        raise
+    attach(conn, lease)
+    return conn
+
+
+def attach(conn: Any, lease: Lease) -> None:
+    """Bind ``lease`` to ``conn``: login records success/failure, logout releases."""
+    previous = getattr(conn, '_emt_provider_lease', None)
+    if previous is not None and previous is not lease:
+        previous.release()
+    conn._emt_provider_lease = lease
+    weakref.finalize(conn, lease.release)
+    if getattr(conn, '_emt_provider_wrapped', False):
+        return
+    conn._emt_provider_wrapped = True
+    original_login = conn.login
+    original_logout = conn.logout
+
+    def login(*args, **kwargs):
+        current = conn._emt_provider_lease
+        try:
+            result = original_login(*args, **kwargs)
+        except Exception as exc:
+            current.failure(exc)
+            current.release()  # a failed probe must not keep the circuit half-open
+            raise
+        current.success()
+        return result
+
+    def logout(*args, **kwargs):
+        try:
+            return original_logout(*args, **kwargs)
+        finally:
+            conn._emt_provider_lease.release()
+
+    conn.login = login
+    conn.logout = logout
+
+
+def close_connection(conn: Any) -> None:
+    """Best-effort logout that always releases the slot held by ``conn``."""
+    if conn is None:
+        return
+    try:
+        conn.logout()
+    except Exception as exc:
+        log.debug("[imap_providers] logout failed", extra={'error': str(exc)})
+    lease = getattr(conn, '_emt_provider_lease', None)
+    if lease is not None:
+        lease.release()
@@ -29,7 +29,15 @@ import backoff
 from imapclient import IMAPClient
 
 from app.utils.rule_engine import evaluate_rules
-from app.utils.email_markers import RELEASE_BYPASS_HEADER, RELEASE_EMAIL_ID_HEADER
+from app.utils.email_markers import RELEASE_BYPASS_HEADER, RELEASE_BYPASS_KEYWORD, RELEASE_EMAIL_ID_HEADER
+from app.services import stats as stats_cache
+from app.services import latency_stats
+from app.services import attachment_store
+from app.services import poll_scheduler
+from app.services import imap_providers
+from app.services import watcher_state
+from app.services import message_summary
+from app.utils.metrics import IngestStageTimer
 
 
 log = logging.getLogger(__name__)
@@ -66,6 +74,27 @@ class ImapWatcher:
         # Phase 5 Quick Wins: UID cache to reduce DB queries by 90%
         self._last_uid_cache: Optional[int] = None
         self._uid_cache_time = 0.0
+        # INTERNALDATE of held UIDs from the last store, for inbox dwell metrics
+        self._held_arrivals: dict[int, datetime] = {}
+        self._ingest_timer: Optional[IngestStageTimer] = None
+        # Provider connection slot held while self._client is open
+        self._provider_lease: Optional[imap_providers.Lease] = None
+        # Warm resume state primed by the startup orchestrator (None = load on connect)
+        self._resume: Optional[dict] = watcher_state.take(cfg.account_id)
+        self._saved_last_uid: Optional[int] = None
+        # Set after a UIDVALIDITY change: resume above uid_floor and ignore
+        # stored rows (id <= uid_floor_row_id) whose UIDs predate the change
+        self._uid_floor = 0
+        self._uid_floor_row_id = 0
+        if self._resume:
+            self._apply_uid_floor(self._resume)
+        if self._resume and self._resume.get('last_uid') is not None:
+            self._last_uid_cache = max(int(self._resume['last_uid']), self._uid_floor)
+            self._uid_cache_time = time.time()
+
+    def _apply_uid_floor(self, resume: dict) -> None:
+        self._uid_floor = int(resume.get('uid_floor') or 0)
+        self._uid_floor_row_id = int(resume.get('uid_floor_row_id') or 0)
 
     def _should_stop(self) -> bool:
         """Return True if the account is deactivated in DB (is_active=0)."""
@@ -173,11 +202,11 @@ class ImapWatcher:
             conn = sqlite3.connect(self.cfg.db_path)
             cursor = conn.cursor()
             row = cursor.execute(
-                "SELECT MAX(original_uid) FROM email_messages WHERE account_id=?",
-                (self.cfg.account_id,)
+                "SELECT MAX(original_uid) FROM email_messages WHERE account_id=? AND id>?",
+                (self.cfg.account_id, self._uid_floor_row_id)
             ).fetchone()
             conn.close()
-            uid = int(row[0]) if row and row[0] else 0
+            uid = max(int(row[0]) if row and row[0] else 0, self._uid_floor)
             
             # Update cache
             self._last_uid_cache = uid
@@ -191,7 +220,33 @@ class ImapWatcher:
             log.error(f"Unexpected error getting last processed UID for account {self.cfg.account_id}: {e}", exc_info=True)
             return self._last_uid_cache if self._last_uid_cache is not None else 0
 
+    def _max_message_row_id(self) -> int:
+        """Highest email_messages id stored so far (0 when unknown)."""
+        try:
+            conn = sqlite3.connect(self.cfg.db_path)
+            try:
+                row = conn.execute("SELECT MAX(id) FROM email_messages").fetchone()
+            finally:
+                conn.close()
+            return int(row[0]) if row and row[0] else 0
+        except sqlite3.Error as e:
+            log.warning(f"Database error reading message ids for account {self.cfg.account_id}: {e}")
+            return 0
+
+    def _release_provider_lease(self) -> None:
+        lease, self._provider_lease = self._provider_lease, None
+        if lease is not None:
+            lease.release()
+
     def _connect(self) -> Optional[IMAPClient]:
+        # A reconnect replaces the old connection; give its provider slot back first
+        self._release_provider_lease()
+        try:
+            lease = imap_providers.acquire(self.cfg.imap_host, timeout=30)
+        except imap_providers.ProviderUnavailable as e:
+            log.warning(f"IMAP connect deferred for account {self.cfg.account_id}: {e}")
+            return None
+        self._provider_lease = lease
         try:
             log.info("Connecting to IMAP %s:%s (ssl=%s)", self.cfg.imap_host, self.cfg.imap_port, self.cfg.use_ssl)
             ssl_context = sslmod.create_default_context() if self.cfg.use_ssl else None
@@ -210,9 +265,14 @@ class ImapWatcher:
                 timeout=to
             )
             client.login(self.cfg.username, self.cfg.password)
+            lease.success()
             log.info("Logged in as %s", self.cfg.username)
             capabilities = client.capabilities()
             log.debug("Server capabilities: %s", capabilities)
+            if self._resume is None and self.cfg.account_id:
+                self._resume = watcher_state.load(self.cfg.db_path, self.cfg.account_id) or {}
+            resume = self._resume or {}
+            self._apply_uid_floor(resume)
             # Ensure folders (robust: try Quarantine variants with server delimiter)
             # Always ensure INBOX first
             try:
@@ -255,6 +315,10 @@ class ImapWatcher:
                     q_candidates.append(f"INBOX{delim}{self.cfg.quarantine}")
             except (TypeError, KeyError):
                 pass  # Delimiter invalid, skip this candidate
+            # The folder that worked last run goes first (usually a single SELECT)
+            known_q = resume.get('quarantine_folder')
+            if known_q:
+                q_candidates = [known_q] + [q for q in q_candidates if q != known_q]
 
             ensured = False
             for qname in q_candidates:
@@ -291,12 +355,25 @@ class ImapWatcher:
 
             # FIX #2: Initialize UIDNEXT tracking from database, not server UIDNEXT
             # This ensures we don't skip UIDs that arrived while watcher was down
+            uidvalidity = None
             try:
-                status = client.folder_status(self.cfg.inbox, [b'UIDNEXT'])
+                status = client.folder_status(self.cfg.inbox, [b'UIDNEXT', b'UIDVALIDITY'])
                 server_uidnext = int(status.get(b'UIDNEXT') or 1)
+                uidvalidity = int(status[b'UIDVALIDITY']) if status.get(b'UIDVALIDITY') else None
             except (imaplib.IMAP4.error, KeyError, ValueError, TypeError) as e:
                 log.warning(f"Failed to get UIDNEXT from server for account {self.cfg.account_id}: {e}")
                 server_uidnext = 1
+            if uidvalidity is not None and resume.get('uidvalidity') not in (None, uidvalidity):
+                # Mailbox was rebuilt server-side: every stored UID (warm state and
+                # email_messages.original_uid) belongs to the old UIDVALIDITY. Resume
+                # from the server's UIDNEXT and stop counting the old rows.
+                self._uid_floor = max(0, server_uidnext - 1)
+                self._uid_floor_row_id = self._max_message_row_id()
+                log.warning(f"UIDVALIDITY changed for account {self.cfg.account_id} "
+                            f"({resume.get('uidvalidity')} -> {uidvalidity}); "
+                            f"resuming after UID {self._uid_floor}")
+                self._last_uid_cache = None
+                self._uid_cache_time = 0.0
 
             # Check database for last processed UID
             last_db_uid = self._get_last_processed_uid()
@@ -307,6 +384,17 @@ class ImapWatcher:
 
             log.info(f"UIDNEXT tracking initialized: server={server_uidnext}, last_db_uid={last_db_uid}, resuming_from={self._last_uidnext}")
 
+            if self.cfg.account_id:
+                watcher_state.save(
+                    self.cfg.db_path, self.cfg.account_id,
+                    last_uid=last_db_uid, uidvalidity=uidvalidity,
+                    capabilities=capabilities or [], quarantine_folder=self.cfg.quarantine,
+                    uid_floor=self._uid_floor, uid_floor_row_id=self._uid_floor_row_id,
+                )
+                self._saved_last_uid = last_db_uid
+                self._resume = dict(resume, uidvalidity=uidvalidity, quarantine_folder=self.cfg.quarantine,
+                                    uid_floor=self._uid_floor, uid_floor_row_id=self._uid_floor_row_id)
+
             return client
         except Exception as e:
             log.error(f"Failed to connect to IMAP for {self.cfg.username}: {e}")
@@ -320,6 +408,9 @@ class ImapWatcher:
                 reason = 'timeout'
             else:
                 reason = 'error'
+            if reason != 'auth_failed':
+                lease.failure(e)
+            self._release_provider_lease()
             self._record_failure(reason)
             return None
 
@@ -453,13 +544,18 @@ class ImapWatcher:
             return []
 
         held_uids: List[int] = []
+        # Batch timer set by _handle_new_messages; direct callers get their own
+        timer = self._ingest_timer or IngestStageTimer(self.cfg.account_id, self.cfg.imap_host)
+        self._held_arrivals = {}
 
         conn = None
         try:
-            fetch_data = client.fetch(uids, ['RFC822', 'ENVELOPE', 'FLAGS', 'INTERNALDATE'])
+            with timer.stage('fetch'):
+                fetch_data = client.fetch(uids, ['RFC822', 'ENVELOPE', 'FLAGS', 'INTERNALDATE'])
 
             conn = sqlite3.connect(self.cfg.db_path)
             conn.row_factory = sqlite3.Row
+            message_summary.ensure_columns_once(self.cfg.db_path, conn)
             cursor = conn.cursor()
 
             for uid, data in fetch_data.items():
@@ -468,7 +564,19 @@ class ImapWatcher:
                     # FIX #3: Log at START of processing each UID
                     log.debug(f"🔍 [START] Processing UID={uid_int}")
 
+                    # Released via server-side MOVE: marked with a keyword instead of a header
+                    flags = {
+                        (f.decode('utf-8', 'ignore') if isinstance(f, bytes) else str(f)).lower()
+                        for f in (data.get(b'FLAGS') or ())
+                    }
+                    if RELEASE_BYPASS_KEYWORD.lower() in flags:
+                        log.info("Skipping released email UID=%s keyword=%s", uid_int, RELEASE_BYPASS_KEYWORD)
+                        self._release_skip_uids.add(uid_int)
+                        continue
+
                     raw_email = data[b'RFC822']
+                    timer.observe_bytes(len(raw_email))
+                    parse_started = time.perf_counter()
                     email_msg = message_from_bytes(raw_email, policy=policy.default)
 
                     release_marker = (email_msg.get(RELEASE_BYPASS_HEADER) or '').strip()
@@ -515,6 +623,7 @@ class ImapWatcher:
                             body_text = content.decode('utf-8', errors='ignore')
                         elif isinstance(content, str):
                             body_text = content
+                    timer.observe('parse', time.perf_counter() - parse_started)
 
                     try:
                         if original_msg_id:
@@ -537,7 +646,8 @@ class ImapWatcher:
                         log.debug(f"Failed to parse INTERNALDATE for UID {uid_int}: {e}")
                         internal_dt = None
 
-                    rule_eval = evaluate_rules(subject, body_text, sender, recipients_list)
+                    with timer.stage('rule_eval'):
+                        rule_eval = evaluate_rules(subject, body_text, sender, recipients_list)
                     should_hold = bool(rule_eval.get('should_hold'))
                     interception_status = 'INTERCEPTED' if should_hold else 'FETCHED'
                     risk_score = rule_eval.get('risk_score', 0)
@@ -546,13 +656,14 @@ class ImapWatcher:
                     # FIX #3: Add INFO-level logging before INSERT to track status mapping
                     log.info(f"[PRE-INSERT] UID={uid_int}, subject='{subject[:40]}...', rule_eval={rule_eval}, should_hold={should_hold}, interception_status='{interception_status}'")
 
+                    write_started = time.perf_counter()
                     cursor.execute('''
                         INSERT INTO email_messages
                         (message_id, sender, recipients, subject, body_text, body_html,
                          raw_content, account_id, interception_status, direction,
                          original_uid, original_internaldate, original_message_id,
-                         risk_score, keywords_matched, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                         risk_score, keywords_matched, preview_snippet, created_at, created_at_utc)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), strftime('%Y-%m-%dT%H:%M:%SZ','now'))
                     ''', (
                         message_id,
                         sender,
@@ -568,12 +679,22 @@ class ImapWatcher:
                         internal_dt,
                         original_msg_id,
                         risk_score,
-                        keywords_json
+                        keywords_json,
+                        message_summary.preview_snippet(body_text, body_html),
                     ))
+                    timer.observe('db_write', time.perf_counter() - write_started)
+
+                    # Attachment metadata only; payloads are decoded on first download/release
+                    try:
+                        attachment_store.index_attachments(conn, cursor.lastrowid, email_msg)
+                    except Exception as e:
+                        log.debug(f"Attachment indexing skipped for UID {uid_int}: {e}")
 
                     # FIX #3: Log successful INSERT with full details
                     if should_hold:
                         held_uids.append(uid_int)
+                        if isinstance(data.get(b'INTERNALDATE'), datetime):
+                            self._held_arrivals[uid_int] = data[b'INTERNALDATE']
                         log.info("✅ [POST-INSERT] Stored INTERCEPTED email (UID=%s, subject='%s', sender=%s, account=%s)", uid_int, subject[:40], sender, self.cfg.account_id)
                     else:
                         log.info("✅ [POST-INSERT] Stored FETCHED email (UID=%s, subject='%s', sender=%s, account=%s)", uid_int, subject[:40], sender, self.cfg.account_id)
@@ -582,7 +703,9 @@ class ImapWatcher:
                     # FIX #3: Enhanced error logging with full context
                     log.error("❌ Failed to store email UID %s (subject='%s', sender=%s): %s", uid_int, subject[:40] if 'subject' in locals() else 'unknown', sender if 'sender' in locals() else 'unknown', e, exc_info=True)
 
-            conn.commit()
+            with timer.stage('db_commit'):
+                conn.commit()
+            stats_cache.invalidate(self.cfg.account_id)
             
             # Phase 5 Quick Wins: Invalidate UID cache after successful DB insert
             self._last_uid_cache = None
@@ -603,6 +726,18 @@ class ImapWatcher:
 
         return held_uids
 
+    def _observe_inbox_dwell(self, timer: IngestStageTimer, uids: List[int]) -> None:
+        """Record INBOX dwell (server INTERNALDATE -> quarantine move) for moved UIDs."""
+        if not timer.sampled:
+            return
+        for uid in uids:
+            arrived = self._held_arrivals.get(uid)
+            if arrived is None:
+                continue
+            # IMAPClient normalises INTERNALDATE to naive local time by default
+            now = datetime.now(arrived.tzinfo) if arrived.tzinfo else datetime.now()
+            timer.observe_dwell((now - arrived).total_seconds())
+
     def _update_message_status(self, uids: List[int], new_status: str) -> None:
         if not self.cfg.account_id or not uids:
             return
@@ -620,6 +755,13 @@ class ImapWatcher:
                 self.cfg.account_id,
                 *[int(u) for u in uids],
             ]
+            # Rows whose latency_ms this UPDATE will set; recorded into the latency sketch after commit
+            fresh_ids: List[int] = []
+            if status_upper == 'HELD':
+                fresh_ids = [r[0] for r in cursor.execute(
+                    f"SELECT id FROM email_messages WHERE account_id = ? AND original_uid IN ({placeholders}) AND latency_ms IS NULL",
+                    [self.cfg.account_id, *[int(u) for u in uids]],
+                ).fetchall()]
             cursor.execute(
                 f"""
                 UPDATE email_messages
@@ -637,6 +779,13 @@ class ImapWatcher:
                 params,
             )
             conn.commit()
+            stats_cache.invalidate(self.cfg.account_id)
+            if fresh_ids:
+                id_marks = ",".join(["?"] * len(fresh_ids))
+                rows = cursor.execute(
+                    f"SELECT latency_ms FROM email_messages WHERE id IN ({id_marks})", fresh_ids
+                ).fetchall()
+                latency_stats.record_many((self.cfg.account_id, r[0]) for r in rows)
         except sqlite3.Error as exc:
             log.error(f"Database error updating interception status for account {self.cfg.account_id} UIDs {uids}: {exc}", exc_info=True)
         except Exception as exc:
@@ -710,10 +859,18 @@ class ImapWatcher:
             conn.close()
         except sqlite3.Error as e:
             log.debug(f"Database error updating last_checked for account {self.cfg.account_id}: {e}")
+            return
         except Exception as e:
             log.error(f"Unexpected error updating last_checked for account {self.cfg.account_id}: {e}", exc_info=True)
-
-    def _handle_new_messages(self, client, changed):
+            return
+        # Persist the resume point only when it moved
+        last_uid = self._last_uidnext - 1
+        if last_uid > 0 and last_uid != self._saved_last_uid:
+            watcher_state.save(self.cfg.db_path, self.cfg.account_id, last_uid=last_uid)
+            self._saved_last_uid = last_uid
+
+    def _handle_new_messages(self, client, changed) -> int:
+        """Ingest new INBOX messages; returns how many were new (for poll scheduling)."""
         # changed example: {b'EXISTS': 12}
         # Build a robust candidate set using UIDNEXT deltas + last-N sweep, then filter out already-processed UIDs
         candidates: list[int] = []
@@ -751,7 +908,7 @@ class ImapWatcher:
 
         # De-dup candidates
         if not candidates:
-            return
+            return 0
         uniq = sorted(set(candidates))
 
         if self._release_skip_uids:
@@ -761,7 +918,7 @@ class ImapWatcher:
                     self._last_uidnext = max(self._last_uidnext, max(uniq) + 1)
                 except (ValueError, TypeError):
                     pass  # Empty uniq list
-                return
+                return 0
             uniq = filtered
 
         # Filter out UIDs we've already stored for this account
@@ -795,15 +952,20 @@ class ImapWatcher:
                 pass  # Empty uniq list
             else:
                 self._release_skip_uids = {u for u in self._release_skip_uids if u >= self._last_uidnext}
-            return
+            return 0
 
         log.info("Intercepting %d messages (acct=%s): %s", len(to_process), self.cfg.account_id, to_process)
 
-        held_uids = self._store_in_database(client, to_process)
+        timer = self._ingest_timer = IngestStageTimer(self.cfg.account_id, self.cfg.imap_host)
+        try:
+            held_uids = self._store_in_database(client, to_process)
+        finally:
+            self._ingest_timer = None
 
         if held_uids:
             held_uids = sorted(set(held_uids))
             move_successful = False
+            move_started = time.perf_counter()
             if self._supports_uid_move():
                 try:
                     log.info("Attempting MOVE for %d held messages to %s (acct=%s)", len(held_uids), self.cfg.quarantine, self.cfg.account_id)
@@ -830,8 +992,11 @@ class ImapWatcher:
                     log.error("Copy+purge failed for %d messages (acct=%s): %s", len(held_uids), self.cfg.account_id, e)
                     move_successful = False
 
+            timer.observe('move', time.perf_counter() - move_started)
             if move_successful:
-                self._update_message_status(held_uids, 'HELD')
+                self._observe_inbox_dwell(timer, held_uids)
+                with timer.stage('status_update'):
+                    self._update_message_status(held_uids, 'HELD')
             else:
                 log.warning("Move failed for %d messages (acct=%s); leaving status as INTERCEPTED for retry", len(held_uids), self.cfg.account_id)
         else:
@@ -845,6 +1010,7 @@ class ImapWatcher:
             log.debug(f"Failed to advance UID tracker: {e}")
         else:
             self._release_skip_uids = {u for u in self._release_skip_uids if u >= self._last_uidnext}
+        return len(to_process)
 
     @backoff.on_exception(backoff.expo, (socket.error, OSError, Exception), max_time=60 * 60)
     def run_forever(self):
@@ -881,10 +1047,13 @@ class ImapWatcher:
         except (ValueError, TypeError) as e:
             log.debug(f"Invalid IMAP_POLL_INTERVAL, using default 30s: {e}")
             poll_interval = 30
+        scheduler = poll_scheduler.get_scheduler()
+        poll_key = self.cfg.account_id if self.cfg.account_id is not None else id(self)
 
         while True:
             # Stop if account was deactivated while running
             if self._should_stop():
+                scheduler.unregister(poll_key)
                 try:
                     self._update_heartbeat("stopped")
                 except Exception as e:
@@ -894,6 +1063,7 @@ class ImapWatcher:
                         client.logout()
                 except (imaplib.IMAP4.error, Exception) as e:
                     log.debug(f"Failed to logout on stop: {e}")
+                self._release_provider_lease()
                 return
             # Ensure client is still connected
             if not client:
@@ -920,23 +1090,32 @@ class ImapWatcher:
 
             if not can_idle:
                 # Poll fallback mode
-                log.info(f"IDLE not supported for account {self.cfg.account_id}, using polling mode (interval: {poll_interval}s)")
+                log.debug(f"IDLE not supported for account {self.cfg.account_id}, using scheduled polling")
                 
                 # Retry IDLE mode every 15 minutes if we were forced into polling due to failures
                 if self._polling_mode_forced and (time.time() - self._last_idle_retry) > 900:  # 15 minutes
                     log.info(f"Retrying IDLE mode for account {self.cfg.account_id} after polling period")
+                    scheduler.unregister(poll_key)
                     self._polling_mode_forced = False
                     self._idle_failure_count = 0
                     self._last_idle_retry = time.time()
                     continue  # Skip this poll iteration and try IDLE again
                 
-                time.sleep(poll_interval)
+                # Central scheduler decides when to poll (adaptive interval, jitter, provider budget)
+                scheduler.register(poll_key, self.cfg.imap_host)
+                if not scheduler.wait_turn(poll_key, timeout=60):
+                    if time.time() - self._last_hb > 30:
+                        self._update_heartbeat("polling"); self._last_hb = time.time()
+                    continue  # re-check stop flag / IDLE retry while waiting
+                new_messages = 0
                 try:
                     client.select_folder(self.cfg.inbox, readonly=False)
-                    self._handle_new_messages(client, {})
+                    new_messages = self._handle_new_messages(client, {}) or 0
                     self._update_last_checked()
                 except Exception as e:
                     log.error(f"Polling check failed for account {self.cfg.account_id}: {e}")
+                finally:
+                    scheduler.report(poll_key, new_messages)
                 if time.time() - self._last_hb > 30:
                     self._update_heartbeat("polling"); self._last_hb = time.time()
                 continue
@@ -979,6 +1158,7 @@ class ImapWatcher:
                             client.logout()
                         except (imaplib.IMAP4.error, Exception) as e:
                             log.debug(f"Failed to logout on stop request: {e}")
+                        self._release_provider_lease()
                         try:
                             self._update_heartbeat("stopped")
                         except Exception as e:
@@ -1086,14 +1266,18 @@ class ImapWatcher:
                 ])
 
                 if should_poll or self._polling_mode_forced:
-                    log.info(f"Switching to polling mode (interval: {poll_interval}s)")
-                    # Sleep and then poll
-                    time.sleep(poll_interval)
+                    log.info(f"Switching to polling mode for account {self.cfg.account_id}")
+                    # Wait for a scheduled slot (bounded by the base interval), then poll
+                    scheduler.register(poll_key, self.cfg.imap_host)
+                    scheduler.wait_turn(poll_key, timeout=poll_interval)
+                    new_messages = 0
                     try:
                         client.select_folder(self.cfg.inbox, readonly=False)
-                        self._handle_new_messages(client, {})
+                        new_messages = self._handle_new_messages(client, {}) or 0
                     except Exception as poll_e:
                         log.error(f"Polling after IDLE failure failed: {poll_e}")
+                    finally:
+                        scheduler.report(poll_key, new_messages)
                     continue  # Continue loop in polling mode
                 else:
                     log.error(f"IDLE failed: {e}, reconnecting...")
@@ -1110,6 +1294,7 @@ class ImapWatcher:
                     log.debug("IMAP logout failed during close", extra={'account_id': self.cfg.account_id, 'error': str(e)}, exc_info=True)
         finally:
             self._client = None
+            self._release_provider_lease()
 
 
 __all__ = ["AccountConfig", "ImapWatcher"]
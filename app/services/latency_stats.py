@@ -0,0 +1,343 @@
+"""Streaming Latency Sketches
+
+Records interception latency (ms) at write time into mergeable log-bucket
+histograms instead of re-reading ``email_messages.latency_ms`` on every query.
+
+Layout:
+- One LatencySketch per (account_id, hour bucket); account 0 = unassigned
+- Recent observations accumulate in memory as deltas and are merged into the
+  ``latency_sketches`` table every LATENCY_SKETCH_FLUSH_SECONDS (default 60s)
+  and on process exit
+- Window queries (1h, 24h, 7d, ...) merge persisted rows with pending deltas;
+  resolution is one hour, relative error ~2% (gamma=1.04)
+- First query on a database without sketches backfills from existing
+  ``latency_ms`` values so history beyond the last N rows is not lost
+
+Sketch Design:
+- Bucket i covers (gamma^(i-1), gamma^i]; values < 1ms share bucket 0
+- Merge = add bucket counts, so sketches combine across accounts and hours
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.utils.db import get_db
+
+log = logging.getLogger(__name__)
+
+_GAMMA = 1.04
+_LOG_GAMMA = math.log(_GAMMA)
+_BUCKET_SECONDS = 3600
+
+WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400}
+
+try:
+    _FLUSH_INTERVAL = max(1.0, float(os.getenv('LATENCY_SKETCH_FLUSH_SECONDS', '60')))
+except ValueError:
+    _FLUSH_INTERVAL = 60.0
+
+
+class LatencySketch:
+    """Mergeable fixed log-bucket histogram of millisecond latencies."""
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @staticmethod
+    def _index(value: float) -> int:
+        if value <= 1.0:
+            return 0
+        return int(math.ceil(math.log(value) / _LOG_GAMMA))
+
+    def add(self, value: float, n: int = 1) -> None:
+        value = max(0.0, float(value))
+        idx = self._index(value)
+        self.buckets[idx] = self.buckets.get(idx, 0) + n
+        self.count += n
+        self.total += value * n
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencySketch') -> 'LatencySketch':
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        if q <= 0.0:
+            return float(self.min or 0.0)
+        if q >= 1.0:
+            return float(self.max or 0.0)
+        rank = q * (self.count - 1)
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                if idx == 0:
+                    estimate = min(1.0, self.max or 0.0)
+                else:
+                    # Midpoint of (gamma^(i-1), gamma^i] keeps relative error within (gamma-1)/2
+                    estimate = 2.0 * (_GAMMA ** idx) / (_GAMMA + 1.0)
+                return float(min(max(estimate, self.min or 0.0), self.max or estimate))
+        return float(self.max or 0.0)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'b': {str(k): v for k, v in self.buckets.items()},
+            'n': self.count, 's': self.total, 'lo': self.min, 'hi': self.max,
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> 'LatencySketch':
+        sketch = cls()
+        if not text:
+            return sketch
+        data = json.loads(text)
+        sketch.buckets = {int(k): int(v) for k, v in (data.get('b') or {}).items()}
+        sketch.count = int(data.get('n') or 0)
+        sketch.total = float(data.get('s') or 0.0)
+        sketch.min = data.get('lo')
+        sketch.max = data.get('hi')
+        return sketch
+
+
+SketchKey = Tuple[int, int]
+
+_LOCK = threading.Lock()
+_PENDING: Dict[SketchKey, LatencySketch] = {}
+_STATE = {'last_flush': time.time(), 'backfill_checked': False, 'started': time.time()}
+
+
+def _bucket_start(ts: float) -> int:
+    return int(ts // _BUCKET_SECONDS) * _BUCKET_SECONDS
+
+
+def _ensure_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS latency_sketches(
+            account_id INTEGER NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            sketch_json TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY(account_id, bucket_start)
+        )
+        """
+    )
+
+
+def record_latency(latency_ms: Optional[float], account_id: Optional[int] = None,
+                   ts: Optional[float] = None) -> None:
+    """Record one latency observation (ms) for ``account_id`` at ``ts`` (epoch seconds).
+
+    Example:
+        >>> record_latency(420, account_id=3)
+    """
+    if latency_ms is None:
+        return
+    try:
+        value = float(latency_ms)
+    except (TypeError, ValueError):
+        return
+    key = (int(account_id or 0), _bucket_start(ts if ts is not None else time.time()))
+    with _LOCK:
+        sketch = _PENDING.get(key)
+        if sketch is None:
+            sketch = _PENDING[key] = LatencySketch()
+        sketch.add(value)
+        due = time.time() - _STATE['last_flush'] >= _FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def record_many(values: Iterable[Tuple[Optional[int], Optional[float]]]) -> None:
+    """Record ``(account_id, latency_ms)`` pairs observed now."""
+    for account_id, latency_ms in values:
+        record_latency(latency_ms, account_id=account_id)
+
+
+def _merge_rows(conn: sqlite3.Connection, deltas: Dict[SketchKey, LatencySketch]) -> None:
+    for (account_id, bucket), delta in deltas.items():
+        row = conn.execute(
+            "SELECT sketch_json FROM latency_sketches WHERE account_id=? AND bucket_start=?",
+            (account_id, bucket),
+        ).fetchone()
+        merged = LatencySketch.from_json(row[0] if row else None).merge(delta)
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO latency_sketches(account_id, bucket_start, sample_count, sketch_json, updated_at)
+            VALUES (?, ?, ?, ?, datetime('now'))
+            """,
+            (account_id, bucket, merged.count, merged.to_json()),
+        )
+
+
+def flush(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Persist pending deltas into ``latency_sketches``. Returns rows touched."""
+    with _LOCK:
+        deltas = dict(_PENDING)
+        _PENDING.clear()
+        _STATE['last_flush'] = time.time()
+    if not deltas:
+        return 0
+    own = conn is None
+    try:
+        c = conn or get_db()
+        try:
+            _ensure_table(c)
+            _maybe_backfill(c)
+            _merge_rows(c, deltas)
+            c.commit()
+        finally:
+            if own:
+                c.close()
+        return len(deltas)
+    except sqlite3.Error as exc:
+        # Put deltas back so the next flush retries them
+        with _LOCK:
+            for key, delta in deltas.items():
+                current = _PENDING.get(key)
+                _PENDING[key] = delta if current is None else delta.merge(current)
+        log.warning("[latency::flush] failed to persist sketches: %s", exc)
+        return 0
+
+
+def backfill_from_messages(conn: sqlite3.Connection, before: Optional[float] = None) -> int:
+    """Seed sketches from existing ``email_messages.latency_ms`` (one-time scan).
+
+    Only rows stamped before ``before`` (default: process start) are read;
+    anything later was recorded live and would otherwise be counted twice.
+    Rows where neither action_taken_at nor created_at parses are skipped:
+    they belong to no time bucket any window could read.
+    """
+    cutoff = int(before if before is not None else _STATE['started'])
+    _ensure_table(conn)
+    rows = conn.execute(
+        """
+        SELECT account_id, ts, latency_ms FROM (
+            SELECT COALESCE(account_id, 0) AS account_id,
+                   CAST(strftime('%s', COALESCE(action_taken_at, created_at)) AS INTEGER) AS ts,
+                   latency_ms
+            FROM email_messages
+            WHERE latency_ms IS NOT NULL
+        ) WHERE ts IS NULL OR ts < ?
+        """,
+        (cutoff,),
+    ).fetchall()
+    deltas: Dict[SketchKey, LatencySketch] = {}
+    seeded = 0
+    for account_id, ts, latency_ms in rows:
+        if ts is None:
+            continue
+        key = (int(account_id), _bucket_start(float(ts)))
+        deltas.setdefault(key, LatencySketch()).add(latency_ms)
+        seeded += 1
+    _merge_rows(conn, deltas)
+    conn.commit()
+    log.info("[latency::backfill] seeded %d sketch buckets from %d rows (%d without a timestamp skipped)",
+             len(deltas), seeded, len(rows) - seeded)
+    return seeded
+
+
+def _maybe_backfill(conn: sqlite3.Connection) -> None:
+    if _STATE['backfill_checked']:
+        return
+    _STATE['backfill_checked'] = True
+    try:
+        _ensure_table(conn)
+        if conn.execute("SELECT 1 FROM latency_sketches LIMIT 1").fetchone() is None:
+            backfill_from_messages(conn)
+    except sqlite3.Error as exc:
+        log.debug("[latency::backfill] skipped: %s", exc)
+
+
+def get_sketch(window_seconds: int, account_id: Optional[int] = None,
+               conn: Optional[sqlite3.Connection] = None) -> LatencySketch:
+    """Merged sketch for the trailing window (hour resolution)."""
+    since = _bucket_start(time.time() - window_seconds + _BUCKET_SECONDS)
+    result = LatencySketch()
+    own = conn is None
+    c = conn or get_db()
+    try:
+        _maybe_backfill(c)
+        sql = "SELECT sketch_json FROM latency_sketches WHERE bucket_start >= ?"
+        params: list = [since]
+        if account_id is not None:
+            sql += " AND account_id = ?"
+            params.append(int(account_id))
+        for (text,) in c.execute(sql, params).fetchall():
+            result.merge(LatencySketch.from_json(text))
+    except sqlite3.Error as exc:
+        log.debug("[latency::query] persisted sketches unavailable: %s", exc)
+    finally:
+        if own:
+            c.close()
+    with _LOCK:
+        for (acct, bucket), delta in _PENDING.items():
+            if bucket >= since and (account_id is None or acct == int(account_id)):
+                result.merge(delta)
+    return result
+
+
+def summarize(sketch: LatencySketch) -> dict:
+    """Percentile payload in the shape served by /api/latency-stats."""
+    if not sketch.count:
+        return {
+            'count': 0,
+            'min': 0, 'p50': 0, 'p90': 0, 'p95': 0, 'p99': 0, 'max': 0,
+            'mean': 0, 'median': 0,
+        }
+    p50 = sketch.quantile(0.50)
+    return {
+        'count': sketch.count,
+        'min': float(sketch.min or 0.0),
+        'p50': p50,
+        'p90': sketch.quantile(0.90),
+        'p95': sketch.quantile(0.95),
+        'p99': sketch.quantile(0.99),
+        'max': float(sketch.max or 0.0),
+        'mean': sketch.total / sketch.count,
+        'median': p50,
+    }
+
+
+def get_latency_summary(window: str = '24h', account_id: Optional[int] = None) -> dict:
+    """Percentiles over a named window ('1h', '24h', '7d', '30d').
+
+    Example:
+        >>> get_latency_summary('1h')['p95']
+    """
+    seconds = WINDOWS.get(window, WINDOWS['24h'])
+    return summarize(get_sketch(seconds, account_id=account_id))
+
+
+def reset() -> None:
+    """Drop pending deltas and backfill state (tests)."""
+    with _LOCK:
+        _PENDING.clear()
+        _STATE['backfill_checked'] = False
+        _STATE['last_flush'] = _STATE['started'] = time.time()
+
+
+atexit.register(flush)
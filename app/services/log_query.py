@@ -0,0 +1,429 @@
+"""Log Query Service
+
+Backs /api/logs, /api/logs/stream and the file fallback of /api/system/logs
+over the files setup_app_logging() writes: one ``app_<ts>.json.log`` /
+``app_<ts>.log`` pair per startup (plus legacy ``app.json.log``/``app.log``).
+
+- Newest first: files are walked newest to oldest and each one backwards
+  from EOF in BLOCK_SIZE reads, so a query only touches the tail it needs
+  instead of reading whole files.
+- Sidecar index (``<file>.idx``): for every CHUNK_BYTES region of a file,
+  the byte span of its lines, first/last timestamp and the levels present.
+  Regions are indexed as a by-product of scans (only once fully scanned and
+  no longer at EOF), and later queries skip regions outside the time range
+  or without a requested level without reading them. Component filters
+  match message text, so they cannot skip regions.
+- follow() keeps a file offset and only reads bytes appended since the last
+  poll, switching to the next file when a restart creates one.
+
+Records carry timestamp/level/message/source. JSON records also keep all
+their other fields (exc_info, module, function, line, extras); text lines
+only have those four.
+
+Timestamps are compared as normalized ISO strings: JSON logs carry UTC,
+text logs the local asctime, so time ranges are exact for JSON logs.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+LOG_DIRS: List[str] = [
+    os.path.join(os.getcwd(), 'logs'),
+    os.path.join(os.getcwd(), 'app', 'logs'),
+]
+LEVEL_RANK = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+BLOCK_SIZE = 64 * 1024
+CHUNK_BYTES = 256 * 1024
+INDEX_SUFFIX = '.idx'
+_INDEX_VERSION = 1
+
+_TEXT_RE = re.compile(r"^(?P<ts>[^ ]+\s+[^ ]+)\s+(?P<level>[A-Z]+)\s+\[(?P<src>[^\]]+)\]\s+(?P<msg>.*)$")
+_OLDER = object()  # scan sentinel: everything further back predates ``since``
+
+_index_lock = threading.Lock()
+_indexes: Dict[str, dict] = {}
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    levels: Optional[FrozenSet[str]] = None
+    component: str = ''
+    since: str = ''
+    until: str = ''
+    exclude: Tuple[str, ...] = ()
+
+    def matches(self, rec: dict) -> bool:
+        if self.levels is not None and rec['level'] not in self.levels:
+            return False
+        if self.until and rec['_ts'] and rec['_ts'] > self.until:
+            return False
+        message = rec['message']
+        if self.component:
+            needle = self.component.lower()
+            if needle not in message.lower() and needle not in (rec['source'] or '').lower():
+                return False
+        return not any(text in message for text in self.exclude)
+
+    def skips_chunk(self, t0: Optional[str], t1: Optional[str], levels: List[str]) -> bool:
+        if self.levels is not None and not self.levels.intersection(levels):
+            return True
+        return bool(self.until and t0 and t0 > self.until)
+
+
+def normalize_ts(value) -> str:
+    """Timestamp -> sortable ``YYYY-MM-DDTHH:MM:SS.ffffff`` ('' when absent)."""
+    text = str(value or '').strip().replace(' ', 'T', 1).replace(',', '.')
+    if text.endswith('Z'):
+        text = text[:-1]
+    elif len(text) > 6 and text[-6] in '+-' and text[-3] == ':':
+        text = text[:-6]
+    if len(text) >= 19 and text[10] == 'T' and text[19:20] in ('', '.'):
+        text = text[:19] + '.' + (text[20:] + '000000')[:6]
+    return text
+
+
+def levels_at_least(min_level: str) -> FrozenSet[str]:
+    cutoff = LEVEL_RANK.get((min_level or 'INFO').upper(), 20)
+    return frozenset(name for name, rank in LEVEL_RANK.items() if rank >= cutoff)
+
+
+def make_filter(levels=None, component: str = '', since=None, until=None, exclude=()) -> LogFilter:
+    return LogFilter(
+        levels=frozenset(l.upper() for l in levels) if levels is not None else None,
+        component=component or '',
+        since=normalize_ts(since),
+        until=normalize_ts(until),
+        exclude=tuple(exclude),
+    )
+
+
+def parse_line(raw: bytes, is_json: bool) -> Optional[dict]:
+    line = raw.decode('utf-8', errors='ignore').strip()
+    if not line:
+        return None
+    if is_json:
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        # Keep every JSON field (exc_info, module, function, line, extras);
+        # only the four shared keys are normalized
+        rec = {k: v for k, v in obj.items() if not k.startswith('_')}
+        rec.update(
+            timestamp=obj.get('timestamp'),
+            level=str(obj.get('level') or 'INFO').upper(),
+            message=str(obj.get('message') or ''),
+            source=obj.get('logger') or obj.get('name') or obj.get('module'),
+        )
+    else:
+        m = _TEXT_RE.match(line)
+        if not m:
+            return None
+        rec = {'timestamp': m.group('ts'), 'level': m.group('level'),
+               'message': m.group('msg'), 'source': m.group('src')}
+    rec['_ts'] = normalize_ts(rec['timestamp'])
+    return rec
+
+
+def _public(rec: dict) -> dict:
+    return {k: v for k, v in rec.items() if not k.startswith('_')}
+
+
+def log_files(log_dirs: Optional[List[str]] = None, kind: str = 'auto') -> List[str]:
+    """Log files newest first; ``kind`` is 'json', 'text' or 'auto' (JSON when present)."""
+    if kind == 'auto':
+        return log_files(log_dirs, 'json') or log_files(log_dirs, 'text')
+    found = set()
+    for directory in log_dirs or LOG_DIRS:
+        if kind == 'json':
+            names = glob.glob(os.path.join(directory, 'app_*.json.log')) + [os.path.join(directory, 'app.json.log')]
+        else:
+            names = [p for p in glob.glob(os.path.join(directory, 'app_*.log')) if not p.endswith('.json.log')]
+            names.append(os.path.join(directory, 'app.log'))
+        found.update(p for p in names if os.path.isfile(p))
+
+    def _mtime(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+    return sorted(found, key=lambda p: (_mtime(p), p), reverse=True)
+
+
+# --- reverse reading -------------------------------------------------------
+
+def _line_boundary(f, size: int) -> int:
+    """Offset just past the last newline (an unterminated last line is still being written)."""
+    pos = size
+    while pos > 0:
+        n = min(BLOCK_SIZE, pos)
+        f.seek(pos - n)
+        idx = f.read(n).rfind(b'\n')
+        if idx != -1:
+            return pos - n + idx + 1
+        pos -= n
+    return 0
+
+
+def _reverse_lines(f, lo: int, hi: int) -> Iterator[Tuple[int, bytes]]:
+    """``(start offset, line)`` for lines in [lo, hi), newest first.
+
+    ``lo`` and ``hi`` must be line boundaries; the file is read backwards in
+    BLOCK_SIZE steps.
+    """
+    pos = hi
+    carry = b''
+    while pos > lo:
+        n = min(BLOCK_SIZE, pos - lo)
+        pos -= n
+        f.seek(pos)
+        carry = f.read(n) + carry
+        end = len(carry)
+        cut = carry.rfind(b'\n', 0, end - 1)
+        while cut != -1:
+            yield pos + cut + 1, carry[cut + 1:end]
+            end = cut + 1
+            cut = carry.rfind(b'\n', 0, end - 1)
+        carry = carry[:end]
+    if carry:
+        yield lo, carry
+
+
+# --- sidecar index ---------------------------------------------------------
+
+def _load_index(path: str, st: os.stat_result) -> dict:
+    with _index_lock:
+        index = _indexes.get(path)
+    if index is None:
+        try:
+            with open(path + INDEX_SUFFIX, 'r', encoding='utf-8') as fh:
+                index = json.load(fh)
+            index['chunks'] = {int(k): v for k, v in index.get('chunks', {}).items()}
+        except (OSError, ValueError, AttributeError):
+            index = None
+    valid = (
+        index is not None
+        and index.get('version') == _INDEX_VERSION
+        and index.get('inode') == st.st_ino
+        and all(chunk[1] <= st.st_size for chunk in index['chunks'].values())
+    )
+    if not valid:
+        index = {'version': _INDEX_VERSION, 'inode': st.st_ino, 'chunks': {}}
+    with _index_lock:
+        _indexes[path] = index
+    return index
+
+
+def _save_index(path: str, index: dict, new_chunks: Dict[int, list]) -> None:
+    with _index_lock:
+        index['chunks'].update(new_chunks)
+        payload = {'version': index['version'], 'inode': index['inode'],
+                   'chunks': {str(k): v for k, v in sorted(index['chunks'].items())}}
+    tmp = path + INDEX_SUFFIX + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, separators=(',', ':'))
+        os.replace(tmp, path + INDEX_SUFFIX)
+    except OSError as e:
+        log.debug(f"[log_query] index not written for {path}: {e}")
+    _prune_orphans(os.path.dirname(path))
+
+
+def _prune_orphans(directory: str) -> None:
+    for sidecar in glob.glob(os.path.join(directory, '*' + INDEX_SUFFIX)):
+        if not os.path.exists(sidecar[:-len(INDEX_SUFFIX)]):
+            try:
+                os.remove(sidecar)
+            except OSError:
+                pass
+            with _index_lock:
+                _indexes.pop(sidecar[:-len(INDEX_SUFFIX)], None)
+
+
+def _scan_gap(f, lo: int, hi: int, is_json: bool, stats: Dict[int, list], state: dict) -> Iterator[dict]:
+    """Records in an unindexed range, collecting per-chunk stats on the way."""
+    for start, raw in _reverse_lines(f, lo, hi):
+        state['low'] = start
+        rec = parse_line(raw, is_json)
+        k = start // CHUNK_BYTES
+        entry = stats.get(k)
+        if entry is None:
+            entry = stats[k] = [start, start + len(raw), None, None, set()]
+        entry[0] = start
+        if rec is None:
+            continue
+        if rec['_ts']:
+            entry[2] = rec['_ts'] if entry[2] is None else min(entry[2], rec['_ts'])
+            entry[3] = rec['_ts'] if entry[3] is None else max(entry[3], rec['_ts'])
+        entry[4].add(rec['level'])
+        yield rec
+    state['low'] = lo
+    state['exhausted'] = True
+
+
+def _complete_chunks(stats: Dict[int, list], lo: int, hi: int, state: dict) -> Dict[int, list]:
+    """Chunks of a gap whose every line was seen (see module docstring)."""
+    done = {}
+    for k, (start, end, t0, t1, levels) in stats.items():
+        if hi < (k + 1) * CHUNK_BYTES:
+            continue  # may still grow / lines above hi unseen
+        if not state.get('exhausted') and state.get('low', hi) > k * CHUNK_BYTES:
+            continue  # scan stopped inside this chunk
+        done[k] = [start, end, t0, t1, sorted(levels)]
+    return done
+
+
+def _scan_file(path: str, flt: LogFilter) -> Iterator[object]:
+    """Matching records of one file, newest first; yields _OLDER and stops at ``since``."""
+    is_json = path.endswith('.json.log')
+    try:
+        st = os.stat(path)
+        f = open(path, 'rb')
+    except OSError:
+        return
+    index = _load_index(path, st)
+    new_chunks: Dict[int, list] = {}
+    try:
+        with f:
+            hi = _line_boundary(f, st.st_size)
+            for k in sorted(index['chunks'], reverse=True):
+                start, end, t0, t1, levels = index['chunks'][k]
+                if end > hi:
+                    continue
+                stats: Dict[int, list] = {}
+                state: dict = {}
+                try:
+                    for rec in _scan_gap(f, end, hi, is_json, stats, state):
+                        if flt.since and rec['_ts'] and rec['_ts'] < flt.since:
+                            yield _OLDER
+                            return
+                        if flt.matches(rec):
+                            yield rec
+                finally:
+                    new_chunks.update(_complete_chunks(stats, end, hi, state))
+                if flt.since and t1 and t1 < flt.since:
+                    yield _OLDER
+                    return
+                if not flt.skips_chunk(t0, t1, levels):
+                    for _start, raw in _reverse_lines(f, start, end):
+                        rec = parse_line(raw, is_json)
+                        if rec is None:
+                            continue
+                        if flt.since and rec['_ts'] and rec['_ts'] < flt.since:
+                            yield _OLDER
+                            return
+                        if flt.matches(rec):
+                            yield rec
+                hi = start
+            stats = {}
+            state = {}
+            try:
+                for rec in _scan_gap(f, 0, hi, is_json, stats, state):
+                    if flt.since and rec['_ts'] and rec['_ts'] < flt.since:
+                        yield _OLDER
+                        return
+                    if flt.matches(rec):
+                        yield rec
+            finally:
+                new_chunks.update(_complete_chunks(stats, 0, hi, state))
+    finally:
+        if new_chunks:
+            _save_index(path, index, new_chunks)
+
+
+def query(log_dirs: Optional[List[str]] = None, *, levels=None, min_level: Optional[str] = None,
+          component: str = '', since=None, until=None, exclude=(), limit: int = 100,
+          kind: str = 'auto') -> List[dict]:
+    """Newest-first records matching the filters, across startup log files.
+
+    Example:
+        >>> query(levels=['ERROR'], component='imap_watcher', limit=50)
+    """
+    if min_level and levels is None:
+        levels = levels_at_least(min_level)
+    flt = make_filter(levels, component, since, until, exclude)
+    out: List[dict] = []
+    for path in log_files(log_dirs, kind):
+        scan = _scan_file(path, flt)
+        try:
+            for rec in scan:
+                if rec is _OLDER:
+                    return out
+                out.append(_public(rec))
+                if len(out) >= limit:
+                    return out
+        finally:
+            scan.close()
+    return out
+
+
+def follow(log_dirs: Optional[List[str]] = None, *, levels=None, min_level: Optional[str] = None,
+           component: str = '', kind: str = 'auto', poll: float = 1.0,
+           sleep: Callable[[float], None] = time.sleep) -> Iterator[List[dict]]:
+    """Yield batches of records appended from now on (oldest first).
+
+    Each poll yields a list, empty when nothing new arrived (callers use
+    those for keepalives). Only bytes appended since the previous poll are
+    read; when a newer log file appears the rest of the current one is
+    drained and following moves to the new file.
+    """
+    if min_level and levels is None:
+        levels = levels_at_least(min_level)
+    flt = make_filter(levels, component)
+    files = log_files(log_dirs, kind)
+    path = files[0] if files else None
+    offset = os.path.getsize(path) if path else 0
+    if path:
+        with open(path, 'rb') as f:
+            offset = _line_boundary(f, offset)
+    first = True
+    while True:
+        if not first:
+            sleep(poll)
+        first = False
+        batch: List[dict] = []
+        files = log_files(log_dirs, kind)
+        newest = files[0] if files else None
+        if path is not None:
+            offset = _read_appended(path, offset, flt, batch)
+        if newest is not None and newest != path:
+            path, offset = newest, 0
+            offset = _read_appended(path, offset, flt, batch)
+        yield batch
+
+
+def _read_appended(path: str, offset: int, flt: LogFilter, batch: List[dict]) -> int:
+    is_json = path.endswith('.json.log')
+    try:
+        size = os.path.getsize(path)
+        if size < offset:
+            offset = 0  # truncated or replaced
+        if size == offset:
+            return offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+    except OSError:
+        return offset
+    complete = data.rfind(b'\n') + 1
+    for raw in data[:complete].splitlines():
+        rec = parse_line(raw, is_json)
+        if rec is not None and flt.matches(rec):
+            batch.append(_public(rec))
+    return offset + complete
+
+
+def reset() -> None:
+    """Forget cached indexes (tests)."""
+    with _index_lock:
+        _indexes.clear()
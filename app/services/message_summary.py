@@ -0,0 +1,146 @@
+"""Ingest-Time Message Summary Columns
+
+List endpoints (unified list, search, inbox, held queue, dashboard) used to
+SELECT body_text for every row just to build a 160-char preview, and to
+fix up created_at / recipients per row on every request. These values are
+now computed once when a message is stored:
+
+- preview_snippet: whitespace-collapsed first PREVIEW_LENGTH chars of the
+  text body (tag-stripped HTML when there is no text part)
+- recipients: always a JSON array of address strings (legacy rows held CSV
+  or bare strings)
+- created_at_utc: ISO-8601 UTC with 'Z' (``2024-05-10T12:30:00Z``), what
+  browsers need; created_at keeps SQLite's format for ordering/range SQL
+
+ensure_columns() adds the columns to older databases and backfill() fills
+existing rows in id-ordered batches. Writers that change body_text (edit)
+refresh preview_snippet through preview_snippet().
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 160
+_BACKFILL_BATCH = 500
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_COLUMNS = (('preview_snippet', 'TEXT'), ('created_at_utc', 'TEXT'))
+
+# List SELECT expression: the stored snippet, or the head of body_text for rows
+# written by a path that does not fill it (pass through preview_snippet()).
+PREVIEW_SQL = "COALESCE(preview_snippet, substr(body_text, 1, 4 * %d)) AS preview_snippet" % PREVIEW_LENGTH
+
+_ensured_paths: set = set()
+_ensured_lock = threading.Lock()
+
+
+def preview_snippet(body_text: Optional[str], body_html: Optional[str] = None) -> str:
+    text = body_text or ''
+    if not text.strip() and body_html:
+        text = _TAG_RE.sub(' ', body_html)
+    return ' '.join(text.split())[:PREVIEW_LENGTH]
+
+
+def recipient_list(value: Any) -> List[str]:
+    """Normalize JSON / CSV / list recipient values to a list of strings."""
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    text = value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+    try:
+        parsed = json.loads(text)
+    except (TypeError, ValueError):
+        return [part.strip() for part in text.split(',') if part.strip()]
+    if isinstance(parsed, list):
+        return [str(v).strip() for v in parsed if str(v).strip()]
+    return [str(parsed).strip()] if str(parsed).strip() else []
+
+
+def recipients_json(value: Any) -> str:
+    return json.dumps(recipient_list(value))
+
+
+def utc_iso(value: Optional[datetime] = None) -> str:
+    """``datetime`` (naive = UTC) -> ``YYYY-MM-DDTHH:MM:SSZ``; now when omitted."""
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def api_created_at(created_at_utc: Optional[str], created_at: Optional[str]) -> Optional[str]:
+    """created_at for API payloads: the stored UTC ISO value, else the legacy fix-up."""
+    if created_at_utc:
+        return created_at_utc
+    if isinstance(created_at, str) and not created_at.endswith('Z') and 'T' not in created_at:
+        # SQLite format: "YYYY-MM-DD HH:MM:SS" (UTC) -> "YYYY-MM-DDTHH:MM:SSZ"
+        return created_at.replace(' ', 'T') + 'Z'
+    return created_at
+
+
+def ensure_columns(conn: sqlite3.Connection) -> List[str]:
+    """Add missing summary columns; returns the names added (empty when current)."""
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(email_messages)")}
+    except sqlite3.Error:
+        return []
+    if not columns:
+        return []
+    added = []
+    for name, decl in _COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE email_messages ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
+
+def ensure_columns_once(db_path: str, conn: sqlite3.Connection) -> None:
+    """ensure_columns() at most once per database path per process (ingest hot path)."""
+    if db_path in _ensured_paths:
+        return
+    ensure_columns(conn)
+    conn.commit()
+    with _ensured_lock:
+        _ensured_paths.add(db_path)
+
+
+def backfill(conn: sqlite3.Connection, batch_size: int = _BACKFILL_BATCH) -> int:
+    """Fill summary columns for rows stored before they existed; returns rows updated.
+
+    The caller commits. Safe to re-run: only rows with NULL columns are touched.
+    """
+    conn.execute(
+        "UPDATE email_messages SET created_at_utc = strftime('%Y-%m-%dT%H:%M:%SZ', created_at) "
+        "WHERE created_at_utc IS NULL AND created_at IS NOT NULL"
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, body_text, body_html, recipients FROM email_messages "
+            "WHERE preview_snippet IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "UPDATE email_messages SET preview_snippet=?, recipients=? WHERE id=?",
+            _backfill_params(rows),
+        )
+        updated += len(rows)
+        last_id = rows[-1][0]
+    if updated:
+        log.info("[message_summary] backfilled summary columns", extra={'rows': updated})
+    return updated
+
+
+def _backfill_params(rows: Iterable[Any]):
+    for row in rows:
+        yield preview_snippet(row[1], row[2]), recipients_json(row[3]), row[0]
@@ -0,0 +1,236 @@
+"""Adaptive Polling Scheduler
+
+Central timing for watchers that cannot IDLE (capability missing,
+IMAP_DISABLE_IDLE, or forced polling after IDLE failures). Each watcher
+thread keeps its own IMAP connection but asks the scheduler when to poll
+instead of sleeping a fixed IMAP_POLL_INTERVAL.
+
+- One dispatcher thread owns a min-heap of (due_time, account); a watcher
+  blocks in wait_turn() until the dispatcher releases it
+- Adaptive interval: a poll that finds mail re-polls after
+  IMAP_POLL_MIN_INTERVAL (bursts usually continue); misses back off by
+  1.5x up to IMAP_POLL_MAX_INTERVAL, capped further by the account's
+  recent arrival rate (EWMA) so busy mailboxes never drift to the max
+- Jitter: every interval is spread by +/- IMAP_POLL_JITTER (default 20%)
+  and first polls are spread across one base interval, so accounts
+  started together do not poll together
+- Per-provider budget: token bucket per IMAP host
+  (IMAP_POLL_PROVIDER_RATE polls/s, burst IMAP_POLL_PROVIDER_BURST);
+  due polls over budget are pushed back until a token is available
+- Poll efficiency (hits / polls) and the current interval are exported
+  per account through app.utils.metrics
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.utils.metrics import record_poll, record_poll_deferred
+
+log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+BASE_INTERVAL = _env_float('IMAP_POLL_INTERVAL', 30, 5, 300)
+MIN_INTERVAL = _env_float('IMAP_POLL_MIN_INTERVAL', 5, 1, 300)
+MAX_INTERVAL = max(BASE_INTERVAL, _env_float('IMAP_POLL_MAX_INTERVAL', 300, 5, 3600))
+JITTER = _env_float('IMAP_POLL_JITTER', 0.2, 0, 0.5)
+PROVIDER_RATE = _env_float('IMAP_POLL_PROVIDER_RATE', 2.0, 0.01, 100)
+PROVIDER_BURST = _env_float('IMAP_POLL_PROVIDER_BURST', 5, 1, 1000)
+
+_BACKOFF = 1.5
+_RATE_ALPHA = 0.3  # EWMA weight of the newest arrival-rate sample
+
+
+class _Account:
+    __slots__ = ('key', 'provider', 'interval', 'rate', 'polls', 'hits', 'last_poll', 'event', 'token')
+
+    def __init__(self, key: Hashable, provider: str, interval: float):
+        self.key = key
+        self.provider = provider
+        self.interval = interval
+        self.rate = 0.0  # messages per second (EWMA)
+        self.polls = 0
+        self.hits = 0
+        self.last_poll: Optional[float] = None
+        self.event = threading.Event()
+        self.token = 0  # heap entries carrying an older token are stale
+
+    @property
+    def efficiency(self) -> float:
+        return self.hits / self.polls if self.polls else 0.0
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, now: float):
+        self.tokens = PROVIDER_BURST
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume a token; returns 0 on success or seconds until one is available."""
+        self.tokens = min(PROVIDER_BURST, self.tokens + (now - self.updated) * PROVIDER_RATE)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / PROVIDER_RATE
+
+
+class PollScheduler:
+    def __init__(self, clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None,
+                 start_thread: bool = True):
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._start_thread = start_thread
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, Hashable, int]] = []
+        self._seq = itertools.count()
+        self._accounts: Dict[Hashable, _Account] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # -- watcher API -------------------------------------------------------
+
+    def register(self, key: Hashable, host: Optional[str]) -> None:
+        """Add an account; its first poll is spread over one base interval."""
+        with self._cond:
+            if key in self._accounts:
+                return
+            acct = _Account(key, str(host or '').lower(), BASE_INTERVAL)
+            self._accounts[key] = acct
+            self._push_locked(acct, self._clock() + self._rng.uniform(0, BASE_INTERVAL))
+            self._ensure_thread_locked()
+
+    def unregister(self, key: Hashable) -> None:
+        with self._cond:
+            acct = self._accounts.pop(key, None)
+            if acct:
+                acct.token += 1
+                acct.event.set()  # release a waiter so it can notice the stop
+
+    def wait_turn(self, key: Hashable, timeout: Optional[float] = None) -> bool:
+        """Block until the scheduler releases ``key``; False on timeout/unregistered."""
+        with self._cond:
+            acct = self._accounts.get(key)
+        if acct is None:
+            return False
+        fired = acct.event.wait(timeout)
+        acct.event.clear()
+        with self._cond:
+            return fired and key in self._accounts
+
+    def report(self, key: Hashable, new_messages: int) -> float:
+        """Record a poll result and schedule the next one; returns the delay."""
+        with self._cond:
+            acct = self._accounts.get(key)
+            if acct is None:
+                return 0.0
+            now = self._clock()
+            hit = new_messages > 0
+            acct.polls += 1
+            if hit:
+                acct.hits += 1
+            if acct.last_poll is not None:
+                elapsed = max(1.0, now - acct.last_poll)
+                acct.rate = _RATE_ALPHA * (new_messages / elapsed) + (1 - _RATE_ALPHA) * acct.rate
+            acct.last_poll = now
+
+            if hit:
+                acct.interval = MIN_INTERVAL
+            else:
+                ceiling = MAX_INTERVAL
+                if acct.rate > 0:
+                    # Poll at least twice per expected arrival
+                    ceiling = min(MAX_INTERVAL, max(MIN_INTERVAL, 0.5 / acct.rate))
+                acct.interval = min(ceiling, max(MIN_INTERVAL, acct.interval * _BACKOFF))
+            delay = acct.interval * (1 + self._rng.uniform(-JITTER, JITTER))
+            self._push_locked(acct, now + delay)
+            efficiency, interval = acct.efficiency, acct.interval
+        record_poll(key, hit, efficiency, interval)
+        return delay
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            now = self._clock()
+            due = {entry[2]: entry[0] for entry in self._heap if self._is_current(entry)}
+            return [{
+                'account': acct.key,
+                'provider': acct.provider,
+                'interval': round(acct.interval, 2),
+                'next_in': round(max(0.0, due[acct.key] - now), 2) if acct.key in due else None,
+                'polls': acct.polls,
+                'hits': acct.hits,
+                'efficiency': round(acct.efficiency, 3),
+            } for acct in self._accounts.values()]
+
+    # -- dispatcher --------------------------------------------------------
+
+    def dispatch_due(self) -> Optional[float]:
+        """Release every due account the provider budgets allow.
+
+        Returns seconds until the next heap entry is due (None when empty).
+        The dispatcher thread runs this in a loop; tests drive it directly.
+        """
+        with self._cond:
+            return self._dispatch_locked()
+
+    def _dispatch_locked(self) -> Optional[float]:
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            acct = self._accounts[entry[2]]
+            bucket = self._buckets.get(acct.provider)
+            if bucket is None:
+                bucket = self._buckets[acct.provider] = _Bucket(now)
+            wait = bucket.take(now)
+            if wait > 0:
+                self._push_locked(acct, now + wait + self._rng.uniform(0, wait))
+                record_poll_deferred(acct.provider)
+                continue
+            acct.event.set()
+        return self._heap[0][0] - now if self._heap else None
+
+    def _run(self) -> None:
+        with self._cond:
+            while True:
+                next_due = self._dispatch_locked()
+                self._cond.wait(timeout=60.0 if next_due is None else max(0.05, next_due))
+
+    def _ensure_thread_locked(self) -> None:
+        if self._start_thread and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name='imap-poll-scheduler', daemon=True)
+            self._thread.start()
+
+    def _push_locked(self, acct: _Account, due: float) -> None:
+        acct.token += 1
+        heapq.heappush(self._heap, (due, next(self._seq), acct.key, acct.token))
+        self._cond.notify()
+
+    def _is_current(self, entry: Tuple[float, int, Hashable, int]) -> bool:
+        acct = self._accounts.get(entry[2])
+        return acct is not None and acct.token == entry[3]
+
+
+_SCHEDULER: Dict[str, Optional[PollScheduler]] = {'instance': None}
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> PollScheduler:
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER['instance'] is None:
+            _SCHEDULER['instance'] = PollScheduler()
+        return _SCHEDULER['instance']
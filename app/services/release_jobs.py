@@ -0,0 +1,215 @@
+"""Asynchronous Release Job Queue
+
+Moves the slow part of a release (IMAP connect/login, Message-ID searches,
+APPEND, Quarantine cleanup) off Flask request threads.
+
+- Bounded worker pool: RELEASE_WORKERS threads (default 4, clamped 1-32)
+- Per-account concurrency: RELEASE_PER_ACCOUNT_LIMIT running jobs per
+  account (default 1) so one slow provider cannot take every worker; later
+  jobs for other accounts overtake blocked ones
+- Bounded backlog: RELEASE_QUEUE_MAX queued jobs (default 200); submit()
+  raises QueueFull beyond that so the API can answer 503
+- Job ids double as idempotency keys (the route persists outcomes in the
+  existing idempotency_keys table); finished jobs stay in memory for
+  RELEASE_JOB_RETENTION_SECONDS (default 3600) for status polling
+
+The queue is transport-agnostic: a job is a zero-arg callable returning
+``(status_code, body)``; the route supplies the Flask app context.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.utils.metrics import record_release_job_finished, record_release_jobs
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int, low: int, high: int) -> int:
+    try:
+        return min(high, max(low, int(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+MAX_WORKERS = _env_int('RELEASE_WORKERS', 4, 1, 32)
+PER_ACCOUNT_LIMIT = _env_int('RELEASE_PER_ACCOUNT_LIMIT', 1, 1, 32)
+QUEUE_MAX = _env_int('RELEASE_QUEUE_MAX', 200, 1, 10000)
+RETENTION_SECONDS = _env_int('RELEASE_JOB_RETENTION_SECONDS', 3600, 60, 7 * 86400)
+
+JobRunner = Callable[[], Tuple[int, Dict[str, Any]]]
+
+
+class QueueFull(Exception):
+    """Raised by submit() when RELEASE_QUEUE_MAX jobs are already waiting."""
+
+
+class ReleaseJob:
+    __slots__ = ('id', 'email_id', 'account_id', 'runner', 'status', 'status_code', 'result',
+                 'created_at', 'started_at', 'finished_at')
+
+    def __init__(self, job_id: str, email_id: int, account_id: Optional[int], runner: JobRunner):
+        self.id = job_id
+        self.email_id = email_id
+        self.account_id = account_id
+        self.runner = runner
+        self.status = 'queued'
+        self.status_code: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'email_id': self.email_id,
+            'account_id': self.account_id,
+            'status': self.status,
+            'status_code': self.status_code,
+            'result': self.result,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+_LOCK = threading.Lock()
+_JOBS: Dict[str, ReleaseJob] = {}
+_QUEUE: Deque[ReleaseJob] = deque()
+_RUNNING: Dict[Optional[int], int] = {}
+_POOL: Dict[str, Optional[ThreadPoolExecutor]] = {'executor': None}
+
+
+def new_job_id() -> str:
+    return f"release-{uuid.uuid4().hex}"
+
+
+def _executor() -> ThreadPoolExecutor:
+    executor = _POOL['executor']
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='release-job')
+        _POOL['executor'] = executor
+    return executor
+
+
+def _publish_locked() -> None:
+    record_release_jobs(len(_QUEUE), sum(_RUNNING.values()))
+
+
+def _prune_locked(now: float) -> None:
+    expired = [jid for jid, job in _JOBS.items()
+               if job.finished_at is not None and now - job.finished_at > RETENTION_SECONDS]
+    for jid in expired:
+        del _JOBS[jid]
+
+
+def _dispatch_locked() -> None:
+    """Start queued jobs while worker slots and per-account slots are free (FIFO)."""
+    running_total = sum(_RUNNING.values())
+    if running_total >= MAX_WORKERS or not _QUEUE:
+        return
+    for job in list(_QUEUE):
+        if running_total >= MAX_WORKERS:
+            break
+        if _RUNNING.get(job.account_id, 0) >= PER_ACCOUNT_LIMIT:
+            continue
+        _QUEUE.remove(job)
+        _RUNNING[job.account_id] = _RUNNING.get(job.account_id, 0) + 1
+        running_total += 1
+        job.status = 'running'
+        job.started_at = time.time()
+        _executor().submit(_run, job)
+
+
+def _run(job: ReleaseJob) -> None:
+    try:
+        status_code, body = job.runner()
+    except Exception as exc:
+        log.exception("[release_jobs] job crashed", extra={'job_id': job.id, 'email_id': job.email_id})
+        status_code, body = 500, {'ok': False, 'error': str(exc)}
+    outcome = 'succeeded' if status_code < 400 else 'failed'
+    with _LOCK:
+        job.status = outcome
+        job.status_code = status_code
+        job.result = body
+        job.finished_at = time.time()
+        job.runner = None  # drop the closure (payload, app reference)
+        remaining = _RUNNING.get(job.account_id, 1) - 1
+        if remaining > 0:
+            _RUNNING[job.account_id] = remaining
+        else:
+            _RUNNING.pop(job.account_id, None)
+        _dispatch_locked()
+        _publish_locked()
+    record_release_job_finished(outcome)
+    log.info("[release_jobs] job finished",
+             extra={'job_id': job.id, 'email_id': job.email_id, 'status': outcome, 'status_code': status_code})
+
+
+def submit(email_id: int, account_id: Optional[int], runner: JobRunner, job_id: Optional[str] = None) -> ReleaseJob:
+    """Queue a release; returns the existing job when ``job_id`` is still active.
+
+    Raises:
+        QueueFull: RELEASE_QUEUE_MAX jobs are already waiting
+    """
+    with _LOCK:
+        now = time.time()
+        _prune_locked(now)
+        if job_id and job_id in _JOBS and _JOBS[job_id].status in ('queued', 'running'):
+            return _JOBS[job_id]
+        if len(_QUEUE) >= QUEUE_MAX:
+            record_release_job_finished('rejected')
+            raise QueueFull(f"{len(_QUEUE)} release jobs already queued")
+        job = ReleaseJob(job_id or new_job_id(), email_id, account_id, runner)
+        _JOBS[job.id] = job
+        _QUEUE.append(job)
+        _dispatch_locked()
+        _publish_locked()
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        payload = job.to_dict()
+        if job.status == 'queued':
+            payload['position'] = next((i for i, queued in enumerate(_QUEUE) if queued is job), 0) + 1
+        return payload
+
+
+def get_queue_info() -> Dict[str, Any]:
+    with _LOCK:
+        return {
+            'queued': len(_QUEUE),
+            'running': sum(_RUNNING.values()),
+            'max_workers': MAX_WORKERS,
+            'per_account_limit': PER_ACCOUNT_LIMIT,
+            'queue_max': QUEUE_MAX,
+        }
+
+
+def wait(job_id: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+    """Block until a job finishes or ``timeout`` passes (tests / CLI)."""
+    deadline = time.time() + timeout
+    while True:
+        job = get_job(job_id)
+        if job is None or job['status'] not in ('queued', 'running') or time.time() >= deadline:
+            return job
+        time.sleep(0.02)
+
+
+def reset() -> None:
+    """Forget finished and queued jobs (tests). Running jobs still complete."""
+    with _LOCK:
+        _QUEUE.clear()
+        for jid in [jid for jid, job in _JOBS.items() if job.status != 'running']:
+            del _JOBS[jid]
+        _publish_locked()
@@ -0,0 +1,336 @@
+"""Time-Bucketed Stats Rollups
+
+Aggregates ``email_messages`` into hourly and daily rollup tables so trend
+charts (30 days and beyond) read a few hundred rollup rows instead of
+scanning raw messages.
+
+Pipeline (run_rollups):
+1. Read rows with id > rollup_state.last_id (batched) to find hour buckets
+   touched by new messages
+2. Add the buckets of rows changed since the email_changes cursor
+   (app.services.change_log), because status changes (HELD -> RELEASED)
+   land on existing rows of any age, plus the buckets of deleted rows
+   (recorded by a delete trigger into rollup_dirty_hours)
+3. Recompute each affected hour from raw rows (created_at range, indexed)
+4. Recompute affected days from the hourly rollups (no raw scan)
+5. Advance both cursors
+
+When the change cursor is missing or older than the change log's
+retention horizon, the rollups are rebuilt in full once.
+
+Dimensions: account_id, direction, status, rule_hit (keywords matched),
+risk_band. Latency percentiles per bucket come from the hourly
+latency_sketches written by app.services.latency_stats.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services import change_log
+from app.utils.db import get_db
+
+log = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day')
+GROUP_BY_DIMENSIONS = ('status', 'direction', 'risk_band', 'rule_hit', 'account_id')
+
+_HOUR_FMT = '%Y-%m-%d %H:00:00'
+_DAY_FMT = '%Y-%m-%d'
+_BATCH_SIZE = 5000
+
+try:
+    _ROLLUP_INTERVAL = min(3600.0, max(10.0, float(os.getenv('ROLLUP_INTERVAL_SECONDS', '300'))))
+except ValueError:
+    _ROLLUP_INTERVAL = 300.0
+
+# Non-blocking: a second caller skips instead of queueing behind a running rollup
+_RUN_LOCK = threading.Lock()
+_STATE = {'last_run': 0.0}
+_WORKER: Dict[str, Any] = {'thread': None, 'stop': threading.Event()}
+
+_RISK_BAND_SQL = """
+    CASE
+        WHEN COALESCE(risk_score, 0) <= 0 THEN 'none'
+        WHEN risk_score < 40 THEN 'low'
+        WHEN risk_score < 70 THEN 'medium'
+        ELSE 'high'
+    END
+"""
+_RULE_HIT_SQL = "CASE WHEN keywords_matched IS NOT NULL AND keywords_matched NOT IN ('', '[]') THEN 1 ELSE 0 END"
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    change_log.ensure_tables(conn)
+    for table in ('stats_rollup_hourly', 'stats_rollup_daily'):
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table}(
+                bucket TEXT NOT NULL,
+                account_id INTEGER NOT NULL DEFAULT 0,
+                direction TEXT NOT NULL DEFAULT 'unknown',
+                status TEXT NOT NULL DEFAULT 'UNKNOWN',
+                rule_hit INTEGER NOT NULL DEFAULT 0,
+                risk_band TEXT NOT NULL DEFAULT 'none',
+                message_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY(bucket, account_id, direction, status, rule_hit, risk_band)
+            )
+            """
+        )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollup_state(
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS rollup_dirty_hours(bucket TEXT PRIMARY KEY)")
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_email_messages_rollup_ad
+        AFTER DELETE ON email_messages
+        WHEN OLD.created_at IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO rollup_dirty_hours(bucket) VALUES (strftime('{_HOUR_FMT}', OLD.created_at));
+        END
+        """
+    )
+
+
+def _hour_buckets_for_new_rows(conn: sqlite3.Connection, last_id: int) -> Tuple[Set[str], int]:
+    buckets: Set[str] = set()
+    cursor_id = last_id
+    while True:
+        rows = conn.execute(
+            f"""
+            SELECT id, strftime('{_HOUR_FMT}', created_at) AS bucket
+            FROM email_messages WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (cursor_id, _BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        buckets.update(r[1] for r in rows if r[1])
+        cursor_id = rows[-1][0]
+        if len(rows) < _BATCH_SIZE:
+            break
+    return buckets, cursor_id
+
+
+def _hour_buckets_for_changes(conn: sqlite3.Connection, since: int, upto: int) -> Set[str]:
+    rows = conn.execute(
+        f"""
+        SELECT DISTINCT strftime('{_HOUR_FMT}', m.created_at)
+        FROM email_changes c JOIN email_messages m ON m.id = c.email_id
+        WHERE c.seq > ? AND c.seq <= ?
+        """,
+        (since, upto),
+    ).fetchall()
+    return {r[0] for r in rows if r[0]}
+
+
+def _read_cursor(conn: sqlite3.Connection, name: str) -> Optional[int]:
+    row = conn.execute("SELECT last_id FROM rollup_state WHERE name=?", (name,)).fetchone()
+    return int(row[0]) if row else None
+
+
+def _write_cursor(conn: sqlite3.Connection, name: str, value: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO rollup_state(name, last_id, updated_at) VALUES(?, ?, datetime('now'))
+        ON CONFLICT(name) DO UPDATE SET last_id=excluded.last_id, updated_at=excluded.updated_at
+        """,
+        (name, value),
+    )
+
+
+def _recompute_hour(conn: sqlite3.Connection, bucket: str) -> None:
+    start = datetime.strptime(bucket, _HOUR_FMT)
+    end = (start + timedelta(hours=1)).strftime(_HOUR_FMT)
+    conn.execute("DELETE FROM stats_rollup_hourly WHERE bucket=?", (bucket,))
+    conn.execute(
+        f"""
+        INSERT INTO stats_rollup_hourly(bucket, account_id, direction, status, rule_hit, risk_band, message_count)
+        SELECT ?, COALESCE(account_id, 0), COALESCE(direction, 'unknown'),
+               COALESCE(interception_status, status, 'UNKNOWN'),
+               {_RULE_HIT_SQL}, {_RISK_BAND_SQL}, COUNT(*)
+        FROM email_messages
+        WHERE created_at >= ? AND created_at < ?
+        GROUP BY 2, 3, 4, 5, 6
+        """,
+        (bucket, bucket, end),
+    )
+
+
+def _recompute_day(conn: sqlite3.Connection, day: str) -> None:
+    conn.execute("DELETE FROM stats_rollup_daily WHERE bucket=?", (day,))
+    conn.execute(
+        """
+        INSERT INTO stats_rollup_daily(bucket, account_id, direction, status, rule_hit, risk_band, message_count)
+        SELECT substr(bucket, 1, 10), account_id, direction, status, rule_hit, risk_band, SUM(message_count)
+        FROM stats_rollup_hourly
+        WHERE bucket >= ? AND bucket < ?
+        GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+        (day, day + '~'),
+    )
+
+
+def run_rollups(conn: Optional[sqlite3.Connection] = None) -> Dict[str, int]:
+    """Incrementally refresh hourly/daily rollups. Returns work counters.
+
+    Safe to call from several threads; concurrent callers return immediately
+    with ``{'skipped': 1}`` while one run is in progress.
+    """
+    if not _RUN_LOCK.acquire(blocking=False):
+        return {'skipped': 1}
+    own = conn is None
+    c = conn or get_db()
+    try:
+        ensure_tables(c)
+        last_id = _read_cursor(c, 'email_messages') or 0
+        change_cursor = _read_cursor(c, 'email_changes')
+        latest_seq = change_log.latest_seq(c)
+        oldest_seq = c.execute("SELECT MIN(seq) FROM email_changes").fetchone()[0]
+        rebuild = change_cursor is None or (oldest_seq is not None and change_cursor < oldest_seq - 1)
+        if rebuild:
+            # Changes since the last run are unknown: restate every bucket once
+            last_id = 0
+            hours: Set[str] = set()
+        else:
+            hours = _hour_buckets_for_changes(c, change_cursor, latest_seq)
+        new_hours, new_last_id = _hour_buckets_for_new_rows(c, last_id)
+        dirty = [r[0] for r in c.execute("SELECT bucket FROM rollup_dirty_hours").fetchall()]
+        hours |= new_hours | {b for b in dirty if b}
+
+        c.executemany("DELETE FROM rollup_dirty_hours WHERE bucket=?", [(b,) for b in dirty])
+        if rebuild:
+            c.execute("DELETE FROM stats_rollup_hourly")
+            c.execute("DELETE FROM stats_rollup_daily")
+        for bucket in sorted(hours):
+            _recompute_hour(c, bucket)
+        days = sorted({h[:10] for h in hours})
+        for day in days:
+            _recompute_day(c, day)
+
+        _write_cursor(c, 'email_messages', new_last_id)
+        _write_cursor(c, 'email_changes', latest_seq)
+        c.commit()
+        _STATE['last_run'] = time.time()
+        log.debug("[rollups] refreshed", extra={'hours': len(hours), 'days': len(days), 'last_id': new_last_id,
+                                                'seq': latest_seq, 'rebuild': rebuild})
+        return {'hours': len(hours), 'days': len(days), 'last_id': new_last_id, 'seq': latest_seq}
+    except sqlite3.Error as exc:
+        log.warning("[rollups] refresh failed: %s", exc)
+        try:
+            c.rollback()
+        except sqlite3.Error:
+            pass
+        return {'error': 1}
+    finally:
+        if own:
+            c.close()
+        _RUN_LOCK.release()
+
+
+def maybe_run_rollups(max_age: Optional[float] = None) -> None:
+    """Run rollups if the last run is older than ``max_age`` (default interval)."""
+    limit = _ROLLUP_INTERVAL if max_age is None else max_age
+    if time.time() - _STATE['last_run'] >= limit:
+        run_rollups()
+
+
+def _rollup_loop() -> None:
+    stop: threading.Event = _WORKER['stop']
+    while not stop.is_set():
+        run_rollups()
+        stop.wait(_ROLLUP_INTERVAL)
+
+
+def start_rollup_worker() -> None:
+    """Start the periodic rollup thread once per process (idempotent)."""
+    thread = _WORKER['thread']
+    if thread is not None and thread.is_alive():
+        return
+    _WORKER['stop'].clear()
+    thread = threading.Thread(target=_rollup_loop, name='stats-rollups', daemon=True)
+    _WORKER['thread'] = thread
+    thread.start()
+
+
+def _window_start(granularity: str, days: int) -> str:
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    return since.strftime(_HOUR_FMT if granularity == 'hour' else _DAY_FMT)
+
+
+def get_trends(granularity: str = 'day', days: int = 30, account_id: Optional[int] = None,
+               group_by: str = 'status', conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """Series of ``{'bucket', 'total', 'counts': {group: n}}`` from rollup tables.
+
+    Example:
+        >>> get_trends('day', 30, group_by='risk_band')[0]['counts']
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    if group_by not in GROUP_BY_DIMENSIONS:
+        raise ValueError(f"group_by must be one of {GROUP_BY_DIMENSIONS}")
+    table = 'stats_rollup_hourly' if granularity == 'hour' else 'stats_rollup_daily'
+    sql = f"SELECT bucket, {group_by} AS grp, SUM(message_count) AS n FROM {table} WHERE bucket >= ?"
+    params: List[Any] = [_window_start(granularity, days)]
+    if account_id is not None:
+        sql += " AND account_id = ?"
+        params.append(int(account_id))
+    sql += " GROUP BY bucket, grp ORDER BY bucket"
+
+    own = conn is None
+    c = conn or get_db()
+    try:
+        ensure_tables(c)
+        rows = c.execute(sql, params).fetchall()
+    finally:
+        if own:
+            c.close()
+
+    series: Dict[str, Dict[str, Any]] = {}
+    for bucket, grp, n in rows:
+        point = series.setdefault(bucket, {'bucket': bucket, 'total': 0, 'counts': {}})
+        point['counts'][str(grp)] = int(n or 0)
+        point['total'] += int(n or 0)
+    return list(series.values())
+
+
+def get_latency_trends(granularity: str = 'day', days: int = 7, account_id: Optional[int] = None,
+                       conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """Per-bucket latency percentiles merged from hourly latency sketches."""
+    from app.services.latency_stats import LatencySketch, summarize
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    since = int(time.time()) - days * 86400
+    sql = "SELECT bucket_start, sketch_json FROM latency_sketches WHERE bucket_start >= ?"
+    params: List[Any] = [since - since % 3600]
+    if account_id is not None:
+        sql += " AND account_id = ?"
+        params.append(int(account_id))
+
+    own = conn is None
+    c = conn or get_db()
+    try:
+        rows = c.execute(sql, params).fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        if own:
+            c.close()
+
+    fmt = _HOUR_FMT if granularity == 'hour' else _DAY_FMT
+    merged: Dict[str, LatencySketch] = {}
+    for bucket_start, text in rows:
+        key = datetime.fromtimestamp(int(bucket_start), tz=timezone.utc).strftime(fmt)
+        merged.setdefault(key, LatencySketch()).merge(LatencySketch.from_json(text))
+    return [dict(summarize(merged[k]), bucket=k) for k in sorted(merged)]
@@ -1,28 +1,135 @@
-"""Statistics Service with In-Memory Caching
+"""Statistics Service with Shared In-Memory Caching
 
-Provides unified statistics for dashboard with TTL-based caching.
-Reduces database load by caching frequent stat queries.
+Provides unified statistics for dashboard, API and health endpoints through a
+single cache layer. Reduces database load by caching frequent stat queries.
 
-Phase 1 Transitional Layout:
-- Extracted from simple_app.py inline caching
-- 2-second TTL for dashboard stats
-- Global-only scope (account-specific deferred to Phase 2)
+Phase 2 Layout:
+- One lock-protected cache keyed by (namespace, account_id, filter)
+- Per-account scoping (global entries use account_id=None)
+- Single-flight loading: concurrent misses for the same key run one query,
+  the other callers wait for the leader's result
+- Write-event invalidation via invalidate(account_id); TTL remains a backstop
+  for writers outside this process (other workers, manual SQL)
+- Hit/miss/coalesced counters exported through app.utils.metrics
 
 Cache Design:
-- Simple dict-based with timestamps
-- Thread-safe for read-heavy workloads
-- No lock needed (stale reads acceptable for stats)
+- Entries: {key: {'ts': float, 'value': Any}}
+- A generation counter is bumped on every invalidation so a load that started
+  before a write never stores its (now stale) result
 """
+import logging
+import threading
 import time
-from app.utils.db import get_db, fetch_counts, table_exists
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from app.utils.db import fetch_counts, table_exists
+from app.utils.metrics import record_stats_cache_event, record_stats_cache_invalidation
 
-# In-memory cache: {'ts': float, 'stats': dict or None}
-_STATS_CACHE = {'ts': 0, 'stats': None}
-_CACHE_TTL = 2.0  # seconds
+log = logging.getLogger(__name__)
 
+_CACHE_TTL = 2.0  # seconds (default backstop TTL)
+_FLIGHT_WAIT_TIMEOUT = 10.0  # seconds a follower waits for the leader
 
-def get_stats(force_refresh=False):
+_COUNT_KEYS = ('total', 'pending', 'approved', 'rejected', 'sent', 'held', 'released', 'discarded')
+
+CacheKey = Tuple[str, Optional[int], str]
+
+_CACHE_LOCK = threading.Lock()
+_STATS_CACHE: Dict[CacheKey, Dict[str, Any]] = {}
+_INFLIGHT: Dict[CacheKey, '_Flight'] = {}
+_GENERATION = {'value': 0}
+
+
+class _Flight:
+    """In-flight load shared by the leader and any waiting followers."""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _normalize_account(account_id: Any) -> Optional[int]:
+    if account_id in (None, '', 'all'):
+        return None
+    try:
+        return int(account_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_or_load(namespace: str, loader: Callable[[], Any], *, account_id: Any = None,
+                filter_key: str = '', ttl: Optional[float] = None,
+                force_refresh: bool = False) -> Tuple[Any, bool]:
+    """Return ``(value, from_cache)`` for a cache key, loading it at most once.
+
+    Args:
+        namespace: Logical stat family (e.g. 'counts', 'unified', 'healthz')
+        loader: Zero-arg callable producing the value on a miss
+        account_id: Account scope, None for global entries
+        filter_key: Extra discriminator (status filter, flags)
+        ttl: Backstop TTL in seconds (defaults to _CACHE_TTL)
+        force_refresh: Bypass a fresh entry (still single-flight)
+
+    Concurrent misses for the same key are collapsed: the first caller runs
+    ``loader`` while the rest block until it finishes and share its result.
+    Loader exceptions propagate to the leader and all followers.
+    """
+    key: CacheKey = (namespace, _normalize_account(account_id), filter_key or '')
+    ttl = _CACHE_TTL if ttl is None else ttl
+
+    with _CACHE_LOCK:
+        entry = _STATS_CACHE.get(key)
+        if not force_refresh and entry is not None and (time.time() - entry['ts']) < ttl:
+            record_stats_cache_event(namespace, 'hit')
+            return entry['value'], True
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _INFLIGHT[key] = flight
+        generation = _GENERATION['value']
+
+    if not leader:
+        record_stats_cache_event(namespace, 'coalesced')
+        if flight.event.wait(_FLIGHT_WAIT_TIMEOUT):
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+        # Leader is stuck; fall back to a direct load rather than blocking the request
+        log.warning("[stats::cache] single-flight wait timed out", extra={'namespace': namespace, 'account_id': key[1]})
+        return loader(), False
+
+    record_stats_cache_event(namespace, 'miss')
+    try:
+        value = loader()
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    else:
+        flight.value = value
+        return value, False
+    finally:
+        with _CACHE_LOCK:
+            _INFLIGHT.pop(key, None)
+            if flight.error is None and _GENERATION['value'] == generation:
+                _STATS_CACHE[key] = {'ts': time.time(), 'value': flight.value}
+        flight.event.set()
+
+
+def _load_counts(account_id: Optional[int]) -> dict:
+    # Be resilient when tables are not yet initialized in test environment
+    try:
+        if not table_exists('email_messages'):
+            return {k: 0 for k in _COUNT_KEYS}
+        return fetch_counts(account_id=account_id)
+    except Exception:
+        return {k: 0 for k in _COUNT_KEYS}
+
+
+def get_stats(force_refresh=False, account_id=None):
     """Get unified dashboard statistics with caching
 
     Returns dict with keys:
@@ -32,42 +139,68 @@ def get_stats(force_refresh=False):
     - rejected: Rejected messages
     - sent: Successfully sent messages
     - held: Messages held for interception
+    - released: Released messages (incl. legacy APPROVED/DELIVERED)
+    - discarded: Discarded messages
 
     Args:
         force_refresh: If True, bypass cache and fetch fresh data
+        account_id: Optional account scope (None = all accounts)
 
     Returns:
         dict: Statistics dictionary
 
-    Cache TTL: 2 seconds (configurable via _CACHE_TTL)
-
     Example:
         >>> stats = get_stats()
         >>> print(f"Pending: {stats['pending']}, Held: {stats['held']}")
     """
-    now = time.time()
+    scope = _normalize_account(account_id)
+    value, _ = get_or_load('counts', lambda: _load_counts(scope), account_id=scope,
+                           force_refresh=force_refresh)
+    return value
 
-    # Check cache validity
-    if not force_refresh and (now - _STATS_CACHE['ts']) < _CACHE_TTL:
-        cached = _STATS_CACHE['stats']
-        if cached is not None:
-            return cached
 
-    # Cache miss or expired - fetch fresh data
-    # Be resilient when tables are not yet initialized in test environment
-    try:
-        if not table_exists('email_messages'):
-            stats = {k: 0 for k in ('total','pending','approved','rejected','sent','held','released')}
-        else:
-            stats = fetch_counts()  # Returns all 6 counts (total, pending, approved, rejected, sent, held)
-    except Exception:
-        stats = {k: 0 for k in ('total','pending','approved','rejected','sent','held','released')}
+def get_unified_stats(account_id=None, force_refresh=False):
+    """Counts used by the unified dashboard badges (/api/unified-stats).
 
-    # Update cache
-    _STATS_CACHE['ts'] = now
-    _STATS_CACHE['stats'] = stats
+    Example:
+        >>> get_unified_stats(account_id=3)['held']
+    """
+    scope = _normalize_account(account_id)
+
+    def _load():
+        counts = _load_counts(scope)
+        return {
+            'total': counts['total'],
+            'pending': counts['pending'],
+            'held': counts['held'],
+            'released': counts.get('released', 0),
+            'rejected': counts.get('rejected', 0),
+            'discarded': counts.get('discarded', 0),
+        }
+
+    value, _ = get_or_load('unified', _load, account_id=scope, ttl=5.0, force_refresh=force_refresh)
+    return value
+
+
+def invalidate(account_id=None):
+    """Drop cached stats after a write touching ``account_id``.
 
-    return stats
+    Entries for that account and all global (account_id=None) entries are
+    removed; with no account every entry is removed. Call after commit so
+    the next reader sees the new rows.
+
+    Example:
+        >>> invalidate(account_id=3)  # after releasing a message of account 3
+    """
+    scope = _normalize_account(account_id)
+    with _CACHE_LOCK:
+        _GENERATION['value'] += 1
+        if scope is None:
+            _STATS_CACHE.clear()
+        else:
+            for key in [k for k in _STATS_CACHE if k[1] is None or k[1] == scope]:
+                del _STATS_CACHE[key]
+    record_stats_cache_invalidation('account' if scope is not None else 'all')
 
 
 def clear_cache():
@@ -76,8 +209,9 @@ def clear_cache():
     Example:
         >>> clear_cache()  # Force next get_stats() to fetch fresh data
     """
-    _STATS_CACHE['ts'] = 0
-    _STATS_CACHE['stats'] = None
+    with _CACHE_LOCK:
+        _GENERATION['value'] += 1
+        _STATS_CACHE.clear()
 
 
 def get_cache_info():
@@ -85,15 +219,22 @@ def get_cache_info():
 
     Returns:
         dict: Cache info with keys 'age_seconds', 'is_valid', 'has_data'
+        (for the global counts entry) plus 'entries' and 'inflight'
 
     Example:
         >>> info = get_cache_info()
         >>> print(f"Cache age: {info['age_seconds']:.1f}s, Valid: {info['is_valid']}")
     """
     now = time.time()
-    age = now - _STATS_CACHE['ts']
+    with _CACHE_LOCK:
+        entry = _STATS_CACHE.get(('counts', None, ''))
+        entries = len(_STATS_CACHE)
+        inflight = len(_INFLIGHT)
+    age = now - entry['ts'] if entry else now
     return {
         'age_seconds': age,
-        'is_valid': age < _CACHE_TTL,
-        'has_data': _STATS_CACHE['stats'] is not None
+        'is_valid': entry is not None and age < _CACHE_TTL,
+        'has_data': entry is not None,
+        'entries': entries,
+        'inflight': inflight,
     }
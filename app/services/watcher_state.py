@@ -0,0 +1,140 @@
+"""Persisted IMAP Watcher Resume State
+
+One row per account in ``watcher_state`` so a restarted watcher does not
+rediscover what the previous run already knew:
+
+- last_uid: highest INBOX UID the watcher has processed
+- uidvalidity: INBOX UIDVALIDITY the UIDs belong to; a change on the
+  server means the stored UIDs are meaningless and warm state is dropped
+- capabilities: server CAPABILITY list from the last login (MOVE, IDLE,
+  UIDPLUS, ...)
+- quarantine_folder: the quarantine folder name that worked last time, tried
+  first on connect instead of probing every candidate
+- uid_floor / uid_floor_row_id: set when UIDVALIDITY changes. uid_floor is
+  the server UIDNEXT - 1 at that point (the watcher resumes above it), and
+  email_messages rows with id <= uid_floor_row_id carry UIDs from the old
+  UIDVALIDITY, so they no longer count towards the last processed UID
+
+The startup orchestrator (app/workers/imap_startup.py) loads every row in
+one query and prime()s an in-process cache; each ImapWatcher take()s its
+entry on construction and falls back to load() when nothing was primed.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+_FIELDS = ('last_uid', 'uidvalidity', 'capabilities', 'quarantine_folder', 'uid_floor', 'uid_floor_row_id')
+
+# Columns added to watcher_state tables created before they existed
+_COLUMNS = (
+    ('uid_floor', 'INTEGER'),
+    ('uid_floor_row_id', 'INTEGER'),
+)
+
+_primed: Dict[int, Dict[str, Any]] = {}
+_primed_lock = threading.Lock()
+
+
+def ensure_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS watcher_state(
+            account_id INTEGER PRIMARY KEY,
+            last_uid INTEGER,
+            uidvalidity INTEGER,
+            capabilities TEXT,
+            quarantine_folder TEXT,
+            uid_floor INTEGER,
+            uid_floor_row_id INTEGER,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(watcher_state)").fetchall()}
+    for name, decl in _COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE watcher_state ADD COLUMN {name} {decl}")
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _row_to_state(row: Any) -> Dict[str, Any]:
+    keys = row.keys()
+    try:
+        caps = json.loads(row['capabilities']) if row['capabilities'] else []
+    except (TypeError, ValueError):
+        caps = []
+    return {
+        'last_uid': _int_or_none(row['last_uid']),
+        'uidvalidity': _int_or_none(row['uidvalidity']),
+        'capabilities': caps,
+        'quarantine_folder': row['quarantine_folder'] or None,
+        'uid_floor': _int_or_none(row['uid_floor']) if 'uid_floor' in keys else None,
+        'uid_floor_row_id': _int_or_none(row['uid_floor_row_id']) if 'uid_floor_row_id' in keys else None,
+    }
+
+
+def load(db_path: str, account_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            ensure_table(conn)
+            row = conn.execute("SELECT * FROM watcher_state WHERE account_id=?", (account_id,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.debug(f"[watcher_state] load failed for account {account_id}: {e}")
+        return None
+    return _row_to_state(row) if row else None
+
+
+def save(db_path: str, account_id: int, **fields: Any) -> None:
+    """Upsert the given fields (any of _FIELDS)."""
+    values = {k: v for k, v in fields.items() if k in _FIELDS}
+    if not values:
+        return
+    if 'capabilities' in values and values['capabilities'] is not None:
+        values['capabilities'] = json.dumps(sorted(
+            c.decode('ascii', 'replace') if isinstance(c, bytes) else str(c) for c in values['capabilities']
+        ))
+    columns = ', '.join(values)
+    updates = ', '.join(f"{k}=excluded.{k}" for k in values)
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            ensure_table(conn)
+            conn.execute(
+                f"INSERT INTO watcher_state(account_id, {columns}) VALUES(?, {', '.join('?' * len(values))}) "
+                f"ON CONFLICT(account_id) DO UPDATE SET {updates}, updated_at=datetime('now')",
+                (account_id, *values.values()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.debug(f"[watcher_state] save failed for account {account_id}: {e}")
+
+
+def prime(states: Dict[int, Dict[str, Any]]) -> None:
+    with _primed_lock:
+        _primed.update(states)
+
+
+def take(account_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Pop the primed state for ``account_id`` (None when the orchestrator had none)."""
+    if account_id is None:
+        return None
+    with _primed_lock:
+        return _primed.pop(account_id, None)
+
+
+def from_rows(rows: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+    """Build prime() input from rows carrying account_id + the watcher_state columns."""
+    return {int(row['account_id']): _row_to_state(row) for row in rows}
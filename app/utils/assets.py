@@ -0,0 +1,170 @@
+"""Static Asset Bundles
+
+Build step plus template helper for the CSS/JS under ``static/``:
+
+- BUNDLES maps a logical asset name to its source files (in cascade order
+  for CSS). ``python -m app.utils.assets`` concatenates and minifies each
+  bundle, writes it to ``static/dist/<stem>.<sha256[:12]><ext>`` next to
+  precompressed ``.gz`` (and ``.br`` when the ``brotli`` package is
+  installed) variants, and records the names in ``static/dist/manifest.json``.
+- asset_urls(name) (a template global) returns the URLs to include for a
+  bundle: the fingerprinted file under ``/assets/`` when a build exists,
+  else the unbundled source files under ``/static/`` so development works
+  without a build step.
+- app/routes/assets.py serves ``/assets/`` with ``Cache-Control: immutable``
+  (the name changes whenever the content does) and picks the precompressed
+  variant from Accept-Encoding.
+
+CSS minification is conservative (comments and redundant whitespace only).
+JavaScript is bundled as-is; the precompressed variants provide the size win
+without risking behaviour changes from a hand-rolled JS minifier.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+STATIC_ROOT = Path(__file__).resolve().parents[2] / 'static'
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSETS_URL_PREFIX = '/assets/'
+
+BUNDLES: Dict[str, List[str]] = {
+    # Shared layout: tokens -> base -> legacy unified (sidebar/nav) -> components
+    'core.css': ['css/tokens.css', 'css/base.css', 'css/unified.css', 'css/components.css'],
+    'login.css': ['css/tokens.css', 'css/base.css'],
+    'css/accounts.css': ['css/accounts.css'],
+    'css/dashboard.css': ['css/dashboard.css'],
+    'css/emails.css': ['css/emails.css'],
+    'css/pages.css': ['css/pages.css'],
+    'js/app.js': ['js/app.js'],
+    'js/dashboard.js': ['js/dashboard.js'],
+    'js/email_editor.js': ['js/email_editor.js'],
+}
+
+_CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_CSS_COMMENT_RE = re.compile(r'(' + _CSS_STRING + r')|/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(_CSS_STRING)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_RE = re.compile(r'\s*([{};,])\s*')
+_CSS_COLON_RE = re.compile(r':\s+')  # only after: "a :hover" differs from "a:hover"
+
+_manifest_lock = threading.Lock()
+_manifest_cache: Dict[str, object] = {'key': None, 'entries': {}}
+
+
+def minify_css(text: str) -> str:
+    """Drop comments and collapse whitespace; strings are left untouched."""
+    text = _CSS_COMMENT_RE.sub(lambda m: m.group(1) or ' ', text)
+    parts: List[str] = []
+    pos = 0
+    for match in _CSS_STRING_RE.finditer(text):
+        parts.append(_squeeze_css(text[pos:match.start()]))
+        parts.append(match.group(0))
+        pos = match.end()
+    parts.append(_squeeze_css(text[pos:]))
+    return ''.join(parts).strip()
+
+
+def _squeeze_css(text: str) -> str:
+    text = _CSS_PUNCT_RE.sub(r'\1', _CSS_SPACE_RE.sub(' ', text))
+    return _CSS_COLON_RE.sub(':', text).replace(';}', '}')
+
+
+def _bundle_source(name: str, sources: List[str], static_root: Path) -> bytes:
+    chunks = []
+    for source in sources:
+        text = (static_root / source).read_text(encoding='utf-8')
+        if name.endswith('.css'):
+            chunks.append(minify_css(text))
+        else:
+            # Separate files safely even when one lacks a trailing semicolon
+            chunks.append(text.rstrip() + '\n;')
+    return '\n'.join(chunks).encode('utf-8') + b'\n'
+
+
+def build(static_root: Optional[Path] = None) -> Dict[str, str]:
+    """Write every bundle to static/dist and return the new manifest."""
+    static_root = Path(static_root or STATIC_ROOT)
+    dist = static_root / DIST_DIR
+    dist.mkdir(parents=True, exist_ok=True)
+    manifest: Dict[str, str] = {}
+    for name, sources in BUNDLES.items():
+        payload = _bundle_source(name, sources, static_root)
+        stem, ext = os.path.splitext(os.path.basename(name))
+        filename = f"{stem}.{hashlib.sha256(payload).hexdigest()[:12]}{ext}"
+        target = dist / filename
+        target.write_bytes(payload)
+        (dist / (filename + '.gz')).write_bytes(gzip.compress(payload, compresslevel=9, mtime=0))
+        if brotli is not None:
+            (dist / (filename + '.br')).write_bytes(brotli.compress(payload, quality=11))
+        manifest[name] = filename
+        log.info("[assets] built bundle", extra={'bundle': name, 'file': filename, 'bytes': len(payload)})
+    tmp = dist / (MANIFEST_NAME + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    tmp.replace(dist / MANIFEST_NAME)
+    _prune_stale(dist, manifest)
+    return manifest
+
+
+def _prune_stale(dist: Path, manifest: Dict[str, str]) -> None:
+    keep = set(manifest.values())
+    for path in dist.iterdir():
+        if path.name == MANIFEST_NAME:
+            continue
+        base = path.name[:-3] if path.name.endswith(('.gz', '.br')) else path.name
+        if base not in keep:
+            path.unlink()
+
+
+def load_manifest(static_root: Optional[Path] = None) -> Dict[str, str]:
+    """Current manifest (re-read when the file changes); empty without a build."""
+    path = Path(static_root or STATIC_ROOT) / DIST_DIR / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return {}
+    with _manifest_lock:
+        if _manifest_cache['key'] != (str(path), mtime):
+            try:
+                entries = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                log.warning(f"[assets] unreadable manifest {path}: {e}")
+                entries = {}
+            _manifest_cache.update(key=(str(path), mtime), entries=entries)
+        return dict(_manifest_cache['entries'])
+
+
+def asset_urls(name: str) -> List[str]:
+    """URLs a template should include for bundle ``name``."""
+    built = load_manifest().get(name)
+    if built:
+        return [ASSETS_URL_PREFIX + built]
+    return ['/static/' + source for source in BUNDLES.get(name, [name])]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build fingerprinted static asset bundles")
+    parser.add_argument('--static-root', default=str(STATIC_ROOT))
+    args = parser.parse_args(argv)
+    manifest = build(Path(args.static_root))
+    for name, filename in sorted(manifest.items()):
+        print(f"{name} -> {DIST_DIR}/{filename}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
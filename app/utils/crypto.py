@@ -1,32 +1,87 @@
-"""Encryption utilities for credential management"""
-from cryptography.fernet import Fernet, InvalidToken
+"""Encryption utilities for credential management
+
+- key.txt holds one Fernet key per line. The first line encrypts; every
+  line can decrypt (MultiFernet). Rotation without downtime:
+  ``python -m app.utils.crypto add-key`` (prepends a key), restart or
+  reload_keys() in every process, ``python -m app.utils.crypto reencrypt``,
+  then delete the old line.
+- get_cipher() is built once per process (reload_keys() after editing key.txt).
+- decrypt_credential(token, account_id=...) keeps the plaintext for
+  CREDENTIAL_CACHE_TTL seconds (default 300) keyed by (account id, sha256 of
+  the ciphertext), so watcher restarts and per-request IMAP logins skip the
+  Fernet HMAC/AES work. Cached plaintext is held in a bytearray and zeroed
+  on expiry, eviction and invalidate_credentials(); strings already handed
+  to callers are outside its reach.
+"""
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+import argparse
+import hashlib
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional, Tuple
 
 log = logging.getLogger(__name__)
 
 KEY_FILE = "key.txt"
 
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+CACHE_TTL = _env_float('CREDENTIAL_CACHE_TTL', 300, 0, 3600)
+CACHE_MAX_ENTRIES = 256
+
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[int, bytes], Tuple[float, bytearray]]" = OrderedDict()
+
+
+def _parse_key(line: bytes) -> bytes:
+    # Handle both plain key and key with prefix
+    if b'Generated encryption key:' in line:
+        line = line.split(b':')[-1]
+    return line.strip()
+
+
 @lru_cache(maxsize=1)
-def get_encryption_key() -> bytes:
-    """Get or generate encryption key for passwords"""
+def get_encryption_keys() -> Tuple[bytes, ...]:
+    """All keys from KEY_FILE, newest (encrypting) first; generated if missing."""
     if not os.path.exists(KEY_FILE):
         key = Fernet.generate_key()
         with open(KEY_FILE, "wb") as f:
             f.write(key)
-        return key
+        return (key,)
     with open(KEY_FILE, "rb") as f:
-        content = f.read().strip()
-        # Handle both plain key and key with prefix
-        if b'Generated encryption key:' in content:
-            content = content.split(b':')[-1].strip()
-        return content
+        keys = tuple(k for k in (_parse_key(line) for line in f.read().splitlines()) if k)
+    if not keys:
+        raise ValueError(f"{KEY_FILE} contains no encryption key")
+    return keys
+
+
+def get_encryption_key() -> bytes:
+    """Get or generate encryption key for passwords (the encrypting key)"""
+    return get_encryption_keys()[0]
+
+
+@lru_cache(maxsize=1)
+def get_cipher() -> MultiFernet:
+    """Process-wide cipher: encrypts with the first key, decrypts with any."""
+    return MultiFernet([Fernet(key) for key in get_encryption_keys()])
+
+
+def reload_keys() -> None:
+    """Re-read KEY_FILE (after adding or retiring a key)."""
+    get_encryption_keys.cache_clear()
+    get_cipher.cache_clear()
+    invalidate_credentials()
 
-def get_cipher() -> Fernet:
-    """Get Fernet cipher instance"""
-    return Fernet(get_encryption_key())
 
 def encrypt_credential(text: Optional[str]) -> Optional[str]:
     """Encrypt credential text"""
@@ -34,12 +89,12 @@ def encrypt_credential(text: Optional[str]) -> Optional[str]:
         return None
     return get_cipher().encrypt(text.encode("utf-8")).decode("utf-8")
 
-def decrypt_credential(encrypted_text: Optional[str]) -> Optional[str]:
-    """Decrypt credential text"""
-    if not encrypted_text:
-        return None
+
+def _decrypt(encrypted_text: str) -> Optional[bytes]:
     try:
-        return get_cipher().decrypt(encrypted_text.encode("utf-8")).decode("utf-8")
+        plain = get_cipher().decrypt(encrypted_text.encode("utf-8"))
+        plain.decode("utf-8")
+        return plain
     except InvalidToken as e:
         log.warning(f"Failed to decrypt credential (invalid token or corrupted data): {e}")
         return None
@@ -48,4 +103,108 @@ def decrypt_credential(encrypted_text: Optional[str]) -> Optional[str]:
         return None
     except Exception as e:
         log.error(f"Unexpected decryption error: {e}", exc_info=True)
-        return None
\ No newline at end of file
+        return None
+
+
+def decrypt_credential(encrypted_text: Optional[str], account_id: Optional[int] = None) -> Optional[str]:
+    """Decrypt credential text (cached briefly when ``account_id`` is given)"""
+    if not encrypted_text:
+        return None
+    if account_id is None or CACHE_TTL <= 0:
+        plain = _decrypt(encrypted_text)
+        return plain.decode("utf-8") if plain is not None else None
+
+    key = (int(account_id), hashlib.sha256(encrypted_text.encode("utf-8")).digest())
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            expires, secret = entry
+            if expires > now:
+                _cache.move_to_end(key)
+                return secret.decode("utf-8")
+            _drop_locked(key)
+
+    plain = _decrypt(encrypted_text)
+    if plain is None:
+        return None
+    with _cache_lock:
+        _drop_locked(key)
+        _cache[key] = (now + CACHE_TTL, bytearray(plain))
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _drop_locked(next(iter(_cache)))
+    return plain.decode("utf-8")
+
+
+def _drop_locked(key: Tuple[int, bytes]) -> None:
+    entry = _cache.pop(key, None)
+    if entry is not None:
+        secret = entry[1]
+        secret[:] = b'\x00' * len(secret)
+
+
+def invalidate_credentials(account_id: Optional[int] = None) -> None:
+    """Zero and drop cached plaintext for one account (or all)."""
+    with _cache_lock:
+        for key in [k for k in _cache if account_id is None or k[0] == int(account_id)]:
+            _drop_locked(key)
+
+
+def reencrypt_credentials(conn) -> int:
+    """Re-encrypt every stored account password under the current first key.
+
+    Tokens that no configured key can decrypt are left untouched (and
+    logged). The caller commits. Returns the number of values rewritten.
+    """
+    cipher = get_cipher()
+    rewritten = 0
+    rows = conn.execute("SELECT id, imap_password, smtp_password FROM email_accounts").fetchall()
+    for account_id, imap_token, smtp_token in rows:
+        updates = {}
+        for column, token in (('imap_password', imap_token), ('smtp_password', smtp_token)):
+            if not token:
+                continue
+            try:
+                updates[column] = cipher.rotate(token.encode("utf-8")).decode("utf-8")
+            except InvalidToken:
+                log.warning(f"[crypto] cannot re-encrypt {column} for account {account_id}: no matching key")
+        if updates:
+            assignments = ', '.join(f"{column} = ?" for column in updates)
+            conn.execute(f"UPDATE email_accounts SET {assignments} WHERE id = ?", (*updates.values(), account_id))
+            rewritten += len(updates)
+    invalidate_credentials()
+    return rewritten
+
+
+def add_key() -> bytes:
+    """Prepend a freshly generated key to KEY_FILE and reload."""
+    key = Fernet.generate_key()
+    existing = list(get_encryption_keys())
+    with open(KEY_FILE, "wb") as f:
+        f.write(b"\n".join([key] + existing) + b"\n")
+    reload_keys()
+    return key
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Credential key rotation")
+    parser.add_argument('command', choices=['add-key', 'reencrypt'],
+                        help="add-key: prepend a new encrypting key; reencrypt: rewrite stored credentials")
+    args = parser.parse_args(argv)
+    if args.command == 'add-key':
+        add_key()
+        print(f"Added a new primary key to {KEY_FILE}; restart workers, then run 'reencrypt'")
+        return 0
+    from app.utils.db import get_db
+    conn = get_db()
+    try:
+        count = reencrypt_credentials(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Re-encrypted {count} credentials")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""Streaming Download Responses
+
+Shared by the attachment and raw-email download routes so large files are
+never read into Python memory in one piece.
+
+- file_response(): serves a file from disk through werkzeug's file wrapper
+  (8 KiB chunks) with Range / If-Range / If-None-Match handling; the ETag
+  is the stored SHA-256 when the caller has one
+- sqlite_blob_response(): same for a BLOB/TEXT column, read through
+  sqlite3 incremental blob I/O (Python 3.11+) instead of SELECTing the
+  whole value; older Pythons read it in BLOB_CHUNK_BYTES substr() slices
+- Proxy offload (DOWNLOAD_OFFLOAD config): 'x-sendfile' hands the absolute
+  path to Apache/lighttpd, 'x-accel' hands ``DOWNLOAD_ACCEL_PREFIX`` +
+  path relative to ``DOWNLOAD_ACCEL_ROOT`` to nginx (an ``internal``
+  location aliased to that root). Conditional requests are still answered
+  here; Range is left to the proxy. Files outside the accel root are
+  streamed by the app as usual.
+"""
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional, Union
+
+from flask import Response, current_app, request, send_file
+from werkzeug.wsgi import wrap_file
+
+log = logging.getLogger(__name__)
+
+OFFLOAD_MODES = ('', 'x-sendfile', 'x-accel')
+BLOB_CHUNK_BYTES = 256 * 1024
+_HAS_BLOBOPEN = hasattr(sqlite3.Connection, 'blobopen')
+
+
+def _offload_mode() -> str:
+    mode = str(current_app.config.get('DOWNLOAD_OFFLOAD') or '').strip().lower()
+    if mode not in OFFLOAD_MODES:
+        log.warning("[downloads] Unknown DOWNLOAD_OFFLOAD mode, streaming in-app", extra={'mode': mode})
+        return ''
+    return mode
+
+
+def _accel_uri(path: Path) -> Optional[str]:
+    root = Path(current_app.config.get('DOWNLOAD_ACCEL_ROOT') or os.getcwd()).resolve()
+    try:
+        relative = path.relative_to(root)
+    except ValueError:
+        return None
+    prefix = str(current_app.config.get('DOWNLOAD_ACCEL_PREFIX') or '/_protected').rstrip('/')
+    return f"{prefix}/{relative.as_posix()}"
+
+
+def _finish(response: Response, etag: Optional[str], accept_ranges: bool,
+            complete_length: Optional[int] = None) -> Response:
+    if etag:
+        response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=accept_ranges, complete_length=complete_length)
+
+
+def file_response(path: Union[str, Path], *, mimetype: str, download_name: str,
+                  etag: Optional[str] = None, as_attachment: bool = True) -> Response:
+    """Serve ``path`` with Range/ETag support, offloading to the proxy when configured."""
+    path = Path(path).resolve()
+    mode = _offload_mode()
+    offload_header = None
+    if mode == 'x-sendfile':
+        offload_header = ('X-Sendfile', str(path))
+    elif mode == 'x-accel':
+        uri = _accel_uri(path)
+        if uri:
+            offload_header = ('X-Accel-Redirect', uri)
+
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, conditional=False, etag=False)
+    if offload_header is None:
+        return _finish(response, etag, accept_ranges=True, complete_length=response.content_length)
+
+    # Body comes from the proxy; drop the file iterator we just opened
+    response.close()
+    response.response = []
+    response.direct_passthrough = False
+    response.headers[offload_header[0]] = offload_header[1]
+    response.headers.pop('Content-Length', None)
+    return _finish(response, etag, accept_ranges=False)
+
+
+class _ValueReader:
+    """Seekable, read-only file over one column value using substr() slices.
+
+    Fallback for Connection.blobopen() (Python < 3.11). The value is cast to
+    BLOB so offsets and lengths are bytes for TEXT columns too.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table: str, column: str, rowid: int):
+        self._conn = conn
+        self._value = f'CAST("{column}" AS BLOB)'
+        self._table = table
+        self._rowid = rowid
+        row = conn.execute(f'SELECT length({self._value}) FROM "{table}" WHERE rowid=?', (rowid,)).fetchone()
+        self._size = int(row[0] or 0) if row else 0
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._size - self._pos
+        if remaining <= 0:
+            return b''
+        size = remaining if size is None or size < 0 else min(size, remaining, BLOB_CHUNK_BYTES)
+        row = self._conn.execute(
+            f'SELECT substr({self._value}, ?, ?) FROM "{self._table}" WHERE rowid=?',
+            (self._pos + 1, size, self._rowid),
+        ).fetchone()
+        data = bytes(row[0]) if row and row[0] is not None else b''
+        self._pos += len(data)
+        return data
+
+    def close(self) -> None:
+        pass
+
+
+def sqlite_blob_response(conn: sqlite3.Connection, table: str, column: str, rowid: int, *,
+                         mimetype: str, download_name: str, etag: Optional[str] = None,
+                         as_attachment: bool = True) -> Optional[Response]:
+    """Stream one column value with Range/ETag support; None when empty.
+
+    The response owns ``conn`` and closes it once the body is sent.
+    """
+    if _HAS_BLOBOPEN:
+        blob = conn.blobopen(table, column, rowid, readonly=True)
+    else:
+        blob = _ValueReader(conn, table, column, rowid)
+    size = len(blob)
+    if size == 0:
+        blob.close()
+        return None
+    response = Response(wrap_file(request.environ, blob), mimetype=mimetype, direct_passthrough=True)
+    response.call_on_close(conn.close)
+    response.content_length = size
+    disposition = 'attachment' if as_attachment else 'inline'
+    response.headers.set('Content-Disposition', disposition, filename=download_name)
+    return _finish(response, etag, accept_ranges=True, complete_length=size)
@@ -8,3 +8,7 @@ RELEASE_BYPASS_HEADER = "X-EMT-Release-Bypass"
 # Header carrying the email_messages table primary key for downstream reconciliation
 RELEASE_EMAIL_ID_HEADER = "X-EMT-Email-ID"
 
+
+# IMAP keyword set on messages released by server-side MOVE (headers cannot be
+# added without re-uploading); watchers treat it like RELEASE_BYPASS_HEADER
+RELEASE_BYPASS_KEYWORD = "$EMTReleased"
@@ -0,0 +1,232 @@
+"""
+IMAP Batch Operations
+
+UID-set based helpers shared by the account resync / scan-inbox routes so a
+sweep over N messages costs a handful of round trips instead of N.
+
+- uid_sets(): compresses UIDs into RFC 3501 sequence sets ("1:5,9,12"),
+  split so each command line stays under MAX_SET_LENGTH characters
+- search_uids(): UID SEARCH (real UIDs, not message sequence numbers)
+- move_uids(): UID MOVE per set; servers without MOVE get UID COPY +
+  one UID STORE +FLAGS.SILENT per set and a single UID EXPUNGE at the end
+  (plain EXPUNGE only when UIDPLUS is missing)
+- fetch_envelopes(): one UID FETCH (UID ENVELOPE) per set, parsed with
+  IMAPClient's response parser; subjects and names are RFC 2047 decoded
+- fetch_messages(): one UID FETCH per set for BODY.PEEK[] (or [HEADER]);
+  INTERNALDATE and RFC822.SIZE come back typed (datetime / int)
+
+A set whose response fails to parse is logged and skipped.
+"""
+
+import imaplib
+import logging
+from email.header import decode_header, make_header
+from email.utils import format_datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from imapclient.exceptions import ProtocolError
+from imapclient.response_parser import parse_fetch_response as imapclient_parse_fetch_response
+
+log = logging.getLogger(__name__)
+
+# Conservative: RFC 7162 suggests clients keep command lines under 8192 octets
+MAX_SET_LENGTH = 1000
+
+
+def uid_sets(uids: Iterable[Union[int, str]], max_length: int = MAX_SET_LENGTH) -> List[str]:
+    """Return sequence-set strings covering ``uids`` (deduplicated, ascending)."""
+    ordered = sorted({int(u) for u in uids})
+    sets: List[str] = []
+    ranges: List[str] = []
+    length = 0
+    i = 0
+    while i < len(ordered):
+        start = end = ordered[i]
+        while i + 1 < len(ordered) and ordered[i + 1] == end + 1:
+            i += 1
+            end = ordered[i]
+        token = str(start) if start == end else f"{start}:{end}"
+        if ranges and length + 1 + len(token) > max_length:
+            sets.append(','.join(ranges))
+            ranges, length = [], 0
+        length += len(token) + (1 if ranges else 0)
+        ranges.append(token)
+        i += 1
+    if ranges:
+        sets.append(','.join(ranges))
+    return sets
+
+
+def _has_capability(imap_obj: imaplib.IMAP4, name: str) -> bool:
+    caps = getattr(imap_obj, 'capabilities', None) or ()
+    return any(str(c).upper() == name for c in caps)
+
+
+def search_uids(imap_obj: imaplib.IMAP4, *criteria: str) -> List[int]:
+    """UID SEARCH in the selected mailbox; returns ascending UIDs."""
+    typ, data = imap_obj.uid('SEARCH', None, *(criteria or ('ALL',)))
+    if typ != 'OK' or not data or not data[0]:
+        return []
+    return sorted(int(x) for x in data[0].split() if x.isdigit())
+
+
+def move_uids(imap_obj: imaplib.IMAP4, uids: Sequence[Union[int, str]], target_folder: str) -> List[int]:
+    """Move ``uids`` from the selected mailbox to ``target_folder``.
+
+    Returns the UIDs that were moved (or copied and flagged for expunge).
+    """
+    moved: List[int] = []
+    pending_expunge: List[str] = []
+    use_move = True
+    for uid_set in uid_sets(uids):
+        members = _expand(uid_set)
+        if use_move:
+            try:
+                typ, _ = imap_obj.uid('MOVE', uid_set, target_folder)
+                if typ == 'OK':
+                    moved.extend(members)
+                    continue
+            except Exception as exc:
+                log.debug("[imap_batch] UID MOVE unavailable, using COPY fallback", extra={'error': str(exc)})
+            use_move = False
+        try:
+            typ, _ = imap_obj.uid('COPY', uid_set, target_folder)
+            if typ != 'OK':
+                continue
+            imap_obj.uid('STORE', uid_set, '+FLAGS.SILENT', r'(\Deleted)')
+        except Exception as exc:
+            log.warning("[imap_batch] COPY fallback failed", extra={'uid_set': uid_set, 'error': str(exc)})
+            continue
+        moved.extend(members)
+        pending_expunge.append(uid_set)
+
+    if pending_expunge:
+        _expunge(imap_obj, pending_expunge)
+    return moved
+
+
+def _expunge(imap_obj: imaplib.IMAP4, sets: List[str]) -> None:
+    if _has_capability(imap_obj, 'UIDPLUS'):
+        try:
+            for uid_set in uid_sets(u for s in sets for u in _expand(s)):
+                imap_obj.uid('EXPUNGE', uid_set)
+            return
+        except Exception as exc:
+            log.debug("[imap_batch] UID EXPUNGE failed, using EXPUNGE", extra={'error': str(exc)})
+    try:
+        imap_obj.expunge()
+    except Exception as exc:
+        log.warning("[imap_batch] EXPUNGE failed", extra={'error': str(exc)})
+
+
+def _expand(uid_set: str) -> List[int]:
+    out: List[int] = []
+    for token in uid_set.split(','):
+        if ':' in token:
+            lo, hi = token.split(':', 1)
+            out.extend(range(int(lo), int(hi) + 1))
+        else:
+            out.append(int(token))
+    return out
+
+
+def fetch_envelopes(imap_obj: imaplib.IMAP4, uids: Sequence[Union[int, str]]) -> Dict[int, Dict[str, Any]]:
+    """Fetch and parse ENVELOPE for ``uids``; keyed by UID."""
+    envelopes: Dict[int, Dict[str, Any]] = {}
+    for uid_set in uid_sets(uids):
+        typ, data = imap_obj.uid('FETCH', uid_set, '(UID ENVELOPE)')
+        if typ != 'OK' or not data:
+            continue
+        for attrs in _parse_set(data, uid_set):
+            uid = attrs.get('UID')
+            env = attrs.get('ENVELOPE')
+            if uid is None or env is None:
+                continue
+            envelopes[uid] = _envelope_dict(uid, env)
+    return envelopes
+
+
+def fetch_messages(imap_obj: imaplib.IMAP4, uids: Sequence[Union[int, str]],
+                   headers_only: bool = False) -> Dict[int, Dict[str, Any]]:
+    """One UID FETCH per set for raw message (or header block) + INTERNALDATE.
+
+    Uses BODY.PEEK so fetching never sets \\Seen. Values are keyed by UID:
+    ``{'uid', 'internaldate' (aware datetime or None), 'size', 'raw'}``.
+    """
+    section = 'HEADER' if headers_only else ''
+    messages: Dict[int, Dict[str, Any]] = {}
+    for uid_set in uid_sets(uids):
+        typ, data = imap_obj.uid('FETCH', uid_set, f'(UID INTERNALDATE RFC822.SIZE BODY.PEEK[{section}])')
+        if typ != 'OK' or not data:
+            continue
+        for attrs in _parse_set(data, uid_set):
+            uid = attrs.get('UID')
+            raw = attrs.get(f'BODY[{section}]')
+            if uid is None or raw is None:
+                continue
+            messages[uid] = {
+                'uid': uid,
+                'internaldate': attrs.get('INTERNALDATE'),
+                'size': attrs.get('RFC822.SIZE'),
+                'raw': bytes(raw),
+            }
+    return messages
+
+
+# --- response parsing -----------------------------------------------------
+
+def _parse_set(data: Sequence[Any], uid_set: str) -> List[Dict[str, Any]]:
+    try:
+        return parse_fetch_response(data)
+    except ProtocolError as exc:
+        log.warning("[imap_batch] unparseable FETCH response", extra={'uid_set': uid_set, 'error': str(exc)})
+        return []
+
+
+def parse_fetch_response(data: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Parse imaplib FETCH data into one ``{ITEM: value}`` dict per message.
+
+    Parsing is IMAPClient's: UID and RFC822.SIZE come back as ints,
+    INTERNALDATE as an aware datetime, ENVELOPE as an Envelope tuple.
+
+    Raises:
+        ProtocolError: the server response is malformed
+    """
+    parsed = imapclient_parse_fetch_response(list(data), normalise_times=False, uid_is_key=False)
+    return [
+        {key.decode('ascii', 'replace').upper(): value for key, value in attrs.items()}
+        for _, attrs in sorted(parsed.items())
+    ]
+
+
+def _text(value: Optional[bytes]) -> str:
+    if value is None:
+        return ''
+    raw = bytes(value).decode('utf-8', 'replace')
+    try:
+        return str(make_header(decode_header(raw)))
+    except Exception:
+        return raw
+
+
+def _addresses(value: Any) -> List[Dict[str, str]]:
+    out = []
+    for addr in value or ():
+        mailbox, host = _text(addr.mailbox), _text(addr.host)
+        if not host:
+            continue  # group syntax markers
+        out.append({'name': _text(addr.name), 'email': f"{mailbox}@{host}"})
+    return out
+
+
+def _envelope_dict(uid: int, env: Any) -> Dict[str, Any]:
+    return {
+        'uid': uid,
+        'date': format_datetime(env.date) if env.date is not None else '',
+        'subject': _text(env.subject),
+        'from': _addresses(env.from_),
+        'to': _addresses(env.to),
+        'cc': _addresses(env.cc),
+        'in_reply_to': _text(env.in_reply_to),
+        'message_id': _text(env.message_id),
+    }
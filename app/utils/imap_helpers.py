@@ -8,7 +8,9 @@ Provides IMAP connection, quarantine management, and message moving utilities.
 import imaplib
 from typing import Tuple, Optional
 
+from app.services import imap_providers
 from app.utils.crypto import decrypt_credential
+from app.utils.email_markers import RELEASE_BYPASS_KEYWORD
 
 
 def _imap_connect_account(account_row) -> Tuple[imaplib.IMAP4, bool]:
@@ -20,9 +22,9 @@ def _imap_connect_account(account_row) -> Tuple[imaplib.IMAP4, bool]:
     if not (host and username and password):
         raise RuntimeError("Missing IMAP credentials")
     if port == 993:
-        imap_obj = imaplib.IMAP4_SSL(host, port)
+        imap_obj = imap_providers.open_connection(host, lambda: imaplib.IMAP4_SSL(host, port))
     else:
-        imap_obj = imaplib.IMAP4(host, port)
+        imap_obj = imap_providers.open_connection(host, lambda: imaplib.IMAP4(host, port))
         try:
             imap_obj.starttls()
         except Exception:
@@ -119,4 +121,72 @@ def _move_uid_to_quarantine(imap_obj: imaplib.IMAP4, uid: str, quarantine: str =
             return True
     except Exception:
         pass
-    return False
\ No newline at end of file
+    return False
+
+def _keyword_is_permanent(imap_obj: imaplib.IMAP4, keyword: str) -> bool:
+    """True when the last SELECT's PERMANENTFLAGS lists ``keyword`` or ``\\*``."""
+    try:
+        _, data = imap_obj.response('PERMANENTFLAGS')
+    except Exception:
+        return False
+    flags = set()
+    for item in data or []:
+        if item is None:
+            continue
+        if isinstance(item, bytes):
+            item = item.decode('utf-8', errors='ignore')
+        flags.update(flag.lower() for flag in str(item).strip().strip('()').split())
+    return '\\*' in flags or keyword.lower() in flags
+
+
+def _move_uid_from_quarantine(imap_obj: imaplib.IMAP4, uid: str, quarantine: str, target_folder: str) -> bool:
+    """Release an unmodified message server-side with MOVE or COPY+EXPUNGE.
+
+    The release bypass keyword is stored first so watchers skip the message
+    when it reappears in the target folder. Returns False without moving when
+    the keyword cannot be stored permanently, so callers fall back to a full
+    APPEND.
+    """
+    uid_str = str(uid)
+    try:
+        typ, _ = imap_obj.select(quarantine, readonly=False)
+        if typ != 'OK':
+            return False
+        # Servers answer OK to STORE of session-only keywords, which would not
+        # survive the MOVE; only trust PERMANENTFLAGS from this SELECT
+        if not _keyword_is_permanent(imap_obj, RELEASE_BYPASS_KEYWORD):
+            return False
+        typ, _ = imap_obj.uid('STORE', uid_str, '+FLAGS', f'({RELEASE_BYPASS_KEYWORD})')
+        if typ != 'OK':
+            return False
+    except Exception:
+        return False
+
+    try:
+        typ, _ = imap_obj.uid('MOVE', uid_str, target_folder)
+        if typ == 'OK':
+            return True
+    except Exception:
+        pass
+
+    try:
+        typ, _ = imap_obj.uid('COPY', uid_str, target_folder)
+        if typ != 'OK':
+            return False
+    except Exception:
+        return False
+    try:
+        imap_obj.uid('STORE', uid_str, '+FLAGS', r'(\Deleted)')
+    except Exception:
+        pass
+    try:
+        # UIDPLUS: expunge only this message; plain EXPUNGE otherwise
+        typ, _ = imap_obj.uid('EXPUNGE', uid_str)
+        if typ != 'OK':
+            imap_obj.expunge()
+    except Exception:
+        try:
+            imap_obj.expunge()
+        except Exception:
+            pass
+    return True
@@ -0,0 +1,171 @@
+"""Conditional, Compressed JSON API Responses
+
+The dashboard polls the list and stats APIs every few seconds and most
+polls return exactly what the previous one did. Three pieces cut that cost:
+
+- conditional_json(): view decorator computing a weak ETag from the table
+  data versions (app.services.data_version), the path, the query string and
+  the user. A matching If-None-Match gets ``304 Not Modified`` before the
+  view (and its query) runs. With ``tables=None`` the ETag is a hash of the
+  body instead, which still saves the transfer for views whose data is not
+  versioned (heartbeats, health probes). Views with rolling time-window
+  fields (``released24h``) pass ``time_bucket`` seconds so the ETag also
+  changes as the window moves between writes.
+- FastJSONProvider: Flask JSON provider that serializes with orjson when it
+  is installed (same output shape: sorted keys, Flask's date handling),
+  falling back to the stdlib encoder for anything orjson rejects.
+- compress_response(): after_request hook that brotli- (when the ``brotli``
+  package is installed) or gzip-encodes JSON bodies of at least
+  JSON_COMPRESS_MIN_BYTES (default 1024) for clients that accept it.
+
+init_app() installs the provider and the compression hook.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import time
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional
+
+from flask import Flask, Response, make_response, request
+from flask.json.provider import DefaultJSONProvider
+from flask_login import current_user
+
+from app.services import data_version
+from app.utils.metrics import record_conditional_response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int, low: int, high: int) -> int:
+    try:
+        return min(high, max(low, int(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+COMPRESS_MIN_BYTES = _env_int('JSON_COMPRESS_MIN_BYTES', 1024, 0, 1 << 30)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with an orjson fast path."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None:
+            option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS \
+                | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            indent = kwargs.pop('indent', None)
+            separators = kwargs.pop('separators', None)
+            if indent == 2:
+                option |= orjson.OPT_INDENT_2
+            if not kwargs and indent in (None, 2) and separators in (None, (',', ':')):
+                try:
+                    return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+                except TypeError:
+                    pass  # e.g. integers beyond 64 bits
+            if indent is not None:
+                kwargs['indent'] = indent
+            if separators is not None:
+                kwargs['separators'] = separators
+        return super().dumps(obj, **kwargs)
+
+
+def _user_key() -> str:
+    try:
+        return str(current_user.get_id() or '')
+    except Exception:
+        return ''
+
+
+def _etag(versions: Iterable[int], time_bucket: Optional[int] = None) -> str:
+    key = '|'.join((
+        ','.join(str(v) for v in versions),
+        str(int(time.time() // time_bucket)) if time_bucket else '',
+        request.path,
+        '&'.join(sorted(request.query_string.decode('latin-1').split('&'))),
+        _user_key(),
+    ))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional_json(tables: Optional[Iterable[str]] = ('email_messages',),
+                     time_bucket: Optional[int] = None) -> Callable:
+    """Answer unchanged polls with 304 (see module docstring).
+
+    Args:
+        tables: Tables whose data versions the view depends on, or None to
+            derive the ETag from the response body.
+        time_bucket: Seconds after which the ETag changes even without
+            writes, for payloads with time-windowed fields.
+    """
+    tracked = tuple(tables) if tables else ()
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            versions = data_version.current(tracked) if tracked else None
+            etag = _etag(versions, time_bucket) if versions is not None else None
+            if etag and request.if_none_match.contains_weak(etag):
+                record_conditional_response(request.endpoint, 'not_modified')
+                return _not_modified(etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+            if etag is None:
+                etag = hashlib.blake2b(response.get_data(), digest_size=12).hexdigest()
+                if request.if_none_match.contains_weak(etag):
+                    record_conditional_response(request.endpoint, 'not_modified')
+                    return _not_modified(etag)
+            record_conditional_response(request.endpoint, 'full')
+            response.set_etag(etag, weak=True)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response: Response) -> Response:
+    """Encode large JSON bodies with br/gzip when the client accepts it."""
+    if (response.status_code != 200 or not response.is_json or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_app(app: Flask) -> None:
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -8,9 +8,11 @@ Provides instrumentation for:
 - System health metrics
 - Latency measurements
 """
+import os
+import random
 import re
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from typing import Optional
 
 from prometheus_client import Counter, Gauge, Histogram, Info
@@ -51,6 +53,26 @@ def _normalize_host_label(host: Optional[str]) -> str:
     return _normalize_label(host, default='host:unknown', prefix='host')
 
 
+_PROVIDER_HOST_HINTS = (
+    ('gmail', ('gmail', 'googlemail', 'google')),
+    ('outlook', ('outlook', 'office365', 'hotmail', 'live.com')),
+    ('yahoo', ('yahoo',)),
+    ('icloud', ('icloud', 'me.com', 'mac.com')),
+    ('hostinger', ('hostinger',)),
+)
+
+
+def normalize_provider_label(host: Optional[str]) -> str:
+    """Map an IMAP/SMTP host to a small fixed set of provider labels."""
+    text = str(host or '').lower()
+    if not text:
+        return 'unknown'
+    for provider, hints in _PROVIDER_HOST_HINTS:
+        if any(h in text for h in hints):
+            return provider
+    return 'other'
+
+
 # =============================================================================
 # Email Operation Metrics
 # =============================================================================
@@ -137,6 +159,97 @@ db_connections_active = Gauge(
     'Number of active database connections'
 )
 
+# Shared stats cache effectiveness (hit / miss / coalesced single-flight waits)
+stats_cache_requests = Counter(
+    'stats_cache_requests_total',
+    'Stats cache lookups by namespace and result',
+    labelnames=['namespace', 'result']
+)
+
+# Stats cache invalidations triggered by write events
+stats_cache_invalidations = Counter(
+    'stats_cache_invalidations_total',
+    'Stats cache invalidations by scope',
+    labelnames=['scope']
+)
+
+# Readiness components refreshed in the background (1 = ok, 0 = failing)
+health_component_up = Gauge(
+    'health_component_up',
+    'Readiness component status from the last background refresh',
+    labelnames=['component']
+)
+
+# Duration of the last readiness check per component
+health_component_duration = Gauge(
+    'health_component_duration_seconds',
+    'Duration of the last readiness check per component in seconds',
+    labelnames=['component']
+)
+
+# Async release jobs waiting for a worker slot / currently running
+release_jobs_active = Gauge(
+    'release_jobs_active',
+    'Asynchronous release jobs by state (queued, running)',
+    labelnames=['state']
+)
+
+# Finished async release jobs by outcome
+release_jobs_finished = Counter(
+    'release_jobs_finished_total',
+    'Asynchronous release jobs finished',
+    labelnames=['outcome']
+)
+
+# Polling-mode IMAP checks by result (hit = new mail found)
+imap_polls = Counter(
+    'imap_polls_total',
+    'Polling-mode IMAP checks by account and result',
+    labelnames=['account_id', 'result']
+)
+
+# Share of polls that found new mail (hits / polls)
+imap_poll_efficiency = Gauge(
+    'imap_poll_efficiency_ratio',
+    'Fraction of polling-mode checks that found new mail',
+    labelnames=['account_id']
+)
+
+# Current adaptive poll interval per account
+imap_poll_interval = Gauge(
+    'imap_poll_interval_seconds',
+    'Adaptive polling interval currently scheduled per account',
+    labelnames=['account_id']
+)
+
+# Polls pushed back because the provider's poll budget was exhausted
+imap_poll_deferred = Counter(
+    'imap_poll_deferred_total',
+    'Polls deferred by the per-provider poll budget',
+    labelnames=['provider']
+)
+
+# IMAP connection admissions per provider (admitted / timeout / circuit_open)
+imap_provider_admissions = Counter(
+    'imap_provider_admissions_total',
+    'IMAP connection admission decisions by provider',
+    labelnames=['provider', 'result']
+)
+
+# Provider circuit breaker state (0=closed, 1=half_open, 2=open)
+imap_provider_circuit = Gauge(
+    'imap_provider_circuit_state',
+    'Per-provider IMAP circuit breaker state (0 closed, 1 half-open, 2 open)',
+    labelnames=['provider']
+)
+
+# Polled JSON API responses: not_modified (304 from the data version) or full
+api_conditional_responses = Counter(
+    'api_conditional_responses_total',
+    'Conditional JSON API responses by endpoint and result',
+    labelnames=['endpoint', 'result']
+)
+
 # =============================================================================
 # Latency Metrics
 # =============================================================================
@@ -165,6 +278,30 @@ imap_operation_latency = Histogram(
     buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
 )
 
+# Watcher ingest hot path, per stage (fetch, parse, rule_eval, db_write, db_commit, move, status_update)
+ingest_stage_latency = Histogram(
+    'imap_ingest_stage_seconds',
+    'IMAP watcher ingest latency per stage in seconds (sampled)',
+    labelnames=['stage', 'account_id', 'provider'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Raw message size fetched by the watcher
+ingest_fetch_bytes = Histogram(
+    'imap_ingest_fetch_bytes',
+    'Size of messages fetched by the IMAP watcher in bytes (sampled)',
+    labelnames=['account_id', 'provider'],
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 52428800)
+)
+
+# Time a held message sat in INBOX (server INTERNALDATE -> quarantine move)
+ingest_inbox_dwell = Histogram(
+    'imap_ingest_inbox_dwell_seconds',
+    'Seconds between server arrival (INTERNALDATE) and quarantine move (sampled)',
+    labelnames=['account_id', 'provider'],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+)
+
 # =============================================================================
 # Application Info
 # =============================================================================
@@ -205,6 +342,62 @@ def track_latency(histogram: Histogram, **labels):
         histogram.labels(**labels).observe(duration)
 
 
+def _ingest_sample_rate() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv('INGEST_METRICS_SAMPLE_RATE', '1.0'))))
+    except ValueError:
+        return 1.0
+
+
+class IngestStageTimer:
+    """Per-batch stage timer for the watcher ingest path.
+
+    The sampling decision is made once per batch (INGEST_METRICS_SAMPLE_RATE,
+    default 1.0). Unsampled batches get a shared null context from stage()
+    and skip every observe call, so the hot path pays one attribute check.
+
+    Usage:
+        timer = IngestStageTimer(account_id, imap_host)
+        with timer.stage('parse'):
+            msg = message_from_bytes(raw)
+    """
+
+    __slots__ = ('sampled', 'account', 'provider')
+
+    _NULL = nullcontext()
+
+    def __init__(self, account_id: Optional[str], host: Optional[str], sample_rate: Optional[float] = None):
+        rate = _ingest_sample_rate() if sample_rate is None else sample_rate
+        self.sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+        self.account = normalize_account_label(account_id)
+        self.provider = normalize_provider_label(host)
+
+    def stage(self, name: str):
+        if not self.sampled:
+            return self._NULL
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        if self.sampled:
+            ingest_stage_latency.labels(stage=name, account_id=self.account, provider=self.provider).observe(seconds)
+
+    def observe_bytes(self, size: int) -> None:
+        if self.sampled:
+            ingest_fetch_bytes.labels(account_id=self.account, provider=self.provider).observe(size)
+
+    def observe_dwell(self, seconds: float) -> None:
+        if self.sampled:
+            ingest_inbox_dwell.labels(account_id=self.account, provider=self.provider).observe(max(0.0, seconds))
+
+
 def record_interception(direction: str = 'inbound',
                        status: str = 'HELD',
                        account_id: Optional[str] = None) -> None:
@@ -295,6 +488,67 @@ def update_db_connections(count: int) -> None:
     db_connections_active.set(count)
 
 
+def record_stats_cache_event(namespace: str, result: str) -> None:
+    """Record a stats cache lookup (result: hit, miss or coalesced)."""
+    stats_cache_requests.labels(
+        namespace=_normalize_label(namespace),
+        result=result
+    ).inc()
+
+
+def record_stats_cache_invalidation(scope: str = 'all') -> None:
+    """Record a stats cache invalidation (scope: account or all)."""
+    stats_cache_invalidations.labels(scope=scope).inc()
+
+
+def record_health_component(component: str, ok: bool, duration_seconds: float) -> None:
+    """Record the outcome and duration of a background readiness check."""
+    health_component_up.labels(component=component).set(1 if ok else 0)
+    health_component_duration.labels(component=component).set(duration_seconds)
+
+
+def record_release_jobs(queued: int, running: int) -> None:
+    """Publish the current async release queue depth and running count."""
+    release_jobs_active.labels(state='queued').set(queued)
+    release_jobs_active.labels(state='running').set(running)
+
+
+def record_release_job_finished(outcome: str) -> None:
+    """Count a finished async release job (succeeded / failed / rejected)."""
+    release_jobs_finished.labels(outcome=outcome).inc()
+
+
+def record_poll(account_id, hit: bool, efficiency: float, interval: float) -> None:
+    """Count one polling-mode check and publish the account's efficiency and next interval."""
+    label = normalize_account_label(account_id)
+    imap_polls.labels(account_id=label, result='hit' if hit else 'miss').inc()
+    imap_poll_efficiency.labels(account_id=label).set(efficiency)
+    imap_poll_interval.labels(account_id=label).set(interval)
+
+
+def record_poll_deferred(host: Optional[str]) -> None:
+    """Count a poll pushed back by the provider budget."""
+    imap_poll_deferred.labels(provider=normalize_provider_label(host)).inc()
+
+
+def record_provider_admission(host: Optional[str], result: str) -> None:
+    """Count one provider admission decision (admitted / timeout / circuit_open)."""
+    imap_provider_admissions.labels(provider=normalize_provider_label(host), result=result).inc()
+
+
+_CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def set_provider_circuit(host: Optional[str], state: str) -> None:
+    """Publish a provider circuit breaker state change."""
+    imap_provider_circuit.labels(provider=normalize_provider_label(host)).set(_CIRCUIT_STATES.get(state, 0))
+
+
+def record_conditional_response(endpoint: Optional[str], result: str) -> None:
+    """Count one conditional API response (result: not_modified or full)."""
+    api_conditional_responses.labels(endpoint=_normalize_label(endpoint), result=result).inc()
+
+
 __all__ = [
     # Metrics objects
     'emails_intercepted',
@@ -308,14 +562,32 @@ __all__ = [
     'emails_pending_current',
     'imap_watcher_status',
     'db_connections_active',
+    'stats_cache_requests',
+    'stats_cache_invalidations',
+    'health_component_up',
+    'health_component_duration',
+    'release_jobs_active',
+    'release_jobs_finished',
+    'imap_polls',
+    'imap_poll_efficiency',
+    'imap_poll_interval',
+    'imap_poll_deferred',
+    'imap_provider_admissions',
+    'imap_provider_circuit',
+    'api_conditional_responses',
     'interception_latency',
     'release_latency',
     'imap_operation_latency',
+    'ingest_stage_latency',
+    'ingest_fetch_bytes',
+    'ingest_inbox_dwell',
     'app_info',
 
     # Helper functions
     'normalize_account_label',
+    'normalize_provider_label',
     'track_latency',
+    'IngestStageTimer',
     'record_interception',
     'record_release',
     'record_discard',
@@ -327,4 +599,14 @@ __all__ = [
     'update_pending_count',
     'set_watcher_status',
     'update_db_connections',
+    'record_stats_cache_event',
+    'record_stats_cache_invalidation',
+    'record_health_component',
+    'record_release_jobs',
+    'record_release_job_finished',
+    'record_poll',
+    'record_poll_deferred',
+    'record_provider_admission',
+    'set_provider_circuit',
+    'record_conditional_response',
 ]
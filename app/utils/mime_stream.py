@@ -0,0 +1,192 @@
+"""Streaming MIME Writer
+
+Serializes a release message part by part into a spooled buffer instead of
+building a full EmailMessage tree and calling ``as_bytes()`` on it.
+
+- Top-level headers live in a header-only EmailMessage, so callers keep the
+  familiar ``msg['X'] = ...`` / ``msg.get(...)`` API until the moment of send
+- Text bodies are small and reuse the stdlib content manager (same transfer
+  encoding choices as before)
+- File attachments are base64-encoded straight from ``storage_path`` in
+  57-byte-aligned chunks; no attachment is ever held fully in memory
+- Output uses CRLF line endings, so IMAP APPEND's newline normalization is a
+  no-op, and spills to disk past MIME_SPOOL_MAX_BYTES (default 4 MiB)
+"""
+import base64
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from email.message import EmailMessage, MIMEPart
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, List, Optional, Tuple, Union
+
+CRLF = b'\r\n'
+CRLF_POLICY = default_policy.clone(linesep='\r\n')
+
+# 57 raw bytes encode to one 76-character base64 line
+_B64_LINE_BYTES = 57
+_B64_CHUNK_BYTES = _B64_LINE_BYTES * 1024
+
+try:
+    SPOOL_MAX_BYTES = max(0, int(os.getenv('MIME_SPOOL_MAX_BYTES', str(4 * 1024 * 1024))))
+except ValueError:
+    SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class TextPart:
+    """text/plain or text/html leaf encoded by the stdlib content manager."""
+    text: str
+    subtype: str = 'plain'
+
+
+@dataclass
+class FilePart:
+    """Attachment leaf streamed from disk as base64."""
+    path: Path
+    maintype: str = 'application'
+    subtype: str = 'octet-stream'
+    filename: Optional[str] = None
+    disposition: str = 'attachment'
+    content_id: Optional[str] = None
+
+
+@dataclass
+class Multipart:
+    subtype: str
+    parts: List['Part'] = field(default_factory=list)
+    boundary: str = field(default_factory=lambda: f"===============emt{uuid.uuid4().hex}==")
+
+
+Part = Union[TextPart, FilePart, Multipart]
+
+
+class StreamingMessage:
+    """Header-only message plus a lazily serialized body tree.
+
+    Supports the header subset of the EmailMessage API used by the release
+    flow (get / [] / del / in / replace_header).
+    """
+
+    def __init__(self, headers: Optional[EmailMessage] = None, body: Optional[Part] = None):
+        self.headers = headers if headers is not None else EmailMessage()
+        self.body: Part = body if body is not None else TextPart('')
+
+    def get(self, name: str, failobj: Any = None) -> Any:
+        return self.headers.get(name, failobj)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.headers[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self.headers[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        del self.headers[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.headers
+
+    def replace_header(self, name: str, value: Any) -> None:
+        self.headers.replace_header(name, value)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return self.headers.items()
+
+    def write_to(self, fp: BinaryIO) -> int:
+        """Serialize headers and body into ``fp``; returns bytes written."""
+        writer = _Writer(fp)
+        for name, value in self.headers.items():
+            if name.lower() in ('mime-version', 'content-type', 'content-transfer-encoding'):
+                continue
+            writer.header(name, value)
+        writer.header('MIME-Version', '1.0')
+        writer.part(self.body)
+        return writer.written
+
+    def spool(self, max_size: Optional[int] = None) -> 'tempfile.SpooledTemporaryFile[bytes]':
+        """Write into a SpooledTemporaryFile rewound to offset 0 (caller closes)."""
+        buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES if max_size is None else max_size, mode='w+b')
+        try:
+            self.write_to(buf)
+            buf.seek(0)
+        except Exception:
+            buf.close()
+            raise
+        return buf
+
+    def as_bytes(self) -> bytes:
+        with self.spool() as buf:
+            return buf.read()
+
+
+class _Writer:
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self.written = 0
+
+    def write(self, data: bytes) -> None:
+        self.fp.write(data)
+        self.written += len(data)
+
+    def header(self, name: str, value: Any) -> None:
+        self.write(CRLF_POLICY.fold_binary(name, value))
+
+    def part(self, node: Part) -> None:
+        """Write the Content-* headers, blank line and body of ``node``."""
+        if isinstance(node, TextPart):
+            leaf = MIMEPart(policy=CRLF_POLICY)
+            leaf.set_content(node.text, subtype=node.subtype)
+            self.write(leaf.as_bytes(policy=CRLF_POLICY))
+        elif isinstance(node, FilePart):
+            leaf = MIMEPart(policy=CRLF_POLICY)
+            leaf['Content-Type'] = f"{node.maintype}/{node.subtype}"
+            leaf.add_header('Content-Disposition', node.disposition, filename=node.filename or node.path.name)
+            leaf['Content-Transfer-Encoding'] = 'base64'
+            if node.content_id:
+                leaf['Content-ID'] = node.content_id
+            for name, value in leaf.items():
+                self.header(name, value)
+            self.write(CRLF)
+            for chunk in iter_base64(node.path):
+                self.write(chunk)
+        else:
+            self.header('Content-Type', f'multipart/{node.subtype}; boundary="{node.boundary}"')
+            self.write(CRLF)
+            delimiter = b'--' + node.boundary.encode('ascii')
+            for child in node.parts:
+                self.write(delimiter + CRLF)
+                self.part(child)
+                self.write(CRLF)
+            self.write(delimiter + b'--' + CRLF)
+
+
+def iter_base64(path: Path, chunk_size: int = _B64_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield CRLF-terminated 76-column base64 lines for ``path`` in chunks."""
+    chunk_size = max(_B64_LINE_BYTES, chunk_size - chunk_size % _B64_LINE_BYTES)
+    with Path(path).open('rb') as fh:
+        while True:
+            data = fh.read(chunk_size)
+            if not data:
+                break
+            yield base64.encodebytes(data).replace(b'\n', CRLF)
+
+
+def read_header_block(source: Union[str, Path, bytes]) -> EmailMessage:
+    """Parse only the header block of a raw message (file path or bytes).
+
+    The release flow only needs the original headers; reading stops at the
+    first blank line so large originals are not loaded or parsed in full.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return BytesParser(policy=default_policy).parsebytes(bytes(source), headersonly=True)
+    lines = []
+    with Path(source).open('rb') as fh:
+        for line in fh:
+            if line in (b'\r\n', b'\n'):
+                break
+            lines.append(line)
+    return BytesParser(policy=default_policy).parsebytes(b''.join(lines) + CRLF, headersonly=True)
@@ -7,27 +7,81 @@ Phase 1 Transitional Layout:
 - Extracted from simple_app.py __main__ block
 - ENABLE_WATCHERS environment variable controls startup
 - Thread registry managed externally by caller
+
+Staggered startup:
+- Accounts start in priority order: HELD backlog first, then recent
+  traffic (messages in the last 24h), then account id
+- Ramp: the first WATCHER_STARTUP_BURST (default 4) start immediately, the
+  rest at WATCHER_STARTUP_RATE per second (default 2) on a background
+  thread, so a fleet restart does not log into every mailbox at once
+- Warm resume: last UID, UIDVALIDITY, capabilities and quarantine folder
+  are loaded for all accounts in one query and primed into
+  app.services.watcher_state before the threads start
 """
 import os
 import threading
-import sqlite3
-from app.utils.db import DB_PATH
+import time
+from typing import Callable, List
+
+from app.services import watcher_state
 from app.utils.crypto import decrypt_credential
+from app.utils.db import get_db
+
+
+def _env_float(name: str, default: float, low: float, high: float) -> float:
+    try:
+        return min(high, max(low, float(os.getenv(name, str(default)))))
+    except ValueError:
+        return default
+
+
+_STARTUP_QUERY = """
+    SELECT a.id, a.id AS account_id, a.account_name, a.imap_username, a.imap_password,
+           (SELECT COUNT(*) FROM email_messages m
+             WHERE m.account_id = a.id AND m.interception_status = 'HELD') AS held_count,
+           (SELECT COUNT(*) FROM email_messages m
+             WHERE m.account_id = a.id AND m.created_at >= datetime('now', '-1 day')) AS recent_count,
+           COALESCE((SELECT MAX(original_uid) FROM email_messages m
+                      WHERE m.account_id = a.id AND m.id > COALESCE(ws.uid_floor_row_id, 0)),
+                    ws.last_uid) AS last_uid,
+           ws.uidvalidity, ws.capabilities, ws.quarantine_folder, ws.uid_floor, ws.uid_floor_row_id
+    FROM email_accounts a
+    LEFT JOIN watcher_state ws ON ws.account_id = a.id
+    WHERE a.is_active = 1
+    ORDER BY held_count > 0 DESC, held_count DESC, recent_count DESC, a.id
+"""
 
 
-def start_imap_watchers(monitor_func, thread_registry, app_logger=None):
+def startup_order() -> List[dict]:
+    """Active accounts in start order, with their warm resume state."""
+    conn = get_db()
+    try:
+        watcher_state.ensure_table(conn)
+        rows = conn.execute(_STARTUP_QUERY).fetchall()
+    finally:
+        conn.close()
+    states = watcher_state.from_rows(rows)
+    return [dict(row, resume=states[row['id']]) for row in rows]
+
+
+def start_imap_watchers(monitor_func, thread_registry, app_logger=None, *,
+                        sleep: Callable[[float], None] = time.sleep, background: bool = True):
     """Start IMAP monitoring threads for all active accounts
 
     Args:
         monitor_func: The monitor_imap_account function to run in threads
         thread_registry: Dict to track running threads (account_id -> thread)
         app_logger: Optional logger for startup messages
+        sleep: Pacing function (tests pass a fake)
+        background: Ramp the accounts after the initial burst on a daemon thread
 
     Returns:
-        int: Number of watchers started
+        int: Number of watchers started or scheduled
 
     Environment:
         ENABLE_WATCHERS: Set to '0' or 'false' to skip IMAP startup
+        WATCHER_STARTUP_RATE: Watchers started per second after the burst
+        WATCHER_STARTUP_BURST: Watchers started immediately
     """
     # Check environment flag
     enable_watchers = os.environ.get('ENABLE_WATCHERS', '1').lower()
@@ -37,22 +91,15 @@ def start_imap_watchers(monitor_func, thread_registry, app_logger=None):
         print("⚠️  IMAP watchers disabled (ENABLE_WATCHERS=0)")
         return 0
 
-    # Fetch active accounts
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    active_accounts = cursor.execute("""
-        SELECT id, account_name, email_address, imap_username, imap_password
-        FROM email_accounts WHERE is_active = 1
-    """).fetchall()
-    conn.close()
-
-    # Start monitoring threads
-    started_count = 0
-    for account in active_accounts:
+    rate = _env_float('WATCHER_STARTUP_RATE', 2.0, 0.05, 100)
+    burst = int(_env_float('WATCHER_STARTUP_BURST', 4, 1, 1000))
+
+    # Fetch active accounts (priority order) and warm resume state in one pass
+    queue = []
+    for account in startup_order():
         account_id = account['id']
         # Skip accounts with missing credentials
-        dec_pwd = decrypt_credential(account['imap_password']) if account['imap_password'] else None
+        dec_pwd = decrypt_credential(account['imap_password'], account_id=account_id) if account['imap_password'] else None
         if not account['imap_username'] or not dec_pwd:
             if app_logger:
                 app_logger.info(
@@ -61,7 +108,14 @@ def start_imap_watchers(monitor_func, thread_registry, app_logger=None):
                 )
             print(f"   ⚠️  Skipping monitoring for {account['account_name']} (ID: {account_id}) - missing credentials")
             continue
+        queue.append(account)
+    watcher_state.prime({account['id']: account['resume'] for account in queue})
 
+    def _start(account) -> None:
+        account_id = account['id']
+        existing = thread_registry.get(account_id)
+        if existing is not None and existing.is_alive():
+            return  # started manually while we were ramping
         thread = threading.Thread(
             target=monitor_func,
             args=(account_id,),
@@ -69,10 +123,28 @@ def start_imap_watchers(monitor_func, thread_registry, app_logger=None):
         )
         thread_registry[account_id] = thread
         thread.start()
-        started_count += 1
 
         if app_logger:
-            app_logger.info(f"Started IMAP monitor for {account['account_name']} (ID: {account_id})")
+            app_logger.info(
+                f"Started IMAP monitor for {account['account_name']} (ID: {account_id}, "
+                f"held={account['held_count']}, recent={account['recent_count']})"
+            )
         print(f"   📬 Started monitoring for {account['account_name']} (ID: {account_id})")
 
-    return started_count
+    def _ramp(accounts) -> None:
+        for account in accounts:
+            sleep(1.0 / rate)
+            _start(account)
+
+    for account in queue[:burst]:
+        _start(account)
+    rest = queue[burst:]
+    if rest:
+        if app_logger:
+            app_logger.info(f"Ramping {len(rest)} more IMAP monitor(s) at {rate:g}/s")
+        if background:
+            threading.Thread(target=_ramp, args=(rest,), name='imap-watcher-startup', daemon=True).start()
+        else:
+            _ramp(rest)
+
+    return len(queue)
@@ -38,6 +38,7 @@ from app.routes.legacy import legacy_bp
 from app.routes.styleguide import styleguide_bp
 from app.routes.watchers import watchers_bp
 from app.routes.system import system_bp
+from app.routes.assets import assets_bp
 from datetime import datetime
 from email import policy
 from email import message_from_bytes
@@ -58,6 +59,9 @@ from app.utils.imap_helpers import _imap_connect_account, _ensure_quarantine, _m
 
 # Import IMAP watcher for email interception
 from app.services.imap_watcher import ImapWatcher, AccountConfig
+from app.services import stats as stats_cache
+from app.services import change_log, message_summary
+from app.utils.assets import asset_urls
 
 # -----------------------------------------------------------------------------
 # Minimal re-initialization (original file trimmed during refactor)
@@ -202,6 +206,19 @@ app.config['ATTACHMENTS_UI_ENABLED'] = _bool_env('ATTACHMENTS_UI_ENABLED', defau
 app.config['ATTACHMENTS_EDIT_ENABLED'] = _bool_env('ATTACHMENTS_EDIT_ENABLED', default=False)
 app.config['ATTACHMENTS_RELEASE_ENABLED'] = _bool_env('ATTACHMENTS_RELEASE_ENABLED', default=False)
 
+# Release via background job queue for every client; the web UI always sends
+# Prefer: respond-async and polls the job, API clients opt in per request
+app.config['RELEASE_ASYNC'] = _bool_env('RELEASE_ASYNC', default=False)
+
+# Download offload behind a reverse proxy: '' (stream in-app), 'x-sendfile' or 'x-accel'
+app.config['DOWNLOAD_OFFLOAD'] = os.environ.get('DOWNLOAD_OFFLOAD', '').strip().lower()
+app.config['DOWNLOAD_ACCEL_PREFIX'] = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/_protected')
+app.config['DOWNLOAD_ACCEL_ROOT'] = os.environ.get('DOWNLOAD_ACCEL_ROOT', os.getcwd())
+
+# orjson serializer + br/gzip for large JSON bodies (see app/utils/json_responses.py)
+from app.utils.json_responses import init_app as init_json_responses
+init_json_responses(app)
+
 # CSRF + Rate Limiting (use shared extension instances)
 try:
     from flask_wtf.csrf import generate_csrf, CSRFError  # type: ignore[import]
@@ -264,27 +281,8 @@ def load_user(user_id):
     """Load user for Flask-Login session management"""
     return load_user_from_db(user_id)
 
-def log_action(action, user_id, target_id, details):
-    """Persist an audit log record (best-effort)."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action TEXT, user_id INTEGER, target_id INTEGER,
-                details TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        cur.execute(
-            "INSERT INTO audit_log (action, user_id, target_id, details) VALUES (?,?,?,?)",
-            (action, user_id, target_id, details)
-        )
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
-        import logging
-        logging.getLogger(__name__).warning(f"[audit] Failed to log action '{action}' for user {user_id}: {e}")
+# Audit logging lives in app.services.audit (buffered); re-exported for legacy imports
+from app.services.audit import log_action
 
 # Compatibility alias for legacy code paths
 def decrypt_password(val: Optional[str]) -> Optional[str]:
@@ -347,10 +345,10 @@ def stop_imap_watcher_for_account(account_id: int) -> bool:
         logging.getLogger(__name__).warning(f"[imap_watcher] Failed to close watcher for account {account_id}: {e}")
     return True
 
-def init_database():
+def migrate_database():
     """
-    Initialize SQLite database with all required tables (idempotent).
-    Creates tables if missing; preserves existing schema & data.
+    Create missing tables, columns, indices and triggers (idempotent).
+    Safe on every startup: preserves existing schema & data and seeds nothing.
     """
     conn = get_db()
     cur = conn.cursor()
@@ -435,6 +433,14 @@ def init_database():
         cur.execute("ALTER TABLE email_messages ADD COLUMN attachments_manifest TEXT")
     if "version" not in existing_columns:
         cur.execute("ALTER TABLE email_messages ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    if "content_edited" not in existing_columns:
+        cur.execute("ALTER TABLE email_messages ADD COLUMN content_edited INTEGER NOT NULL DEFAULT 0")
+        # Edits saved before this column existed are unknown; keep held rows off the MOVE fast path
+        cur.execute("UPDATE email_messages SET content_edited=1 WHERE interception_status='HELD'")
+    # Ingest-time preview/recipients/UTC columns (see app/services/message_summary.py);
+    # rows stored before they existed are backfilled once, when the columns are added
+    if message_summary.ensure_columns(conn):
+        message_summary.backfill(conn)
 
     # Idempotency: avoid duplicate rows by Message-ID when present
     try:
@@ -473,10 +479,14 @@ def init_database():
             storage_path TEXT NOT NULL,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP,
             updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            part_index INTEGER,
             UNIQUE(email_id, filename, is_original, is_staged)
         )
         """
     )
+    # Deduplicated attachment payloads + part_index migration (see app/services/attachment_store.py)
+    from app.services.attachment_store import ensure_tables as ensure_attachment_tables
+    ensure_attachment_tables(conn)
 
     # Release coordination tables
     cur.execute(
@@ -499,6 +509,36 @@ def init_database():
         """
     )
 
+    # Streaming latency sketches (hourly, per account; see app/services/latency_stats.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS latency_sketches(
+            account_id INTEGER NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            sketch_json TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY(account_id, bucket_start)
+        )
+        """
+    )
+
+    # Per-account watcher resume state (see app/services/watcher_state.py)
+    from app.services.watcher_state import ensure_table as ensure_watcher_state_table
+    ensure_watcher_state_table(conn)
+
+    # Trigger-maintained table versions for API ETags (see app/services/data_version.py)
+    from app.services.data_version import ensure_tables as ensure_data_version_tables
+    ensure_data_version_tables(conn)
+
+    # Email change log / outbox for since= deltas and cache sync (see app/services/change_log.py)
+    from app.services.change_log import ensure_tables as ensure_change_log_tables
+    ensure_change_log_tables(conn)
+
+    # Hourly/daily stats rollups + incremental cursor (see app/services/rollups.py)
+    from app.services.rollups import ensure_tables as ensure_rollup_tables
+    ensure_rollup_tables(conn)
+
     # Moderation rules table
     cur.execute("""CREATE TABLE IF NOT EXISTS moderation_rules(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -510,15 +550,9 @@ def init_database():
         created_at TEXT DEFAULT CURRENT_TIMESTAMP
     )""")
 
-    # Audit log table
-    cur.execute("""CREATE TABLE IF NOT EXISTS audit_log(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        action TEXT,
-        user_id INTEGER,
-        target_id INTEGER,
-        details TEXT,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    )""")
+    # Audit log table (migrates the legacy action/target_id/details layout; see app/services/audit.py)
+    from app.services.audit import ensure_table as ensure_audit_table
+    ensure_audit_table(conn)
 
     # Worker heartbeats (observability)
     cur.execute("""CREATE TABLE IF NOT EXISTS worker_heartbeats(
@@ -527,6 +561,19 @@ def init_database():
         status TEXT
     )""")
 
+    conn.commit()
+    conn.close()
+
+def init_database():
+    """
+    Initialize SQLite database with all required tables (idempotent).
+    Creates tables if missing; preserves existing schema & data.
+    Also seeds the default admin user, so only call it for a new database.
+    """
+    migrate_database()
+    conn = get_db()
+    cur = conn.cursor()
+
     # Create default admin user if not exists
     cur.execute("SELECT id FROM users WHERE username='admin'")
     if not cur.fetchone():
@@ -577,7 +624,7 @@ def monitor_imap_account(account_id: int):
 
                 # Decrypt password
                 encrypted_password = row['imap_password']
-                password = decrypt_credential(encrypted_password)
+                password = decrypt_credential(encrypted_password, account_id=account_id)
                 if not password:
                     raise RuntimeError("Missing decrypted IMAP password for account")
 
@@ -715,6 +762,7 @@ app.register_blueprint(legacy_bp)        # Legacy compatibility routes
 app.register_blueprint(styleguide_bp)    # UI style guide showcase
 app.register_blueprint(system_bp)        # System diagnostics APIs
 app.register_blueprint(watchers_bp)      # Watchers & Settings management
+app.register_blueprint(assets_bp)        # Fingerprinted static bundles: /assets/<file>
 
         # (Legacy inline IMAP loop removed during refactor)
 
@@ -795,8 +843,9 @@ class EmailModerationHandler:
                         INSERT INTO email_messages
                         (message_id, account_id, direction, status, interception_status,
                          sender, recipients, subject, body_text, body_html,
-                         raw_content, keywords_matched, risk_score, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                         raw_content, keywords_matched, risk_score, preview_snippet,
+                         created_at, created_at_utc)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), strftime('%Y-%m-%dT%H:%M:%SZ','now'))
                     ''', (
                         message_id,
                         account_id,
@@ -804,17 +853,19 @@ class EmailModerationHandler:
                         'PENDING',
                         'HELD',
                         sender,
-                        recipients,
+                        message_summary.recipients_json(recipients),
                         subject,
                         body_text,
                         body_html,
                         envelope.content,
                         json.dumps(keywords_matched),
-                        risk_score
+                        risk_score,
+                        message_summary.preview_snippet(body_text, body_html)
                     ))
                     conn.commit()
                     print(f"📨 SMTP Handler: Database commit successful - Row ID: {cursor.lastrowid}")
                     conn.close()
+                    stats_cache.invalidate(account_id)
                     break
                 except sqlite3.OperationalError as e:
                     if "locked" in str(e) and attempt < max_retries - 1:
@@ -847,27 +898,44 @@ class EmailModerationHandler:
 #     except Exception:
 #         pass
 
+@app.before_request
+def sync_change_log():
+    """Invalidate cached stats for accounts changed since the last sync (throttled)."""
+    if request.endpoint == 'static':
+        return
+    change_log.sync_caches()
+
+
+def _template_pending_count() -> int:
+    """Pending badge for templates, resolved on first use and memoized per request."""
+    if 'pending_count' not in g:
+        g.pending_count = 0
+        try:
+            if current_user.is_authenticated:
+                # Shared counts cache (same entry as the dashboard); invalidated on writes
+                g.pending_count = stats_cache.get_stats()['pending']
+        except Exception as e:
+            import logging
+            logging.getLogger(__name__).warning(f"[context] Failed to fetch pending count: {e}")
+    return g.pending_count
+
+
 # Context processor to inject pending_count and csrf_token into all templates
 @app.context_processor
 def inject_template_context():
     """Inject pending_count and csrf_token into all templates"""
     from typing import Dict, Any
-    context: Dict[str, Any] = {'pending_count': 0, 'imap_only': bool(app.config.get('IMAP_ONLY', False))}
-
-    # Add pending count for authenticated users
-    try:
-        if current_user.is_authenticated:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            pending_count = cursor.execute("SELECT COUNT(*) FROM email_messages WHERE status = 'PENDING'").fetchone()[0]
-            conn.close()
-            context['pending_count'] = pending_count
-    except sqlite3.Error as e:
-        import logging
-        logging.getLogger(__name__).warning(f"[context] Failed to fetch pending count: {e}")
+    from werkzeug.local import LocalProxy
+    # Lazy: templates that never read pending_count never touch the cache or DB
+    context: Dict[str, Any] = {
+        'pending_count': LocalProxy(_template_pending_count),
+        'imap_only': bool(app.config.get('IMAP_ONLY', False)),
+    }
 
     # Add CSRF token
     context['csrf_token'] = generate_csrf
+    # Bundled/fingerprinted CSS+JS URLs (see app/utils/assets.py)
+    context['asset_urls'] = asset_urls
     context['attachments_flags'] = {
         'ui': bool(app.config.get('ATTACHMENTS_UI_ENABLED', False)),
         'edit': bool(app.config.get('ATTACHMENTS_EDIT_ENABLED', False)),
@@ -1139,9 +1207,12 @@ def _parse_cli_args():
     return parser.parse_args()
 
 
-# Initialize database if tables don't exist
+# Initialize database if tables don't exist; otherwise only apply the
+# idempotent schema migrations (new tables, columns, triggers)
 if not table_exists("users"):
     init_database()
+else:
+    migrate_database()
 
 # --- Interception Dashboard & API (Added) ---
 import statistics
@@ -1155,10 +1226,6 @@ def _intercept_db():
 # In-memory heartbeat registry for interception workers (populated externally / future integration)
 WORKER_HEARTBEATS = {}
 
-# Simple metrics/stat caches (centralized)
-_HEALTH_CACHE: Dict[str, Any] = {'ts': 0.0, 'payload': None}
-_CACHE: Dict[str, Dict[str, Any]] = {'unified': {'t': 0, 'v': None}, 'lat': {'t': 0, 'v': None}}
-
 # ------------------------------------------------------------------
 # REMOVED: Duplicate interception routes (now in blueprint)
 # Routes /healthz, /interception, /api/interception/held, /api/interception/release,
@@ -1266,6 +1333,14 @@ if __name__ == '__main__':
         elif imap_only_mode:
             print("ℹ️  SMTP proxy not started because IMAP_ONLY=1. Set IMAP_ONLY=0 (or unset) to enable SMTP interception.")
 
+    # Background readiness refresher (/readyz serves its snapshot; probes never hit the DB)
+    from app.services.health import start_refresher
+    start_refresher()
+
+    # Periodic stats rollups for trend charts
+    from app.services.rollups import start_rollup_worker
+    start_rollup_worker()
+
     # Start IMAP monitoring threads (only if ENABLE_WATCHERS=1)
     watchers_started = 0
     if _bool_env('ENABLE_WATCHERS', default=False):
@@ -1239,7 +1239,7 @@ async function runAction(url, opts = {}) {
         credentials: 'same-origin'
     };
 
-    const response = await fetch(url, fetchOptions);
+    const response = await awaitAcceptedJob(await fetch(url, fetchOptions));
     let parsed = null;
     try {
         parsed = await parseResponseBody(response);
@@ -1279,6 +1279,67 @@ async function runAction(url, opts = {}) {
 }
 window.runAction = runAction;
 
+// ============================================================================
+// Async release jobs (202 Accepted + status polling)
+// ============================================================================
+
+/**
+ * Follow a 202 Accepted job reply until the job finishes.
+ * Resolves to a Response carrying the job's final status code and body, so
+ * callers parse it like a synchronous reply; other responses pass through.
+ */
+async function awaitAcceptedJob(response, opts = {}) {
+    if (response.status !== 202) return response;
+    let accepted = null;
+    try {
+        accepted = await response.clone().json();
+    } catch (_) {
+        return response;
+    }
+    const statusUrl = (accepted && accepted.status_url) || response.headers.get('Location');
+    if (!statusUrl) return response;
+
+    const interval = opts.interval || 1000;
+    const deadline = Date.now() + (opts.timeout || 180000);
+    const reply = (status, body) => new Response(JSON.stringify(body), {
+        status,
+        headers: { 'Content-Type': 'application/json' }
+    });
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, interval));
+        let job = null;
+        try {
+            const poll = await fetch(statusUrl, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' });
+            job = await poll.json();
+            if (!poll.ok) return reply(poll.status, job);
+        } catch (_) {
+            continue;  // transient network error: keep polling
+        }
+        if (['succeeded', 'failed', 'lost'].includes(job.status)) {
+            const status = job.status_code || (job.status === 'succeeded' ? 200 : 500);
+            return reply(status, job.result || { ok: false, reason: `release-job-${job.status}` });
+        }
+        if (typeof opts.onProgress === 'function') {
+            try { opts.onProgress(job); } catch (_) { /* no-op */ }
+        }
+    }
+    return reply(504, { ok: false, reason: 'release-job-timeout', job_id: accepted.job_id });
+}
+
+/**
+ * POST a release through the background queue (Prefer: respond-async) and
+ * resolve once the job has finished.
+ */
+async function fetchRelease(url, options = {}) {
+    const headers = new Headers(options.headers || {});
+    headers.set('Prefer', 'respond-async');
+    const response = await fetch(url, Object.assign({}, options, { headers }));
+    return awaitAcceptedJob(response, options);
+}
+
+window.awaitAcceptedJob = awaitAcceptedJob;
+window.fetchRelease = fetchRelease;
+
 // ============================================================================
 // Formatting & HTML helpers
 // ============================================================================
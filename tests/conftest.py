@@ -143,6 +143,9 @@ def _create_test_schema(conn: sqlite3.Connection) -> None:
             updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
             attachments_manifest TEXT,
             version INTEGER NOT NULL DEFAULT 0,
+            content_edited INTEGER NOT NULL DEFAULT 0,
+            preview_snippet TEXT,
+            created_at_utc TEXT,
             FOREIGN KEY (account_id) REFERENCES email_accounts (id)
         )
     ''')
@@ -163,9 +166,25 @@ def _create_test_schema(conn: sqlite3.Connection) -> None:
             storage_path TEXT NOT NULL,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP,
             updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            part_index INTEGER,
             UNIQUE(email_id, filename, is_original, is_staged)
         )
     ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_blobs(
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            storage_path TEXT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_index_state(
+            email_id INTEGER PRIMARY KEY,
+            indexed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
 
     # Release coordination tables (Phase 4)
     cursor.execute('''
@@ -228,6 +247,40 @@ def _create_test_schema(conn: sqlite3.Connection) -> None:
         )
     ''')
 
+    # Watcher resume state (mirrors init_database / app.services.watcher_state)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watcher_state (
+            account_id INTEGER PRIMARY KEY,
+            last_uid INTEGER,
+            uidvalidity INTEGER,
+            capabilities TEXT,
+            quarantine_folder TEXT,
+            uid_floor INTEGER,
+            uid_floor_row_id INTEGER,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Latency sketches (mirrors init_database / app.services.latency_stats)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latency_sketches (
+            account_id INTEGER NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            sketch_json TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY(account_id, bucket_start)
+        )
+    ''')
+
+    # Table data versions + triggers (mirrors init_database / app.services.data_version)
+    from app.services.data_version import ensure_tables as ensure_data_version_tables
+    ensure_data_version_tables(conn)
+
+    # Email change log + triggers (mirrors init_database / app.services.change_log)
+    from app.services.change_log import ensure_tables as ensure_change_log_tables
+    ensure_change_log_tables(conn)
+
     # Helpful index for release logic (mirrors init_database)
     cursor.execute('''
         CREATE UNIQUE INDEX IF NOT EXISTS idx_email_messages_msgid_unique
@@ -272,6 +325,18 @@ def app(test_db_path: str, monkeypatch) -> Flask:
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for easier testing
 
+    # Shared stats cache is process-wide; never leak entries between tests
+    from app.services.stats import clear_cache
+    clear_cache()
+    from app.models.simple_user import invalidate_user
+    invalidate_user()
+    from app.services.change_log import reset_sync_state
+    reset_sync_state()
+    from app.routes.emails import clear_row_cache
+    clear_row_cache()
+    from app.services import audit
+    audit.reset()
+
     return app
 
 
@@ -309,6 +374,14 @@ def authenticated_client(client: FlaskClient) -> FlaskClient:
     return client
 
 
+@pytest.fixture(autouse=True)
+def _fresh_imap_provider_registry(monkeypatch):
+    """Isolate the process-wide IMAP provider budget/circuit state per test."""
+    from app.services import imap_providers
+
+    monkeypatch.setattr(imap_providers, '_REGISTRY', imap_providers.ProviderRegistry())
+
+
 @pytest.fixture(scope='function')
 def mock_imap_connection():
     """
@@ -35,3 +35,34 @@ def test_login_redirects_authenticated_users(authenticated_client):
     resp = authenticated_client.get("/login", follow_redirects=False)
     assert resp.status_code == 302
     assert resp.headers["Location"].endswith("/dashboard")
+
+
+def test_user_loader_is_cached_until_invalidated(client, monkeypatch):
+    from app.models import simple_user
+
+    _seed_admin_user()
+    monkeypatch.setenv("USER_CACHE_TTL", "60")
+    calls = []
+    real_get_db = simple_user.get_db
+
+    def counting_get_db():
+        calls.append(1)
+        return real_get_db()
+
+    monkeypatch.setattr(simple_user, "get_db", counting_get_db)
+
+    assert simple_user.load_user_from_db(1).role == "admin"
+    assert simple_user.load_user_from_db("1").role == "admin"
+    assert len(calls) == 1
+
+    conn = get_db()
+    conn.execute("UPDATE users SET role='viewer' WHERE id=1")
+    conn.commit()
+    conn.close()
+    assert simple_user.load_user_from_db(1).role == "admin"  # cached
+
+    simple_user.invalidate_user(1)
+    assert simple_user.load_user_from_db(1).role == "viewer"
+    assert len(calls) == 2
+    _seed_admin_user()
+    simple_user.invalidate_user()
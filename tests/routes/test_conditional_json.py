@@ -0,0 +1,99 @@
+import gzip
+import json
+
+from app.routes import interception as route
+from app.utils.db import get_db
+from tests.routes.test_interception_additional import _login
+
+
+def _add_held(email_id, subject="Polled"):
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO email_messages (id, sender, subject, body_text, interception_status, direction, created_at)"
+        " VALUES (?, 'poll@example.com', ?, 'body', 'HELD', 'inbound', datetime('now'))",
+        (email_id, subject),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_unchanged_poll_gets_304_without_running_the_query(client, monkeypatch):
+    _login(client)
+    _add_held(701)
+    first = client.get("/api/interception/held")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    calls = []
+    monkeypatch.setattr(route, "_db", lambda: calls.append(1) or get_db())
+    again = client.get("/api/interception/held", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert calls == []
+
+    other_filter = client.get("/api/interception/held?x=1", headers={"If-None-Match": etag})
+    assert other_filter.status_code == 200
+
+    _add_held(702, "Changed")
+    changed = client.get("/api/interception/held", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert 702 in {m["id"] for m in changed.get_json()["messages"]}
+
+
+def test_time_windowed_view_etag_changes_without_writes(client, monkeypatch):
+    from types import SimpleNamespace
+    from app.utils import json_responses
+
+    _login(client)
+    _add_held(703)
+    now = [1_000_000.0]
+    monkeypatch.setattr(json_responses, "time", SimpleNamespace(time=lambda: now[0]))
+    etag = client.get("/api/interception/held").headers["ETag"]
+    assert client.get("/api/interception/held", headers={"If-None-Match": etag}).status_code == 304
+
+    now[0] += 60  # released24h may have changed although nothing was written
+    stale = client.get("/api/interception/held", headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.headers["ETag"] != etag
+
+
+def test_large_json_is_gzipped_when_accepted(client):
+    _login(client)
+    for i in range(40):
+        _add_held(800 + i, "Subject padding " * 5)
+    plain = client.get("/api/interception/held")
+    assert "Content-Encoding" not in plain.headers
+
+    packed = client.get("/api/interception/held", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in packed.headers["Vary"]
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+
+
+def test_since_returns_only_changed_rows_and_removals(client):
+    _login(client)
+    _add_held(901)
+    _add_held(902)
+    full = client.get("/api/interception/held").get_json()
+    seq = full["seq"]
+    assert "delta" not in full
+
+    conn = get_db()
+    conn.execute("UPDATE email_messages SET subject='Edited' WHERE id=901")
+    conn.execute("UPDATE email_messages SET interception_status='RELEASED' WHERE id=902")
+    conn.commit()
+    conn.close()
+
+    delta = client.get(f"/api/interception/held?since={seq}").get_json()
+    assert delta["delta"] is True
+    assert [m["id"] for m in delta["messages"]] == [901]
+    assert delta["messages"][0]["subject"] == "Edited"
+    assert delta["removed"] == [902]
+    assert delta["seq"] > seq
+    assert delta["stats"]["held"] >= 1
+
+    unified = client.get(f"/api/emails/unified?since={seq}").get_json()
+    assert {e["id"] for e in unified["emails"]} == {901, 902}
+    assert unified["removed"] == []
@@ -31,3 +31,27 @@ def test_dashboard_filters_by_account(client):
     resp = client.get("/dashboard?account_id=401")
     assert resp.status_code == 200
     assert b"dashboard" in resp.data.lower()
+
+
+def test_pending_badge_is_lazy_and_cached(app, monkeypatch):
+    from types import SimpleNamespace
+
+    from flask import render_template_string
+
+    import simple_app
+
+    calls = []
+
+    def fake_stats(*args, **kwargs):
+        calls.append(1)
+        return {"pending": 7}
+
+    monkeypatch.setattr(simple_app.stats_cache, "get_stats", fake_stats)
+    monkeypatch.setattr(simple_app, "current_user", SimpleNamespace(is_authenticated=True))
+
+    with app.test_request_context("/"):
+        assert render_template_string("no badge here") == "no badge here"
+        assert calls == []
+        html = render_template_string("{% if pending_count > 0 %}{{ pending_count }}{% endif %}|{{ pending_count }}")
+        assert html == "7|7"
+        assert len(calls) == 1
@@ -0,0 +1,120 @@
+import hashlib
+
+from app.utils.db import get_db
+
+
+RAW = b"Subject: Big\r\nMessage-ID: <big@example.com>\r\n\r\n" + b"line of body text\r\n" * 2000
+
+
+def _insert_email(email_id=4242, raw=RAW, raw_path=None):
+    conn = get_db()
+    conn.execute("DELETE FROM email_messages WHERE id=?", (email_id,))
+    conn.execute(
+        "INSERT INTO email_messages(id, subject, raw_content, raw_path, direction, created_at) "
+        "VALUES (?, 'Big report', ?, ?, 'inbound', datetime('now'))",
+        (email_id, raw, raw_path),
+    )
+    conn.commit()
+    conn.close()
+    return email_id
+
+
+def _insert_attachment(tmp_path, app, monkeypatch, payload):
+    root = tmp_path / "attachments"
+    root.mkdir(exist_ok=True)
+    stored = root / "preview.pdf"
+    stored.write_bytes(payload)
+    monkeypatch.setitem(app.config, "ATTACHMENTS_ROOT_DIR", str(root))
+    monkeypatch.setitem(app.config, "ATTACHMENTS_STAGED_ROOT_DIR", str(tmp_path / "staged"))
+    conn = get_db()
+    conn.execute("DELETE FROM email_attachments")
+    cur = conn.execute(
+        "INSERT INTO email_attachments(email_id, filename, mime_type, size, sha256, is_original, storage_path) "
+        "VALUES (4242, 'preview.pdf', 'application/pdf', ?, ?, 1, ?)",
+        (len(payload), hashlib.sha256(payload).hexdigest(), str(stored)),
+    )
+    conn.commit()
+    attachment_id = cur.lastrowid
+    conn.close()
+    return attachment_id, stored
+
+
+def test_email_download_streams_ranges_and_revalidates(authenticated_client):
+    email_id = _insert_email()
+
+    full = authenticated_client.get(f"/api/email/{email_id}/download")
+    assert full.status_code == 200
+    assert full.data == RAW
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert 'filename="Big report_4242.eml"' in full.headers["Content-Disposition"]
+    etag = full.headers["ETag"]
+
+    partial = authenticated_client.get(f"/api/email/{email_id}/download", headers={"Range": "bytes=0-6"})
+    assert partial.status_code == 206
+    assert partial.data == b"Subject"
+    assert partial.headers["Content-Range"] == f"bytes 0-6/{len(RAW)}"
+
+    cached = authenticated_client.get(f"/api/email/{email_id}/download", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+
+def test_email_download_without_blobopen_reads_in_slices(authenticated_client, monkeypatch):
+    from app.utils import downloads
+
+    monkeypatch.setattr(downloads, "_HAS_BLOBOPEN", False)
+    monkeypatch.setattr(downloads, "BLOB_CHUNK_BYTES", 1000)
+    email_id = _insert_email()
+
+    full = authenticated_client.get(f"/api/email/{email_id}/download")
+    assert full.status_code == 200
+    assert full.data == RAW
+
+    partial = authenticated_client.get(f"/api/email/{email_id}/download", headers={"Range": "bytes=-8"})
+    assert partial.status_code == 206
+    assert partial.data == RAW[-8:]
+
+
+def test_email_download_prefers_raw_path(authenticated_client, tmp_path):
+    raw_file = tmp_path / "on_disk.eml"
+    raw_file.write_bytes(b"Subject: From disk\r\n\r\nbody\r\n")
+    email_id = _insert_email(raw=None, raw_path=str(raw_file))
+
+    assert authenticated_client.get(f"/api/email/{email_id}/download").data == raw_file.read_bytes()
+    assert authenticated_client.get("/api/email/999999/download").status_code == 404
+
+
+def test_attachment_download_uses_sha256_etag_and_ranges(authenticated_client, app, monkeypatch, tmp_path):
+    payload = bytes(range(256)) * 64
+    attachment_id, _ = _insert_attachment(tmp_path, app, monkeypatch, payload)
+    url = f"/api/attachment/{attachment_id}/download"
+
+    full = authenticated_client.get(url)
+    assert full.status_code == 200
+    assert full.headers["ETag"] == f'"{hashlib.sha256(payload).hexdigest()}"'
+    assert full.data == payload
+
+    partial = authenticated_client.get(url + "?inline=1", headers={"Range": "bytes=-16"})
+    assert partial.status_code == 206
+    assert partial.data == payload[-16:]
+    assert partial.headers["Content-Disposition"].startswith("inline")
+
+    assert authenticated_client.get(url, headers={"If-None-Match": full.headers["ETag"]}).status_code == 304
+
+
+def test_attachment_download_offloads_to_proxy(authenticated_client, app, monkeypatch, tmp_path):
+    attachment_id, stored = _insert_attachment(tmp_path, app, monkeypatch, b"%PDF" * 100)
+    url = f"/api/attachment/{attachment_id}/download"
+
+    monkeypatch.setitem(app.config, "DOWNLOAD_OFFLOAD", "x-accel")
+    monkeypatch.setitem(app.config, "DOWNLOAD_ACCEL_ROOT", str(tmp_path))
+    monkeypatch.setitem(app.config, "DOWNLOAD_ACCEL_PREFIX", "/_protected/")
+    resp = authenticated_client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers["X-Accel-Redirect"] == "/_protected/attachments/preview.pdf"
+    assert resp.data == b""
+
+    monkeypatch.setitem(app.config, "DOWNLOAD_OFFLOAD", "x-sendfile")
+    resp = authenticated_client.get(url)
+    assert resp.headers["X-Sendfile"] == str(stored.resolve())
+    assert resp.data == b""
@@ -0,0 +1,76 @@
+from app.routes import emails as route
+from app.utils.db import get_db
+from tests.routes.test_interception_additional import _login
+
+
+ACCOUNT = 77  # keeps the listing clear of rows other tests leave behind
+URL = f"/api/emails/unified/rows?account_id={ACCOUNT}"
+
+
+def _add(email_id, subject, status="HELD"):
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO email_messages (id, account_id, sender, recipients, subject, body_text, interception_status, direction, created_at)"
+        " VALUES (?, ?, 'rows@example.com', '[\"to@example.com\"]', ?, 'row body', ?, 'inbound', datetime('now', ?))",
+        (email_id, ACCOUNT, subject, status, f"-{email_id} seconds"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _ids(payload):
+    return [email_id for email_id, _rev in payload["order"]]
+
+
+def test_rows_full_load_then_delta_patch(client, monkeypatch):
+    _login(client)
+    _add(1, "First <b>")
+    _add(2, "Second")
+
+    full = client.get(URL).get_json()
+    assert full["delta"] is False
+    assert _ids(full) == [1, 2]
+    assert set(full["rows"]) == {"1", "2"}
+    html = full["rows"]["1"]
+    assert 'data-email-id="1"' in html and "First &lt;b&gt;" in html
+    assert "to@example.com" in html and "action-release" in html
+
+    conn = get_db()
+    conn.execute("UPDATE email_messages SET interception_status='RELEASED' WHERE id=2")
+    conn.commit()
+    conn.close()
+
+    renders = []
+    real = route.get_template_attribute
+    monkeypatch.setattr(route, "get_template_attribute", lambda *a: renders.append(a) or real(*a))
+    delta = client.get(f"{URL}&since={full['seq']}").get_json()
+    assert delta["delta"] is True
+    assert _ids(delta) == [1, 2]
+    assert list(delta["rows"]) == ["2"]
+    assert "action-view" in delta["rows"]["2"]
+    assert len(renders) == 1
+
+    released = client.get(f"{URL}&status=RELEASED&since={full['seq']}").get_json()
+    assert _ids(released) == [2]
+    assert list(released["rows"]) == ["2"]
+
+
+def test_row_html_is_cached_per_id_and_revision(client, monkeypatch):
+    _login(client)
+    _add(5, "Cached")
+    client.get(URL)
+
+    renders = []
+    real = route.get_template_attribute
+    monkeypatch.setattr(route, "get_template_attribute", lambda *a: renders.append(a) or real(*a))
+    again = client.get(URL + "&x=1").get_json()
+    assert "Cached" in again["rows"]["5"]
+    assert renders == []
+
+    conn = get_db()
+    conn.execute("UPDATE email_messages SET subject='Edited' WHERE id=5")
+    conn.commit()
+    conn.close()
+    edited = client.get(URL).get_json()
+    assert "Edited" in edited["rows"]["5"]
+    assert len(renders) == 1
@@ -0,0 +1,119 @@
+"""Batched /api/fetch-emails: one UID FETCH per window, multi-account fan-out."""
+
+from email.message import EmailMessage
+
+from app.utils.crypto import encrypt_credential
+from app.utils.db import get_db
+
+
+def _raw(uid, account_id):
+    msg = EmailMessage()
+    msg["Subject"] = f"Message {uid}"
+    msg["From"] = "sender@example.com"
+    msg["To"] = "Team <team@example.com>"
+    msg["Message-ID"] = f"<fetch-{account_id}-{uid}@example.com>"
+    msg.set_content(f"body {uid}")
+    return msg.as_bytes()
+
+
+class BatchIMAP:
+    instances = []
+
+    def __init__(self, host, port):
+        self.account_id = int(host.split(".")[0][len("imap"):])
+        self.commands = []
+        BatchIMAP.instances.append(self)
+
+    def starttls(self):
+        return "OK", []
+
+    def login(self, username, password):
+        return "OK", []
+
+    def select(self, mailbox):
+        return "OK", [b"3"]
+
+    def uid(self, command, *args):
+        self.commands.append((command, *args))
+        if command == "SEARCH":
+            return "OK", [b"10 11 12"]
+        if command == "FETCH":
+            section = "HEADER" if "[HEADER]" in args[1] else ""
+            data = []
+            for uid in (11, 12):
+                raw = _raw(uid, self.account_id)
+                if section:
+                    raw = raw.split(b"\n\n", 1)[0] + b"\n\n"
+                head = f'{uid - 10} (UID {uid} INTERNALDATE "01-Feb-2024 09:30:00 +0000" RFC822.SIZE 900 BODY[{section}] {{{len(raw)}}}'
+                data.extend([(head.encode(), raw), b")"])
+            return "OK", data
+        return "OK", []
+
+    def logout(self):
+        return "BYE", []
+
+
+def _account(conn, account_id):
+    pwd = encrypt_credential("password123")
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO email_accounts (
+            id, email_address, imap_host, imap_port, imap_username, imap_password,
+            imap_use_ssl, smtp_host, smtp_port, smtp_username, smtp_password, smtp_use_ssl, is_active
+        )
+        VALUES (?, ?, ?, 143, 'user', ?, 0, 'smtp.example.com', 587, 'user', ?, 0, 1)
+        """,
+        (account_id, f"user{account_id}@example.com", f"imap{account_id}.example.com", pwd, pwd),
+    )
+
+
+def test_fetch_uses_single_batched_uid_fetch(monkeypatch, authenticated_client):
+    BatchIMAP.instances = []
+    with get_db() as conn:
+        _account(conn, 301)
+        conn.commit()
+    monkeypatch.setattr("app.routes.emails.imaplib.IMAP4", BatchIMAP)
+
+    resp = authenticated_client.post("/api/fetch-emails", json={"account_id": 301, "count": 2})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["total_available"] == 3
+    assert [e["uid"] for e in body["emails"]] == ["12", "11"]
+
+    fetches = [c for c in BatchIMAP.instances[0].commands if c[0] == "FETCH"]
+    assert len(fetches) == 1
+    assert fetches[0][1] == "11:12"
+    assert "BODY.PEEK[]" in fetches[0][2]
+
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT original_uid, original_internaldate, recipients FROM email_messages WHERE message_id=?",
+            ("<fetch-301-12@example.com>",),
+        ).fetchone()
+    assert row["original_uid"] == 12
+    assert row["original_internaldate"]
+    assert "team@example.com" in row["recipients"]
+
+
+def test_fetch_multiple_accounts_concurrently(monkeypatch, authenticated_client):
+    BatchIMAP.instances = []
+    with get_db() as conn:
+        _account(conn, 302)
+        _account(conn, 303)
+        conn.commit()
+    monkeypatch.setattr("app.routes.emails.imaplib.IMAP4", BatchIMAP)
+
+    resp = authenticated_client.post(
+        "/api/fetch-emails", json={"account_ids": [302, 303, 999], "count": 2, "headers_only": True}
+    )
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["fetched"] == 4
+    assert body["accounts"]["999"]["status"] == 404
+    assert body["accounts"]["302"]["emails"][0]["subject"] == "Message 12"
+    assert all("BODY.PEEK[HEADER]" in c[2] for inst in BatchIMAP.instances for c in inst.commands if c[0] == "FETCH")
+
+    # Header-only listing never stores rows
+    with get_db() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM email_messages WHERE account_id IN (302, 303)").fetchone()[0]
+    assert stored == 0
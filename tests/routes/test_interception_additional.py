@@ -8,6 +8,7 @@ from types import SimpleNamespace
 import pytest
 
 from app.routes import interception as route
+from app.services import stats as stats_cache
 from app.utils.db import get_db
 from app.utils.crypto import encrypt_credential
 
@@ -79,7 +80,7 @@ def test_healthz_reports_status_and_cache(client, monkeypatch):
         ),
     )
 
-    route._HEALTH_CACHE = {"ts": 0.0, "payload": None}
+    stats_cache.clear_cache()
     client.application.config["SECRET_KEY"] = "x" * 40
 
     conn = get_db()
@@ -110,7 +111,7 @@ def test_healthz_reports_status_and_cache(client, monkeypatch):
 
 
 def test_healthz_handles_db_error(client, monkeypatch):
-    route._HEALTH_CACHE = {"ts": 0.0, "payload": None}
+    stats_cache.clear_cache()
     monkeypatch.setattr(route, "_db", lambda: (_ for _ in ()).throw(sqlite3.OperationalError("boom")))
 
     resp = client.get("/healthz")
@@ -120,8 +121,10 @@ def test_healthz_handles_db_error(client, monkeypatch):
     assert "error" in data
 
 
-def test_healthz_returns_cached_payload(client):
-    route._HEALTH_CACHE = {"ts": time.time(), "payload": {"ok": True, "cached": False}}
+def test_healthz_returns_cached_payload(client, monkeypatch):
+    stats_cache.clear_cache()
+    client.get("/healthz")
+    monkeypatch.setattr(route, "_db", lambda: (_ for _ in ()).throw(sqlite3.OperationalError("boom")))
     resp = client.get("/healthz")
     assert resp.get_json()["cached"] is True
 
@@ -136,7 +139,7 @@ def test_healthz_handles_security_exception(client, monkeypatch):
             return super().get(key, default)
 
     client.application.config = BrokenConfig(original_config)
-    route._HEALTH_CACHE = {"ts": 0.0, "payload": None}
+    stats_cache.clear_cache()
     resp = client.get("/healthz")
     assert resp.status_code == 200
     assert resp.get_json()["security"]["status"] == "unavailable"
@@ -150,7 +153,7 @@ def test_healthz_handles_imap_config_exception(client, monkeypatch):
         return route.os.getenv(key, default)
 
     monkeypatch.setattr(route.os, "getenv", failing_getenv)
-    route._HEALTH_CACHE = {"ts": 0.0, "payload": None}
+    stats_cache.clear_cache()
     resp = client.get("/healthz")
     data = resp.get_json()
     assert data["imap_config"]["status"] == "unavailable"
@@ -361,6 +364,35 @@ def test_api_interception_get_includes_snippet_and_diff(client, tmp_path):
     assert "preview_snippet" in data and "Changed body" in data["body_diff"][-1]
 
 
+def test_api_interception_get_uses_stored_preview_without_raw_file(client, tmp_path, monkeypatch):
+    _login(client)
+    conn = get_db()
+    conn.execute("DELETE FROM email_messages")
+    raw_file = tmp_path / "stored.eml"
+    raw_file.write_text("Subject: Demo\r\nContent-Type: text/plain\r\n\r\nOriginal text")
+    conn.execute(
+        """
+        INSERT INTO email_messages
+        (id, interception_status, status, raw_path, body_text, preview_snippet, direction)
+        VALUES (24, 'HELD', 'PENDING', ?, 'Stored body', 'Stored body', 'inbound')
+        """,
+        (str(raw_file),),
+    )
+    conn.commit()
+
+    parsed = []
+    real_parser = route.BytesParser
+    monkeypatch.setattr(route, "BytesParser", lambda *a, **k: parsed.append(1) or real_parser(*a, **k))
+    resp = client.get("/api/interception/held/24")
+    assert resp.status_code == 200
+    assert resp.get_json()["preview_snippet"] == "Stored body"
+    assert parsed == []
+
+    resp = client.get("/api/interception/held/24?include_diff=1")
+    assert "+Stored body" in resp.get_json()["body_diff"]
+    assert parsed == [1]
+
+
 def test_api_interception_get_html_single_part(client, tmp_path):
     _login(client)
     conn = get_db()
@@ -521,3 +553,25 @@ def test_api_email_edit_not_held_returns_conflict(client):
     )
     assert resp.status_code == 409
     assert resp.get_json()["error"] == "not-held"
+
+
+def test_inbox_list_uses_stored_preview_and_falls_back_to_body(client):
+    _login(client)
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO email_messages (id, sender, subject, body_text, preview_snippet, interception_status, direction, created_at)"
+        " VALUES (501, 'a@example.com', 'Stored', 'ignored body', 'stored preview', 'HELD', 'inbound', datetime('now'))"
+    )
+    conn.execute(
+        "INSERT INTO email_messages (id, sender, subject, body_text, interception_status, direction, created_at)"
+        " VALUES (502, 'b@example.com', 'Legacy', '  legacy\n body ', 'HELD', 'inbound', datetime('now'))"
+    )
+    conn.commit()
+    conn.close()
+
+    resp = client.get("/api/inbox")
+    assert resp.status_code == 200
+    by_id = {m["id"]: m for m in resp.get_json()["messages"]}
+    assert by_id[501]["preview_snippet"] == "stored preview"
+    assert by_id[502]["preview_snippet"] == "legacy body"
+    assert "body_text" not in by_id[501]
@@ -6,6 +6,7 @@ from email.policy import default as default_policy
 from types import SimpleNamespace
 from app.utils.crypto import encrypt_credential
 from app.utils.db import get_db
+from app.utils.email_markers import RELEASE_BYPASS_KEYWORD
 from tests.routes.test_interception_additional import _login
 
 
@@ -47,6 +48,8 @@ class ReleaseIMAP:
         ]
         return "OK", mailboxes
 
+    permanent_flags = b'(\\Answered \\Flagged \\Deleted \\Seen \\Draft \\*)'
+
     def select(self, mailbox, readonly=True):
         self.current_folder = mailbox
         # Track All Mail selection
@@ -54,6 +57,11 @@ class ReleaseIMAP:
             self.gmail_operations.append(('select', mailbox))
         return "OK", [b"1"]
 
+    def response(self, code):
+        if code == 'PERMANENTFLAGS':
+            return code, [self.permanent_flags]
+        return code, [None]
+
     def search(self, charset, criterion, header, value):
         if self.current_folder not in self.mailboxes:
             return "NO", [b""]
@@ -242,6 +250,97 @@ def test_release_basic(monkeypatch, client, tmp_path):
     if response.status_code != 200:
         print(f"ERROR RESPONSE: {response.get_json()}")
     assert response.status_code == 200
+    # Unedited release moves the quarantined original instead of re-uploading it
+    assert response.get_json()["fast_path"] is True
+    assert not fake_imap.appended
+    assert fake_imap.mailboxes["INBOX"] == {123: "<test@example.com>"}
+    assert fake_imap.mailboxes["Quarantine"] == {}
+
+
+def test_release_unedited_falls_back_to_append_without_keyword_support(monkeypatch, client, tmp_path):
+    _login(client)
+
+    raw_file = tmp_path / "no_keywords.eml"
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg.set_content("Body")
+    raw_file.write_bytes(msg.as_bytes())
+    _prepare_release_fixture(str(raw_file))
+
+    class NoKeywordIMAP(ReleaseIMAP):
+        def uid(self, command, *args):
+            if command == 'STORE' and RELEASE_BYPASS_KEYWORD in str(args):
+                return "NO", [b"[CANNOT] keywords not supported"]
+            return super().uid(command, *args)
+
+    fake_imap = NoKeywordIMAP("imap.example.com", 993)
+    fake_imap.preload("Quarantine", 123, "<test@example.com>")
+    monkeypatch.setattr(route, "imaplib", SimpleNamespace(IMAP4_SSL=lambda *args, **kwargs: fake_imap, Time2Internaldate=route.imaplib.Time2Internaldate, IMAP4=route.imaplib.IMAP4))
+    monkeypatch.setattr(route, "_ensure_quarantine", lambda imap_obj, folder: folder)
+
+    response = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX"},
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.get_json()["fast_path"] is False
+    assert fake_imap.appended
+
+
+def test_release_unedited_falls_back_to_append_when_keyword_not_permanent(monkeypatch, client, tmp_path):
+    _login(client)
+
+    raw_file = tmp_path / "session_keywords.eml"
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg.set_content("Body")
+    raw_file.write_bytes(msg.as_bytes())
+    _prepare_release_fixture(str(raw_file))
+
+    class SessionKeywordIMAP(ReleaseIMAP):
+        # STORE of the keyword still answers OK, but it would not be kept
+        permanent_flags = b'(\\Answered \\Flagged \\Deleted \\Seen \\Draft)'
+
+    fake_imap = SessionKeywordIMAP("imap.example.com", 993)
+    fake_imap.preload("Quarantine", 123, "<test@example.com>")
+    monkeypatch.setattr(route, "imaplib", SimpleNamespace(IMAP4_SSL=lambda *args, **kwargs: fake_imap, Time2Internaldate=route.imaplib.Time2Internaldate, IMAP4=route.imaplib.IMAP4))
+    monkeypatch.setattr(route, "_ensure_quarantine", lambda imap_obj, folder: folder)
+
+    response = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX"},
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.get_json()["fast_path"] is False
+    assert fake_imap.appended
+
+
+def test_release_after_saved_edit_skips_fast_path(monkeypatch, client, tmp_path):
+    _login(client)
+
+    raw_file = tmp_path / "saved_edit.eml"
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg.set_content("Body")
+    raw_file.write_bytes(msg.as_bytes())
+    _prepare_release_fixture(str(raw_file))
+
+    assert client.post("/api/email/1/edit", json={"body_text": "Edited in review"}).status_code == 200
+
+    fake_imap = ReleaseIMAP("imap.example.com", 993)
+    fake_imap.preload("Quarantine", 123, "<test@example.com>")
+    monkeypatch.setattr(route, "imaplib", SimpleNamespace(IMAP4_SSL=lambda *args, **kwargs: fake_imap, Time2Internaldate=route.imaplib.Time2Internaldate, IMAP4=route.imaplib.IMAP4))
+    monkeypatch.setattr(route, "_ensure_quarantine", lambda imap_obj, folder: folder)
+
+    response = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX"},
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.get_json()["fast_path"] is False
     assert fake_imap.appended
 
 
@@ -441,3 +540,121 @@ def test_release_removes_original_from_inbox_if_present(monkeypatch, client, tmp
     # Original should be removed from INBOX and Quarantine; only the edited should remain in INBOX
     assert original_mid not in list(fake_imap.mailboxes.get("INBOX", {}).values())
     assert fake_imap.mailboxes.get("Quarantine", {}) == {}
+
+
+def test_release_streams_attachments_from_storage(monkeypatch, client, tmp_path, app):
+    _login(client)
+
+    raw_file = tmp_path / "with_attachment.eml"
+    msg = EmailMessage()
+    msg["Subject"] = "Has attachment"
+    msg["Message-ID"] = "<test@example.com>"
+    msg.set_content("Body")
+    raw_file.write_bytes(msg.as_bytes())
+    _prepare_release_fixture(str(raw_file))
+
+    attachments_root = tmp_path / "attachments"
+    attachments_root.mkdir()
+    payload = bytes(range(256)) * 400
+    stored = attachments_root / "report.pdf"
+    stored.write_bytes(payload)
+    monkeypatch.setitem(app.config, "ATTACHMENTS_ROOT_DIR", str(attachments_root))
+    monkeypatch.setitem(app.config, "ATTACHMENTS_STAGED_ROOT_DIR", str(tmp_path / "staged"))
+
+    conn = get_db()
+    conn.execute("DELETE FROM email_attachments")
+    conn.execute(
+        "INSERT INTO email_attachments(email_id, filename, mime_type, size, is_original, storage_path) "
+        "VALUES (1, 'report.pdf', 'application/pdf', ?, 1, ?)",
+        (len(payload), str(stored)),
+    )
+    conn.commit()
+    conn.close()
+
+    appended = []
+
+    class CapturingIMAP(ReleaseIMAP):
+        def append(self, folder, flags, date_time, message_bytes):
+            appended.append(message_bytes)
+            return super().append(folder, flags, date_time, message_bytes)
+
+    fake_imap = CapturingIMAP("imap.example.com", 993)
+    fake_imap.preload("Quarantine", 123, "<test@example.com>")
+    monkeypatch.setattr(route, "imaplib", SimpleNamespace(IMAP4_SSL=lambda *args, **kwargs: fake_imap, Time2Internaldate=route.imaplib.Time2Internaldate, IMAP4=route.imaplib.IMAP4))
+    monkeypatch.setattr(route, "_ensure_quarantine", lambda imap_obj, folder: folder)
+
+    response = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX", "edited_subject": "Has attachment (reviewed)"},
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 200
+    assert len(appended) == 1
+
+    released = BytesParser(policy=default_policy).parsebytes(appended[0])
+    assert released[route.RELEASE_BYPASS_HEADER] == "emt-release-1"
+    assert released["X-EMT-Released-From"] == "<test@example.com>"
+    [attachment] = list(released.iter_attachments())
+    assert attachment.get_filename() == "report.pdf"
+    assert attachment.get_content() == payload
+
+
+def test_async_release_returns_job_and_reports_status(monkeypatch, client, tmp_path):
+    from app.services import release_jobs
+
+    _login(client)
+    raw_file = tmp_path / "async.eml"
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg.set_content("Body")
+    raw_file.write_bytes(msg.as_bytes())
+    _prepare_release_fixture(str(raw_file))
+
+    fake_imap = ReleaseIMAP("imap.example.com", 993)
+    fake_imap.preload("Quarantine", 123, "<test@example.com>")
+    monkeypatch.setattr(route, "imaplib", SimpleNamespace(IMAP4_SSL=lambda *args, **kwargs: fake_imap, Time2Internaldate=route.imaplib.Time2Internaldate, IMAP4=route.imaplib.IMAP4))
+    monkeypatch.setattr(route, "_ensure_quarantine", lambda imap_obj, folder: folder)
+
+    response = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX"},
+        headers={"Prefer": "respond-async", "X-Idempotency-Key": "async-key-1"},
+    )
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["job_id"] == "async-key-1"
+    assert response.headers["Location"] == body["status_url"]
+
+    assert release_jobs.wait("async-key-1")["status"] == "succeeded"
+    status = client.get(body["status_url"]).get_json()
+    assert status["status"] == "succeeded"
+    assert status["result"]["released_to"] == "INBOX"
+
+    # Same key again replays the stored outcome instead of releasing twice
+    replay = client.post(
+        "/api/interception/release/1",
+        json={"target_folder": "INBOX", "async": True},
+        headers={"X-Idempotency-Key": "async-key-1"},
+    )
+    assert replay.status_code == 200
+    assert replay.get_json()["released_to"] == "INBOX"
+
+    # Finished jobs stay queryable from idempotency_keys after the in-memory job is gone
+    release_jobs.reset()
+    assert client.get(body["status_url"]).get_json()["status"] == "succeeded"
+    assert client.get("/api/interception/release-jobs/unknown").status_code == 404
+
+
+def test_reused_idempotency_key_tracks_latest_email():
+    conn = get_db()
+    try:
+        conn.execute("DELETE FROM idempotency_keys WHERE key='reused-key'")
+        route._set_idempotency_record(conn, "reused-key", 1, "failed", {"ok": False})
+        route._set_idempotency_record(conn, "reused-key", 2, "queued")
+        record = route._get_idempotency_record(conn, "reused-key")
+        assert record["email_id"] == 2
+        assert record["status"] == "queued"
+    finally:
+        conn.execute("DELETE FROM idempotency_keys WHERE key='reused-key'")
+        conn.commit()
+        conn.close()
@@ -0,0 +1,125 @@
+import sqlite3
+from email.message import EmailMessage
+
+import pytest
+
+from app.services import attachment_store
+
+
+PDF = b"%PDF-1.4 shared newsletter attachment" * 50
+
+
+@pytest.fixture
+def store_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "attachments.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        """
+        CREATE TABLE email_attachments(
+            id INTEGER PRIMARY KEY AUTOINCREMENT, email_id INTEGER NOT NULL, filename TEXT NOT NULL,
+            mime_type TEXT, size INTEGER, sha256 TEXT, disposition TEXT, content_id TEXT,
+            is_original INTEGER NOT NULL DEFAULT 0, is_staged INTEGER NOT NULL DEFAULT 0,
+            storage_path TEXT NOT NULL, created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(email_id, filename, is_original, is_staged)
+        )
+        """
+    )
+    attachment_store.ensure_tables(conn)
+    yield conn
+    conn.close()
+
+
+def _message(subject):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "news@example.com"
+    msg.set_content("body")
+    msg.add_attachment(PDF, maintype="application", subtype="pdf", filename="report.pdf")
+    return msg
+
+
+def _email_row(email_id, msg):
+    return {"id": email_id, "raw_path": None, "raw_content": msg.as_bytes()}
+
+
+def test_index_records_metadata_without_extracting(store_db, tmp_path):
+    written = attachment_store.index_attachments(store_db, 1, _message("one"))
+    assert written == 1
+
+    row = store_db.execute("SELECT * FROM email_attachments").fetchone()
+    assert row["filename"] == "report.pdf"
+    assert row["mime_type"] == "application/pdf"
+    assert row["storage_path"] == attachment_store.PENDING_PATH
+    assert row["sha256"] is None
+    assert abs(row["size"] - len(PDF)) <= 3
+    assert not (tmp_path / "blobs").exists()
+
+    # Re-indexing the same email is a no-op
+    assert attachment_store.index_attachments(store_db, 1, _message("one")) == 0
+
+
+def test_identical_attachments_share_one_blob(store_db, tmp_path):
+    for email_id in (1, 2):
+        msg = _message(f"issue {email_id}")
+        attachment_store.index_attachments(store_db, email_id, msg)
+        assert attachment_store.extract_pending(store_db, _email_row(email_id, msg), tmp_path) == 1
+
+    rows = store_db.execute("SELECT sha256, storage_path, size FROM email_attachments").fetchall()
+    assert len({r["storage_path"] for r in rows}) == 1
+    assert all(r["size"] == len(PDF) for r in rows)
+    blob = store_db.execute("SELECT * FROM attachment_blobs").fetchone()
+    assert blob["refcount"] == 2
+    assert attachment_store.blob_path(tmp_path, blob["sha256"]).read_bytes() == PDF
+
+    assert attachment_store.release_email_blobs(store_db, [1]) == 0
+    assert store_db.execute("SELECT refcount FROM attachment_blobs").fetchone()[0] == 1
+    assert attachment_store.release_email_blobs(store_db, [2]) == 1
+    assert store_db.execute("SELECT COUNT(*) FROM attachment_blobs").fetchone()[0] == 0
+    assert store_db.execute("SELECT COUNT(*) FROM email_attachments").fetchone()[0] == 0
+    assert not attachment_store.blob_path(tmp_path, blob["sha256"]).exists()
+
+
+def test_deleting_legacy_row_with_same_hash_keeps_shared_blob(store_db, tmp_path):
+    msg = _message("blob")
+    attachment_store.index_attachments(store_db, 1, msg)
+    attachment_store.extract_pending(store_db, _email_row(1, msg), tmp_path)
+    sha = store_db.execute("SELECT sha256 FROM attachment_blobs").fetchone()[0]
+    legacy = tmp_path / "7" / "report.pdf"
+    legacy.parent.mkdir()
+    legacy.write_bytes(PDF)
+    store_db.execute(
+        "INSERT INTO email_attachments(email_id, filename, sha256, is_original, storage_path) "
+        "VALUES (7, 'report.pdf', ?, 1, ?)",
+        (sha, str(legacy)),
+    )
+    store_db.execute(
+        "INSERT INTO email_attachments(email_id, filename, sha256, is_original, storage_path) "
+        "VALUES (7, 'pending.pdf', ?, 1, ?)",
+        (sha, attachment_store.PENDING_PATH),
+    )
+
+    assert attachment_store.release_email_blobs(store_db, [7]) == 0
+    assert store_db.execute("SELECT refcount FROM attachment_blobs").fetchone()[0] == 1
+    assert attachment_store.blob_path(tmp_path, sha).read_bytes() == PDF
+    assert store_db.execute("SELECT COUNT(*) FROM email_attachments WHERE email_id=7").fetchone()[0] == 0
+
+
+def test_extract_pending_is_idempotent(store_db, tmp_path):
+    msg = _message("once")
+    attachment_store.index_attachments(store_db, 7, msg)
+    assert attachment_store.extract_pending(store_db, _email_row(7, msg), tmp_path) == 1
+    assert attachment_store.extract_pending(store_db, _email_row(7, msg), tmp_path) == 0
+    assert store_db.execute("SELECT refcount FROM attachment_blobs").fetchone()[0] == 1
+
+
+def test_message_without_attachments_is_marked_indexed(store_db):
+    plain = EmailMessage()
+    plain["Subject"] = "no attachments"
+    plain.set_content("body")
+    assert not attachment_store.is_indexed(store_db, 3)
+    assert attachment_store.index_attachments(store_db, 3, plain) == 0
+    assert attachment_store.is_indexed(store_db, 3)
+
+    attachment_store.release_email_blobs(store_db, [3])
+    assert not attachment_store.is_indexed(store_db, 3)
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from app.services import audit
+
+
+@pytest.fixture
+def audit_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "audit.db")
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    monkeypatch.setattr(audit, "get_db", connect)
+    monkeypatch.setattr(audit, "_start_flusher", lambda: None)
+    audit.reset()
+    yield connect
+    audit.reset()
+
+
+def test_records_are_buffered_until_flush(audit_db):
+    for i in range(5):
+        audit.log_action("email_released", 1, i, "Bulk release")
+    assert audit.pending_count() == 5
+
+    assert audit.flush() == 5
+    assert audit.pending_count() == 0
+    rows = audit_db().execute("SELECT action_type, email_id FROM audit_log ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [("email_released", i) for i in range(5)]
+
+
+def test_login_is_written_synchronously_with_pending_records(audit_db):
+    audit.log_action("EDIT", 1, 9, "Updated fields: subject")
+    audit.log_action("LOGIN", 1, None, "User admin logged in")
+    assert audit.pending_count() == 0
+    rows = [r["action_type"] for r in audit.get_recent_logs()]
+    assert rows == ["LOGIN", "EDIT"]
+
+
+def test_failed_flush_keeps_records_and_legacy_table_is_migrated(audit_db, monkeypatch):
+    def broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(audit, "get_db", broken)
+    audit.log_action("RELEASE", 1, 3, "Released to INBOX")
+    assert audit.flush() == 0
+    assert audit.pending_count() == 1
+
+    legacy = audit_db()
+    legacy.execute(
+        "CREATE TABLE audit_log(id INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT, user_id INTEGER,"
+        " target_id INTEGER, details TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+    )
+    legacy.commit()
+    legacy.close()
+    monkeypatch.setattr(audit, "get_db", audit_db)
+    assert audit.flush() == 1
+    row = audit_db().execute("SELECT action_type, email_id, message FROM audit_log").fetchone()
+    assert tuple(row) == ("RELEASE", 3, "Released to INBOX")
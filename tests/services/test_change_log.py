@@ -0,0 +1,67 @@
+import sqlite3
+
+from app.services import change_log
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE email_messages(id INTEGER PRIMARY KEY, account_id INTEGER, interception_status TEXT)"
+    )
+    change_log.ensure_tables(conn)
+    return conn
+
+
+def test_triggers_record_every_write_in_order():
+    conn = _db()
+    conn.execute("INSERT INTO email_messages(id, account_id, interception_status) VALUES (1, 7, 'HELD')")
+    conn.execute("INSERT INTO email_messages(id, account_id, interception_status) VALUES (2, 8, 'HELD')")
+    since = change_log.latest_seq(conn)
+    conn.execute("UPDATE email_messages SET interception_status='RELEASED' WHERE id=1")
+    conn.execute("DELETE FROM email_messages WHERE id=2")
+
+    ops = [tuple(r) for r in conn.execute("SELECT email_id, account_id, op FROM email_changes ORDER BY seq")]
+    assert ops == [(1, 7, 'insert'), (2, 8, 'insert'), (1, 7, 'update'), (2, 8, 'delete')]
+    assert sorted(change_log.changed_since(conn, since)) == [1, 2]
+    assert change_log.changed_since(conn, change_log.latest_seq(conn)) == []
+    assert change_log.changed_since(conn, 0, limit=1) is None
+
+
+def test_pruned_history_forces_full_reload_and_keeps_latest_seq():
+    conn = _db()
+    for i in range(1, 4):
+        conn.execute("INSERT INTO email_messages(id, account_id) VALUES (?, 1)", (i,))
+    latest = change_log.latest_seq(conn)
+    conn.execute("UPDATE email_changes SET changed_at = datetime('now', '-10 days')")
+    assert change_log.prune(conn, retention_hours=1) == 2
+    assert change_log.latest_seq(conn) == latest
+    assert change_log.changed_since(conn, 0) is None
+    assert change_log.changed_since(conn, latest - 1) == [3]
+
+
+def test_sync_caches_invalidates_only_touched_accounts(tmp_path, monkeypatch):
+    path = str(tmp_path / "changes.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE email_messages(id INTEGER PRIMARY KEY, account_id INTEGER)")
+    change_log.ensure_tables(conn)
+    conn.commit()
+
+    def _connect():
+        c = sqlite3.connect(path)
+        c.row_factory = sqlite3.Row
+        return c
+
+    invalidated = []
+    monkeypatch.setattr(change_log, "get_db", _connect)
+    monkeypatch.setattr(change_log.stats_cache, "invalidate", lambda account_id=None: invalidated.append(account_id))
+    change_log.reset_sync_state()
+
+    change_log.sync_caches(force=True)  # first sync only positions the cursor
+    conn.execute("INSERT INTO email_messages(id, account_id) VALUES (1, 5)")
+    conn.execute("INSERT INTO email_messages(id, account_id) VALUES (2, 5)")
+    conn.commit()
+    change_log.sync_caches(force=True)
+    change_log.sync_caches(force=True)
+    assert invalidated == [5]
+    change_log.reset_sync_state()
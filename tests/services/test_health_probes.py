@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from app.services import health
+
+
+@pytest.fixture(autouse=True)
+def _no_background_refresh(monkeypatch):
+    monkeypatch.setattr(health, "start_refresher", lambda: None)
+    health.reset()
+    yield
+    health.reset()
+
+
+def test_readiness_reports_starting_before_first_refresh():
+    payload = health.readiness()
+    assert payload["ready"] is False
+    assert payload["status"] == "starting"
+
+
+def test_refresh_records_per_component_timing(monkeypatch):
+    monkeypatch.setattr(health, "COMPONENT_CHECKS", {
+        "database": lambda: {"ok": True},
+        "smtp": lambda: {"ok": False, "listening": False},
+    })
+    health.refresh_now()
+
+    payload = health.readiness()
+    assert payload["ready"] is True
+    assert payload["status"] == "degraded"
+    assert payload["degraded"] == ["smtp"]
+    for component in payload["components"].values():
+        assert component["duration_ms"] >= 0
+        assert component["checked_at"]
+
+
+def test_failing_required_component_is_not_ready(monkeypatch):
+    def broken():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(health, "COMPONENT_CHECKS", {"database": broken})
+    health.refresh_now()
+
+    payload = health.readiness()
+    assert payload["ready"] is False
+    assert payload["components"]["database"]["error"] == "db down"
+
+
+def test_stale_snapshot_is_not_ready(monkeypatch):
+    monkeypatch.setattr(health, "COMPONENT_CHECKS", {"database": lambda: {"ok": True}})
+    health.refresh_now()
+    health._SNAPSHOT["refreshed_at"] -= 10 * health._REFRESH_INTERVAL
+    assert health.readiness()["status"] == "stale"
+
+
+def test_probes_do_not_touch_database(client, monkeypatch):
+    from app.routes import interception as route
+
+    def _no_db():
+        raise AssertionError("probe queried the database")
+
+    monkeypatch.setattr(health, "get_db", _no_db)
+    monkeypatch.setattr(route, "_db", _no_db)
+
+    live = client.get("/livez")
+    assert live.status_code == 200
+    assert live.get_json()["ok"] is True
+
+    assert client.get("/readyz").status_code == 503
+
+    health._SNAPSHOT["components"] = {"database": {"ok": True, "duration_ms": 1.0}}
+    health._SNAPSHOT["refreshed_at"] = time.time()
+    ready = client.get("/readyz")
+    assert ready.status_code == 200
+    assert ready.get_json()["components"]["database"]["duration_ms"] == 1.0
@@ -0,0 +1,141 @@
+import pytest
+
+from app.services import imap_providers
+from app.services.imap_providers import ProviderRegistry, ProviderUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(imap_providers, 'MAX_CONNECTIONS', 2)
+    monkeypatch.setattr(imap_providers, 'LOGIN_RATE', 1.0)
+    monkeypatch.setattr(imap_providers, 'LOGIN_BURST', 3)
+    monkeypatch.setattr(imap_providers, 'FAILURE_THRESHOLD', 2)
+    monkeypatch.setattr(imap_providers, 'COOLDOWN_SECONDS', 30)
+    clock = FakeClock()
+    return ProviderRegistry(clock=clock), clock
+
+
+def test_connection_cap_and_login_rate(registry):
+    reg, clock = registry
+    first = reg.acquire('imap.example.com', timeout=0)
+    reg.acquire('IMAP.example.com', timeout=0)
+    with pytest.raises(ProviderUnavailable) as exc:
+        reg.acquire('imap.example.com', timeout=0)
+    assert exc.value.reason == 'connection limit'
+
+    first.release()
+    first.release()  # idempotent
+    third = reg.acquire('imap.example.com', timeout=0)  # last burst token
+    third.release()
+    with pytest.raises(ProviderUnavailable) as exc:
+        reg.acquire('imap.example.com', timeout=0)
+    assert exc.value.reason == 'login rate'
+    assert exc.value.retry_after == pytest.approx(1.0)
+
+    clock.now += 1
+    reg.acquire('imap.example.com', timeout=0).release()
+    # Other providers have their own budget
+    reg.acquire('imap.other.net', timeout=0).release()
+
+
+def test_circuit_opens_half_opens_and_closes(registry):
+    reg, clock = registry
+    host = 'imap.example.com'
+    reg.record_failure(host, 'AUTHENTICATIONFAILED invalid credentials')
+    reg.record_failure(host, 'connection reset')
+    reg.acquire(host, timeout=0).release()  # one failure is below the threshold
+    reg.record_failure(host, 'connection reset')
+
+    with pytest.raises(ProviderUnavailable) as exc:
+        reg.acquire(host, timeout=0)
+    assert exc.value.retry_after == pytest.approx(30)
+
+    clock.now += 31
+    probe = reg.acquire(host, timeout=0)
+    assert probe.probe
+    with pytest.raises(ProviderUnavailable):
+        reg.acquire(host, timeout=0)  # only one probe at a time
+    probe.failure('timed out')
+    probe.release()
+    with pytest.raises(ProviderUnavailable):
+        reg.acquire(host, timeout=0)  # failed probe re-opens
+
+    clock.now += 31
+    probe = reg.acquire(host, timeout=0)
+    probe.success()
+    probe.release()
+    assert reg.snapshot()[0]['state'] == 'closed'
+    reg.acquire(host, timeout=0).release()
+
+
+def test_open_connection_tracks_login_and_logout(monkeypatch, registry):
+    reg, _ = registry
+    monkeypatch.setattr(imap_providers, '_REGISTRY', reg)
+
+    class FakeIMAP:
+        def __init__(self, fail_login=False):
+            self.fail_login = fail_login
+
+        def login(self, user, password):
+            if self.fail_login:
+                raise OSError('connection reset')
+            return 'OK', [b'']
+
+        def logout(self):
+            return 'BYE', [b'']
+
+    conn = imap_providers.open_connection('imap.example.com', FakeIMAP)
+    conn.login('u', 'p')
+    assert reg.snapshot()[0]['active_connections'] == 1
+    conn.logout()
+    assert reg.snapshot()[0]['active_connections'] == 0
+
+    bad = imap_providers.open_connection('imap.example.com', lambda: FakeIMAP(fail_login=True))
+    with pytest.raises(OSError):
+        bad.login('u', 'p')
+    bad.logout()
+    with pytest.raises(OSError):
+        imap_providers.open_connection('imap.example.com', lambda: (_ for _ in ()).throw(OSError('refused')))
+    state = reg.snapshot()[0]
+    assert state['state'] == 'open'
+    assert state['active_connections'] == 0
+
+
+def test_failed_probe_login_releases_slot_without_logout(monkeypatch, registry):
+    reg, clock = registry
+    monkeypatch.setattr(imap_providers, '_REGISTRY', reg)
+    host = 'imap.example.com'
+    reg.record_failure(host, 'connection reset')
+    reg.record_failure(host, 'connection reset')
+    clock.now += 31
+
+    class FlakyIMAP:
+        def login(self, user, password):
+            raise OSError('timed out')
+
+        def logout(self):
+            raise OSError('socket closed')
+
+    conn = imap_providers.open_connection(host, FlakyIMAP)
+    with pytest.raises(OSError):
+        conn.login('u', 'p')
+    # Error paths that never log out must not keep the probe in flight
+    state = reg.snapshot()[0]
+    assert state['active_connections'] == 0
+    assert state['state'] == 'open'
+    clock.now += 31
+    probe = reg.acquire(host, timeout=0)
+    assert probe.probe
+    probe.release()
+
+    imap_providers.close_connection(conn)  # logout errors are swallowed
+    imap_providers.close_connection(None)
+    assert reg.snapshot()[0]['active_connections'] == 0
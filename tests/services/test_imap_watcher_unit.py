@@ -6,6 +6,7 @@ from email.message import EmailMessage
 import pytest
 
 from app.services.imap_watcher import ImapWatcher, AccountConfig
+from app.utils.email_markers import RELEASE_BYPASS_KEYWORD
 from tests.conftest import _create_test_schema
 
 
@@ -236,6 +237,23 @@ def test_store_in_database_non_hold(monkeypatch, watcher_setup):
     assert row[0] == "FETCHED"
 
 
+def test_store_in_database_skips_release_keyword(monkeypatch, watcher_setup):
+    watcher, db_path = watcher_setup
+    email = EmailMessage()
+    email["Subject"] = "Released by move"
+    email["From"] = "sender@example.com"
+    email.set_content("body")
+
+    monkeypatch.setattr("app.services.imap_watcher.evaluate_rules", lambda *args, **kwargs: {"should_hold": True, "risk_score": 80, "keywords": []})
+
+    client = FetchClient(email.as_bytes())
+    client._data[b"FLAGS"] = (b"\\Seen", RELEASE_BYPASS_KEYWORD.encode())
+    assert watcher._store_in_database(client, [777]) == []
+    assert 777 in watcher._release_skip_uids
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM email_messages WHERE original_uid=777").fetchone()[0] == 0
+
+
 def test_update_message_status_sets_latency(watcher_setup, monkeypatch):
     watcher, db_path = watcher_setup
     watcher.cfg.quarantine = "Quarantine"
@@ -399,6 +417,59 @@ def test_connect_initializes_quarantine(monkeypatch, watcher_setup):
     assert watcher.cfg.quarantine.endswith("Quarantine")
 
 
+def test_connect_resumes_from_uidnext_after_uidvalidity_change(monkeypatch, watcher_setup):
+    from app.services import watcher_state
+
+    watcher, db_path = watcher_setup
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO email_messages (account_id, original_uid, interception_status) VALUES (1, 900, 'RELEASED')"
+        )
+        conn.commit()
+    watcher_state.save(db_path, 1, last_uid=900, uidvalidity=1)
+
+    class RebuiltMailboxClient:
+        def __init__(self, host, port, ssl, ssl_context, timeout):
+            pass
+
+        def login(self, username, password):
+            pass
+
+        def capabilities(self):
+            return [b"UIDPLUS", b"MOVE"]
+
+        def select_folder(self, folder, readonly=False):
+            pass
+
+        def create_folder(self, folder):
+            pass
+
+        def list_folders(self):
+            return [((), b"/", "INBOX")]
+
+        def folder_status(self, folder, keys):
+            return {b"UIDNEXT": 50, b"UIDVALIDITY": 2}
+
+    monkeypatch.setattr("app.services.imap_watcher.sslmod.create_default_context", lambda: None)
+    monkeypatch.setattr("app.services.imap_watcher.IMAPClient", RebuiltMailboxClient)
+
+    watcher._connect()
+
+    # UID 900 belongs to the old UIDVALIDITY; new mail starts at the server UIDNEXT
+    assert watcher._last_uidnext == 50
+    state = watcher_state.load(db_path, 1)
+    assert (state["uidvalidity"], state["uid_floor"], state["last_uid"]) == (2, 49, 49)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO email_messages (account_id, original_uid, interception_status) VALUES (1, 55, 'HELD')"
+        )
+        conn.commit()
+    restarted = ImapWatcher(watcher.cfg)
+    restarted._connect()
+    assert restarted._last_uidnext == 56  # same UIDVALIDITY: the old rows stay ignored
+
+
 def test_connect_failure_records_reason(monkeypatch, watcher_setup):
     watcher, _ = watcher_setup
 
@@ -423,3 +494,30 @@ def test_check_connection_alive_handles_exception(watcher_setup):
 
     assert watcher._check_connection_alive(None) is False
     assert watcher._check_connection_alive(BadClient()) is False
+
+
+def test_store_in_database_records_stage_metrics(monkeypatch, watcher_setup):
+    from app.utils.metrics import IngestStageTimer, ingest_fetch_bytes, ingest_stage_latency
+
+    watcher, _ = watcher_setup
+    email = EmailMessage()
+    email["Subject"] = "Timed"
+    email["From"] = "timed@example.com"
+    email["To"] = "recipient@example.com"
+    email.set_content("Body")
+    monkeypatch.setattr("app.services.imap_watcher.evaluate_rules", lambda *args, **kwargs: {"should_hold": True, "risk_score": 10, "keywords": []})
+
+    watcher._ingest_timer = IngestStageTimer(watcher.cfg.account_id, watcher.cfg.imap_host, sample_rate=1.0)
+    labels = dict(account_id=watcher._ingest_timer.account, provider="other")
+    bytes_before = ingest_fetch_bytes.labels(**labels)._sum.get()
+    stage_counts = {
+        stage: ingest_stage_latency.labels(stage=stage, **labels)._sum.get()
+        for stage in ("fetch", "parse", "rule_eval", "db_write", "db_commit")
+    }
+
+    assert watcher._store_in_database(FetchClient(email.as_bytes()), [777]) == [777]
+
+    assert ingest_fetch_bytes.labels(**labels)._sum.get() == bytes_before + len(email.as_bytes())
+    for stage, before in stage_counts.items():
+        assert ingest_stage_latency.labels(stage=stage, **labels)._sum.get() > before
+    assert watcher._held_arrivals[777] == datetime(2024, 1, 1, 12, 0, 0)
@@ -0,0 +1,102 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.services import latency_stats
+from app.services.latency_stats import LatencySketch
+
+
+@pytest.fixture
+def sketch_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "latency.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE email_messages (id INTEGER PRIMARY KEY, account_id INTEGER, latency_ms INTEGER, "
+        "created_at TEXT, action_taken_at TEXT)"
+    )
+    latency_stats.reset()
+    yield conn
+    latency_stats.reset()
+    conn.close()
+
+
+def test_sketch_quantiles_within_relative_error():
+    sketch = LatencySketch()
+    for v in range(1, 10001):
+        sketch.add(v)
+    assert sketch.count == 10000
+    for q, exact in ((0.5, 5000), (0.9, 9000), (0.99, 9900)):
+        assert abs(sketch.quantile(q) - exact) / exact < 0.03
+    assert sketch.quantile(1.0) == 10000
+
+
+def test_sketch_merge_equals_combined_stream():
+    a, b, both = LatencySketch(), LatencySketch(), LatencySketch()
+    for v in (5, 50, 500):
+        a.add(v); both.add(v)
+    for v in (7, 70, 7000):
+        b.add(v); both.add(v)
+    merged = LatencySketch.from_json(a.to_json()).merge(b)
+    assert merged.buckets == both.buckets
+    assert (merged.count, merged.min, merged.max) == (6, 5, 7000)
+
+
+def test_pending_and_flushed_observations_are_queryable(sketch_db):
+    latency_stats.record_latency(100, account_id=1)
+    latency_stats.record_latency(300, account_id=2)
+    assert latency_stats.flush(conn=sketch_db) == 2
+    latency_stats.record_latency(200, account_id=1)
+
+    all_accounts = latency_stats.get_sketch(3600, conn=sketch_db)
+    assert all_accounts.count == 3
+    acct_1 = latency_stats.get_sketch(3600, account_id=1, conn=sketch_db)
+    assert acct_1.count == 2 and acct_1.max == 200
+
+
+def test_window_excludes_older_buckets(sketch_db):
+    now = time.time()
+    latency_stats.record_latency(10, ts=now)
+    latency_stats.record_latency(20, ts=now - 3 * 86400)
+    latency_stats.flush(conn=sketch_db)
+
+    assert latency_stats.get_sketch(latency_stats.WINDOWS['24h'], conn=sketch_db).count == 1
+    assert latency_stats.get_sketch(latency_stats.WINDOWS['7d'], conn=sketch_db).count == 2
+
+
+def test_first_query_backfills_all_history(sketch_db):
+    rows = [(i, 1, 100 + i, "2000-01-01 00:00:00", None) for i in range(1, 1501)]
+    sketch_db.executemany("INSERT INTO email_messages VALUES (?, ?, ?, ?, ?)", rows)
+    sketch_db.execute(
+        "INSERT INTO email_messages VALUES (9999, 1, 5, datetime('now', '-1 hour'), datetime('now', '-1 hour'))"
+    )
+    sketch_db.commit()
+
+    recent = latency_stats.get_sketch(latency_stats.WINDOWS['24h'], conn=sketch_db)
+    assert recent.count == 1
+    persisted = sketch_db.execute("SELECT SUM(sample_count) FROM latency_sketches").fetchone()[0]
+    assert persisted == 1501
+
+
+def test_backfill_skips_rows_without_a_timestamp(sketch_db):
+    sketch_db.executemany(
+        "INSERT INTO email_messages VALUES (?, 1, ?, ?, ?)",
+        [(1, 40, "2000-01-01 00:00:00", None), (2, 50, None, None), (3, 60, "not a date", "")],
+    )
+    sketch_db.commit()
+
+    assert latency_stats.backfill_from_messages(sketch_db) == 1
+    buckets = sketch_db.execute("SELECT bucket_start, sample_count FROM latency_sketches").fetchall()
+    assert [tuple(b) for b in buckets] == [(946684800, 1)]
+
+
+def test_summary_payload_shape():
+    empty = latency_stats.summarize(LatencySketch())
+    assert empty['count'] == 0 and empty['p99'] == 0
+    sketch = LatencySketch()
+    for v in (10, 20, 30):
+        sketch.add(v)
+    payload = latency_stats.summarize(sketch)
+    assert payload['count'] == 3
+    assert payload['min'] == 10 and payload['max'] == 30
+    assert payload['mean'] == pytest.approx(20)
@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+from app.services import log_query
+
+
+def _entry(i, level="INFO", logger="app.routes.accounts"):
+    return {
+        "timestamp": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}.000000Z",
+        "level": level,
+        "logger": logger,
+        "message": f"event {i}",
+    }
+
+
+def _write(path, entries):
+    with open(path, "a", encoding="utf-8") as fh:
+        for entry in entries:
+            fh.write(json.dumps(entry) + "\n")
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(log_query, "BLOCK_SIZE", 512)
+    monkeypatch.setattr(log_query, "CHUNK_BYTES", 2048)
+    log_query.reset()
+    yield
+    log_query.reset()
+
+
+def _levels(i):
+    return "ERROR" if i in (7, 250) else ("WARNING" if i % 10 == 0 else "INFO")
+
+
+def test_query_matches_full_scan_newest_first(tmp_path, small_chunks):
+    entries = [_entry(i, _levels(i), "app.services.imap_watcher" if i % 3 == 0 else "app.routes.accounts")
+               for i in range(300)]
+    _write(tmp_path / "app_2026-01-01_000000.json.log", entries)
+    dirs = [str(tmp_path)]
+
+    newest = log_query.query(dirs, limit=5)
+    assert [r["message"] for r in newest] == [f"event {i}" for i in range(299, 294, -1)]
+    assert newest[2]["source"] == "app.services.imap_watcher"  # event 297
+
+    errors = log_query.query(dirs, levels=["ERROR"], limit=10)
+    assert [r["message"] for r in errors] == ["event 250", "event 7"]
+
+    window = log_query.query(dirs, min_level="WARNING", component="imap_watcher",
+                             since="2026-01-01T00:01:00Z", until="2026-01-01T00:02:00Z", limit=100)
+    expected = [i for i in range(120, 59, -1) if _levels(i) != "INFO" and i % 3 == 0]
+    assert [r["message"] for r in window] == [f"event {i}" for i in expected]
+
+
+def test_json_records_keep_extra_fields(tmp_path, small_chunks):
+    entry = dict(_entry(1, "ERROR"), module="accounts", function="save", line=42,
+                 exc_info="Traceback (most recent call last): ...")
+    _write(tmp_path / "app_2026-01-01_000000.json.log", [entry])
+
+    (rec,) = log_query.query([str(tmp_path)], limit=5)
+    assert rec == dict(entry, source="app.routes.accounts")
+
+
+def test_sidecar_index_lets_level_queries_skip_chunks(tmp_path, small_chunks, monkeypatch):
+    path = tmp_path / "app_2026-01-01_000000.json.log"
+    _write(path, [_entry(i, _levels(i)) for i in range(300)])
+    dirs = [str(tmp_path)]
+    log_query.query(dirs, limit=1000)
+    assert os.path.exists(str(path) + log_query.INDEX_SUFFIX)
+
+    log_query.reset()  # force the sidecar to be read back from disk
+    parsed = []
+    real = log_query.parse_line
+    monkeypatch.setattr(log_query, "parse_line", lambda raw, is_json: parsed.append(raw) or real(raw, is_json))
+    errors = log_query.query(dirs, levels=["ERROR"], limit=10)
+    assert [r["message"] for r in errors] == ["event 250", "event 7"]
+    assert 0 < len(parsed) < 150
+
+    _write(path, [_entry(300, "ERROR")])
+    assert log_query.query(dirs, levels=["ERROR"], limit=1)[0]["message"] == "event 300"
+
+
+def test_text_logs_and_follow_across_restart(tmp_path):
+    text = tmp_path / "app_2026-01-01_000000.log"
+    text.write_text(
+        "2026-01-01 00:00:01,000 INFO [simple_app] started\n"
+        "2026-01-01 00:00:02,000 ERROR [app.routes.emails] boom\n",
+        encoding="utf-8",
+    )
+    dirs = [str(tmp_path)]
+    rows = log_query.query(dirs, limit=10)
+    assert [(r["level"], r["message"], r["source"]) for r in rows] == [
+        ("ERROR", "boom", "app.routes.emails"), ("INFO", "started", "simple_app")]
+
+    first = tmp_path / "app_2026-01-01_000000.json.log"
+    _write(first, [_entry(1)])
+    follower = log_query.follow(dirs, min_level="INFO", sleep=lambda _s: None)
+    assert next(follower) == []
+
+    _write(first, [_entry(2), _entry(3, "DEBUG")])
+    assert [r["message"] for r in next(follower)] == ["event 2"]
+
+    second = tmp_path / "app_2026-01-01_000100.json.log"
+    _write(second, [_entry(4)])
+    os.utime(second, (os.path.getmtime(first) + 5,) * 2)
+    assert [r["message"] for r in next(follower)] == ["event 4"]
+    assert next(follower) == []
@@ -0,0 +1,43 @@
+import sqlite3
+
+from app.services import message_summary
+
+
+def _legacy_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE email_messages(id INTEGER PRIMARY KEY, body_text TEXT, body_html TEXT, "
+        "recipients TEXT, created_at TEXT)"
+    )
+    return conn
+
+
+def test_preview_and_recipient_normalization():
+    assert message_summary.preview_snippet("  Hello\n\n  world  ") == "Hello world"
+    assert message_summary.preview_snippet("", "<p>From <b>HTML</b></p>") == "From HTML"
+    assert len(message_summary.preview_snippet("x " * 500)) == message_summary.PREVIEW_LENGTH
+    assert message_summary.recipient_list('["a@x.com", "b@x.com"]') == ["a@x.com", "b@x.com"]
+    assert message_summary.recipient_list("a@x.com, b@x.com") == ["a@x.com", "b@x.com"]
+    assert message_summary.recipient_list('"a@x.com"') == ["a@x.com"]
+    assert message_summary.recipient_list(None) == []
+    assert message_summary.api_created_at(None, "2024-05-10 12:30:00") == "2024-05-10T12:30:00Z"
+    assert message_summary.api_created_at("2024-05-10T12:30:00Z", "ignored") == "2024-05-10T12:30:00Z"
+
+
+def test_backfill_adds_columns_and_fills_legacy_rows_in_batches():
+    conn = _legacy_db()
+    conn.executemany(
+        "INSERT INTO email_messages(body_text, body_html, recipients, created_at) VALUES (?, ?, ?, ?)",
+        [(f"body  {i}", None, "a@x.com, b@x.com", "2024-05-10 12:30:00") for i in range(7)]
+        + [(None, "<i>html only</i>", '["c@x.com"]', None)],
+    )
+    assert message_summary.ensure_columns(conn)
+    assert message_summary.ensure_columns(conn) == []  # idempotent
+
+    assert message_summary.backfill(conn, batch_size=3) == 8
+    rows = conn.execute(
+        "SELECT preview_snippet, recipients, created_at_utc FROM email_messages ORDER BY id"
+    ).fetchall()
+    assert rows[0] == ("body 0", '["a@x.com", "b@x.com"]', "2024-05-10T12:30:00Z")
+    assert rows[-1] == ("html only", '["c@x.com"]', None)
+    assert message_summary.backfill(conn) == 0
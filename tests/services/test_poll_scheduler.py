@@ -0,0 +1,70 @@
+import random
+
+from app.services import poll_scheduler
+from app.services.poll_scheduler import PollScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler(clock):
+    return PollScheduler(clock=clock, rng=random.Random(7), start_thread=False)
+
+
+def _released(sched, keys):
+    return {k for k in keys if sched.wait_turn(k, timeout=0)}
+
+
+def test_first_polls_are_spread_and_released_when_due():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    keys = list(range(10))
+    for key in keys:
+        sched.register(key, "imap.example.com")
+
+    nexts = sorted(entry["next_in"] for entry in sched.snapshot())
+    assert nexts[0] < nexts[-1]  # jittered, not synchronized
+    assert all(0 <= n <= poll_scheduler.BASE_INTERVAL for n in nexts)
+    assert _released(sched, keys) == set()
+
+    clock.now += poll_scheduler.BASE_INTERVAL
+    sched.dispatch_due()
+    released = _released(sched, keys)
+    assert len(released) == poll_scheduler.PROVIDER_BURST  # provider budget caps the burst
+
+
+def test_interval_adapts_to_activity():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.register(1, "imap.example.com")
+
+    intervals = []
+    for _ in range(4):
+        clock.now += 10
+        sched.report(1, 0)
+        intervals.append(sched.snapshot()[0]["interval"])
+    assert intervals == sorted(intervals) and intervals[-1] > intervals[0]
+
+    clock.now += 10
+    delay = sched.report(1, 3)
+    assert sched.snapshot()[0]["interval"] == poll_scheduler.MIN_INTERVAL
+    assert delay <= poll_scheduler.MIN_INTERVAL * (1 + poll_scheduler.JITTER)
+
+    stats = sched.snapshot()[0]
+    assert stats["polls"] == 5 and stats["hits"] == 1
+    assert stats["efficiency"] == 0.2
+
+
+def test_unregister_releases_waiter_without_turn():
+    clock = FakeClock()
+    sched = _scheduler(clock)
+    sched.register("a", "imap.example.com")
+    sched.unregister("a")
+    assert sched.wait_turn("a", timeout=0) is False
+    clock.now += 10_000
+    assert sched.dispatch_due() is None
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from app.services import release_jobs
+
+
+@pytest.fixture(autouse=True)
+def _clean_queue():
+    release_jobs.reset()
+    yield
+    release_jobs.reset()
+
+
+def _blocking_runner(gate, started, name):
+    def run():
+        started.append(name)
+        gate.wait(5)
+        return 200, {"ok": True, "name": name}
+    return run
+
+
+def test_per_account_limit_lets_other_accounts_overtake(monkeypatch):
+    monkeypatch.setattr(release_jobs, "MAX_WORKERS", 2)
+    monkeypatch.setattr(release_jobs, "PER_ACCOUNT_LIMIT", 1)
+    gate = threading.Event()
+    started = []
+
+    first = release_jobs.submit(1, 10, _blocking_runner(gate, started, "a1"))
+    second = release_jobs.submit(2, 10, _blocking_runner(gate, started, "a2"))
+    other = release_jobs.submit(3, 20, _blocking_runner(gate, started, "b1"))
+
+    assert release_jobs.get_job(second.id)["status"] == "queued"
+    assert release_jobs.get_job(other.id)["status"] == "running"
+    assert release_jobs.get_queue_info()["running"] == 2
+
+    gate.set()
+    for job in (first, second, other):
+        assert release_jobs.wait(job.id)["status"] == "succeeded"
+    assert started.index("b1") < started.index("a2")
+
+
+def test_resubmitting_active_job_id_is_deduplicated():
+    gate = threading.Event()
+    job = release_jobs.submit(1, 1, _blocking_runner(gate, [], "x"), job_id="key-1")
+    again = release_jobs.submit(1, 1, _blocking_runner(gate, [], "y"), job_id="key-1")
+    assert again is job
+    gate.set()
+    assert release_jobs.wait("key-1")["result"] == {"ok": True, "name": "x"}
+
+
+def test_queue_full_and_crashing_runner(monkeypatch):
+    monkeypatch.setattr(release_jobs, "MAX_WORKERS", 1)
+    monkeypatch.setattr(release_jobs, "QUEUE_MAX", 1)
+    gate = threading.Event()
+    running = release_jobs.submit(1, 1, _blocking_runner(gate, [], "run"))
+
+    def boom():
+        raise RuntimeError("imap down")
+
+    queued = release_jobs.submit(2, 2, boom)
+    with pytest.raises(release_jobs.QueueFull):
+        release_jobs.submit(3, 3, boom)
+
+    gate.set()
+    assert release_jobs.wait(running.id)["status"] == "succeeded"
+    failed = release_jobs.wait(queued.id)
+    assert failed["status"] == "failed"
+    assert failed["status_code"] == 500 and failed["result"]["error"] == "imap down"
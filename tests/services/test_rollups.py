@@ -0,0 +1,132 @@
+import sqlite3
+import pytest
+
+from app.services import rollups
+
+
+@pytest.fixture
+def rollup_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "rollups.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        """
+        CREATE TABLE email_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, direction TEXT,
+            status TEXT, interception_status TEXT, risk_score INTEGER DEFAULT 0,
+            keywords_matched TEXT, created_at TEXT
+        )
+        """
+    )
+    yield conn
+    conn.close()
+
+
+def _insert(conn, created_at, status="HELD", account_id=1, risk=0, keywords="[]"):
+    conn.execute(
+        "INSERT INTO email_messages(account_id, direction, status, interception_status, risk_score, keywords_matched, created_at) "
+        "VALUES (?, 'inbound', 'PENDING', ?, ?, ?, ?)",
+        (account_id, status, risk, keywords, created_at),
+    )
+    conn.commit()
+
+
+def _daily(conn):
+    return {
+        (r["bucket"], r["status"]): r["message_count"]
+        for r in conn.execute("SELECT bucket, status, SUM(message_count) AS message_count FROM stats_rollup_daily GROUP BY 1, 2")
+    }
+
+
+def test_rollup_aggregates_new_rows_by_hour_and_day(rollup_db):
+    _insert(rollup_db, "2024-05-01 09:15:00")
+    _insert(rollup_db, "2024-05-01 09:45:00", risk=80, keywords='["invoice"]')
+    _insert(rollup_db, "2024-05-01 17:00:00", status="RELEASED")
+
+    result = rollups.run_rollups(rollup_db)
+    assert result["last_id"] == 3
+
+    hourly = rollup_db.execute(
+        "SELECT SUM(message_count) FROM stats_rollup_hourly WHERE bucket='2024-05-01 09:00:00'"
+    ).fetchone()[0]
+    assert hourly == 2
+    assert _daily(rollup_db) == {("2024-05-01", "HELD"): 2, ("2024-05-01", "RELEASED"): 1}
+    bands = dict(rollup_db.execute("SELECT risk_band, SUM(message_count) FROM stats_rollup_daily GROUP BY 1").fetchall())
+    assert bands == {"none": 2, "high": 1}
+
+
+def test_rollup_is_incremental_and_idempotent(rollup_db):
+    _insert(rollup_db, "2024-05-01 09:15:00")
+    rollups.run_rollups(rollup_db)
+    rollups.run_rollups(rollup_db)
+    assert _daily(rollup_db) == {("2024-05-01", "HELD"): 1}
+
+    _insert(rollup_db, "2024-05-02 08:00:00")
+    result = rollups.run_rollups(rollup_db)
+    assert result["last_id"] == 2
+    assert _daily(rollup_db) == {("2024-05-01", "HELD"): 1, ("2024-05-02", "HELD"): 1}
+
+
+def test_recent_status_changes_are_restated(rollup_db):
+    _insert(rollup_db, "2024-05-10 11:10:00")
+    rollups.run_rollups(rollup_db)
+    rollup_db.execute("UPDATE email_messages SET interception_status='RELEASED'")
+    rollup_db.commit()
+
+    rollups.run_rollups(rollup_db)
+    assert _daily(rollup_db) == {("2024-05-10", "RELEASED"): 1}
+
+
+def test_old_status_changes_and_deletes_are_restated(rollup_db):
+    _insert(rollup_db, "2023-01-05 09:00:00")
+    _insert(rollup_db, "2023-01-05 10:00:00")
+    rollups.run_rollups(rollup_db)
+
+    rollup_db.execute("UPDATE email_messages SET interception_status='RELEASED' WHERE id=1")
+    rollup_db.execute("DELETE FROM email_messages WHERE id=2")
+    rollup_db.commit()
+    result = rollups.run_rollups(rollup_db)
+    assert result["hours"] == 2
+    assert _daily(rollup_db) == {("2023-01-05", "RELEASED"): 1}
+
+    # Nothing changed: nothing is recomputed
+    assert rollups.run_rollups(rollup_db)["hours"] == 0
+
+
+def test_pruned_change_cursor_rebuilds_rollups(rollup_db):
+    _insert(rollup_db, "2023-01-05 09:00:00")
+    rollups.run_rollups(rollup_db)
+    rollup_db.execute("INSERT INTO stats_rollup_daily(bucket, message_count) VALUES('2022-12-01', 7)")
+    rollup_db.execute("UPDATE email_messages SET interception_status='DISCARDED'")
+    rollup_db.execute("UPDATE email_messages SET interception_status='RELEASED'")
+    rollup_db.execute("DELETE FROM email_changes WHERE seq < (SELECT MAX(seq) FROM email_changes)")
+    rollup_db.commit()
+
+    rollups.run_rollups(rollup_db)
+    assert _daily(rollup_db) == {("2023-01-05", "RELEASED"): 1}
+
+
+def test_get_trends_groups_series(rollup_db, monkeypatch):
+    monkeypatch.setattr(rollups, "_window_start", lambda granularity, days: "2024-01-01")
+    _insert(rollup_db, "2024-05-01 09:15:00", account_id=1)
+    _insert(rollup_db, "2024-05-01 10:15:00", account_id=2, status="DISCARDED")
+    rollups.run_rollups(rollup_db)
+
+    series = rollups.get_trends("day", 30, group_by="status", conn=rollup_db)
+    assert series == [{"bucket": "2024-05-01", "total": 2, "counts": {"DISCARDED": 1, "HELD": 1}}]
+
+    scoped = rollups.get_trends("hour", 30, account_id=2, group_by="account_id", conn=rollup_db)
+    assert scoped == [{"bucket": "2024-05-01 10:00:00", "total": 1, "counts": {"2": 1}}]
+
+    with pytest.raises(ValueError):
+        rollups.get_trends("week", 30, conn=rollup_db)
+
+
+def test_trends_api_returns_series(authenticated_client):
+    resp = authenticated_client.get("/api/stats/trends?granularity=day&days=7")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["granularity"] == "day"
+    assert isinstance(data["series"], list)
+
+    assert authenticated_client.get("/api/stats/trends?group_by=subject").status_code == 400
+    assert authenticated_client.get("/api/stats/trends/latency?granularity=hour").status_code == 200
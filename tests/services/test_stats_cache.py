@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from app.services import stats
+from app.utils.metrics import stats_cache_requests
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    stats.clear_cache()
+    yield
+    stats.clear_cache()
+
+
+def _count(namespace, result):
+    return stats_cache_requests.labels(namespace=namespace, result=result)._value.get()
+
+
+def test_get_or_load_hits_after_first_miss():
+    calls = []
+    miss_before = _count("unit", "miss")
+    hit_before = _count("unit", "hit")
+
+    first, cached_first = stats.get_or_load("unit", lambda: calls.append(1) or {"n": 1})
+    second, cached_second = stats.get_or_load("unit", lambda: calls.append(1) or {"n": 2})
+
+    assert first == second == {"n": 1}
+    assert (cached_first, cached_second) == (False, True)
+    assert len(calls) == 1
+    assert _count("unit", "miss") == miss_before + 1
+    assert _count("unit", "hit") == hit_before + 1
+
+
+def test_entries_are_scoped_per_account_and_filter():
+    a, _ = stats.get_or_load("unit", lambda: "acct-1", account_id=1)
+    b, _ = stats.get_or_load("unit", lambda: "acct-2", account_id="2")
+    c, _ = stats.get_or_load("unit", lambda: "acct-1-held", account_id=1, filter_key="HELD")
+    assert (a, b, c) == ("acct-1", "acct-2", "acct-1-held")
+    assert stats.get_or_load("unit", lambda: "other", account_id="1")[0] == "acct-1"
+
+
+def test_concurrent_misses_run_loader_once():
+    calls = []
+    gate = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        gate.wait(2)
+        return 42
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(stats.get_or_load("herd", slow_loader)[0]))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == [42] * 8
+    assert len(calls) == 1
+
+
+def test_loader_error_propagates_and_is_not_cached():
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        stats.get_or_load("unit", broken)
+    assert stats.get_or_load("unit", lambda: "ok")[0] == "ok"
+
+
+def test_invalidate_drops_account_and_global_entries_only():
+    stats.get_or_load("unit", lambda: "global")
+    stats.get_or_load("unit", lambda: "acct-1", account_id=1)
+    stats.get_or_load("unit", lambda: "acct-2", account_id=2)
+
+    stats.invalidate(1)
+
+    assert stats.get_or_load("unit", lambda: "global-new")[0] == "global-new"
+    assert stats.get_or_load("unit", lambda: "acct-1-new", account_id=1)[0] == "acct-1-new"
+    assert stats.get_or_load("unit", lambda: "acct-2-new", account_id=2)[0] == "acct-2"
+
+
+def test_invalidate_during_load_discards_stale_result():
+    def loader():
+        stats.invalidate()
+        return "stale"
+
+    assert stats.get_or_load("unit", loader)[0] == "stale"
+    assert stats.get_or_load("unit", lambda: "fresh")[0] == "fresh"
+
+
+def test_get_stats_scoped_by_account(monkeypatch):
+    seen = []
+
+    def fake_fetch_counts(account_id=None, **kwargs):
+        seen.append(account_id)
+        return {k: (account_id or 0) for k in stats._COUNT_KEYS}
+
+    monkeypatch.setattr(stats, "table_exists", lambda name: True)
+    monkeypatch.setattr(stats, "fetch_counts", fake_fetch_counts)
+
+    assert stats.get_stats()["held"] == 0
+    assert stats.get_stats(account_id=3)["held"] == 3
+    assert stats.get_unified_stats(account_id=3)["released"] == 3
+    stats.get_stats(account_id=3)
+    assert seen == [None, 3, 3]
+    assert stats.get_cache_info()["has_data"] is True
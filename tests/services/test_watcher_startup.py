@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from app.services import watcher_state
+from app.utils.crypto import encrypt_credential
+from app.workers import imap_startup
+
+
+@pytest.fixture
+def startup_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "startup.db")
+    monkeypatch.setenv("TEST_DB_PATH", path)
+    monkeypatch.setenv("ENABLE_WATCHERS", "1")
+    monkeypatch.setenv("WATCHER_STARTUP_BURST", "1")
+    monkeypatch.setenv("WATCHER_STARTUP_RATE", "4")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE email_accounts (id INTEGER PRIMARY KEY, account_name TEXT, imap_username TEXT, "
+        "imap_password TEXT, is_active INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE email_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, "
+        "interception_status TEXT, original_uid INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+    )
+    pwd = encrypt_credential("secret")
+    conn.executemany(
+        "INSERT INTO email_accounts VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, "quiet", "u1", pwd, 1),
+            (2, "busy", "u2", pwd, 1),
+            (3, "backlog", "u3", pwd, 1),
+            (4, "no-creds", "", pwd, 1),
+            (5, "inactive", "u5", pwd, 0),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO email_messages(account_id, interception_status, original_uid, created_at) VALUES (?, ?, ?, ?)",
+        [
+            (1, "RELEASED", 40, "2000-01-01 00:00:00"),
+            (2, "RELEASED", 7, None),
+            (2, "RELEASED", 8, None),
+            (3, "HELD", 12, "2000-01-01 00:00:00"),
+        ],
+    )
+    conn.execute("UPDATE email_messages SET created_at=datetime('now') WHERE created_at IS NULL")
+    conn.commit()
+    watcher_state.ensure_table(conn)
+    conn.close()
+    watcher_state.save(path, 3, last_uid=5, uidvalidity=77, capabilities=[b"IDLE", b"MOVE"],
+                       quarantine_folder="INBOX.Quarantine")
+    yield path
+    watcher_state._primed.clear()
+
+
+def test_startup_prioritizes_backlog_and_ramps(startup_db):
+    started, sleeps = [], []
+    registry = {}
+
+    count = imap_startup.start_imap_watchers(
+        started.append, registry, sleep=sleeps.append, background=False
+    )
+
+    assert count == 3
+    registry_order = list(registry)
+    assert registry_order == [3, 2, 1]  # HELD backlog, then recent traffic, then the rest
+    assert sleeps == [0.25, 0.25]  # first one immediate, rest at WATCHER_STARTUP_RATE
+    for thread in registry.values():
+        thread.join(timeout=2)
+    assert sorted(started) == [1, 2, 3]
+
+    warm = watcher_state.take(3)
+    assert warm == {
+        "last_uid": 12,  # newest stored UID wins over the persisted value
+        "uidvalidity": 77,
+        "capabilities": ["IDLE", "MOVE"],
+        "quarantine_folder": "INBOX.Quarantine",
+        "uid_floor": None,
+        "uid_floor_row_id": None,
+    }
+    assert watcher_state.take(1)["last_uid"] == 40
+    assert watcher_state.take(4) is None
+
+
+def test_state_round_trip_merges_fields(tmp_path):
+    path = str(tmp_path / "state.db")
+    watcher_state.save(path, 9, uidvalidity=1, quarantine_folder="Quarantine")
+    watcher_state.save(path, 9, last_uid=33)
+
+    assert watcher_state.load(path, 9) == {
+        "last_uid": 33,
+        "uidvalidity": 1,
+        "capabilities": [],
+        "quarantine_folder": "Quarantine",
+        "uid_floor": None,
+        "uid_floor_row_id": None,
+    }
+    assert watcher_state.load(path, 10) is None
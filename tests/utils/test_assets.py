@@ -0,0 +1,60 @@
+import gzip
+import json
+
+from app.utils import assets
+
+
+def _static_tree(tmp_path, monkeypatch):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "js").mkdir()
+    for source in {s for sources in assets.BUNDLES.values() for s in sources}:
+        path = tmp_path / source
+        if source.endswith(".css"):
+            path.write_text(f"/* {source} */\n.{path.stem} ,  .x  {{\n  content: \"a  ,  b\";\n  color: red;\n}}\n")
+        else:
+            path.write_text(f"window.{path.stem} = 1\n")
+    monkeypatch.setattr(assets, "STATIC_ROOT", tmp_path)
+    return tmp_path
+
+
+def test_build_writes_fingerprinted_minified_bundles(tmp_path, monkeypatch):
+    root = _static_tree(tmp_path, monkeypatch)
+    assert assets.asset_urls("core.css") == [
+        "/static/css/tokens.css", "/static/css/base.css", "/static/css/unified.css", "/static/css/components.css",
+    ]
+
+    manifest = assets.build(root)
+    dist = root / assets.DIST_DIR
+    core = (dist / manifest["core.css"]).read_text()
+    assert manifest["core.css"].startswith("core.") and manifest["core.css"].endswith(".css")
+    assert core.index(".tokens,.x{") < core.index(".base,") < core.index(".unified,") < core.index(".components,")
+    assert 'content:"a  ,  b";color:red}' in core and "/*" not in core
+    assert gzip.decompress((dist / (manifest["core.css"] + ".gz")).read_bytes()).decode() == core
+    assert json.loads((dist / assets.MANIFEST_NAME).read_text()) == manifest
+    assert assets.asset_urls("core.css") == ["/assets/" + manifest["core.css"]]
+
+    # Content change -> new name, old files pruned
+    (root / "css" / "base.css").write_text(".base{color:blue}")
+    rebuilt = assets.build(root)
+    assert rebuilt["core.css"] != manifest["core.css"]
+    assert not (dist / manifest["core.css"]).exists()
+    assert rebuilt["js/app.js"] == manifest["js/app.js"]
+
+
+def test_assets_route_serves_precompressed_immutable_files(client, tmp_path, monkeypatch):
+    root = _static_tree(tmp_path, monkeypatch)
+    manifest = assets.build(root)
+    url = "/assets/" + manifest["js/app.js"]
+
+    plain = client.get(url)
+    assert plain.status_code == 200
+    assert "immutable" in plain.headers["Cache-Control"]
+    assert "max-age=31536000" in plain.headers["Cache-Control"]
+    assert "Content-Encoding" not in plain.headers
+
+    packed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.mimetype in ("text/javascript", "application/javascript")
+    assert gzip.decompress(packed.data) == plain.data
+    assert client.get("/assets/" + assets.MANIFEST_NAME).status_code == 404
+    assert client.get("/assets/missing.0123456789ab.css").status_code == 404
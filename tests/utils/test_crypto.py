@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+from cryptography.fernet import Fernet
+
+from app.utils import crypto
+
+
+@pytest.fixture
+def key_file(tmp_path, monkeypatch):
+    path = tmp_path / "key.txt"
+    path.write_bytes(Fernet.generate_key())
+    monkeypatch.setattr(crypto, "KEY_FILE", str(path))
+    crypto.reload_keys()
+    yield path
+    monkeypatch.undo()
+    crypto.reload_keys()
+
+
+def test_cipher_is_shared_and_decrypts_are_cached_per_account(key_file, monkeypatch):
+    assert crypto.get_cipher() is crypto.get_cipher()
+    token = crypto.encrypt_credential("s3cret")
+
+    calls = []
+    real = crypto._decrypt
+    monkeypatch.setattr(crypto, "_decrypt", lambda t: calls.append(t) or real(t))
+    assert crypto.decrypt_credential(token, account_id=1) == "s3cret"
+    assert crypto.decrypt_credential(token, account_id=1) == "s3cret"
+    assert len(calls) == 1
+    assert crypto.decrypt_credential(token) == "s3cret"
+    assert len(calls) == 2
+
+    new_token = crypto.encrypt_credential("changed")
+    assert crypto.decrypt_credential(new_token, account_id=1) == "changed"
+    assert crypto.decrypt_credential("not-a-token", account_id=1) is None
+
+
+def test_invalidate_zeroes_cached_plaintext(key_file):
+    token = crypto.encrypt_credential("s3cret")
+    crypto.decrypt_credential(token, account_id=7)
+    (_expires, secret), = [v for k, v in crypto._cache.items() if k[0] == 7]
+    crypto.invalidate_credentials(7)
+    assert bytes(secret) == b"\x00" * len("s3cret")
+    assert not [k for k in crypto._cache if k[0] == 7]
+
+
+def test_rotation_keeps_old_tokens_readable_and_reencrypts(key_file):
+    old_token = crypto.encrypt_credential("imap-pass")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE email_accounts(id INTEGER PRIMARY KEY, imap_password TEXT, smtp_password TEXT)")
+    conn.execute("INSERT INTO email_accounts VALUES (1, ?, NULL)", (old_token,))
+
+    old_key = crypto.get_encryption_key()
+    crypto.add_key()
+    assert crypto.get_encryption_keys()[1] == old_key
+    assert crypto.decrypt_credential(old_token) == "imap-pass"
+
+    assert crypto.reencrypt_credentials(conn) == 1
+    new_token = conn.execute("SELECT imap_password FROM email_accounts").fetchone()[0]
+    assert new_token != old_token
+    assert Fernet(crypto.get_encryption_key()).decrypt(new_token.encode()) == b"imap-pass"
@@ -80,3 +80,23 @@ def test_fetch_by_interception(memory_conn):
     )
     rows = db.fetch_by_interception(["HELD"], conn=memory_conn)
     assert len(rows) == 2
+
+
+def test_migrate_database_does_not_reseed_default_admin(tmp_path, monkeypatch):
+    import simple_app
+
+    monkeypatch.setenv("TEST_DB_PATH", str(tmp_path / "startup.db"))
+    simple_app.init_database()
+    conn = db.get_db()
+    conn.execute("DELETE FROM users WHERE username='admin'")
+    conn.commit()
+    conn.close()
+
+    simple_app.migrate_database()
+
+    conn = db.get_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE username='admin'").fetchone()[0] == 0
+        assert db.table_exists("email_changes", conn=conn)
+    finally:
+        conn.close()
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from app.utils import imap_batch
+
+
+class RecordingIMAP:
+    def __init__(self, move_ok=True, capabilities=("IMAP4REV1", "UIDPLUS")):
+        self.move_ok = move_ok
+        self.capabilities = capabilities
+        self.commands = []
+        self.expunged = 0
+
+    def uid(self, command, *args):
+        self.commands.append((command, *args))
+        if command == "MOVE":
+            if not self.move_ok:
+                raise RuntimeError("MOVE not supported")
+            return "OK", [None]
+        if command == "SEARCH":
+            return "OK", [b"3 4 5 6 9 12"]
+        if command == "FETCH":
+            return "OK", [
+                (b'1 (UID 3 ENVELOPE ("Mon, 1 Jan 2024 10:00:00 +0000" {21}', b"=?utf-8?q?Caf=C3=A9?="),
+                b' (("Alice" NIL "alice" "example.com")) NIL NIL (("Bob \\"B\\"" NIL "bob" "example.org")) NIL NIL NIL "<m3@x>"))',
+                b'2 (ENVELOPE (NIL "Plain subject" NIL NIL NIL NIL NIL NIL NIL NIL) UID 4)',
+            ]
+        return "OK", [None]
+
+    def expunge(self):
+        self.expunged += 1
+        return "OK", [None]
+
+
+def test_uid_sets_compress_ranges_and_respect_length():
+    assert imap_batch.uid_sets([12, 1, 2, 3, 9, 4, 5, 5]) == ["1:5,9,12"]
+    sets = imap_batch.uid_sets(range(1, 2000, 2), max_length=40)
+    assert all(len(s) <= 40 for s in sets)
+    assert sum(len(imap_batch._expand(s)) for s in sets) == 1000
+
+
+def test_move_uses_one_command_per_set():
+    imap = RecordingIMAP()
+    moved = imap_batch.move_uids(imap, [3, 4, 5, 6, 9], "Quarantine")
+    assert moved == [3, 4, 5, 6, 9]
+    assert imap.commands == [("MOVE", "3:6,9", "Quarantine")]
+
+
+def test_move_fallback_expunges_once_by_uid():
+    imap = RecordingIMAP(move_ok=False)
+    moved = imap_batch.move_uids(imap, imap_batch.search_uids(imap), "Quarantine")
+    assert moved == [3, 4, 5, 6, 9, 12]
+    assert [c[0] for c in imap.commands] == ["SEARCH", "MOVE", "COPY", "STORE", "EXPUNGE"]
+    assert imap.commands[-1] == ("EXPUNGE", "3:6,9,12")
+    assert imap.expunged == 0
+
+    legacy = RecordingIMAP(move_ok=False, capabilities=("IMAP4REV1",))
+    imap_batch.move_uids(legacy, [1, 2], "Quarantine")
+    assert legacy.expunged == 1
+
+
+def test_fetch_envelopes_parses_literals_and_addresses():
+    envelopes = imap_batch.fetch_envelopes(RecordingIMAP(), [3, 4])
+    assert envelopes[3]["subject"] == "Café"
+    assert envelopes[3]["from"] == [{"name": "Alice", "email": "alice@example.com"}]
+    assert envelopes[3]["to"] == [{"name": 'Bob "B"', "email": "bob@example.org"}]
+    assert envelopes[3]["message_id"] == "<m3@x>"
+    assert envelopes[3]["date"] == "Mon, 01 Jan 2024 10:00:00 +0000"
+    assert envelopes[4]["subject"] == "Plain subject"
+    assert envelopes[4]["from"] == []
+
+
+def test_unparseable_fetch_response_is_skipped():
+    class BrokenIMAP(RecordingIMAP):
+        def uid(self, command, *args):
+            return "OK", [(b'1 (UID 3 BODY[] {99}', b"short"), b")"]
+
+    assert imap_batch.fetch_messages(BrokenIMAP(), [3]) == {}
+
+
+def test_fetch_messages_types_internaldate_without_strptime():
+    class MessageIMAP(RecordingIMAP):
+        def uid(self, command, *args):
+            return "OK", [
+                (b'1 (UID 7 INTERNALDATE "17-Jul-1996 02:44:25 -0700" RFC822.SIZE 5 BODY[] {5}', b"hello"),
+                b")",
+                (b'2 (UID 8 INTERNALDATE "not a date" RFC822.SIZE 3 BODY[] {3}', b"bye"),
+                b")",
+            ]
+
+    messages = imap_batch.fetch_messages(MessageIMAP(), [7, 8])
+    stamp = messages[7]["internaldate"]
+    assert stamp.utcoffset() == timedelta(hours=-7)
+    assert (stamp.year, stamp.month, stamp.day, stamp.hour) == (1996, 7, 17, 2)
+    assert messages[7]["size"] == 5 and messages[7]["raw"] == b"hello"
+    assert messages[8]["internaldate"] is None
@@ -0,0 +1,79 @@
+import base64
+from email.parser import BytesParser
+from email.policy import default as default_policy
+
+from app.utils import mime_stream
+from app.utils.mime_stream import FilePart, Multipart, StreamingMessage, TextPart
+
+
+def _build(tmp_path, payload):
+    attachment = tmp_path / "report.bin"
+    attachment.write_bytes(payload)
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"\x89PNG" + b"\x00" * 300)
+
+    msg = StreamingMessage()
+    msg["Subject"] = "Quarterly report"
+    msg["From"] = "a@example.com"
+    msg["Message-ID"] = "<abc@example.com>"
+    body = Multipart("alternative", [TextPart("plain body"), TextPart("<p>html body</p>", "html")])
+    related = Multipart("related", [body, FilePart(logo, "image", "png", "logo.png", "inline", "<logo@x>")])
+    msg.body = Multipart("mixed", [related, FilePart(attachment, filename="report.bin")])
+    return msg
+
+
+def test_streamed_message_round_trips_through_parser(tmp_path):
+    payload = bytes(range(256)) * 1000
+    msg = _build(tmp_path, payload)
+
+    raw = msg.as_bytes()
+    assert b"\r\n" in raw and b"\n" not in raw.replace(b"\r\n", b"")
+
+    parsed = BytesParser(policy=default_policy).parsebytes(raw)
+    assert parsed["Subject"] == "Quarterly report"
+    assert parsed["MIME-Version"] == "1.0"
+    assert parsed.get_content_type() == "multipart/mixed"
+
+    attachments = list(parsed.iter_attachments())
+    assert [a.get_filename() for a in attachments] == ["report.bin"]
+    assert attachments[0].get_content() == payload
+
+    inline = next(p for p in parsed.walk() if p.get_content_type() == "image/png")
+    assert inline["Content-ID"] == "<logo@x>"
+    assert inline.get_content_disposition() == "inline"
+    assert parsed.get_body(("html",)).get_content().strip() == "<p>html body</p>"
+
+
+def test_header_api_matches_email_message(tmp_path):
+    msg = _build(tmp_path, b"x")
+    msg["X-Marker"] = "one"
+    msg.replace_header("X-Marker", "two")
+    assert "X-Marker" in msg and msg.get("x-marker") == "two"
+    del msg["X-Marker"]
+    assert msg.get("X-Marker") is None
+
+
+def test_base64_chunks_are_line_aligned(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"z" * 1000)
+    chunks = list(mime_stream.iter_base64(path, chunk_size=100))
+    assert len(chunks) > 1
+    lines = b"".join(chunks).split(b"\r\n")[:-1]
+    assert all(len(line) == 76 for line in lines[:-1])
+    assert base64.b64decode(b"".join(lines)) == b"z" * 1000
+
+
+def test_spool_rolls_over_to_disk(tmp_path):
+    msg = _build(tmp_path, b"y" * 20000)
+    with msg.spool(max_size=1024) as buf:
+        assert buf._rolled
+        assert buf.read(4) == b"Subj"
+
+
+def test_read_header_block_stops_at_blank_line(tmp_path):
+    raw = tmp_path / "orig.eml"
+    raw.write_bytes(b"Subject: hi\r\nMessage-ID: <m@x>\r\n\r\nbody line\r\nFrom: not-a-header\r\n")
+    headers = mime_stream.read_header_block(raw)
+    assert headers["Message-ID"] == "<m@x>"
+    assert headers["From"] is None
+    assert mime_stream.read_header_block(raw.read_bytes())["Subject"] == "hi"
@@ -6,7 +6,10 @@ Verifies that metrics are properly instrumented and exposed.
 import pytest
 
 from app.utils.metrics import (
+    IngestStageTimer,
+    ingest_stage_latency,
     normalize_account_label,
+    normalize_provider_label,
     record_interception,
     record_release,
     record_discard,
@@ -227,3 +230,32 @@ def test_normalize_account_label_sanitizes_value():
     label = normalize_account_label(' user@example.com ')
     assert label.startswith('acct:')
     assert ' ' not in label
+
+
+def test_normalize_provider_label_maps_known_hosts():
+    assert normalize_provider_label('imap.gmail.com') == 'gmail'
+    assert normalize_provider_label('outlook.office365.com') == 'outlook'
+    assert normalize_provider_label('imap.example.org') == 'other'
+    assert normalize_provider_label(None) == 'unknown'
+
+
+def test_ingest_stage_timer_observes_when_sampled():
+    timer = IngestStageTimer('timer-acct', 'imap.gmail.com', sample_rate=1.0)
+    labels = dict(stage='parse', account_id=timer.account, provider='gmail')
+    before = ingest_stage_latency.labels(**labels)._sum.get()
+    with timer.stage('parse'):
+        pass
+    timer.observe('parse', 0.5)
+    assert ingest_stage_latency.labels(**labels)._sum.get() >= before + 0.5
+
+
+def test_ingest_stage_timer_skips_when_not_sampled():
+    timer = IngestStageTimer('timer-skip', 'imap.gmail.com', sample_rate=0.0)
+    assert timer.sampled is False
+    labels = dict(stage='fetch', account_id=timer.account, provider='gmail')
+    before = ingest_stage_latency.labels(**labels)._sum.get()
+    with timer.stage('fetch'):
+        pass
+    timer.observe('fetch', 1.0)
+    timer.observe_bytes(1024)
+    assert ingest_stage_latency.labels(**labels)._sum.get() == before